@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import auth, users, properties, units, tenants, leases, invoices, maintenance, whatsapp
+from app.api.api_v1.endpoints import auth, users, properties, units, tenants, leases, invoices, maintenance, media, whatsapp, reports, transactions
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -11,4 +11,7 @@ api_router.include_router(tenants.router, prefix="/tenants", tags=["tenants"])
 api_router.include_router(leases.router, prefix="/leases", tags=["leases"])
 api_router.include_router(invoices.router, prefix="/invoices", tags=["invoices"])
 api_router.include_router(maintenance.router, prefix="/maintenance", tags=["maintenance"])
+api_router.include_router(media.router, prefix="/media", tags=["media"])
 api_router.include_router(whatsapp.router, prefix="/whatsapp", tags=["whatsapp"])
+api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
+api_router.include_router(transactions.router, prefix="/transactions", tags=["transactions"])
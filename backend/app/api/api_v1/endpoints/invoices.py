@@ -1,10 +1,16 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Any, List, Optional
+from datetime import date
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app import crud, models, schemas
 from app.api import deps
 from app.db.base import get_db
+from app.services import billing as billing_service
+from app.services import invoice_pdf
+from app.services import reconciliation as reconciliation_service
 
 router = APIRouter()
 
@@ -12,6 +18,7 @@ router = APIRouter()
 def read_invoices(
     db: Session = Depends(get_db),
     lease_id: int = Query(None, description="Lease ID to filter invoices"),
+    status: Optional[schemas.InvoiceStatus] = Query(None, description="Invoice status, e.g. overdue"),
     skip: int = 0,
     limit: int = 100,
     current_user: models.User = Depends(deps.get_current_user),
@@ -20,7 +27,7 @@ def read_invoices(
     Retrieve invoices owned by the current user.
     """
     if lease_id:
-        invoices = crud.invoice.get_by_lease(db=db, lease_id=lease_id)
+        invoices = crud.invoice.get_by_lease(db=db, lease_id=lease_id, status=status)
         # Verify lease ownership
         if invoices:
             lease = crud.lease.get(db=db, id=lease_id)
@@ -30,7 +37,9 @@ def read_invoices(
                     raise HTTPException(status_code=404, detail="Lease not found")
         return invoices
     else:
-        invoices = crud.invoice.get_by_owner(db=db, owner_id=current_user.id, skip=skip, limit=limit)
+        invoices = crud.invoice.get_by_owner(
+            db=db, owner_id=current_user.id, status=status, skip=skip, limit=limit
+        )
         return invoices
 
 @router.post("/", response_model=schemas.Invoice)
@@ -51,6 +60,117 @@ def create_invoice(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/billing-runs/preview", response_model=schemas.BillingPreview)
+def preview_billing_run(
+    db: Session = Depends(get_db),
+    period: date = Query(..., description="Any day in the month to bill"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Dry run: show how many invoices a billing run for the period would create.
+    """
+    return billing_service.preview_billing_run(db, period=period, owner_id=current_user.id)
+
+@router.post("/billing-runs", response_model=schemas.BillingRun, status_code=202)
+def create_billing_run(
+    *,
+    db: Session = Depends(get_db),
+    run_in: schemas.BillingRunCreate,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Queue invoicing all active leases of the current user for a period.
+    The run is executed after the response; poll it by id for its progress.
+    Safe to repeat: leases already invoiced for the period are skipped and
+    an interrupted run resumes where it stopped.
+    """
+    run = billing_service.start_or_resume_run(db, period=run_in.period, owner_id=current_user.id)
+    background_tasks.add_task(billing_service.execute_queued_run, run.id)
+    return run
+
+@router.get("/billing-runs/{run_id}", response_model=schemas.BillingRun)
+def read_billing_run(
+    *,
+    db: Session = Depends(get_db),
+    run_id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get a billing run of the current user.
+    """
+    run = db.get(models.BillingRun, run_id)
+    if not run or run.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Billing run not found")
+    return run
+
+@router.post("/reconciliation", response_model=schemas.ReconciliationReport)
+def reconcile_payments(
+    *,
+    db: Session = Depends(get_db),
+    request_in: schemas.ReconciliationRequest,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Match incoming bank transactions to open invoices and book them as payments.
+    Every transaction in the report lists why it was or was not matched.
+    """
+    return reconciliation_service.reconcile(
+        db, owner_id=current_user.id, start=request_in.start, end=request_in.end, dry_run=request_in.dry_run
+    )
+
+@router.post("/pdf/render", response_model=schemas.InvoiceRenderResult)
+def render_invoice_pdfs(
+    *,
+    db: Session = Depends(get_db),
+    run_in: schemas.BillingRunCreate,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Pre-render PDFs for all invoices of the current user in a billing period.
+    """
+    return invoice_pdf.render_period(db, period=run_in.period, owner_id=current_user.id)
+
+@router.post("/{id}/payments", response_model=schemas.Invoice)
+def create_invoice_payment(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    payment_in: schemas.PaymentCreate,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Record a payment for an invoice. Without an amount the open amount is paid.
+    """
+    try:
+        return crud.invoice.record_payment(
+            db=db, invoice_id=id, owner_id=current_user.id,
+            amount=payment_in.amount, paid_on=payment_in.paid_on,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{id}/pdf", response_class=FileResponse)
+async def read_invoice_pdf(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Download invoice as PDF. Rendered once per invoice revision, then served from disk.
+    """
+    data = await run_in_threadpool(invoice_pdf.get_document_data, db, invoice_id=id, owner_id=current_user.id)
+    if not data:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    path = await invoice_pdf.get_invoice_pdf(data)
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        filename=f"{data['invoice_number']}.pdf",
+        headers={"Cache-Control": "private, max-age=3600"},
+    )
+
 @router.get("/{id}", response_model=schemas.Invoice)
 def read_invoice(
     *,
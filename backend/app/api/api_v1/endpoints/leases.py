@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas
 from app.api import deps
 from app.db.base import get_db
+from app.services import ledger as ledger_service
 
 router = APIRouter()
 
@@ -46,6 +47,8 @@ def create_lease(
             db=db, obj_in=lease_in, owner_id=current_user.id
         )
         return lease
+    except crud.ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -59,7 +62,10 @@ def sign_lease(
     """
     Sign a lease digitally.
     """
-    lease = crud.lease.sign_lease(db=db, lease_id=id, owner_id=current_user.id)
+    try:
+        lease = crud.lease.sign_lease(db=db, lease_id=id, owner_id=current_user.id)
+    except crud.ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     if not lease:
         raise HTTPException(
             status_code=404, 
@@ -86,4 +92,26 @@ def read_lease(
     if not unit:
         raise HTTPException(status_code=404, detail="Lease not found")
     
-    return lease
\ No newline at end of file
+    return lease
+@router.get("/{id}/ledger", response_model=schemas.LeaseLedger)
+def read_lease_ledger(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    skip: int = 0,
+    limit: int = Query(100, le=1000),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Get the lease balance and its charges and payments, newest first.
+    """
+    lease = crud.lease.get(db=db, id=id)
+    if not lease:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    
+    # Verify ownership
+    unit = crud.unit.get_by_owner_and_id(db=db, unit_id=lease.unit_id, owner_id=current_user.id)
+    if not unit:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    
+    return ledger_service.lease_ledger(db, lease_id=id, skip=skip, limit=limit)
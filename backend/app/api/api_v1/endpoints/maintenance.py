@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas
 from app.api import deps
 from app.db.base import get_db
+from app.services import maintenance_assignment
 
 router = APIRouter()
 
@@ -36,6 +37,20 @@ def read_maintenance_requests(
         requests = crud.maintenance_request.get_by_owner(db=db, owner_id=current_user.id, skip=skip, limit=limit)
         return requests
 
+@router.get("/requests/overdue", response_model=List[schemas.MaintenanceRequest])
+def read_overdue_maintenance_requests(
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = Query(100, le=1000),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Retrieve open maintenance requests past their SLA deadline, most overdue first.
+    """
+    return crud.maintenance_request.get_overdue_by_owner(
+        db=db, owner_id=current_user.id, skip=skip, limit=limit
+    )
+
 @router.post("/requests", response_model=schemas.MaintenanceRequest)
 def create_maintenance_request(
     *,
@@ -53,6 +68,18 @@ def create_maintenance_request(
     )
     return request
 
+@router.post("/requests/auto-assign", response_model=schemas.MaintenanceAutoAssignResult)
+def auto_assign_maintenance_requests(
+    db: Session = Depends(get_db),
+    limit: int = Query(None, ge=1, description="Assign at most this many requests"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Assign open unassigned requests to the least-loaded worker with the right skill,
+    most urgent and oldest first.
+    """
+    return maintenance_assignment.auto_assign(db, owner_id=current_user.id, limit=limit)
+
 @router.put("/requests/{id}/assign", response_model=schemas.MaintenanceRequest)
 def assign_maintenance_request(
     *,
@@ -93,4 +120,47 @@ def resolve_maintenance_request(
             status_code=404, 
             detail="Maintenance request not found"
         )
-    return request
\ No newline at end of file
+    return request
+
+@router.get("/workers", response_model=List[schemas.MaintenanceWorker])
+def read_maintenance_workers(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Retrieve maintenance workers of the current user.
+    """
+    return crud.maintenance_worker.get_by_owner(db=db, owner_id=current_user.id)
+
+@router.post("/workers", response_model=schemas.MaintenanceWorker)
+def create_maintenance_worker(
+    *,
+    db: Session = Depends(get_db),
+    worker_in: schemas.MaintenanceWorkerCreate,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Register a user as maintenance worker with skills and capacity.
+    """
+    if not crud.user.get(db=db, id=worker_in.user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    try:
+        return crud.maintenance_worker.create_for_owner(db=db, obj_in=worker_in, owner_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/workers/{id}", response_model=schemas.MaintenanceWorker)
+def update_maintenance_worker(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    worker_in: schemas.MaintenanceWorkerUpdate,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Update skills, capacity or availability of a maintenance worker.
+    """
+    worker = crud.maintenance_worker.get_by_owner_and_id(db=db, worker_id=id, owner_id=current_user.id)
+    if not worker:
+        raise HTTPException(status_code=404, detail="Maintenance worker not found")
+    return crud.maintenance_worker.update(db=db, db_obj=worker, obj_in=worker_in)
@@ -0,0 +1,189 @@
+import os
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, models, schemas
+from app.api import deps
+from app.core.config import settings
+from app.db.base import get_db
+from app.services import media as media_service
+
+router = APIRouter()
+
+# Content-addressed files never change, so clients may keep them for a year
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+async def _upload(
+    request: Request,
+    db: Session,
+    *,
+    filename: str,
+    owner_id: int,
+    uploaded_by: int,
+    property_id: Optional[int] = None,
+    maintenance_request_id: Optional[int] = None,
+) -> models.MediaAttachment:
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MEDIA_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    try:
+        return await media_service.upload(
+            db,
+            request.stream(),
+            filename=filename,
+            content_type=request.headers.get("content-type", ""),
+            owner_id=owner_id,
+            uploaded_by=uploaded_by,
+            property_id=property_id,
+            maintenance_request_id=maintenance_request_id,
+        )
+    except media_service.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _file_response(request: Request, path: str, *, content_type: str, etag: str, filename: str) -> Response:
+    """Serve a content-addressed file with validators, long-lived caching and single byte ranges."""
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = media_service.parse_range(range_header, size)
+    except media_service.RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        return FileResponse(
+            path, media_type=content_type, filename=filename, headers=headers, content_disposition_type="inline"
+        )
+
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(
+        media_service.iter_file(path, start, end), status_code=206, media_type=content_type, headers=headers
+    )
+
+@router.post("/properties/{id}", response_model=schemas.MediaAttachment)
+async def upload_property_media(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    id: int,
+    filename: str = Query(..., min_length=1, description="Original file name"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Upload a photo, video or document for a property. Send the raw file as the
+    request body with its Content-Type; the body is streamed to disk.
+    """
+    property = await run_in_threadpool(
+        crud.property.get_by_owner_and_id, db=db, owner_id=current_user.id, property_id=id
+    )
+    if not property:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return await _upload(
+        request, db, filename=filename, owner_id=current_user.id, uploaded_by=current_user.id, property_id=id
+    )
+
+@router.get("/properties/{id}", response_model=List[schemas.MediaAttachment])
+def read_property_media(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    List media attached to a property.
+    """
+    property = crud.property.get_by_owner_and_id(db=db, owner_id=current_user.id, property_id=id)
+    if not property:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return media_service.list_attachments(db, property_id=id)
+
+@router.post("/maintenance-requests/{id}", response_model=schemas.MediaAttachment)
+async def upload_maintenance_request_media(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    id: int,
+    filename: str = Query(..., min_length=1, description="Original file name"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Upload a photo, video or document for a maintenance request. Send the raw
+    file as the request body with its Content-Type; the body is streamed to disk.
+    """
+    maintenance_request = await run_in_threadpool(
+        crud.maintenance_request.get_by_owner_and_id, db=db, request_id=id, owner_id=current_user.id
+    )
+    if not maintenance_request:
+        raise HTTPException(status_code=404, detail="Maintenance request not found")
+    return await _upload(
+        request, db, filename=filename, owner_id=current_user.id, uploaded_by=current_user.id,
+        maintenance_request_id=id,
+    )
+
+@router.get("/maintenance-requests/{id}", response_model=List[schemas.MediaAttachment])
+def read_maintenance_request_media(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    List media attached to a maintenance request.
+    """
+    maintenance_request = crud.maintenance_request.get_by_owner_and_id(db=db, request_id=id, owner_id=current_user.id)
+    if not maintenance_request:
+        raise HTTPException(status_code=404, detail="Maintenance request not found")
+    return media_service.list_attachments(db, maintenance_request_id=id)
+
+@router.get("/{id}")
+def download_media(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Download an attachment. Supports Range requests for seeking in videos.
+    """
+    attachment = media_service.get_attachment(db, attachment_id=id, user_id=current_user.id)
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return _file_response(
+        request, media_service.blob_path(attachment.sha256),
+        content_type=attachment.content_type, etag=attachment.sha256, filename=attachment.filename,
+    )
+
+@router.get("/{id}/thumbnail")
+async def download_media_thumbnail(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Download a JPEG thumbnail of an image attachment.
+    """
+    attachment = await run_in_threadpool(media_service.get_attachment, db, attachment_id=id, user_id=current_user.id)
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Media not found")
+    path = await media_service.get_thumbnail(attachment.sha256, attachment.content_type)
+    if not path:
+        raise HTTPException(status_code=404, detail="No thumbnail for this media")
+    return _file_response(
+        request, path, content_type="image/jpeg", etag=f"{attachment.sha256}-thumb",
+        filename=f"thumb-{attachment.filename}.jpg",
+    )
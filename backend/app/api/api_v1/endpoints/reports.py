@@ -0,0 +1,88 @@
+from typing import Any, Optional
+from datetime import date
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.api import deps
+from app.db.base import get_db
+from app.services import cashflow as cashflow_service
+from app.services import ledger as ledger_service
+from app.services import maintenance_costs
+from app.services import projection as projection_service
+from app.services import vat as vat_service
+
+router = APIRouter()
+
+@router.get("/projection", response_model=schemas.RentProjection)
+def read_rent_projection(
+    db: Session = Depends(get_db),
+    years: int = Query(5, ge=1, le=10, description="Projection horizon in years"),
+    indexation_rate: float = Query(2.0, ge=-10, le=25, description="Annual rent indexation in %"),
+    renewal_probability: float = Query(0.7, ge=0, le=1, description="Chance a tenant renews at lease end"),
+    vacancy_rate: float = Query(0.05, ge=0, le=1, description="Share of time a re-let unit stands empty"),
+    start: Optional[date] = Query(None, description="First projected month, defaults to next month"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Project monthly rent income for the current user's portfolio.
+    """
+    params = projection_service.ProjectionParams(
+        years=years,
+        indexation_rate=indexation_rate,
+        renewal_probability=renewal_probability,
+        vacancy_rate=vacancy_rate,
+        start=start,
+    )
+    return projection_service.project_rent(db, owner_id=current_user.id, params=params)
+
+@router.get("/vat", response_model=schemas.VATReturn)
+def read_vat_return(
+    db: Session = Depends(get_db),
+    year: int = Query(..., ge=2000, le=2100),
+    quarter: Optional[int] = Query(None, ge=1, le=4, description="Calendar quarter, whole year if omitted"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    VAT totals per country and rate for a quarter or year, from invoice issue dates.
+    """
+    if quarter:
+        start, end = vat_service.quarter_bounds(year, quarter)
+    else:
+        start, end = date(year, 1, 1), date(year, 12, 1)
+    return vat_service.vat_return(db, owner_id=current_user.id, start=start, end=end)
+
+@router.get("/arrears", response_model=schemas.ArrearsReport)
+def read_arrears(
+    db: Session = Depends(get_db),
+    as_of: Optional[date] = Query(None, description="Reference date, defaults to today"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Unpaid charges of the current user's leases in 0-30/31-60/61-90/90+ days past due buckets.
+    """
+    return ledger_service.aging(db, owner_id=current_user.id, as_of=as_of)
+
+@router.get("/maintenance-costs", response_model=schemas.MaintenanceCostReport)
+def read_maintenance_costs(
+    db: Session = Depends(get_db),
+    start: Optional[date] = Query(None, description="First month included, all history if omitted"),
+    end: Optional[date] = Query(None, description="Last month included"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Costs of resolved maintenance requests per property and category, by month of resolution.
+    """
+    return maintenance_costs.cost_report(db, owner_id=current_user.id, start=start, end=end)
+
+@router.get("/cashflow", response_model=schemas.CashflowReport)
+def read_cashflow(
+    db: Session = Depends(get_db),
+    months: int = Query(24, ge=1, le=60, description="Length of the series"),
+    end: Optional[date] = Query(None, description="Last month included, defaults to the current month"),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Monthly rent invoiced and collected, expenses and net operating income per property.
+    """
+    return cashflow_service.cashflow(db, owner_id=current_user.id, months=months, end=end)
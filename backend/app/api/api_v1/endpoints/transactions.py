@@ -0,0 +1,168 @@
+from datetime import date
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.api import deps
+from app.db.base import get_db
+from app.services import categorization, transaction_ledger
+
+router = APIRouter()
+
+def _ledger_query(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(deps.get_current_user),
+    account_id: Optional[str] = Query(None, description="Bank account ID"),
+    type: Optional[models.TransactionType] = None,
+    category: Optional[str] = None,
+    start: Optional[date] = Query(None, description="First booking day included"),
+    end: Optional[date] = Query(None, description="Last booking day included"),
+):
+    try:
+        return transaction_ledger.ledger_query(
+            db,
+            user_id=current_user.id,
+            account_id=account_id,
+            type=type,
+            category=category,
+            start=start,
+            end=end,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=schemas.TransactionLedger)
+def read_transactions(
+    query=Depends(_ledger_query),
+    before: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+) -> Any:
+    """
+    The current user's transactions, newest booking first.
+    """
+    try:
+        transactions, next_cursor = transaction_ledger.page(query, before=before, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"transactions": transactions, "next_cursor": next_cursor}
+
+@router.get("/export")
+def export_transactions(query=Depends(_ledger_query)) -> Any:
+    """
+    The current user's transactions as CSV, newest booking first, with the
+    same filters as the ledger. The file is streamed as it is read.
+    """
+    return StreamingResponse(
+        transaction_ledger.iter_csv(query),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="transactions.csv"'},
+    )
+
+@router.get("/category-rules", response_model=List[schemas.CategoryRule])
+def read_category_rules(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Categorization rules of the current user, in the order they are tried.
+    """
+    return (
+        db.query(models.CategoryRule)
+        .filter(models.CategoryRule.owner_id == current_user.id)
+        .order_by(models.CategoryRule.priority, models.CategoryRule.id)
+        .all()
+    )
+
+@router.post("/category-rules", response_model=schemas.CategoryRule, status_code=201)
+def create_category_rule(
+    *,
+    db: Session = Depends(get_db),
+    rule_in: schemas.CategoryRuleCreate,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Add a categorization rule. It applies to newly synced transactions;
+    existing ones are updated by `python -m app.cli recategorize-transactions`.
+    """
+    rule_data = rule_in.model_dump()
+    if rule_in.transaction_type is not None:
+        rule_data["transaction_type"] = models.TransactionType(rule_in.transaction_type.value)
+    rule = models.CategoryRule(**rule_data, owner_id=current_user.id)
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    return rule
+
+@router.delete("/category-rules/{rule_id}", response_model=schemas.CategoryRule)
+def delete_category_rule(
+    *,
+    db: Session = Depends(get_db),
+    rule_id: int,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Delete a categorization rule; categories it already assigned stay.
+    """
+    rule = (
+        db.query(models.CategoryRule)
+        .filter(models.CategoryRule.id == rule_id, models.CategoryRule.owner_id == current_user.id)
+        .first()
+    )
+    if not rule:
+        raise HTTPException(status_code=404, detail="Category rule not found")
+    db.delete(rule)
+    db.commit()
+    return rule
+
+@router.put("/{transaction_id}/category", response_model=schemas.Transaction)
+def update_transaction_category(
+    *,
+    db: Session = Depends(get_db),
+    transaction_id: str,
+    category_in: schemas.TransactionCategoryUpdate,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Set or confirm a transaction's category. Manual categories are never
+    overwritten and teach the classifier.
+    """
+    transaction = (
+        db.query(models.Transaction)
+        .filter(models.Transaction.id == transaction_id, models.Transaction.user_id == str(current_user.id))
+        .first()
+    )
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return categorization.set_category(
+        db, transaction, category=category_in.category, subcategory=category_in.subcategory
+    )
+
+@router.put("/{transaction_id}/property", response_model=schemas.Transaction)
+def update_transaction_property(
+    *,
+    db: Session = Depends(get_db),
+    transaction_id: str,
+    property_in: schemas.TransactionPropertyUpdate,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Allocate an expense to one of the current user's properties, for the
+    cash-flow report.
+    """
+    transaction = (
+        db.query(models.Transaction)
+        .filter(models.Transaction.id == transaction_id, models.Transaction.user_id == str(current_user.id))
+        .first()
+    )
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    if property_in.property_id is not None and not crud.property.get_by_owner_and_id(
+        db=db, owner_id=current_user.id, property_id=property_in.property_id
+    ):
+        raise HTTPException(status_code=404, detail="Property not found")
+    transaction.property_id = property_in.property_id
+    db.commit()
+    db.refresh(transaction)
+    return transaction
@@ -1,4 +1,5 @@
-from typing import Any, List
+from typing import Any, List, Optional
+from datetime import date
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
@@ -22,6 +23,32 @@ def read_units(
     )
     return units
 
+@router.get("/availability", response_model=List[schemas.Unit])
+def read_available_units(
+    db: Session = Depends(get_db),
+    start_date: date = Query(..., description="First day of the requested period"),
+    end_date: date = Query(..., description="Last day of the requested period"),
+    property_id: Optional[int] = Query(None, description="Restrict search to one property"),
+    skip: int = 0,
+    limit: int = 100,
+    current_user: models.User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Retrieve units across the current user's portfolio that are free for the whole period.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    units = crud.unit.get_available_for_owner(
+        db=db,
+        owner_id=current_user.id,
+        start_date=start_date,
+        end_date=end_date,
+        property_id=property_id,
+        skip=skip,
+        limit=limit,
+    )
+    return units
+
 @router.post("/", response_model=schemas.Unit)
 def create_unit(
     *,
@@ -56,7 +83,10 @@ def update_unit(
     )
     if not unit:
         raise HTTPException(status_code=404, detail="Unit not found")
-    unit = crud.unit.update(db=db, db_obj=unit, obj_in=unit_in)
+    try:
+        unit = crud.unit.update(db=db, db_obj=unit, obj_in=unit_in)
+    except crud.ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     return unit
 
 @router.delete("/{id}", response_model=schemas.Unit)
@@ -1,181 +1,81 @@
-from typing import Any, Dict
-from fastapi import APIRouter, Request, HTTPException, Depends
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Request, HTTPException, Depends, Query
 from fastapi.responses import PlainTextResponse
-import hashlib
-import hmac
 import json
 import logging
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app import crud, schemas
 from app.api import deps
 from app.models.user import User
+from app.models.whatsapp_config import WhatsAppBroadcast, WhatsAppConfig
+from app.services import whatsapp_archive, whatsapp_broadcast, whatsapp_inbox
+from app.services.whatsapp import send_whatsapp_message, verify_signature
+from app.services.whatsapp_accounts import AccountSnapshot, registry
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# WhatsApp Business API Configuration
-WHATSAPP_VERIFY_TOKEN = "your_verify_token_here"  # Set this in environment
-WHATSAPP_ACCESS_TOKEN = "your_access_token_here"  # Set this in environment
-WHATSAPP_APP_SECRET = "your_app_secret_here"     # Set this in environment
-WHATSAPP_PHONE_NUMBER_ID = "your_phone_number_id" # Set this in environment
+async def _accounts(db: Session) -> AccountSnapshot:
+    # Only reaches the database when the cached snapshot has expired
+    return registry.cached() or await run_in_threadpool(registry.load, db)
 
 @router.get("/webhook")
 async def verify_webhook(
     request: Request,
     hub_mode: str = None,
     hub_challenge: str = None,
-    hub_verify_token: str = None
+    hub_verify_token: str = None,
+    db: Session = Depends(deps.get_db)
 ):
-    """Webhook verification for WhatsApp Business API"""
-    try:
-        # Verify the webhook
-        if (hub_mode == "subscribe" and 
-            hub_challenge and 
-            hub_verify_token == WHATSAPP_VERIFY_TOKEN):
-            logger.info("WhatsApp webhook verified successfully")
-            return PlainTextResponse(hub_challenge)
-        else:
-            logger.warning("Webhook verification failed")
-            raise HTTPException(status_code=403, detail="Verification failed")
-    except Exception as e:
-        logger.error(f"Webhook verification error: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+    """Webhook verification for WhatsApp Business API; any account's verify token is accepted"""
+    accounts = await _accounts(db)
+    if (hub_mode == "subscribe" and 
+        hub_challenge and 
+        accounts.for_verify_token(hub_verify_token)):
+        logger.info("WhatsApp webhook verified successfully")
+        return PlainTextResponse(hub_challenge)
+    logger.warning("Webhook verification failed")
+    raise HTTPException(status_code=403, detail="Verification failed")
 
 @router.post("/webhook")
 async def handle_webhook(
     request: Request,
     db: Session = Depends(deps.get_db)
 ):
-    """Handle incoming WhatsApp messages"""
+    """Verify and store incoming WhatsApp events; the inbox workers process them"""
+    body = await request.body()
+    signature = request.headers.get("X-Hub-Signature-256", "")
+
     try:
-        # Verify webhook signature
-        body = await request.body()
-        signature = request.headers.get("X-Hub-Signature-256", "")
-        
-        if not verify_signature(body, signature):
-            raise HTTPException(status_code=403, detail="Invalid signature")
-        
-        # Parse webhook data
         data = json.loads(body)
-        
-        # Process webhook events
-        if "entry" in data:
-            for entry in data["entry"]:
-                if "changes" in entry:
-                    for change in entry["changes"]:
-                        if change.get("field") == "messages":
-                            await handle_message(change["value"], db)
-        
-        return {"status": "success"}
-        
-    except Exception as e:
-        logger.error(f"Webhook handling error: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
-
-def verify_signature(payload: bytes, signature: str) -> bool:
-    """Verify webhook signature for security"""
-    if not signature.startswith("sha256="):
-        return False
-    
-    signature = signature[7:]  # Remove 'sha256=' prefix
-    expected_signature = hmac.new(
-        WHATSAPP_APP_SECRET.encode(),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
-    
-    return hmac.compare_digest(expected_signature, signature)
-
-async def handle_message(message_data: Dict[str, Any], db: Session):
-    """Process incoming WhatsApp message"""
-    try:
-        if "messages" not in message_data:
-            return
-        
-        for message in message_data["messages"]:
-            from_number = message["from"]
-            message_text = message.get("text", {}).get("body", "")
-            message_id = message["id"]
-            
-            logger.info(f"Received message from {from_number}: {message_text}")
-            
-            # Generate response based on message content
-            response_text = generate_bot_response(message_text)
-            
-            # Send response back to WhatsApp
-            await send_whatsapp_message(from_number, response_text)
-            
-    except Exception as e:
-        logger.error(f"Message handling error: {e}")
-
-def generate_bot_response(message_text: str) -> str:
-    """Generate chatbot response based on message content"""
-    message_lower = message_text.lower()
-    
-    # Property management specific responses
-    if any(keyword in message_lower for keyword in ["rent", "payment", "due"]):
-        return "Your rent payments are up to date! Next payment is due on the 1st of next month. Would you like me to send you a reminder?"
-    
-    elif any(keyword in message_lower for keyword in ["maintenance", "repair", "fix", "broken"]):
-        return "I can help you schedule maintenance! Please describe what needs to be fixed and I'll create a maintenance request for you."
-    
-    elif any(keyword in message_lower for keyword in ["lease", "contract", "agreement"]):
-        return "I can help with lease information. Would you like to review your current lease terms or have questions about renewal?"
-    
-    elif any(keyword in message_lower for keyword in ["invoice", "bill", "receipt"]):
-        return "I can help you access your invoices and payment history. Would you like me to send you the latest invoice or payment receipt?"
-    
-    elif any(keyword in message_lower for keyword in ["contact", "landlord", "property manager"]):
-        return "I can connect you with your property manager. Would you like me to schedule a call or send them a message on your behalf?"
-    
-    elif any(keyword in message_lower for keyword in ["hello", "hi", "help", "start"]):
-        return """👋 Hello! I'm your RentGuy assistant. I can help you with:
-
-• Check rent payment status
-• Schedule maintenance requests  
-• Access lease information
-• View invoices and receipts
-• Contact property management
-
-How can I assist you today?"""
-    
-    else:
-        return "I understand your request. Let me connect you with our property management team who can assist you further. Is this urgent?"
-
-async def send_whatsapp_message(to_number: str, message_text: str):
-    """Send message via WhatsApp Business API"""
-    import aiohttp
-    
-    url = f"https://graph.facebook.com/v18.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-    
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "messaging_product": "whatsapp",
-        "to": to_number,
-        "text": {"body": message_text}
+    except ValueError:
+        # Would fail on every retry, so do not queue it
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    # The signing secret is that of the business number the events are for
+    accounts = await _accounts(db)
+    secrets = {
+        account.app_secret if account else None
+        for account in map(accounts.for_phone_number_id, whatsapp_inbox.phone_number_ids(data))
     }
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=data) as response:
-                if response.status == 200:
-                    logger.info(f"Message sent successfully to {to_number}")
-                else:
-                    logger.error(f"Failed to send message: {response.status}")
-                    
-    except Exception as e:
-        logger.error(f"Error sending WhatsApp message: {e}")
+    if len(secrets) != 1 or not verify_signature(body, signature, secrets.pop()):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+
+    await run_in_threadpool(whatsapp_inbox.enqueue, db, body)
+    whatsapp_inbox.inbox.wake()
+    return {"status": "success"}
 
 @router.post("/send-message")
 async def send_message_endpoint(
     request: Request,
+    db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
-    """Manual endpoint to send WhatsApp messages"""
+    """Manual endpoint to send WhatsApp messages from the current user's account"""
+    account = (await _accounts(db)).for_owner(current_user.id)
+    if account is None:
+        raise HTTPException(status_code=400, detail="No WhatsApp account is configured")
     try:
         data = await request.json()
         to_number = data.get("to")
@@ -184,9 +84,156 @@ async def send_message_endpoint(
         if not to_number or not message:
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        await send_whatsapp_message(to_number, message)
+        message_id = await send_whatsapp_message(account, to_number, message)
+        whatsapp_archive.archive.add([{
+            "message_id": message_id,
+            "from_number": account.business_phone_number or account.phone_number_id,
+            "to_number": to_number,
+            "message_text": message,
+            "direction": "outgoing",
+            "status": "sent" if message_id else "failed",
+            "user_id": current_user.id,
+        }])
+        if message_id is None:
+            raise HTTPException(status_code=502, detail="WhatsApp did not accept the message")
         return {"status": "Message sent successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Send message error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to send message")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to send message")
+
+@router.get("/tenants/{tenant_id}/messages", response_model=schemas.WhatsAppThread)
+def read_tenant_thread(
+    tenant_id: int,
+    before: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """WhatsApp messages exchanged with a tenant, newest first."""
+    tenant = crud.tenant.get_by_owner_and_id(db=db, tenant_id=tenant_id, owner_id=current_user.id)
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    if not tenant.phone_normalized:
+        return {"messages": [], "next_cursor": None}
+    try:
+        messages, next_cursor = whatsapp_archive.thread(
+            db, user_id=current_user.id, phone=tenant.phone_normalized, before=before, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"messages": messages, "next_cursor": next_cursor}
+
+@router.get("/accounts", response_model=List[schemas.WhatsAppAccount])
+def read_accounts(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Business numbers of the current user; credentials are never returned."""
+    return db.query(WhatsAppConfig).filter(WhatsAppConfig.user_id == current_user.id).order_by(WhatsAppConfig.id).all()
+
+@router.post("/accounts", response_model=schemas.WhatsAppAccount, status_code=201)
+def create_account(
+    account_in: schemas.WhatsAppAccountCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Connect a WhatsApp Business number; its webhooks and messages are routed to the current user."""
+    if db.query(WhatsAppConfig.id).filter(WhatsAppConfig.phone_number_id == account_in.phone_number_id).first():
+        raise HTTPException(status_code=400, detail="This phone number ID is already connected")
+    config = WhatsAppConfig(**account_in.model_dump(), user_id=current_user.id)
+    db.add(config)
+    db.commit()
+    db.refresh(config)
+    return config
+
+@router.delete("/accounts/{account_id}", response_model=schemas.WhatsAppAccount)
+def delete_account(
+    account_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Disconnect a business number."""
+    config = (
+        db.query(WhatsAppConfig)
+        .filter(WhatsAppConfig.id == account_id, WhatsAppConfig.user_id == current_user.id)
+        .first()
+    )
+    if not config:
+        raise HTTPException(status_code=404, detail="WhatsApp account not found")
+    db.delete(config)
+    db.commit()
+    return config
+
+@router.post("/broadcasts", response_model=schemas.Broadcast, status_code=201)
+async def create_broadcast(
+    broadcast_in: schemas.BroadcastCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Send a templated rent reminder to every tenant with a pending invoice due
+    within ``days_ahead`` days. Recipients are queued at once; sending continues
+    in the background and survives restarts.
+    """
+    try:
+        broadcast = await run_in_threadpool(
+            whatsapp_broadcast.create_broadcast,
+            db,
+            owner_id=current_user.id,
+            name=broadcast_in.name,
+            template=broadcast_in.template,
+            days_ahead=broadcast_in.days_ahead,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if broadcast.status == schemas.BroadcastStatus.PENDING.value:
+        whatsapp_broadcast.broadcaster.start(broadcast.id)
+    return broadcast
+
+@router.get("/broadcasts", response_model=List[schemas.Broadcast])
+def read_broadcasts(
+    db: Session = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Broadcasts of the current user, newest first."""
+    return (
+        db.query(WhatsAppBroadcast)
+        .filter(WhatsAppBroadcast.owner_id == current_user.id)
+        .order_by(WhatsAppBroadcast.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+@router.get("/broadcasts/{broadcast_id}", response_model=schemas.Broadcast)
+def read_broadcast(
+    broadcast_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Progress of a broadcast."""
+    broadcast = (
+        db.query(WhatsAppBroadcast)
+        .filter(WhatsAppBroadcast.id == broadcast_id, WhatsAppBroadcast.owner_id == current_user.id)
+        .first()
+    )
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return broadcast
+
+@router.post("/broadcasts/{broadcast_id}/cancel", response_model=schemas.Broadcast)
+def cancel_broadcast(
+    broadcast_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Stop a broadcast; messages not yet sent are marked cancelled."""
+    broadcast = whatsapp_broadcast.cancel_broadcast(db, broadcast_id=broadcast_id, owner_id=current_user.id)
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return broadcast
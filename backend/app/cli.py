@@ -0,0 +1,188 @@
+"""
+Command line entry points for maintenance jobs.
+
+Usage:
+    python -m app.cli billing-run --period 2024-05 [--owner-id 3] [--dry-run]
+    python -m app.cli render-invoices --period 2024-05 [--owner-id 3]
+    python -m app.cli rebuild-vat-rollups [--owner-id 3]
+    python -m app.cli backfill-maintenance-costs [--batch-size 5000]
+    python -m app.cli backfill-ledger [--batch-size 5000]
+    python -m app.cli install-lease-constraints
+    python -m app.cli backfill-tenant-phones [--batch-size 5000]
+    python -m app.cli sync-banks [--connection-id abc]
+    python -m app.cli recategorize-transactions --owner-id 3 [--batch-size 5000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+from datetime import date, datetime
+
+from app import crud
+from app.db.session import SessionLocal, engine
+from app.models.lease import install_overlap_protection
+from app.services import billing as billing_service
+from app.services import bank_sync
+from app.services import categorization
+from app.services import invoice_pdf
+from app.services import maintenance_costs
+from app.services import vat as vat_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def billing_run(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            preview = billing_service.preview_billing_run(db, period=args.period, owner_id=args.owner_id)
+            print(json.dumps(preview, default=str, indent=2))
+        else:
+            run = billing_service.execute_billing_run(
+                db, period=args.period, owner_id=args.owner_id, batch_size=args.batch_size
+            )
+            print(f"Billing run {run.id}: {run.invoices_created} invoices, total {run.total_amount:.2f}")
+    finally:
+        db.close()
+
+
+def render_invoices(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        result = invoice_pdf.render_period(db, period=args.period, owner_id=args.owner_id)
+        print(f"{result['rendered']} invoices rendered, {result['cached']} already cached")
+    finally:
+        db.close()
+        invoice_pdf.shutdown_pool()
+
+
+def rebuild_vat_rollups(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        rows = vat_service.rebuild_rollups(db, owner_id=args.owner_id)
+        print(f"Rebuilt {rows} VAT rollup rows")
+    finally:
+        db.close()
+
+
+def backfill_maintenance_costs(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        parsed = maintenance_costs.backfill_costs(db, batch_size=args.batch_size)
+        rows = maintenance_costs.rebuild_rollups(db)
+        print(f"Parsed costs of {parsed} maintenance requests, rebuilt {rows} cost rollup rows")
+    finally:
+        db.close()
+
+
+def backfill_ledger(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        posted = crud.invoice.backfill_ledger(db, batch_size=args.batch_size)
+        print(f"Posted ledger charges of {posted} invoices")
+    finally:
+        db.close()
+
+
+def install_lease_constraints(args: argparse.Namespace) -> None:
+    with engine.begin() as connection:
+        added = install_overlap_protection(connection)
+    print(f"Installed {added} lease overlap constraints" if added else "Lease overlap constraints already installed")
+
+
+def backfill_tenant_phones(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        updated = crud.tenant.backfill_phone_numbers(db, batch_size=args.batch_size)
+        print(f"Normalized phone numbers of {updated} tenants")
+    finally:
+        db.close()
+
+
+def sync_banks(args: argparse.Namespace) -> None:
+    engine = bank_sync.BankSync()
+    if args.connection_id:
+        result = asyncio.run(engine.sync_connection(args.connection_id))
+        print(f"Synced {result['accounts']} accounts, {result['transactions']} transactions written")
+    else:
+        result = asyncio.run(engine.sync_all())
+        print(
+            f"Synced {result['connections']} connections ({result['failed']} failed), "
+            f"{result['transactions']} transactions written"
+        )
+
+
+def recategorize_transactions(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        result = categorization.recategorize(db, owner_id=args.owner_id, batch_size=args.batch_size)
+        print(f"Categorized {result['transactions']} transactions, {result['updated']} changed")
+    finally:
+        db.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    billing = subparsers.add_parser("billing-run", help="Invoice all active leases for a month")
+    billing.add_argument("--period", type=_month, required=True, help="Month to bill, YYYY-MM")
+    billing.add_argument("--owner-id", type=int, default=None, help="Only bill this owner's leases")
+    billing.add_argument("--batch-size", type=int, default=None)
+    billing.add_argument("--dry-run", action="store_true", help="Show what would be invoiced")
+    billing.set_defaults(func=billing_run)
+
+    render = subparsers.add_parser("render-invoices", help="Render PDFs for all invoices of a month")
+    render.add_argument("--period", type=_month, required=True, help="Billing month, YYYY-MM")
+    render.add_argument("--owner-id", type=int, default=None, help="Only render this owner's invoices")
+    render.set_defaults(func=render_invoices)
+
+    vat = subparsers.add_parser("rebuild-vat-rollups", help="Recompute VAT rollups from VAT entries")
+    vat.add_argument("--owner-id", type=int, default=None, help="Only rebuild this owner's rollups")
+    vat.set_defaults(func=rebuild_vat_rollups)
+
+    costs = subparsers.add_parser(
+        "backfill-maintenance-costs", help="Parse existing maintenance cost strings and rebuild cost rollups"
+    )
+    costs.add_argument("--batch-size", type=int, default=5000, help="Requests updated per transaction")
+    costs.set_defaults(func=backfill_maintenance_costs)
+
+    ledger = subparsers.add_parser(
+        "backfill-ledger", help="Post ledger charges for invoices created before the lease ledger"
+    )
+    ledger.add_argument("--batch-size", type=int, default=5000, help="Invoices posted per transaction")
+    ledger.set_defaults(func=backfill_ledger)
+
+    constraints = subparsers.add_parser(
+        "install-lease-constraints", help="Add the lease overlap constraint to an existing leases table"
+    )
+    constraints.set_defaults(func=install_lease_constraints)
+
+    phones = subparsers.add_parser(
+        "backfill-tenant-phones", help="Index tenant phone numbers for matching WhatsApp senders"
+    )
+    phones.add_argument("--batch-size", type=int, default=5000, help="Tenants updated per transaction")
+    phones.set_defaults(func=backfill_tenant_phones)
+
+    banks = subparsers.add_parser("sync-banks", help="Fetch new transactions from connected bank accounts")
+    banks.add_argument("--connection-id", default=None, help="Only sync this bank connection")
+    banks.set_defaults(func=sync_banks)
+
+    recategorize = subparsers.add_parser(
+        "recategorize-transactions", help="Apply category rules and the classifier to all existing transactions"
+    )
+    recategorize.add_argument("--owner-id", type=int, required=True)
+    recategorize.add_argument("--batch-size", type=int, default=None, help="Transactions categorized per query")
+    recategorize.set_defaults(func=recategorize_transactions)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
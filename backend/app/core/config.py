@@ -23,6 +23,92 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./rentguy.db"  # Default fallback
     
+    # Billing
+    BILLING_BATCH_SIZE: int = 2000  # Leases invoiced per transaction in a billing run
+    INVOICE_NUMBER_BLOCK_SIZE: int = 100  # Invoice numbers reserved per database round trip
+    OVERDUE_INVOICE_JOB_INTERVAL_SECONDS: int = 60 * 60
+    OVERDUE_INVOICE_BATCH_SIZE: int = 5000
+    INVOICE_PDF_CACHE_DIR: str = "./data/invoice_pdfs"
+    PDF_RENDER_WORKERS: int = 0  # Processes rendering invoice PDFs, 0 = one per CPU
+    RECONCILIATION_DATE_WINDOW_DAYS: int = 20  # Fuzzy matches must be booked this close to the due date
+    RECONCILIATION_MIN_SCORE: float = 0.6  # Fuzzy match confidence required to book a payment
+    
+    # Banking
+    BANK_SYNC_PROVIDER: Optional[str] = None  # Open Banking provider, e.g. "fake" for development; unset = no syncing
+    BANK_SYNC_INTERVAL_SECONDS: int = 60 * 60
+    BANK_SYNC_CONCURRENCY: int = 8  # Accounts fetched at once, across all connections
+    BANK_SYNC_PAGE_SIZE: int = 500  # Transactions requested per provider call
+    BANK_SYNC_BATCH_SIZE: int = 1000  # Transactions upserted per statement
+    BANK_SYNC_INITIAL_DAYS: int = 90  # History fetched on a connection's first sync
+    BANK_SYNC_OVERLAP_DAYS: int = 3  # Fetched again on every sync; pending transactions settle late
+    TRANSACTION_EXPORT_BATCH_SIZE: int = 5000  # Transactions read per query of a CSV export
+    CATEGORIZATION_BATCH_SIZE: int = 5000  # Transactions categorized per query when recategorizing
+    CATEGORIZATION_MIN_CONFIDENCE: float = 0.8  # The classifier leaves transactions it is less sure of uncategorized
+    CATEGORIZATION_MIN_TRAINING_SAMPLES: int = 20  # Confirmed categories an owner needs before the classifier is used
+    CATEGORIZATION_TRAINING_LIMIT: int = 50_000  # Most recent confirmed categories trained on
+    CATEGORIZATION_HASH_BITS: int = 16  # Classifier features, 2 ** bits per category
+    CATEGORIZATION_MODEL_TTL_SECONDS: int = 10 * 60  # Rules and classifier are reloaded this often
+    CATEGORIZATION_CACHE_SIZE: int = 64  # Owners whose rules and classifier are kept in memory
+    
+    # Background jobs
+    SCHEDULER_ENABLED: bool = True
+    
+    # Maintenance
+    MAINTENANCE_ESCALATION_INTERVAL_SECONDS: int = 15 * 60
+    MAINTENANCE_ESCALATION_BATCH_SIZE: int = 5000
+    MAINTENANCE_ASSIGNMENT_INTERVAL_SECONDS: int = 5 * 60
+    
+    # Media
+    MEDIA_DIR: str = "./data/media"
+    MEDIA_MAX_UPLOAD_BYTES: int = 512 * 1024 * 1024
+    MEDIA_ALLOWED_CONTENT_TYPES: List[str] = [
+        "image/jpeg", "image/png", "image/webp", "image/gif", "video/mp4", "video/quicktime", "application/pdf",
+    ]
+    MEDIA_THUMBNAIL_SIZE: int = 320  # Longest side in pixels
+    MEDIA_THUMBNAIL_WORKERS: int = 2
+    
+    # WhatsApp
+    # Default account for owners without a WhatsAppConfig of their own; unset to require one
+    WHATSAPP_PHONE_NUMBER_ID: Optional[str] = None
+    WHATSAPP_ACCESS_TOKEN: Optional[str] = None
+    WHATSAPP_APP_SECRET: Optional[str] = None
+    WHATSAPP_VERIFY_TOKEN: Optional[str] = None
+    WHATSAPP_ACCOUNT_CACHE_SECONDS: int = 60  # Other processes see account changes after this
+    WHATSAPP_GRAPH_API_URL: str = "https://graph.facebook.com/v18.0"
+    WHATSAPP_RATE_PER_SECOND: float = 80.0  # Messages per second per sending phone number
+    WHATSAPP_RATE_BURST: int = 80
+    WHATSAPP_HTTP_POOL_SIZE: int = 100  # Open connections to the Graph API
+    WHATSAPP_HTTP_TIMEOUT_SECONDS: float = 30.0
+    WHATSAPP_MAX_RETRIES: int = 4  # On 429, 5xx and connection errors
+    WHATSAPP_RETRY_BASE_SECONDS: float = 0.5  # Backoff before the first retry, doubling after
+    WHATSAPP_RETRY_MAX_SECONDS: float = 30.0
+    WHATSAPP_INBOX_WORKERS: int = 4  # Concurrent webhook event processors, 0 = none in this process
+    WHATSAPP_INBOX_BATCH_SIZE: int = 20  # Events claimed per database round trip
+    WHATSAPP_INBOX_POLL_SECONDS: float = 1.0  # Idle workers check for work this often
+    WHATSAPP_INBOX_CLAIM_TIMEOUT_SECONDS: int = 5 * 60  # Reclaim events of crashed workers after this
+    WHATSAPP_INBOX_MAX_ATTEMPTS: int = 5
+    WHATSAPP_BROADCAST_CONCURRENCY: int = 50  # Messages of one broadcast in flight at once
+    WHATSAPP_BROADCAST_BATCH_SIZE: int = 500  # Recipients read and results written per round trip
+    WHATSAPP_BROADCAST_CLAIM_TIMEOUT_SECONDS: int = 2 * 60  # Resume broadcasts of a sender silent this long
+    WHATSAPP_BROADCAST_RESUME_INTERVAL_SECONDS: int = 60  # Check for pending or abandoned broadcasts this often
+    WHATSAPP_BROADCAST_DB_ATTEMPTS: int = 3  # Tries of a batch read or write before the sender backs off
+    WHATSAPP_BROADCAST_DB_RETRY_SECONDS: float = 1.0  # Delay before retrying a batch read or write, doubling after
+    PHONE_DEFAULT_COUNTRY_CODE: str = "31"  # For tenant numbers stored without one, e.g. "06 1234 5678"
+    WHATSAPP_TENANT_CACHE_SECONDS: int = 5 * 60  # How long a sender's tenant match is reused
+    WHATSAPP_CONVERSATION_CACHE_SIZE: int = 10_000  # Conversations kept in memory per process
+    WHATSAPP_CONVERSATION_TTL_SECONDS: int = 24 * 60 * 60  # Multi-turn context is forgotten after this
+    WHATSAPP_CONVERSATION_PURGE_INTERVAL_SECONDS: int = 60 * 60
+    WHATSAPP_ARCHIVE_BATCH_SIZE: int = 500  # Buffered outgoing messages written per insert
+    WHATSAPP_ARCHIVE_FLUSH_SECONDS: float = 1.0  # Buffered messages are written at least this often
+    WHATSAPP_ARCHIVE_BUFFER_LIMIT: int = 50_000  # Oldest buffered messages are dropped beyond this
+    WHATSAPP_ARCHIVE_RETENTION_DAYS: int = 2 * 365  # Messages are deleted after this, 0 = keep forever
+    WHATSAPP_ARCHIVE_COMPACT_AFTER_DAYS: int = 7  # Processed webhook bodies are deleted after this, 0 = keep
+    WHATSAPP_ARCHIVE_PURGE_BATCH_SIZE: int = 5_000  # Rows deleted per transaction
+    WHATSAPP_ARCHIVE_PURGE_INTERVAL_SECONDS: int = 6 * 60 * 60
+    
+    # Reports
+    REPORT_CACHE_SIZE: int = 256  # Cached report results kept per process
+    
     # First Superuser
     FIRST_SUPERUSER_EMAIL: str = "admin@rentguy.com"
     FIRST_SUPERUSER_PASSWORD: str = "AdminPassword123!"
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    interval_seconds: float
+    func: Callable[[], object]  # Blocking callable, run in the thread pool, or a coroutine function
+
+
+class Scheduler:
+    """Runs registered jobs periodically on the application's event loop."""
+
+    def __init__(self):
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, name: str, interval_seconds: float, func: Callable[[], object]) -> None:
+        self.jobs[name] = PeriodicJob(name, interval_seconds, func)
+
+    async def _loop(self, job: PeriodicJob) -> None:
+        while True:
+            await asyncio.sleep(job.interval_seconds)
+            try:
+                if asyncio.iscoroutinefunction(job.func):
+                    result = await job.func()
+                else:
+                    result = await run_in_threadpool(job.func)
+                logger.info(f"Job {job.name} finished: {result}")
+            except Exception as e:
+                # Keep the schedule alive; the next tick retries
+                logger.error(f"Job {job.name} failed: {e}")
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job:{job.name}"))
+        logger.info(f"Scheduler started with jobs: {', '.join(self.jobs) or 'none'}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+scheduler = Scheduler()
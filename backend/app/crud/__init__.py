@@ -1,13 +1,13 @@
-from .base import CRUDBase
+from .base import CRUDBase, ConcurrencyConflictError
 from .crud_user import user
 from .crud_property import property
 from .crud_unit import unit
 from .crud_tenant import tenant, screening_result
 from .crud_lease import lease
 from .crud_invoice import invoice, vat_entry
-from .crud_maintenance import maintenance_request
+from .crud_maintenance import maintenance_request, maintenance_worker
 
 __all__ = [
-    "CRUDBase", "user", "property", "unit", "tenant", "screening_result", 
-    "lease", "invoice", "vat_entry", "maintenance_request"
+    "CRUDBase", "ConcurrencyConflictError", "user", "property", "unit", "tenant", "screening_result", 
+    "lease", "invoice", "vat_entry", "maintenance_request", "maintenance_worker"
 ]
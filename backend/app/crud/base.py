@@ -3,6 +3,7 @@ from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.db.base_class import Base
 
@@ -10,6 +11,9 @@ ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+class ConcurrencyConflictError(Exception):
+    """Raised when a versioned row was changed by someone else since it was read."""
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         """
@@ -46,14 +50,22 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     ) -> ModelType:
         obj_data = jsonable_encoder(db_obj)
         if isinstance(obj_in, dict):
-            update_data = obj_in
+            update_data = dict(obj_in)
         else:
             update_data = obj_in.dict(exclude_unset=True)
+        # Versioned models: the client may pass the version it last saw
+        expected_version = update_data.pop("version", None)
+        if expected_version is not None and expected_version != getattr(db_obj, "version", None):
+            raise ConcurrencyConflictError(f"{self.model.__name__} was modified concurrently")
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
-        db.commit()
+        try:
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            raise ConcurrencyConflictError(f"{self.model.__name__} was modified concurrently")
         db.refresh(db_obj)
         return db_obj
 
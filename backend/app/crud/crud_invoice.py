@@ -1,25 +1,70 @@
 from typing import List, Optional
+from sqlalchemy import and_, func, or_, select, update
 from sqlalchemy.orm import Session
 from datetime import datetime, date, timedelta
 
 from app.crud.base import CRUDBase
-from app.models.invoice import Invoice, VATEntry
+from app.models.invoice import Invoice, InvoiceStatus, VATEntry
 from app.models.lease import Lease
 from app.models.unit import Unit
 from app.models.property import Property
 from app.schemas.invoice import InvoiceCreate, InvoiceUpdate, VATEntryCreate
+from app.services import invoice_numbers
+from app.services import ledger as ledger_service
+from app.services import vat as vat_service
 
 class CRUDInvoice(CRUDBase[Invoice, InvoiceCreate, InvoiceUpdate]):
-    def get_by_lease(self, db: Session, *, lease_id: int) -> List[Invoice]:
-        return db.query(self.model).filter(Invoice.lease_id == lease_id).all()
+    def get_by_lease(self, db: Session, *, lease_id: int, status: Optional[str] = None) -> List[Invoice]:
+        query = db.query(self.model).filter(Invoice.lease_id == lease_id)
+        return self._filter_status(query, status).all()
     
-    def get_by_owner(self, db: Session, *, owner_id: int, skip: int = 0, limit: int = 100) -> List[Invoice]:
-        return (
+    def get_by_owner(
+        self, db: Session, *, owner_id: int, status: Optional[str] = None, skip: int = 0, limit: int = 100
+    ) -> List[Invoice]:
+        query = (
             db.query(self.model)
             .join(Lease).join(Unit).join(Property)
             .filter(Property.owner_id == owner_id)
-            .offset(skip).limit(limit).all()
         )
+        return self._filter_status(query, status).offset(skip).limit(limit).all()
+    
+    def _filter_status(self, query, status: Optional[str]):
+        if status == InvoiceStatus.OVERDUE:
+            # Include pending invoices that fell due since the last overdue job run
+            return query.filter(self.overdue_condition(date.today())).order_by(Invoice.due_date)
+        if status is not None:
+            return query.filter(Invoice.status == status)
+        return query
+    
+    @staticmethod
+    def overdue_condition(as_of: date):
+        # Both branches are range scans on ix_invoices_status_due_date
+        return or_(
+            Invoice.status == InvoiceStatus.OVERDUE,
+            and_(Invoice.status == InvoiceStatus.PENDING, Invoice.due_date < as_of),
+        )
+    
+    def mark_overdue(self, db: Session, *, as_of: Optional[date] = None, batch_size: int = 5000) -> int:
+        """Move PENDING invoices past their due date to OVERDUE, one indexed UPDATE per batch."""
+        as_of = as_of or date.today()
+        total = 0
+        while True:
+            batch = (
+                select(Invoice.id)
+                .where(Invoice.status == InvoiceStatus.PENDING, Invoice.due_date < as_of)
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            result = db.execute(
+                update(Invoice)
+                .where(Invoice.id.in_(batch))
+                .values(status=InvoiceStatus.OVERDUE.value, updated_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                return total
     
     def create_for_lease(self, db: Session, *, lease_id: int, owner_id: int) -> Invoice:
         # Verify lease belongs to owner
@@ -36,8 +81,8 @@ class CRUDInvoice(CRUDBase[Invoice, InvoiceCreate, InvoiceUpdate]):
         vat_amount = amount * (lease.vat_rate / 100)
         total_amount = amount + vat_amount
         
-        # Generate invoice number
-        invoice_number = Invoice.generate_invoice_number()
+        # Take the next number from this owner's series
+        invoice_number = invoice_numbers.next_invoice_number(db, owner_id=owner_id)
         
         # Create invoice
         db_obj = Invoice(
@@ -64,10 +109,107 @@ class CRUDInvoice(CRUDBase[Invoice, InvoiceCreate, InvoiceUpdate]):
                 country_iso=lease.unit.property.country_iso
             )
             db.add(vat_entry)
+            vat_service.record_entries(
+                db,
+                owner_id=owner_id,
+                issue_date=db_obj.issue_date,
+                entries=[{
+                    "vat_rate": vat_entry.vat_rate,
+                    "net_amount": vat_entry.net_amount,
+                    "vat_amount": vat_entry.vat_amount,
+                    "gross_amount": vat_entry.gross_amount,
+                    "country_iso": vat_entry.country_iso,
+                }],
+            )
+        
+        settled = ledger_service.post_charges(db, [{
+            "lease_id": lease_id,
+            "owner_id": owner_id,
+            "invoice_id": db_obj.id,
+            "amount": total_amount,
+            "due_date": db_obj.due_date,
+            "booked_on": db_obj.issue_date,
+        }])
+        if settled:
+            # Paid from the lease's credit
+            self.mark_paid(db, invoice_ids=settled, paid_at=datetime.combine(db_obj.issue_date, datetime.min.time()))
         
         db.commit()
         db.refresh(db_obj)
         return db_obj
+    
+    def record_payment(
+        self,
+        db: Session,
+        *,
+        invoice_id: int,
+        owner_id: int,
+        amount: Optional[float] = None,
+        paid_on: Optional[date] = None,
+    ) -> Invoice:
+        """
+        Book a payment against an invoice; defaults to its open amount. Any
+        invoice the payment fully settles is marked paid.
+        """
+        invoice = (
+            db.query(Invoice).join(Lease).join(Unit).join(Property)
+            .filter(Invoice.id == invoice_id, Property.owner_id == owner_id)
+            .first()
+        )
+        if not invoice:
+            raise ValueError("Invoice not found or not owned by user")
+        if invoice.status == InvoiceStatus.CANCELLED:
+            raise ValueError("Cannot pay a cancelled invoice")
+        # Invoices from before the ledger get their charge on first payment
+        missing = ledger_service.missing_charges(db, invoice_ids=[invoice_id])
+        if missing:
+            if ledger_service.post_missing_charges(db, missing):
+                self.mark_paid(
+                    db, invoice_ids=[invoice_id], paid_at=datetime.combine(invoice.issue_date, datetime.min.time())
+                )
+            db.commit()
+        if amount is None:
+            amount = ledger_service.open_amount(db, invoice_id=invoice_id)
+        if amount <= 0:
+            raise ValueError("Payment amount must be positive")
+        
+        paid_on = paid_on or date.today()
+        settled = ledger_service.post_payment(
+            db, lease_id=invoice.lease_id, owner_id=owner_id, amount=amount,
+            booked_on=paid_on, invoice_id=invoice_id,
+        )
+        if settled:
+            self.mark_paid(db, invoice_ids=settled, paid_at=datetime.combine(paid_on, datetime.min.time()))
+        db.commit()
+        db.refresh(invoice)
+        return invoice
+    
+    def backfill_ledger(self, db: Session, *, batch_size: int = 5000) -> int:
+        """Post the charges of invoices from before the ledger, one transaction per batch; safe to repeat."""
+        total = 0
+        last_id = 0
+        while True:
+            invoices = ledger_service.missing_charges(db, after_id=last_id, limit=batch_size)
+            if not invoices:
+                return total
+            # Credit on the lease can settle the posted charges, as for new invoices
+            issued = {invoice.id: invoice.issue_date for invoice in invoices}
+            for invoice_id in ledger_service.post_missing_charges(db, invoices):
+                paid_on = issued.get(invoice_id, date.today())
+                self.mark_paid(db, invoice_ids=[invoice_id], paid_at=datetime.combine(paid_on, datetime.min.time()))
+            db.commit()
+            total += len(invoices)
+            last_id = invoices[-1].id
+    
+    def mark_paid(self, db: Session, *, invoice_ids: List[int], paid_at: datetime) -> int:
+        """Set invoices to PAID in one statement (caller commits)."""
+        result = db.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(invoice_ids), Invoice.status != InvoiceStatus.PAID)
+            .values(status=InvoiceStatus.PAID.value, paid_at=paid_at, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
 
 class CRUDVATEntry(CRUDBase[VATEntry, VATEntryCreate, VATEntryCreate]):
     def get_by_invoice(self, db: Session, *, invoice_id: int) -> List[VATEntry]:
@@ -1,8 +1,11 @@
 from typing import List, Optional
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date
 
-from app.crud.base import CRUDBase
+from app.crud.base import CRUDBase, ConcurrencyConflictError
 from app.models.lease import Lease, LeaseStatus
 from app.models.unit import Unit
 from app.models.property import Property
@@ -27,28 +30,54 @@ class CRUDLease(CRUDBase[Lease, LeaseCreate, LeaseUpdate]):
             .offset(skip).limit(limit).all()
         )
     
+    def get_overlapping(
+        self, db: Session, *, unit_id: int, start_date: date, end_date: date
+    ) -> List[Lease]:
+        return (
+            db.query(self.model)
+            .filter(Lease.unit_id == unit_id, Lease.overlapping(start_date, end_date))
+            .all()
+        )
+    
     def create_for_owner(self, db: Session, *, obj_in: LeaseCreate, owner_id: int) -> Lease:
-        # Verify unit belongs to owner and is vacant
+        if obj_in.lease_end_date < obj_in.lease_start_date:
+            raise ValueError("Lease end date must not be before start date")
+        
+        # Verify unit belongs to owner
         unit = (
             db.query(Unit).join(Property)
-            .filter(Unit.id == obj_in.unit_id, Property.owner_id == owner_id, Unit.is_vacant == True)
+            .filter(Unit.id == obj_in.unit_id, Property.owner_id == owner_id)
             .first()
         )
         if not unit:
-            raise ValueError("Unit not found, not owned by user, or not vacant")
+            raise ValueError("Unit not found or not owned by user")
         
-        # Check for existing active lease
-        existing_lease = self.get_active_by_unit(db, unit_id=obj_in.unit_id)
-        if existing_lease:
-            raise ValueError("Unit already has an active lease")
+        # Check the requested period against existing leases; the database
+        # constraint below catches anything that slips in concurrently
+        if self.get_overlapping(
+            db, unit_id=obj_in.unit_id,
+            start_date=obj_in.lease_start_date, end_date=obj_in.lease_end_date,
+        ):
+            raise ValueError("Lease period overlaps an existing lease for this unit")
         
         db_obj = self.model(**obj_in.dict())
         db.add(db_obj)
         
-        # Mark unit as occupied
-        unit.is_vacant = False
+        # Mark unit as occupied if the lease is running today
+        if obj_in.lease_start_date <= date.today() <= obj_in.lease_end_date:
+            unit.is_vacant = False
+        # Always touch the unit so the flush compare-and-swaps its version:
+        # of two concurrent leases for one unit only the first can match
+        unit.updated_at = func.now()
         
-        db.commit()
+        try:
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            raise ConcurrencyConflictError("Unit was modified concurrently, please retry")
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("Lease period overlaps an existing lease for this unit")
         db.refresh(db_obj)
         return db_obj
     
@@ -61,7 +90,11 @@ class CRUDLease(CRUDBase[Lease, LeaseCreate, LeaseUpdate]):
         if lease and lease.status == LeaseStatus.PENDING_SIGNATURE:
             lease.status = LeaseStatus.ACTIVE
             lease.digital_signed_at = datetime.utcnow()
-            db.commit()
+            try:
+                db.commit()
+            except StaleDataError:
+                db.rollback()
+                raise ConcurrencyConflictError("Lease was modified concurrently, please retry")
             db.refresh(lease)
         return lease
 
@@ -1,12 +1,30 @@
-from typing import List, Optional
+import logging
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.crud.base import CRUDBase
-from app.models.maintenance import MaintenanceRequest, MaintenanceStatus
+from app.models.maintenance import (
+    MaintenanceRequest, MaintenancePriority, MaintenanceStatus, MaintenanceWorker, OPEN_MAINTENANCE_STATUSES,
+    SLA_PERIODS,
+)
 from app.models.unit import Unit
 from app.models.property import Property
-from app.schemas.maintenance import MaintenanceRequestCreate, MaintenanceRequestUpdate
+from app.services import maintenance_costs  # noqa: F401  Registers the events that maintain the cost rollups
+from app.schemas.maintenance import (
+    MaintenanceRequestCreate, MaintenanceRequestUpdate, MaintenanceWorkerCreate, MaintenanceWorkerUpdate,
+)
+
+logger = logging.getLogger(__name__)
+
+# Escalation path for breached requests; urgent ones are re-notified instead
+NEXT_PRIORITY = {
+    MaintenancePriority.LOW.value: MaintenancePriority.NORMAL.value,
+    MaintenancePriority.NORMAL.value: MaintenancePriority.HIGH.value,
+    MaintenancePriority.HIGH.value: MaintenancePriority.URGENT.value,
+}
 
 class CRUDMaintenanceRequest(CRUDBase[MaintenanceRequest, MaintenanceRequestCreate, MaintenanceRequestUpdate]):
     def get_by_unit(self, db: Session, *, unit_id: int) -> List[MaintenanceRequest]:
@@ -23,6 +41,97 @@ class CRUDMaintenanceRequest(CRUDBase[MaintenanceRequest, MaintenanceRequestCrea
             .offset(skip).limit(limit).all()
         )
     
+    def get_by_owner_and_id(self, db: Session, *, request_id: int, owner_id: int) -> Optional[MaintenanceRequest]:
+        return (
+            db.query(self.model).join(Unit).join(Property)
+            .filter(MaintenanceRequest.id == request_id, Property.owner_id == owner_id)
+            .first()
+        )
+
+    def get_overdue_by_owner(
+        self, db: Session, *, owner_id: int, as_of: Optional[datetime] = None, skip: int = 0, limit: int = 100
+    ) -> List[MaintenanceRequest]:
+        """Open requests past their SLA deadline, most overdue first."""
+        as_of = as_of or datetime.utcnow()
+        return (
+            db.query(self.model)
+            .join(Unit).join(Property)
+            .filter(
+                Property.owner_id == owner_id,
+                MaintenanceRequest.status.in_(OPEN_MAINTENANCE_STATUSES),
+                MaintenanceRequest.sla_due_at < as_of,
+            )
+            .order_by(MaintenanceRequest.sla_due_at, MaintenanceRequest.id)
+            .offset(skip).limit(limit).all()
+        )
+    
+    def backfill_sla_deadlines(self, db: Session, *, batch_size: int = 5000) -> int:
+        """Set missing SLA deadlines on open requests created before the column existed."""
+        total = 0
+        table = MaintenanceRequest.__table__
+        while True:
+            rows = db.execute(
+                select(MaintenanceRequest.id, MaintenanceRequest.priority, MaintenanceRequest.reported_at)
+                .where(MaintenanceRequest.sla_due_at.is_(None), MaintenanceRequest.status.in_(OPEN_MAINTENANCE_STATUSES))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return total
+            db.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values(sla_due_at=bindparam("b_due")),
+                [
+                    {"b_id": id, "b_due": MaintenanceRequest.sla_deadline(priority, reported_at or datetime.utcnow())}
+                    for id, priority, reported_at in rows
+                ],
+            )
+            db.commit()
+            total += len(rows)
+    
+    def escalate_overdue(
+        self, db: Session, *, now: Optional[datetime] = None, batch_size: int = 5000
+    ) -> Dict[str, int]:
+        """
+        Bump the priority of open requests past their SLA deadline and give them
+        the new priority's SLA from now; breached urgent requests are notified
+        and get a fresh deadline so they are reported once per SLA period.
+        Each batch is a single indexed UPDATE and its own transaction.
+        """
+        now = now or datetime.utcnow()
+        counts = {"escalated": 0, "notified": 0}
+        # Urgent first, so requests bumped to urgent in this run are not also notified
+        for priority in (MaintenancePriority.URGENT.value, *reversed(list(NEXT_PRIORITY))):
+            new_priority = NEXT_PRIORITY.get(priority, priority)
+            while True:
+                ids = db.execute(
+                    select(MaintenanceRequest.id)
+                    .where(
+                        MaintenanceRequest.status.in_(OPEN_MAINTENANCE_STATUSES),
+                        MaintenanceRequest.sla_due_at < now,
+                        MaintenanceRequest.priority == priority,
+                    )
+                    .limit(batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                db.execute(
+                    update(MaintenanceRequest)
+                    .where(MaintenanceRequest.id.in_(ids))
+                    .values(
+                        priority=new_priority,
+                        sla_due_at=now + SLA_PERIODS[new_priority],
+                        escalation_level=MaintenanceRequest.escalation_level + 1,
+                        escalated_at=now,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+                if priority == new_priority:
+                    counts["notified"] += len(ids)
+                    logger.warning(f"{len(ids)} urgent maintenance requests breached their SLA: {ids[:20]}")
+                else:
+                    counts["escalated"] += len(ids)
+        return counts
+    
     def create_for_unit(self, db: Session, *, obj_in: MaintenanceRequestCreate, reported_by: int) -> MaintenanceRequest:
         obj_in_data = obj_in.dict()
         obj_in_data["reported_by"] = reported_by
@@ -53,6 +162,7 @@ class CRUDMaintenanceRequest(CRUDBase[MaintenanceRequest, MaintenanceRequestCrea
             .first()
         )
         if request:
+            # The cost rollups follow through the request's mapper events
             request.status = MaintenanceStatus.RESOLVED
             request.resolved_at = datetime.utcnow()
             if actual_cost:
@@ -61,4 +171,29 @@ class CRUDMaintenanceRequest(CRUDBase[MaintenanceRequest, MaintenanceRequestCrea
             db.refresh(request)
         return request
 
-maintenance_request = CRUDMaintenanceRequest(MaintenanceRequest)
\ No newline at end of file
+class CRUDMaintenanceWorker(CRUDBase[MaintenanceWorker, MaintenanceWorkerCreate, MaintenanceWorkerUpdate]):
+    def get_by_owner(self, db: Session, *, owner_id: int) -> List[MaintenanceWorker]:
+        return db.query(self.model).filter(MaintenanceWorker.owner_id == owner_id).order_by(MaintenanceWorker.id).all()
+    
+    def get_by_owner_and_id(self, db: Session, *, worker_id: int, owner_id: int) -> Optional[MaintenanceWorker]:
+        return (
+            db.query(self.model)
+            .filter(MaintenanceWorker.id == worker_id, MaintenanceWorker.owner_id == owner_id)
+            .first()
+        )
+    
+    def create_for_owner(self, db: Session, *, obj_in: MaintenanceWorkerCreate, owner_id: int) -> MaintenanceWorker:
+        obj_in_data = obj_in.dict()
+        obj_in_data["skills"] = [skill.value for skill in obj_in.skills]
+        db_obj = self.model(**obj_in_data, owner_id=owner_id)
+        db.add(db_obj)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("This user is already a maintenance worker")
+        db.refresh(db_obj)
+        return db_obj
+
+maintenance_request = CRUDMaintenanceRequest(MaintenanceRequest)
+maintenance_worker = CRUDMaintenanceWorker(MaintenanceWorker)
\ No newline at end of file
@@ -1,9 +1,10 @@
 from typing import List, Optional
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.crud.base import CRUDBase
-from app.models.tenant import Tenant, ScreeningResult, ScreeningStatus
+from app.models.tenant import Tenant, ScreeningResult, ScreeningStatus, normalize_phone
 from app.schemas.tenant import TenantCreate, TenantUpdate, ScreeningResultCreate, ScreeningResultUpdate
 
 class CRUDTenant(CRUDBase[Tenant, TenantCreate, TenantUpdate]):
@@ -18,6 +19,28 @@ class CRUDTenant(CRUDBase[Tenant, TenantCreate, TenantUpdate]):
             .all()
         )
     
+    def backfill_phone_numbers(self, db: Session, *, batch_size: int = 5000) -> int:
+        """Set phone_normalized on tenants saved before the column existed."""
+        total = 0
+        last_id = 0
+        table = Tenant.__table__
+        while True:
+            rows = db.execute(
+                select(Tenant.id, Tenant.phone_number)
+                .where(Tenant.id > last_id, Tenant.phone_number.isnot(None), Tenant.phone_normalized.is_(None))
+                .order_by(Tenant.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return total
+            db.execute(
+                update(table).where(table.c.id == bindparam("b_id")).values(phone_normalized=bindparam("b_phone")),
+                [{"b_id": id, "b_phone": normalize_phone(phone)} for id, phone in rows],
+            )
+            db.commit()
+            total += len(rows)
+            last_id = rows[-1][0]
+    
     def get_by_owner_and_id(
         self, db: Session, *, tenant_id: int, owner_id: int
     ) -> Optional[Tenant]:
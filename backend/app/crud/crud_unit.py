@@ -1,9 +1,11 @@
 from typing import List, Optional
+from datetime import date
 from sqlalchemy.orm import Session
 
 from app.crud.base import CRUDBase
 from app.models.unit import Unit
 from app.models.property import Property
+from app.models.lease import Lease
 from app.schemas.unit import UnitCreate, UnitUpdate
 
 class CRUDUnit(CRUDBase[Unit, UnitCreate, UnitUpdate]):
@@ -38,6 +40,32 @@ class CRUDUnit(CRUDBase[Unit, UnitCreate, UnitUpdate]):
             .first()
         )
     
+    def get_available_for_owner(
+        self,
+        db: Session,
+        *,
+        owner_id: int,
+        start_date: date,
+        end_date: date,
+        property_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Unit]:
+        """Units of the owner's portfolio with no blocking lease in the date range."""
+        busy = (
+            db.query(Lease.id)
+            .filter(Lease.unit_id == Unit.id, Lease.overlapping(start_date, end_date))
+            .exists()
+        )
+        query = (
+            db.query(self.model)
+            .join(Property)
+            .filter(Property.owner_id == owner_id, ~busy)
+        )
+        if property_id is not None:
+            query = query.filter(Unit.property_id == property_id)
+        return query.order_by(Unit.id).offset(skip).limit(limit).all()
+    
     def create_for_property(
         self, db: Session, *, obj_in: UnitCreate, owner_id: int
     ) -> Unit:
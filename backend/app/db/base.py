@@ -5,10 +5,14 @@ from app.models.property import Property
 from app.models.unit import Unit
 from app.models.tenant import Tenant, ScreeningResult
 from app.models.lease import Lease
-from app.models.invoice import Invoice, VATEntry
-from app.models.maintenance import MaintenanceRequest
+from app.models.invoice import Invoice, VATEntry, InvoiceSequence, VATRollup
+from app.models.billing_run import BillingRun
+from app.models.ledger import LedgerEntry, LeaseBalance
+from app.models.maintenance import MaintenanceRequest, MaintenanceWorker, MaintenanceCostRollup
+from app.models.media import MediaBlob, MediaAttachment
 from app.models.bank_connection import BankConnection, BankAccount
-from app.models.transaction import Transaction
+from app.models.whatsapp_config import WhatsAppConfig, WhatsAppMessage, WhatsAppWebhookEvent, WhatsAppBroadcast, WhatsAppConversation
+from app.models.transaction import Transaction, TransactionRawData, CategoryRule
 
 # Re-export the database session components
 from app.db.session import SessionLocal, engine, get_db
@@ -0,0 +1,100 @@
+"""
+Periodic background jobs, registered on the shared scheduler at startup.
+"""
+import asyncio
+import logging
+
+from app import crud
+from app.core.config import settings
+from app.core.scheduler import scheduler
+from app.db.session import SessionLocal
+from app.services import (
+    bank_sync,
+    maintenance_assignment,
+    whatsapp_archive,
+    whatsapp_broadcast,
+    whatsapp_conversations,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def mark_overdue_invoices() -> int:
+    db = SessionLocal()
+    try:
+        return crud.invoice.mark_overdue(db, batch_size=settings.OVERDUE_INVOICE_BATCH_SIZE)
+    finally:
+        db.close()
+
+
+def escalate_maintenance_requests() -> dict:
+    db = SessionLocal()
+    try:
+        batch_size = settings.MAINTENANCE_ESCALATION_BATCH_SIZE
+        crud.maintenance_request.backfill_sla_deadlines(db, batch_size=batch_size)
+        return crud.maintenance_request.escalate_overdue(db, batch_size=batch_size)
+    finally:
+        db.close()
+
+
+def auto_assign_maintenance_requests() -> int:
+    db = SessionLocal()
+    try:
+        return maintenance_assignment.auto_assign_all(db)
+    finally:
+        db.close()
+
+
+def purge_whatsapp_conversations() -> int:
+    db = SessionLocal()
+    try:
+        return whatsapp_conversations.conversations.purge_expired(db)
+    finally:
+        db.close()
+
+
+def purge_whatsapp_archive() -> dict:
+    db = SessionLocal()
+    try:
+        return whatsapp_archive.purge(db)
+    finally:
+        db.close()
+
+
+def sync_bank_connections() -> dict:
+    # Runs in the thread pool, so it gets an event loop of its own
+    return asyncio.run(bank_sync.BankSync().sync_all())
+
+
+def register_jobs() -> None:
+    scheduler.register(
+        "mark_overdue_invoices", settings.OVERDUE_INVOICE_JOB_INTERVAL_SECONDS, mark_overdue_invoices
+    )
+    scheduler.register(
+        "escalate_maintenance_requests",
+        settings.MAINTENANCE_ESCALATION_INTERVAL_SECONDS,
+        escalate_maintenance_requests,
+    )
+    scheduler.register(
+        "auto_assign_maintenance_requests",
+        settings.MAINTENANCE_ASSIGNMENT_INTERVAL_SECONDS,
+        auto_assign_maintenance_requests,
+    )
+    scheduler.register(
+        "purge_whatsapp_conversations",
+        settings.WHATSAPP_CONVERSATION_PURGE_INTERVAL_SECONDS,
+        purge_whatsapp_conversations,
+    )
+    scheduler.register(
+        "purge_whatsapp_archive",
+        settings.WHATSAPP_ARCHIVE_PURGE_INTERVAL_SECONDS,
+        purge_whatsapp_archive,
+    )
+    # Also run at startup; this picks up broadcasts whose sender gave up or died since
+    scheduler.register(
+        "resume_whatsapp_broadcasts",
+        settings.WHATSAPP_BROADCAST_RESUME_INTERVAL_SECONDS,
+        whatsapp_broadcast.broadcaster.resume,
+    )
+    if settings.BANK_SYNC_PROVIDER:
+        scheduler.register("sync_bank_connections", settings.BANK_SYNC_INTERVAL_SECONDS, sync_bank_connections)
@@ -11,6 +11,9 @@ from app.api.api_v1.api import api_router
 from app.core.config import settings
 from app.db.base import Base, engine, SessionLocal
 from app.startup import init_db, check_db_connected
+from app.core.scheduler import scheduler
+from app.jobs import register_jobs
+from app.services import invoice_pdf, media, whatsapp, whatsapp_archive, whatsapp_broadcast, whatsapp_inbox
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -89,6 +92,28 @@ async def startup_event():
         logger.warning(f"Error during startup (continuing anyway): {e}")
         # Don't raise - let the application start anyway
         # Database might become available later
+    finally:
+        if settings.SCHEDULER_ENABLED:
+            register_jobs()
+            scheduler.start()
+        await whatsapp.client.start()
+        whatsapp_inbox.inbox.start(settings.WHATSAPP_INBOX_WORKERS)
+        whatsapp_archive.archive.start()
+        try:
+            await whatsapp_broadcast.broadcaster.resume()
+        except Exception as e:
+            logger.warning(f"Could not resume WhatsApp broadcasts: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scheduler.stop()
+    await whatsapp_inbox.inbox.stop()
+    await whatsapp_broadcast.broadcaster.stop()
+    # After everything that archives messages has stopped
+    await whatsapp_archive.archive.stop()
+    await whatsapp.client.close()
+    invoice_pdf.shutdown_pool()
+    media.shutdown_pool()
 
 # Health check endpoint
 @app.get(f"{settings.API_V1_STR}/health", status_code=status.HTTP_200_OK)
@@ -8,10 +8,14 @@ from app.models.property import Property
 from app.models.unit import Unit  
 from app.models.tenant import Tenant, ScreeningResult
 from app.models.lease import Lease
-from app.models.invoice import Invoice, VATEntry
-from app.models.maintenance import MaintenanceRequest
+from app.models.invoice import Invoice, VATEntry, InvoiceSequence, VATRollup
+from app.models.ledger import LedgerEntry, LedgerEntryType, LeaseBalance
+from app.models.billing_run import BillingRun, BillingRunStatus
+from app.models.maintenance import MaintenanceRequest, MaintenanceWorker, MaintenanceCostRollup
+from app.models.media import MediaBlob, MediaAttachment
 from app.models.bank_connection import BankConnection, BankAccount, BankConnectionStatus
-from app.models.transaction import Transaction, TransactionType, TransactionStatus
+from app.models.whatsapp_config import WhatsAppConfig, WhatsAppMessage, WhatsAppWebhookEvent, WhatsAppBroadcast, WhatsAppConversation
+from app.models.transaction import Transaction, TransactionType, TransactionStatus, TransactionRawData, CategoryRule, CategorySource
 
 __all__ = [
     "UserRole",
@@ -23,11 +27,30 @@ __all__ = [
     "Lease", 
     "Invoice",
     "VATEntry",
+    "InvoiceSequence",
+    "VATRollup",
+    "BillingRun",
+    "BillingRunStatus",
+    "LedgerEntry",
+    "LedgerEntryType",
+    "LeaseBalance",
     "MaintenanceRequest",
+    "MaintenanceWorker",
+    "MaintenanceCostRollup",
+    "MediaBlob",
+    "MediaAttachment",
     "BankConnection",
     "BankAccount", 
     "BankConnectionStatus",
     "Transaction",
     "TransactionType",
-    "TransactionStatus"
+    "TransactionStatus",
+    "TransactionRawData",
+    "CategoryRule",
+    "CategorySource",
+    "WhatsAppConfig",
+    "WhatsAppMessage",
+    "WhatsAppWebhookEvent",
+    "WhatsAppBroadcast",
+    "WhatsAppConversation",
 ]
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
@@ -57,9 +57,10 @@ class BankConnection(Base):
 
 class BankAccount(Base):
     __tablename__ = "bank_accounts"
+    __table_args__ = (UniqueConstraint("connection_id", "account_id", name="uq_bank_accounts_connection_account"),)
     
     id = Column(String, primary_key=True, index=True)
-    connection_id = Column(String, ForeignKey("bank_connections.id"), nullable=False)
+    connection_id = Column(String, ForeignKey("bank_connections.id"), nullable=False, index=True)
     
     # Account details
     account_id = Column(String, nullable=False)  # ID from the bank
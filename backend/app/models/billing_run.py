@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, String, Float, Index, func
+import enum
+
+from app.db.base_class import Base
+
+class BillingRunStatus(str, enum.Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class BillingRun(Base):
+    __tablename__ = "billing_runs"
+    __table_args__ = (
+        Index("ix_billing_runs_owner_period", "owner_id", "period"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # None = all owners
+    period = Column(Date, nullable=False)  # First day of the billed month
+    status = Column(String, nullable=False, default=BillingRunStatus.RUNNING)
+    last_lease_id = Column(Integer, nullable=False, default=0)  # Resume cursor
+    invoices_created = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<BillingRun {self.period} - {self.status}>"
@@ -1,7 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Enum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Enum, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 import enum
-from datetime import datetime, timedelta
 
 from app.db.base_class import Base
 
@@ -13,12 +12,19 @@ class InvoiceStatus(str, enum.Enum):
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # At most one invoice per lease and billing period
+        UniqueConstraint("lease_id", "billing_period", name="uq_invoices_lease_period"),
+        # Serves overdue detection and status filters
+        Index("ix_invoices_status_due_date", "status", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     lease_id = Column(Integer, ForeignKey("leases.id"), nullable=False)
     invoice_number = Column(String, nullable=False, unique=True, index=True)
     issue_date = Column(Date, nullable=False)
     due_date = Column(Date, nullable=False)
+    billing_period = Column(Date, nullable=True)  # First day of the billed month, set by billing runs
     amount = Column(Float, nullable=False)
     vat_amount = Column(Float, nullable=False, default=0.0)
     total_amount = Column(Float, nullable=False)
@@ -38,15 +44,25 @@ class Invoice(Base):
     @property
     def is_overdue(self) -> bool:
         from datetime import date
+        if self.status == InvoiceStatus.OVERDUE:
+            return True
         return self.status == InvoiceStatus.PENDING and self.due_date < date.today()
 
     @classmethod
-    def generate_invoice_number(cls, date_obj: datetime = None) -> str:
-        if date_obj is None:
-            date_obj = datetime.now()
-        date_str = date_obj.strftime("%Y%m%d")
-        # In production, this should include a sequence number from the database
-        return f"INV-{date_str}-{datetime.now().microsecond}"
+    def format_invoice_number(cls, series: str, number: int) -> str:
+        # Numbers come from InvoiceSequence blocks, see app.services.invoice_numbers
+        return f"INV-{series}-{number:06d}"
+
+class InvoiceSequence(Base):
+    """Per-series counter handing out blocks of invoice numbers (hi/lo)."""
+    __tablename__ = "invoice_sequences"
+
+    series = Column(String(50), primary_key=True)
+    next_value = Column(Integer, nullable=False, default=1)  # First number not yet reserved
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<InvoiceSequence {self.series} - {self.next_value}>"
 
 class VATEntry(Base):
     __tablename__ = "vat_entries"
@@ -64,4 +80,22 @@ class VATEntry(Base):
     invoice = relationship("Invoice", back_populates="vat_entries")
 
     def __repr__(self):
-        return f"<VATEntry {self.vat_rate}% - {self.vat_amount}>"
\ No newline at end of file
+        return f"<VATEntry {self.vat_rate}% - {self.vat_amount}>"
+
+
+class VATRollup(Base):
+    """Running VAT totals per owner, country, month and rate, maintained as entries are written."""
+    __tablename__ = "vat_rollups"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    country_iso = Column(String(2), primary_key=True)
+    period = Column(Date, primary_key=True)  # First day of the invoice's issue month
+    vat_rate = Column(Float, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)
+    net_amount = Column(Float, nullable=False, default=0.0)
+    vat_amount = Column(Float, nullable=False, default=0.0)
+    gross_amount = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<VATRollup {self.owner_id} {self.country_iso} {self.period} {self.vat_rate}%>"
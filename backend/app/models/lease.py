@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Enum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Enum, Index, event, and_, text
 from sqlalchemy.orm import relationship
 import enum
 
@@ -10,8 +10,15 @@ class LeaseStatus(str, enum.Enum):
     EXPIRED = "expired"
     TERMINATED = "terminated"
 
+# Leases in these states reserve the unit for their whole period
+BLOCKING_LEASE_STATUSES = (LeaseStatus.PENDING_SIGNATURE.value, LeaseStatus.ACTIVE.value)
+
 class Lease(Base):
     __tablename__ = "leases"
+    __table_args__ = (
+        # Interval index used by availability search and the overlap check
+        Index("ix_leases_unit_period", "unit_id", "lease_start_date", "lease_end_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
@@ -25,9 +32,13 @@ class Lease(Base):
     vat_rate = Column(Float, nullable=False, default=0.0)
     status = Column(String, nullable=False, default=LeaseStatus.PENDING_SIGNATURE)
     digital_signed_at = Column(DateTime, nullable=True)
+    version = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    # Every UPDATE is a compare-and-swap on the version column
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     unit = relationship("Unit", back_populates="leases")
     tenant = relationship("Tenant", back_populates="leases")
@@ -42,4 +53,73 @@ class Lease(Base):
 
     @property
     def total_deposit(self) -> float:
-        return self.security_deposit
\ No newline at end of file
+        return self.security_deposit
+
+    @classmethod
+    def overlapping(cls, start_date, end_date):
+        """SQL condition matching blocking leases that intersect [start_date, end_date]."""
+        return and_(
+            cls.status.in_(BLOCKING_LEASE_STATUSES),
+            cls.lease_start_date <= end_date,
+            cls.lease_end_date >= start_date,
+        )
+
+# Overlap protection enforced by the database itself. On PostgreSQL a GiST
+# exclusion constraint indexes the lease periods per unit; SQLite has no
+# exclusion constraints, so triggers probe ix_leases_unit_period instead.
+_blocking_sql = ", ".join(f"'{s}'" for s in BLOCKING_LEASE_STATUSES)
+
+_POSTGRESQL_CONSTRAINT = "excl_leases_unit_period"
+_SQLITE_TRIGGERS = {
+    f"trg_leases_no_overlap_{_event.lower()}": (
+        f"CREATE TRIGGER IF NOT EXISTS trg_leases_no_overlap_{_event.lower()} "
+        f"BEFORE {_event} ON leases "
+        f"WHEN NEW.status IN ({_blocking_sql}) "
+        "BEGIN "
+        "SELECT RAISE(ABORT, 'Lease period overlaps an existing lease for this unit') "
+        "WHERE EXISTS (SELECT 1 FROM leases "
+        "WHERE unit_id = NEW.unit_id "
+        f"AND status IN ({_blocking_sql}) "
+        "AND lease_start_date <= NEW.lease_end_date "
+        f"AND lease_end_date >= NEW.lease_start_date{_exclude_self}); "
+        "END"
+    )
+    for _event, _exclude_self in (("INSERT", ""), ("UPDATE", " AND id != NEW.id"))
+}
+
+
+def install_overlap_protection(connection) -> int:
+    """
+    Add the overlap constraint or triggers to the leases table if they are
+    missing; returns how many were added. Safe to run on every start. On
+    PostgreSQL it fails while existing leases overlap.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        exists = connection.execute(
+            text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": _POSTGRESQL_CONSTRAINT}
+        ).first()
+        if exists:
+            return 0
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        connection.execute(text(
+            f"ALTER TABLE leases ADD CONSTRAINT {_POSTGRESQL_CONSTRAINT} "
+            "EXCLUDE USING gist (unit_id WITH =, "
+            "daterange(lease_start_date, lease_end_date, '[]') WITH &&) "
+            f"WHERE (status IN ({_blocking_sql}))"
+        ))
+        return 1
+    if dialect == "sqlite":
+        existing = set(connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'leases'")
+        ).scalars())
+        missing = [name for name in _SQLITE_TRIGGERS if name not in existing]
+        for name in missing:
+            connection.execute(text(_SQLITE_TRIGGERS[name]))
+        return len(missing)
+    return 0
+
+
+@event.listens_for(Lease.__table__, "after_create")
+def _install_overlap_protection(target, connection, **kw):
+    install_overlap_protection(connection)
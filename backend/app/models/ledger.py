@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, func, text
+import enum
+
+from app.db.base_class import Base
+
+class LedgerEntryType(str, enum.Enum):
+    CHARGE = "charge"
+    PAYMENT = "payment"
+
+class LedgerEntry(Base):
+    """One charge or payment on a lease; charges are positive, payments negative."""
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        Index("ix_ledger_entries_lease_id_id", "lease_id", "id"),
+        # Only open charges are indexed, so aging reads stay small however long the ledger grows
+        Index(
+            "ix_ledger_entries_open_charges", "owner_id", "due_date", "lease_id", "open_amount",
+            postgresql_where=text("open_amount > 0"),
+            sqlite_where=text("open_amount > 0"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    lease_id = Column(Integer, ForeignKey("leases.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=True)
+    entry_type = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    balance_after = Column(Float, nullable=False)  # Lease balance including this entry
+    due_date = Column(Date, nullable=True)  # Charges only
+    open_amount = Column(Float, nullable=False, default=0.0)  # Unpaid part of a charge
+    booked_on = Column(Date, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<LedgerEntry {self.lease_id} {self.entry_type} {self.amount}>"
+
+class LeaseBalance(Base):
+    """Materialized running balance per lease (positive = tenant owes)."""
+    __tablename__ = "lease_balances"
+
+    lease_id = Column(Integer, ForeignKey("leases.id"), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    balance = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<LeaseBalance {self.lease_id} - {self.balance}>"
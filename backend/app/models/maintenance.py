@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func, Enum
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, Boolean, ForeignKey, JSON, func, Enum, Index, UniqueConstraint, event, inspect
 from sqlalchemy.orm import relationship
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 import enum
+import re
 
 from app.db.base_class import Base
 
@@ -16,6 +19,37 @@ class MaintenancePriority(str, enum.Enum):
     HIGH = "high"
     URGENT = "urgent"
 
+# Time allowed from reporting to resolution
+SLA_PERIODS = {
+    MaintenancePriority.LOW.value: timedelta(days=7),
+    MaintenancePriority.NORMAL.value: timedelta(days=7),
+    MaintenancePriority.HIGH.value: timedelta(days=7),
+    MaintenancePriority.URGENT.value: timedelta(hours=24),
+}
+
+# Requests still counting against their SLA
+OPEN_MAINTENANCE_STATUSES = (MaintenanceStatus.OPEN.value, MaintenanceStatus.IN_PROGRESS.value)
+
+COST_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+def _cost_number(text: str) -> float:
+    # The last separator is the decimal point unless it groups thousands: a comma
+    # before three digits ("1,250"), or a repeated point ("1.250.000"); "0.125" is a decimal
+    head, sep, tail = max(text.rpartition("."), text.rpartition(","), key=lambda parts: len(parts[0]))
+    thousands = len(tail) == 3 and (sep == "," or text.count(".") > 1)
+    if sep and not thousands:
+        return float(head.replace(".", "").replace(",", "") + "." + tail)
+    return float(text.replace(".", "").replace(",", ""))
+
+def parse_cost_range(text: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Parse free-form costs like "100-500", "EUR 250", "500+" or "1.250,50" into (min, max)."""
+    numbers = [_cost_number(n) for n in COST_NUMBER_RE.findall(text or "")][:2]
+    if not numbers:
+        return None, None
+    if len(numbers) == 1:
+        return numbers[0], None if text.strip().endswith("+") else numbers[0]
+    return min(numbers), max(numbers)
+
 class MaintenanceCategory(str, enum.Enum):
     PLUMBING = "plumbing"
     ELECTRICAL = "electrical"
@@ -30,6 +64,12 @@ class MaintenanceCategory(str, enum.Enum):
 
 class MaintenanceRequest(Base):
     __tablename__ = "maintenance_requests"
+    __table_args__ = (
+        # SLA breach queue: open statuses, earliest deadline first
+        Index("ix_maintenance_requests_status_sla_due_at", "status", "sla_due_at"),
+        # Open work per assignee
+        Index("ix_maintenance_requests_assigned_to_status", "assigned_to", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
@@ -46,6 +86,13 @@ class MaintenanceRequest(Base):
     closed_at = Column(DateTime, nullable=True)
     estimated_cost = Column(String, nullable=True)  # Can be "0-100", "100-500", etc.
     actual_cost = Column(String, nullable=True)
+    # Parsed from the strings above on every write
+    estimated_cost_min = Column(Float, nullable=True)
+    estimated_cost_max = Column(Float, nullable=True)
+    actual_cost_amount = Column(Float, nullable=True)
+    sla_due_at = Column(DateTime, nullable=True)  # Set on creation and priority change
+    escalation_level = Column(Integer, nullable=False, default=0)
+    escalated_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -63,9 +110,79 @@ class MaintenanceRequest(Base):
 
     @property
     def is_overdue(self) -> bool:
-        from datetime import datetime, timedelta
         if self.status in [MaintenanceStatus.RESOLVED, MaintenanceStatus.CLOSED]:
             return False
-        # Consider urgent requests overdue after 24 hours, normal after 7 days
-        threshold = timedelta(hours=24) if self.is_urgent else timedelta(days=7)
-        return datetime.now() - self.reported_at > threshold
\ No newline at end of file
+        if self.sla_due_at is None:
+            return datetime.utcnow() - self.reported_at > SLA_PERIODS[self.priority]
+        return datetime.utcnow() > self.sla_due_at
+
+    @staticmethod
+    def sla_deadline(priority: str, start: datetime) -> datetime:
+        return start + SLA_PERIODS[getattr(priority, "value", priority)]
+
+class MaintenanceWorker(Base):
+    """A user who can be assigned maintenance requests of an owner's properties."""
+    __tablename__ = "maintenance_workers"
+    __table_args__ = (UniqueConstraint("owner_id", "user_id", name="uq_maintenance_workers_owner_user"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    skills = Column(JSON, nullable=False, default=list)  # MaintenanceCategory values, empty = any
+    capacity = Column(Integer, nullable=False, default=10)  # Max open requests at once
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", foreign_keys=[user_id])
+
+    def __repr__(self):
+        return f"<MaintenanceWorker {self.user_id} - {self.skills}>"
+
+    def can_handle(self, category: str) -> bool:
+        return not self.skills or category in self.skills
+
+class MaintenanceCostRollup(Base):
+    """Costs of resolved requests per (owner, property, category, month of resolution)."""
+    __tablename__ = "maintenance_cost_rollups"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    property_id = Column(Integer, ForeignKey("properties.id"), primary_key=True)
+    category = Column(String, primary_key=True)
+    period = Column(Date, primary_key=True)  # First day of the month
+    resolved_count = Column(Integer, nullable=False, default=0)
+    costed_count = Column(Integer, nullable=False, default=0)  # Resolved with a known actual cost
+    actual_cost = Column(Float, nullable=False, default=0.0)
+    estimated_cost_min = Column(Float, nullable=False, default=0.0)
+    estimated_cost_max = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<MaintenanceCostRollup {self.property_id} {self.category} {self.period} - {self.actual_cost}>"
+
+def _set_cost_amounts(target, estimated_changed: bool, actual_changed: bool) -> None:
+    if estimated_changed:
+        target.estimated_cost_min, target.estimated_cost_max = parse_cost_range(target.estimated_cost)
+    if actual_changed:
+        target.actual_cost_amount = parse_cost_range(target.actual_cost)[0]
+
+@event.listens_for(MaintenanceRequest, "before_insert")
+def _set_insert_cost_amounts(mapper, connection, target):
+    _set_cost_amounts(target, target.estimated_cost is not None, target.actual_cost is not None)
+
+@event.listens_for(MaintenanceRequest, "before_update")
+def _set_update_cost_amounts(mapper, connection, target):
+    attrs = inspect(target).attrs
+    _set_cost_amounts(target, attrs.estimated_cost.history.has_changes(), attrs.actual_cost.history.has_changes())
+
+@event.listens_for(MaintenanceRequest, "before_insert")
+def _set_sla_deadline(mapper, connection, target):
+    if target.sla_due_at is None:
+        target.sla_due_at = MaintenanceRequest.sla_deadline(
+            target.priority or MaintenancePriority.NORMAL, target.reported_at or datetime.utcnow()
+        )
+
+@event.listens_for(MaintenanceRequest, "before_update")
+def _reset_sla_deadline(mapper, connection, target):
+    if inspect(target).attrs.priority.history.has_changes():
+        target.sla_due_at = MaintenanceRequest.sla_deadline(target.priority, target.reported_at or datetime.utcnow())
\ No newline at end of file
@@ -0,0 +1,51 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import relationship
+
+from app.db.base_class import Base
+
+class MediaBlob(Base):
+    """Uploaded file content, stored once on disk under its SHA-256."""
+    __tablename__ = "media_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    content_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    def __repr__(self):
+        return f"<MediaBlob {self.sha256[:12]} - {self.size}>"
+
+class MediaAttachment(Base):
+    """A blob attached to a property or a maintenance request under an upload's file name."""
+    __tablename__ = "media_attachments"
+    __table_args__ = (
+        Index("ix_media_attachments_property_id", "property_id"),
+        Index("ix_media_attachments_maintenance_request_id", "maintenance_request_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    blob_id = Column(Integer, ForeignKey("media_blobs.id"), nullable=False, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    property_id = Column(Integer, ForeignKey("properties.id"), nullable=True)
+    maintenance_request_id = Column(Integer, ForeignKey("maintenance_requests.id"), nullable=True)
+    filename = Column(String, nullable=False)
+    uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    blob = relationship("MediaBlob", lazy="joined")
+
+    def __repr__(self):
+        return f"<MediaAttachment {self.id} - {self.filename}>"
+
+    @property
+    def sha256(self) -> str:
+        return self.blob.sha256
+
+    @property
+    def content_type(self) -> str:
+        return self.blob.content_type
+
+    @property
+    def size(self) -> int:
+        return self.blob.size
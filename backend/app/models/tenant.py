@@ -1,9 +1,29 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, func, Enum, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, func, Enum, Text, event, inspect
 from sqlalchemy.orm import relationship
+from typing import Optional
 import enum
+import re
 
+from app.core.config import settings
 from app.db.base_class import Base
 
+def normalize_phone(number: Optional[str]) -> Optional[str]:
+    """
+    International digits without "+", the form WhatsApp reports senders in:
+    "+31 6 1234 5678", "0031612345678" and "06-12345678" all become
+    "31612345678". National numbers get PHONE_DEFAULT_COUNTRY_CODE.
+    """
+    digits = re.sub(r"\D", "", number or "")
+    if not digits:
+        return None
+    if number.lstrip().startswith("+"):
+        return digits
+    if digits.startswith("00"):
+        return digits[2:] or None
+    if digits.startswith("0"):
+        return settings.PHONE_DEFAULT_COUNTRY_CODE + digits[1:]
+    return digits
+
 class ScreeningStatus(str, enum.Enum):
     NOT_SUBMITTED = "not_submitted"
     PENDING = "pending"
@@ -18,6 +38,7 @@ class Tenant(Base):
     last_name = Column(String, nullable=False)
     email = Column(String, nullable=False, index=True)
     phone_number = Column(String, nullable=True)
+    phone_normalized = Column(String(20), nullable=True, index=True)  # Set from phone_number on save
     date_of_birth = Column(Date, nullable=True)
     nationality_iso = Column(String(2), nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -36,6 +57,15 @@ class Tenant(Base):
     def full_name(self) -> str:
         return f"{self.first_name} {self.last_name}"
 
+@event.listens_for(Tenant, "before_insert")
+def _set_insert_phone_normalized(mapper, connection, target):
+    target.phone_normalized = normalize_phone(target.phone_number)
+
+@event.listens_for(Tenant, "before_update")
+def _set_update_phone_normalized(mapper, connection, target):
+    if inspect(target).attrs.phone_number.history.has_changes():
+        target.phone_normalized = normalize_phone(target.phone_number)
+
 class ScreeningResult(Base):
     __tablename__ = "screening_results"
 
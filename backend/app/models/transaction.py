@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, JSON, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, String, Integer, Numeric, DateTime, ForeignKey, JSON, Boolean, Index, Enum as SQLAlchemyEnum
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
@@ -18,8 +18,23 @@ class TransactionStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class CategorySource(str, Enum):
+    RULE = "rule"  # An owner's category rule matched
+    MODEL = "model"  # Predicted from the owner's confirmed categories
+    MANUAL = "manual"  # Set or confirmed by the owner; never overwritten
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Training data of the categorization model
+        Index("ix_transactions_user_id_category_source", "user_id", "category_source"),
+        # Ledger pages newest first and the cash-flow report; covering on PostgreSQL
+        Index(
+            "ix_transactions_user_id_booking_date_id", "user_id", "booking_date", "id",
+            postgresql_include=["bank_account_id", "type", "category", "amount", "property_id", "updated_at"],
+        ),
+    )
 
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -30,11 +45,13 @@ class Transaction(Base):
     currency = Column(String(3), default="GBP")
     description = Column(String)
     reference = Column(String)
+    counterparty = Column(String)  # Name of the payer or payee
     
     # Categorization
     type = Column(SQLAlchemyEnum(TransactionType), nullable=False)
     category = Column(String)
     subcategory = Column(String)
+    category_source = Column(String(10))  # CategorySource, None while uncategorized
     
     # Status and timing
     status = Column(SQLAlchemyEnum(TransactionStatus), default=TransactionStatus.COMPLETED)
@@ -46,6 +63,14 @@ class Transaction(Base):
     bank_account_id = Column(String)
     raw_data = Column(JSON)  # Store raw bank data
     
+    # Property an expense is allocated to, for the cash-flow report; banks do not know it
+    property_id = Column(Integer, ForeignKey("properties.id"), nullable=True)
+    
+    # Reconciliation
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=True, index=True)
+    match_rule = Column(String)  # "reference" or "fuzzy"
+    reconciled_at = Column(DateTime)
+    
     # Relationships
     user = relationship("User", back_populates="transactions")
     bank_connection = relationship("BankConnection", back_populates="transactions")
@@ -64,10 +89,44 @@ class Transaction(Base):
             "type": self.type.value,
             "category": self.category,
             "subcategory": self.subcategory,
+            "category_source": self.category_source,
             "status": self.status.value,
             "booking_date": self.booking_date.isoformat(),
             "value_date": self.value_date.isoformat() if self.value_date else None,
             "bank_account_id": self.bank_account_id,
+            "property_id": self.property_id,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat()
         }
+
+
+class CategoryRule(Base):
+    """
+    Owner-defined categorization: the first active rule by priority whose
+    conditions all hold categorizes a transaction. Unset conditions always hold.
+    """
+    __tablename__ = "category_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    priority = Column(Integer, nullable=False, default=100)  # Lower wins
+    pattern = Column(String(200))  # Text in the reference or description, case-insensitive
+    counterparty = Column(String(200))  # Exact payer or payee name, case-insensitive
+    transaction_type = Column(SQLAlchemyEnum(TransactionType))
+    min_amount = Column(Numeric(10, 2))  # Bounds on the absolute amount, inclusive
+    max_amount = Column(Numeric(10, 2))
+    category = Column(String, nullable=False)
+    subcategory = Column(String)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TransactionRawData(Base):
+    """Provider payload of a synced transaction, kept out of the frequently scanned transactions table."""
+    __tablename__ = "transaction_raw_data"
+
+    bank_transaction_id = Column(String, primary_key=True)
+    bank_connection_id = Column(String, ForeignKey("bank_connections.id"), nullable=False, index=True)
+    raw_data = Column(JSON, nullable=False)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -17,9 +17,13 @@ class Unit(Base):
     currency_iso = Column(String(3), nullable=False, default="EUR")
     deposit_amount = Column(Float, nullable=False, default=0.0)
     is_vacant = Column(Boolean, default=True)
+    version = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    # Every UPDATE is a compare-and-swap on the version column
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<Unit {self.unit_number}>"
 
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, JSON
 from sqlalchemy.sql import func
+import enum
 
 from app.db.base_class import Base
 
@@ -8,9 +9,9 @@ class WhatsAppConfig(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True, nullable=False)
-    phone_number_id = Column(String(100), nullable=False)
+    phone_number_id = Column(String(100), nullable=False, unique=True, index=True)  # Routes webhooks and sends
     access_token = Column(Text, nullable=False)
-    verify_token = Column(String(100), nullable=False)
+    verify_token = Column(String(100), nullable=False, index=True)
     app_secret = Column(Text, nullable=False)
     webhook_url = Column(String(255), nullable=True)
     business_phone_number = Column(String(20), nullable=True)
@@ -20,15 +21,88 @@ class WhatsAppConfig(Base):
 
 class WhatsAppMessage(Base):
     __tablename__ = "whatsapp_messages"
+    __table_args__ = (
+        # Broadcast progress and the queued remainder of a resumed broadcast
+        Index("ix_whatsapp_messages_broadcast_id_status_id", "broadcast_id", "status", "id"),
+        # Conversation threads, newest first with keyset pagination
+        Index("ix_whatsapp_messages_counterparty_created_at_id", "counterparty", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     message_id = Column(String(100), unique=True, index=True)
     from_number = Column(String(20), nullable=False)
     to_number = Column(String(20), nullable=False)
+    counterparty = Column(String(20), nullable=True)  # The tenant-side number, normalized
     message_text = Column(Text, nullable=False)
     message_type = Column(String(20), default="text")  # text, image, document, etc.
     direction = Column(String(10), nullable=False)  # incoming, outgoing
     status = Column(String(20), default="sent")  # sent, delivered, read, failed
     user_id = Column(Integer, nullable=True)  # Link to user if available
+    broadcast_id = Column(Integer, ForeignKey("whatsapp_broadcasts.id"), nullable=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    error = Column(Text, nullable=True)  # Why sending failed
+    replied_at = Column(DateTime, nullable=True)  # When an incoming message's reply was generated
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class WebhookEventStatus(str, enum.Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+class WhatsAppWebhookEvent(Base):
+    """Raw webhook delivery, stored before acknowledging and processed by the inbox workers."""
+    __tablename__ = "whatsapp_webhook_events"
+    __table_args__ = (
+        # Claim queue: next available pending events in arrival order
+        Index("ix_whatsapp_webhook_events_status_available_at", "status", "available_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    payload = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default=WebhookEventStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, server_default=func.now())  # Not claimed before this time
+    claimed_by = Column(String(32), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime, server_default=func.now())
+
+class BroadcastStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+class WhatsAppBroadcast(Base):
+    """A templated message to a queried audience; recipients are its queued ``WhatsAppMessage`` rows."""
+    __tablename__ = "whatsapp_broadcasts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String(200), nullable=False)
+    template = Column(Text, nullable=False)
+    audience = Column(JSON, nullable=False)  # e.g. {"type": "rent_reminder", "days_ahead": 3}
+    status = Column(String(20), nullable=False, default=BroadcastStatus.PENDING.value)
+    total_recipients = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    claimed_by = Column(String(32), nullable=True)  # Process currently sending
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class WhatsAppConversation(Base):
+    """What the bot is waiting for from a sender, e.g. the description of a repair."""
+    __tablename__ = "whatsapp_conversations"
+
+    phone_number_id = Column(String(100), primary_key=True)  # Business number the sender is talking to
+    phone = Column(String(20), primary_key=True)  # Sender, normalized, see normalize_phone
+    state = Column(String(50), nullable=True)
+    context = Column(JSON, nullable=False, default=dict)
+    locale = Column(String(5), nullable=True)
+    updated_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
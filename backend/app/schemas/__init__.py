@@ -4,8 +4,22 @@ from app.schemas.property import Property, PropertyCreate, PropertyUpdate, Prope
 from app.schemas.unit import Unit, UnitCreate, UnitUpdate, UnitInDB
 from app.schemas.tenant import Tenant, TenantCreate, TenantUpdate, TenantInDB, TenantWithScreening, ScreeningResult, ScreeningResultCreate, ScreeningResultUpdate
 from app.schemas.lease import Lease, LeaseCreate, LeaseUpdate, LeaseInDB, LeaseSign
-from app.schemas.invoice import Invoice, InvoiceCreate, InvoiceUpdate, InvoiceInDB, VATEntry, VATEntryCreate
-from app.schemas.maintenance import MaintenanceRequest, MaintenanceRequestCreate, MaintenanceRequestUpdate, MaintenanceRequestInDB, MaintenanceRequestAssign, MaintenanceRequestResolve
+from app.schemas.invoice import Invoice, InvoiceStatus, InvoiceCreate, InvoiceUpdate, InvoiceInDB, VATEntry, VATEntryCreate, InvoiceRenderResult
+from app.schemas.billing import BillingRun, BillingRunCreate, BillingPreview, BillingCurrencyTotal
+from app.schemas.ledger import LedgerEntry, LedgerEntryType, LeaseLedger, PaymentCreate, AgingBuckets, LeaseAging, ArrearsReport
+from app.schemas.transaction import Transaction, TransactionLedger, TransactionCategoryUpdate, TransactionPropertyUpdate, CategoryRule, CategoryRuleCreate
+from app.schemas.reconciliation import ReconciliationRequest, ReconciliationItem, ReconciliationReport
+from app.schemas.report import (
+    RentProjection, PropertyProjection, VATReturn, VATReturnLine,
+    MaintenanceCostTotals, PropertyMaintenanceCost, CategoryMaintenanceCost, MaintenanceCostReport,
+    CashflowSeries, PropertyCashflow, CashflowReport,
+)
+from app.schemas.maintenance import (
+    MaintenanceRequest, MaintenanceRequestCreate, MaintenanceRequestUpdate, MaintenanceRequestInDB, MaintenanceRequestAssign, MaintenanceRequestResolve,
+    MaintenanceWorker, MaintenanceWorkerCreate, MaintenanceWorkerUpdate, MaintenanceAssignment, MaintenanceAutoAssignResult,
+)
+from app.schemas.media import MediaAttachment
+from app.schemas.whatsapp import Broadcast, BroadcastCreate, BroadcastStatus, WhatsAppAccount, WhatsAppAccountCreate, WhatsAppMessage, WhatsAppThread
 
 __all__ = [
     "Token", "TokenPayload", "TokenData",
@@ -15,7 +29,18 @@ __all__ = [
     "Tenant", "TenantCreate", "TenantUpdate", "TenantInDB", "TenantWithScreening",
     "ScreeningResult", "ScreeningResultCreate", "ScreeningResultUpdate",
     "Lease", "LeaseCreate", "LeaseUpdate", "LeaseInDB", "LeaseSign",
-    "Invoice", "InvoiceCreate", "InvoiceUpdate", "InvoiceInDB", "VATEntry", "VATEntryCreate",
+    "Invoice", "InvoiceStatus", "InvoiceCreate", "InvoiceUpdate", "InvoiceInDB", "VATEntry", "VATEntryCreate", "InvoiceRenderResult",
     "MaintenanceRequest", "MaintenanceRequestCreate", "MaintenanceRequestUpdate", "MaintenanceRequestInDB",
-    "MaintenanceRequestAssign", "MaintenanceRequestResolve"
+    "MaintenanceRequestAssign", "MaintenanceRequestResolve",
+    "MaintenanceWorker", "MaintenanceWorkerCreate", "MaintenanceWorkerUpdate", "MaintenanceAssignment",
+    "MaintenanceAutoAssignResult",
+    "MediaAttachment",
+    "Broadcast", "BroadcastCreate", "BroadcastStatus", "WhatsAppAccount", "WhatsAppAccountCreate", "WhatsAppMessage", "WhatsAppThread",
+    "BillingRun", "BillingRunCreate", "BillingPreview", "BillingCurrencyTotal",
+    "LedgerEntry", "LedgerEntryType", "LeaseLedger", "PaymentCreate", "AgingBuckets", "LeaseAging", "ArrearsReport",
+    "Transaction", "TransactionLedger", "TransactionCategoryUpdate", "TransactionPropertyUpdate", "CategoryRule", "CategoryRuleCreate",
+    "ReconciliationRequest", "ReconciliationItem", "ReconciliationReport",
+    "RentProjection", "PropertyProjection", "VATReturn", "VATReturnLine",
+    "MaintenanceCostTotals", "PropertyMaintenanceCost", "CategoryMaintenanceCost", "MaintenanceCostReport",
+    "CashflowSeries", "PropertyCashflow", "CashflowReport",
 ]
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, validator
+from typing import List, Optional
+from datetime import datetime, date
+from enum import Enum
+
+class BillingRunStatus(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class BillingRunCreate(BaseModel):
+    period: date  # Any day in the month to bill
+
+    @validator('period')
+    def normalize_period(cls, v):
+        return v.replace(day=1)
+
+class BillingRun(BaseModel):
+    id: int
+    owner_id: Optional[int] = None
+    period: date
+    status: BillingRunStatus
+    last_lease_id: int
+    invoices_created: int
+    total_amount: float
+    error: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BillingCurrencyTotal(BaseModel):
+    currency_iso: str
+    invoice_count: int
+    amount: float
+    vat_amount: float
+    total_amount: float
+
+class BillingPreview(BaseModel):
+    period: date
+    invoice_count: int
+    totals: List[BillingCurrencyTotal]
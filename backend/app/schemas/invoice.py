@@ -84,4 +84,9 @@ class VATEntry(VATEntryInDBBase):
     pass
 
 class VATEntryInDB(VATEntryInDBBase):
-    pass
\ No newline at end of file
+    pass
+# PDF rendering
+class InvoiceRenderResult(BaseModel):
+    invoices: int
+    rendered: int
+    cached: int
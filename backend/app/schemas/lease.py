@@ -50,7 +50,7 @@ class LeaseCreate(LeaseBase):
     vat_rate: float = Field(0.0, ge=0, le=100)
 
 class LeaseUpdate(LeaseBase):
-    pass
+    version: Optional[int] = None  # Last version seen by the client
 
 class LeaseSign(BaseModel):
     """Schema for signing a lease"""
@@ -65,6 +65,7 @@ class LeaseInDBBase(LeaseBase):
     rent_amount: float
     status: LeaseStatus
     digital_signed_at: Optional[datetime] = None
+    version: int
     created_at: datetime
     updated_at: datetime
 
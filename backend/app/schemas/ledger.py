@@ -0,0 +1,54 @@
+from pydantic import BaseModel, validator
+from typing import List, Optional
+from datetime import datetime, date
+from enum import Enum
+
+class LedgerEntryType(str, Enum):
+    CHARGE = "charge"
+    PAYMENT = "payment"
+
+class LedgerEntry(BaseModel):
+    id: int
+    lease_id: int
+    invoice_id: Optional[int] = None
+    entry_type: LedgerEntryType
+    amount: float  # Charges positive, payments negative
+    balance_after: float
+    due_date: Optional[date] = None
+    open_amount: float
+    booked_on: date
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class LeaseLedger(BaseModel):
+    lease_id: int
+    balance: float  # Positive = tenant owes
+    entries: List[LedgerEntry]  # Newest first
+
+class PaymentCreate(BaseModel):
+    amount: Optional[float] = None  # Defaults to the invoice's open amount
+    paid_on: Optional[date] = None
+
+    @validator('amount')
+    def amount_positive(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError('Payment amount must be positive')
+        return v
+
+class AgingBuckets(BaseModel):
+    not_due: float
+    days_0_30: float
+    days_31_60: float
+    days_61_90: float
+    days_over_90: float
+    total: float
+
+class LeaseAging(AgingBuckets):
+    lease_id: int
+
+class ArrearsReport(BaseModel):
+    as_of: date
+    totals: AgingBuckets
+    leases: List[LeaseAging]
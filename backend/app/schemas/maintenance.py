@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -70,6 +70,11 @@ class MaintenanceRequestInDBBase(MaintenanceRequestBase):
     assigned_at: Optional[datetime] = None
     resolved_at: Optional[datetime] = None
     closed_at: Optional[datetime] = None
+    estimated_cost_min: Optional[float] = None
+    estimated_cost_max: Optional[float] = None  # None for open-ended estimates like "500+"
+    actual_cost_amount: Optional[float] = None
+    sla_due_at: Optional[datetime] = None
+    escalation_level: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -80,4 +85,37 @@ class MaintenanceRequest(MaintenanceRequestInDBBase):
     pass
 
 class MaintenanceRequestInDB(MaintenanceRequestInDBBase):
-    pass
\ No newline at end of file
+    pass
+
+# Maintenance worker schemas
+class MaintenanceWorkerBase(BaseModel):
+    skills: List[MaintenanceCategory] = []  # Empty = handles any category
+    capacity: int = Field(10, ge=1, le=1000)  # Max open requests at once
+    is_active: bool = True
+
+class MaintenanceWorkerCreate(MaintenanceWorkerBase):
+    user_id: int
+
+class MaintenanceWorkerUpdate(BaseModel):
+    skills: Optional[List[MaintenanceCategory]] = None
+    capacity: Optional[int] = Field(None, ge=1, le=1000)
+    is_active: Optional[bool] = None
+
+class MaintenanceWorker(MaintenanceWorkerBase):
+    id: int
+    owner_id: int
+    user_id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Auto-assignment
+class MaintenanceAssignment(BaseModel):
+    request_id: int
+    assigned_to: int
+
+class MaintenanceAutoAssignResult(BaseModel):
+    assigned: int
+    unassigned: int  # Left open: no worker with the skill and spare capacity
+    assignments: List[MaintenanceAssignment]
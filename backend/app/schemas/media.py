@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class MediaAttachment(BaseModel):
+    id: int
+    filename: str
+    content_type: str
+    size: int
+    sha256: str  # Also the ETag the file is served with
+    property_id: Optional[int] = None
+    maintenance_request_id: Optional[int] = None
+    uploaded_by: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+class ReconciliationRequest(BaseModel):
+    start: Optional[date] = None  # First booking date to consider
+    end: Optional[date] = None  # Last booking date to consider
+    dry_run: bool = False  # Only report matches, book nothing
+
+class ReconciliationItem(BaseModel):
+    transaction_id: str
+    amount: float
+    booking_date: date
+    invoice_id: Optional[int] = None
+    invoice_number: Optional[str] = None
+    rule: Optional[str] = None  # "reference", "fuzzy" or None when unmatched
+    score: float
+    reasons: List[str]
+
+class ReconciliationReport(BaseModel):
+    dry_run: bool
+    transactions: int
+    matched: int
+    invoices_paid: int
+    items: List[ReconciliationItem]
@@ -0,0 +1,65 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+class PropertyProjection(BaseModel):
+    property_id: int
+    expected: List[float]
+
+class RentProjection(BaseModel):
+    months: List[date]
+    expected: List[float]  # Expected income incl. renewals and re-lettings
+    contracted: List[float]  # Income from existing leases only
+    by_property: List[PropertyProjection]
+    unit_count: int
+    lease_count: int
+
+class VATReturnLine(BaseModel):
+    country_iso: str
+    vat_rate: float
+    entry_count: int
+    net_amount: float
+    vat_amount: float
+    gross_amount: float
+
+class VATReturn(BaseModel):
+    period_start: date  # First month included
+    period_end: date  # Last month included
+    lines: List[VATReturnLine]
+    net_amount: float
+    vat_amount: float
+
+class MaintenanceCostTotals(BaseModel):
+    resolved_count: int
+    costed_count: int  # Resolved requests with a known actual cost
+    actual_cost: float
+    average_cost: Optional[float] = None  # Per costed request
+    estimated_cost_min: float
+    estimated_cost_max: float
+
+class PropertyMaintenanceCost(MaintenanceCostTotals):
+    property_id: int
+    property_name: str
+
+class CategoryMaintenanceCost(MaintenanceCostTotals):
+    category: str
+
+class MaintenanceCostReport(MaintenanceCostTotals):
+    period_start: Optional[date] = None  # First month included
+    period_end: Optional[date] = None  # Last month included
+    by_property: List[PropertyMaintenanceCost]
+    by_category: List[CategoryMaintenanceCost]
+
+class CashflowSeries(BaseModel):
+    invoiced: List[float]  # Net rent invoiced, by billing month
+    collected: List[float]  # Net rent paid, by month of payment
+    expenses: List[float]  # Completed outgoing bank transactions
+    noi: List[float]  # Net operating income: collected - expenses
+
+class PropertyCashflow(CashflowSeries):
+    property_id: Optional[int] = None  # None for expenses not allocated to a property
+    property_name: Optional[str] = None
+
+class CashflowReport(CashflowSeries):
+    months: List[date]
+    by_property: List[PropertyCashflow]
@@ -0,0 +1,80 @@
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+
+class TransactionType(str, Enum):
+    INCOME = "income"
+    EXPENSE = "expense"
+    TRANSFER = "transfer"
+
+class TransactionStatus(str, Enum):
+    PENDING = "pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class Transaction(BaseModel):
+    id: str
+    bank_account_id: Optional[str] = None
+    amount: Decimal
+    currency: str
+    description: Optional[str] = None
+    reference: Optional[str] = None
+    counterparty: Optional[str] = None
+    type: TransactionType
+    status: TransactionStatus
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    category_source: Optional[str] = None  # "rule", "model", "manual" or None
+    booking_date: datetime
+    value_date: datetime
+    invoice_id: Optional[int] = None
+    property_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class TransactionLedger(BaseModel):
+    transactions: List[Transaction]
+    next_cursor: Optional[str] = None  # Pass as `before` for older transactions, None on the last page
+
+class TransactionCategoryUpdate(BaseModel):
+    category: Optional[str] = Field(None, max_length=100)  # None removes the category
+    subcategory: Optional[str] = Field(None, max_length=100)
+
+class TransactionPropertyUpdate(BaseModel):
+    property_id: Optional[int] = None  # None removes the allocation
+
+class CategoryRuleBase(BaseModel):
+    priority: int = Field(100, ge=0)  # Lower wins
+    pattern: Optional[str] = Field(None, min_length=2, max_length=200)  # Text in the reference or description
+    counterparty: Optional[str] = Field(None, max_length=200)
+    transaction_type: Optional[TransactionType] = None
+    min_amount: Optional[Decimal] = Field(None, ge=0)  # Bounds on the absolute amount
+    max_amount: Optional[Decimal] = Field(None, ge=0)
+    category: str = Field(..., min_length=1, max_length=100)
+    subcategory: Optional[str] = Field(None, max_length=100)
+    is_active: bool = True
+
+class CategoryRuleCreate(CategoryRuleBase):
+    @validator('max_amount')
+    def validate_amount_range(cls, v, values):
+        if v is not None and values.get('min_amount') is not None and values['min_amount'] > v:
+            raise ValueError('max_amount must not be below min_amount')
+        return v
+
+    @validator('category')
+    def validate_has_condition(cls, v, values):
+        conditions = ('pattern', 'counterparty', 'min_amount', 'max_amount')
+        if all(values.get(name) is None for name in conditions):
+            raise ValueError('A rule needs a pattern, counterparty or amount range')
+        return v
+
+class CategoryRule(CategoryRuleBase):
+    id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -38,13 +38,14 @@ class UnitCreate(UnitBase):
 
 # Properties to receive via API on update
 class UnitUpdate(UnitBase):
-    pass
+    version: Optional[int] = None  # Last version seen by the client
 
 # Properties shared by models stored in DB
 class UnitInDBBase(UnitBase):
     id: int
     property_id: int
     unit_number: str
+    version: int
     created_at: datetime
     updated_at: datetime
 
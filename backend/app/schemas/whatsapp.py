@@ -0,0 +1,70 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from enum import Enum
+
+class WhatsAppAccountCreate(BaseModel):
+    phone_number_id: str = Field(..., min_length=1, max_length=100)
+    business_phone_number: Optional[str] = Field(None, max_length=20)
+    access_token: str = Field(..., min_length=1)
+    verify_token: str = Field(..., min_length=8, max_length=100)
+    app_secret: str = Field(..., min_length=1, max_length=255)
+
+class WhatsAppAccount(BaseModel):
+    # Credentials are write-only
+    id: int
+    phone_number_id: str
+    business_phone_number: Optional[str] = None
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class WhatsAppMessage(BaseModel):
+    id: int
+    message_id: Optional[str] = None
+    direction: str
+    from_number: str
+    to_number: str
+    message_type: str
+    message_text: str
+    status: str
+    broadcast_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class WhatsAppThread(BaseModel):
+    messages: List[WhatsAppMessage]
+    next_cursor: Optional[str] = None  # Pass as ``before`` for older messages; None on the last page
+
+class BroadcastStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+class BroadcastCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    # Placeholders: {first_name}, {last_name}, {invoice_number}, {amount}, {currency},
+    # {due_date}, {days_until_due}, {property_name}, {unit_number}
+    template: str = Field(..., min_length=1, max_length=4096)
+    days_ahead: int = Field(3, ge=0, le=60, description="Remind tenants with pending invoices due within this many days")
+
+class Broadcast(BaseModel):
+    id: int
+    name: str
+    template: str
+    audience: Dict[str, Any]
+    status: BroadcastStatus
+    total_recipients: int
+    sent_count: int
+    failed_count: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
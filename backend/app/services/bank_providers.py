@@ -0,0 +1,169 @@
+"""
+Open Banking providers the bank sync engine fetches accounts and
+transactions from.
+
+A provider turns its aggregator's API into ``ProviderAccount`` and
+``ProviderTransaction`` values. Transactions are returned oldest first in
+cursor-paginated pages. ``FakeBankProvider`` generates a deterministic
+history locally, for development and tests.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class SyncTarget:
+    """What a provider needs to know about a connection, detached from the session."""
+    connection_id: str
+    user_id: str
+    institution_id: str
+    access_token: Optional[str]
+    last_synced_at: Optional[datetime]
+
+
+@dataclass
+class ProviderAccount:
+    account_id: str
+    currency: str
+    current_balance: Decimal
+    available_balance: Optional[Decimal] = None
+    account_name: Optional[str] = None
+    account_type: Optional[str] = None
+    iban: Optional[str] = None
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ProviderTransaction:
+    transaction_id: str  # Unique across the provider
+    amount: Decimal  # Negative for money going out
+    currency: str
+    booking_date: datetime
+    value_date: datetime
+    description: Optional[str] = None
+    reference: Optional[str] = None
+    counterparty: Optional[str] = None
+    pending: bool = False
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class TransactionPage:
+    transactions: List[ProviderTransaction]
+    next_cursor: Optional[str] = None
+
+
+class BankProvider:
+    """Interface of an Open Banking aggregator; implementations must be safe to call concurrently."""
+
+    async def accounts(self, target: SyncTarget) -> List[ProviderAccount]:
+        raise NotImplementedError
+
+    async def transactions(
+        self, target: SyncTarget, account_id: str, *, since: datetime, cursor: Optional[str] = None, limit: int = 500
+    ) -> TransactionPage:
+        """Transactions booked on or after ``since``, oldest first."""
+        raise NotImplementedError
+
+
+MERCHANTS = ["Eneco", "Vattenfall", "Gemeente Amsterdam", "Loodgieter Jansen", "Gamma", "Ziggo"]
+
+
+class FakeBankProvider(BankProvider):
+    """Generated accounts with evenly spread transactions; tests can add or change transactions in between syncs."""
+
+    def __init__(
+        self,
+        *,
+        accounts_per_connection: int = 2,
+        transactions_per_account: int = 200,
+        start: datetime = datetime(2024, 1, 1),
+        days: int = 365,
+        latency_seconds: float = 0.0,
+    ):
+        self.accounts_per_connection = accounts_per_connection
+        self.transactions_per_account = transactions_per_account
+        self.start = start
+        self.days = days
+        self.latency_seconds = latency_seconds
+        self.requests: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._history: Dict[str, List[ProviderTransaction]] = {}
+
+    def account_ids(self, connection_id: str) -> List[str]:
+        return [f"{connection_id}-acc{i}" for i in range(self.accounts_per_connection)]
+
+    def history(self, account_id: str) -> List[ProviderTransaction]:
+        """The account's transactions, generated on first use; may be changed in place."""
+        if account_id not in self._history:
+            step = timedelta(days=self.days) / max(self.transactions_per_account, 1)
+            history = []
+            for i in range(self.transactions_per_account):
+                booked = self.start + step * i
+                incoming = i % 4 == 0
+                amount = Decimal(1200 if incoming else -(15 + (i * 37) % 400)).quantize(Decimal("0.01"))
+                history.append(ProviderTransaction(
+                    transaction_id=f"{account_id}-tx{i:08d}",
+                    amount=amount,
+                    currency="EUR",
+                    booking_date=booked,
+                    value_date=booked,
+                    description="Rent payment" if incoming else f"Card payment {i}",
+                    reference=f"REF{i:08d}",
+                    counterparty=f"Tenant {i % 7}" if incoming else MERCHANTS[i % len(MERCHANTS)],
+                    raw={"transactionId": f"{account_id}-tx{i:08d}", "amount": str(amount)},
+                ))
+            self._history[account_id] = history
+        return self._history[account_id]
+
+    async def _call(self, request: Dict[str, Any]) -> None:
+        # in_flight counts concurrent transaction page requests
+        self.requests.append(request)
+        if request["call"] != "transactions":
+            await asyncio.sleep(self.latency_seconds)
+            return
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency_seconds)
+        finally:
+            self.in_flight -= 1
+
+    async def accounts(self, target: SyncTarget) -> List[ProviderAccount]:
+        await self._call({"call": "accounts", "connection_id": target.connection_id})
+        accounts = []
+        for account_id in self.account_ids(target.connection_id):
+            balance = sum((tx.amount for tx in self.history(account_id) if not tx.pending), Decimal("0.00"))
+            accounts.append(ProviderAccount(
+                account_id=account_id, currency="EUR", current_balance=balance, available_balance=balance,
+                account_name=f"Account {account_id}", account_type="current", raw={"accountId": account_id},
+            ))
+        return accounts
+
+    async def transactions(
+        self, target: SyncTarget, account_id: str, *, since: datetime, cursor: Optional[str] = None, limit: int = 500
+    ) -> TransactionPage:
+        await self._call({"call": "transactions", "account_id": account_id, "since": since, "cursor": cursor})
+        matching = [tx for tx in self.history(account_id) if tx.booking_date >= since]
+        offset = int(cursor or 0)
+        page = matching[offset:offset + limit]
+        next_offset = offset + len(page)
+        return TransactionPage(page, str(next_offset) if next_offset < len(matching) else None)
+
+
+PROVIDERS = {"fake": FakeBankProvider}
+
+
+def get_provider() -> BankProvider:
+    if not settings.BANK_SYNC_PROVIDER:
+        raise ValueError("No bank provider is configured")
+    try:
+        return PROVIDERS[settings.BANK_SYNC_PROVIDER]()
+    except KeyError:
+        raise ValueError(f"Unknown bank provider: {settings.BANK_SYNC_PROVIDER}")
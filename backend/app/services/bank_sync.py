@@ -0,0 +1,261 @@
+"""
+Incremental bank transaction sync.
+
+Each sync of a connection fetches only what was booked since its previous
+sync. It goes back ``BANK_SYNC_OVERLAP_DAYS`` further, because pending
+transactions settle and banks backdate bookings. A first sync fetches
+``BANK_SYNC_INITIAL_DAYS`` of history.
+
+Accounts are fetched in parallel. At most ``BANK_SYNC_CONCURRENCY`` are
+fetched at once, across all connections being synced. Within an account the
+next page is requested while the current one is written, so the provider and
+the database work at the same time.
+
+Pages are upserted in multi-row statements keyed on ``bank_transaction_id``,
+so fetching a transaction again never duplicates it. The upsert only
+rewrites a row if the bank changed it. It never touches the columns owned
+by this application: category, reconciliation and the row's ID. The
+provider's raw payload goes to ``transaction_raw_data``, and only for
+inserted or changed transactions. These are also categorized in the same
+transaction, see ``categorization``.
+
+``last_synced_at`` advances to the sync's start time only when every account
+succeeded. A failed sync is therefore repeated in full, which is safe
+because every write is idempotent.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.bank_connection import BankAccount, BankConnection, BankConnectionStatus
+from app.models.transaction import Transaction, TransactionRawData, TransactionStatus, TransactionType
+from app.services import categorization
+from app.services.bank_providers import BankProvider, ProviderAccount, ProviderTransaction, SyncTarget, get_provider
+
+logger = logging.getLogger(__name__)
+
+# Set by the bank; everything else on a transaction belongs to this application
+SYNCED_COLUMNS = (
+    "amount", "currency", "description", "reference", "counterparty", "type", "status", "booking_date", "value_date",
+)
+
+# Connections that are synced; pending ones have no consent yet
+SYNCED_STATUSES = (BankConnectionStatus.CONNECTED.value, BankConnectionStatus.ERROR.value)
+
+
+def load_target(db: Session, connection_id: str) -> SyncTarget:
+    connection = db.get(BankConnection, connection_id)
+    if connection is None:
+        raise ValueError(f"Bank connection {connection_id} not found")
+    return SyncTarget(
+        connection_id=connection.id,
+        user_id=connection.user_id,
+        institution_id=connection.institution_id,
+        access_token=connection.access_token,
+        last_synced_at=connection.last_synced_at,
+    )
+
+
+def connections_to_sync(db: Session) -> List[str]:
+    rows = db.query(BankConnection.id).filter(BankConnection.status.in_(SYNCED_STATUSES)).order_by(BankConnection.id)
+    return [connection_id for connection_id, in rows]
+
+
+def sync_window_start(target: SyncTarget, now: datetime) -> datetime:
+    if target.last_synced_at is None:
+        return now - timedelta(days=settings.BANK_SYNC_INITIAL_DAYS)
+    return target.last_synced_at - timedelta(days=settings.BANK_SYNC_OVERLAP_DAYS)
+
+
+def upsert_accounts(db: Session, target: SyncTarget, accounts: List[ProviderAccount]) -> Dict[str, str]:
+    """Create or update the connection's accounts and balances; returns our account ID per provider account ID."""
+    existing = {
+        account.account_id: account
+        for account in db.query(BankAccount).filter(BankAccount.connection_id == target.connection_id)
+    }
+    for provided in accounts:
+        account = existing.get(provided.account_id)
+        if account is None:
+            account = BankAccount(id=str(uuid.uuid4()), connection_id=target.connection_id, account_id=provided.account_id)
+            db.add(account)
+            existing[provided.account_id] = account
+        account.account_name = provided.account_name
+        account.account_type = provided.account_type
+        account.iban = provided.iban
+        account.currency = provided.currency
+        account.current_balance = str(provided.current_balance)
+        account.available_balance = str(provided.available_balance) if provided.available_balance is not None else None
+        account.raw_data = provided.raw
+    db.commit()
+    return {account_id: account.id for account_id, account in existing.items()}
+
+
+def _transaction_row(target: SyncTarget, bank_account_id: str, tx: ProviderTransaction) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": target.user_id,
+        "bank_connection_id": target.connection_id,
+        "bank_account_id": bank_account_id,
+        "bank_transaction_id": tx.transaction_id,
+        "amount": tx.amount,
+        "currency": tx.currency,
+        "description": tx.description,
+        "reference": tx.reference,
+        "counterparty": tx.counterparty,
+        "type": TransactionType.INCOME if tx.amount > 0 else TransactionType.EXPENSE,
+        "status": TransactionStatus.PENDING if tx.pending else TransactionStatus.COMPLETED,
+        "booking_date": tx.booking_date,
+        "value_date": tx.value_date,
+    }
+
+
+def upsert_transactions(
+    db: Session, target: SyncTarget, bank_account_id: str, transactions: List[ProviderTransaction]
+) -> int:
+    """Insert new and update changed transactions; returns how many were written."""
+    if not transactions:
+        return 0
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    now = datetime.utcnow()
+    table = Transaction.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bank_transaction_id"],
+        set_={**{column: stmt.excluded[column] for column in SYNCED_COLUMNS}, "updated_at": now},
+        where=or_(*(table.c[column].is_distinct_from(stmt.excluded[column]) for column in SYNCED_COLUMNS)),
+    ).returning(table.c.bank_transaction_id)
+    raw_table = TransactionRawData.__table__
+    raw_stmt = insert(raw_table)
+    raw_stmt = raw_stmt.on_conflict_do_update(
+        index_elements=["bank_transaction_id"],
+        set_={"raw_data": raw_stmt.excluded.raw_data, "fetched_at": raw_stmt.excluded.fetched_at},
+    )
+
+    written = 0
+    batch_size = settings.BANK_SYNC_BATCH_SIZE
+    for start in range(0, len(transactions), batch_size):
+        batch = transactions[start:start + batch_size]
+        rows = [_transaction_row(target, bank_account_id, tx) for tx in batch]
+        changed = set(db.execute(stmt, rows).scalars())
+        if changed:
+            categorization.categorize_synced(
+                db, owner_id=int(target.user_id), rows=[row for row in rows if row["bank_transaction_id"] in changed]
+            )
+            db.execute(raw_stmt, [
+                {
+                    "bank_transaction_id": tx.transaction_id,
+                    "bank_connection_id": target.connection_id,
+                    "raw_data": tx.raw,
+                    "fetched_at": now,
+                }
+                for tx in batch if tx.transaction_id in changed
+            ])
+        written += len(changed)
+    db.commit()
+    return written
+
+
+def finish_connection(db: Session, connection_id: str, *, synced_at: Optional[datetime] = None) -> None:
+    """Record a successful sync, or a failed one if ``synced_at`` is None."""
+    values: Dict[str, Any] = {"updated_at": datetime.utcnow()}
+    if synced_at is None:
+        values["status"] = BankConnectionStatus.ERROR.value
+    else:
+        values.update(status=BankConnectionStatus.CONNECTED.value, last_synced_at=synced_at)
+    db.execute(update(BankConnection.__table__).where(BankConnection.id == connection_id).values(**values))
+    db.commit()
+
+
+class BankSync:
+    """Syncs connections from one provider, with the provider calls on the event loop and writes in the thread pool."""
+
+    def __init__(self, provider: Optional[BankProvider] = None, session_factory: Callable[[], Session] = SessionLocal):
+        self.provider = provider or get_provider()
+        self.session_factory = session_factory
+
+    def _in_session(self, func: Callable, *args, **kwargs):
+        db = self.session_factory()
+        try:
+            return func(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    async def _db(self, func: Callable, *args, **kwargs):
+        return await run_in_threadpool(self._in_session, func, *args, **kwargs)
+
+    async def _sync_account(
+        self, semaphore: asyncio.Semaphore, target: SyncTarget, account_id: str, bank_account_id: str, since: datetime
+    ) -> int:
+        def fetch(cursor: Optional[str]):
+            return self.provider.transactions(
+                target, account_id, since=since, cursor=cursor, limit=settings.BANK_SYNC_PAGE_SIZE
+            )
+
+        written = 0
+        async with semaphore:
+            page = await fetch(None)
+            while True:
+                # Fetch the next page while this one is written
+                next_page = asyncio.create_task(fetch(page.next_cursor)) if page.next_cursor else None
+                try:
+                    written += await self._db(upsert_transactions, target, bank_account_id, page.transactions)
+                except BaseException:
+                    if next_page is not None:
+                        next_page.cancel()
+                    raise
+                if next_page is None:
+                    return written
+                page = await next_page
+
+    async def sync_connection(
+        self, connection_id: str, *, semaphore: Optional[asyncio.Semaphore] = None, now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Sync one connection's accounts and transactions; raises if any account failed."""
+        started = now or datetime.utcnow()
+        semaphore = semaphore or asyncio.Semaphore(settings.BANK_SYNC_CONCURRENCY)
+        target = await self._db(load_target, connection_id)
+        since = sync_window_start(target, started)
+        try:
+            accounts = await self.provider.accounts(target)
+            account_ids = await self._db(upsert_accounts, target, accounts)
+            results = await asyncio.gather(
+                *(
+                    self._sync_account(semaphore, target, account.account_id, account_ids[account.account_id], since)
+                    for account in accounts
+                ),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        except Exception:
+            await self._db(finish_connection, connection_id)
+            raise
+        await self._db(finish_connection, connection_id, synced_at=started)
+        return {"connection_id": connection_id, "accounts": len(accounts), "transactions": sum(results)}
+
+    async def sync_all(self) -> Dict[str, Any]:
+        """Sync every connected connection; one failing connection does not stop the others."""
+        connection_ids = await self._db(connections_to_sync)
+        semaphore = asyncio.Semaphore(settings.BANK_SYNC_CONCURRENCY)
+        results = await asyncio.gather(
+            *(self.sync_connection(connection_id, semaphore=semaphore) for connection_id in connection_ids),
+            return_exceptions=True,
+        )
+        summary = {"connections": len(connection_ids), "failed": 0, "transactions": 0}
+        for connection_id, result in zip(connection_ids, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Bank sync of connection {connection_id} failed: {result}")
+                summary["failed"] += 1
+            else:
+                summary["transactions"] += result["transactions"]
+        return summary
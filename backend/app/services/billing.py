@@ -0,0 +1,288 @@
+"""
+Monthly billing runs.
+
+A run invoices every active lease for one billing period in set-based
+batches: one query selects the next batch of billable leases together with
+the property country, invoices and VAT entries are bulk inserted, and the
+run's cursor is committed in the same transaction. A crashed run therefore
+resumes from its last committed batch, and the (lease_id, billing_period)
+unique constraint keeps re-runs idempotent. A lease that was invoiced by
+hand during the month is not billed for it again.
+
+Runs started over the API are queued: the request records the run and it
+is executed after the response, in a session of its own.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.billing_run import BillingRun, BillingRunStatus
+from app.models.invoice import Invoice, InvoiceStatus, VATEntry
+from app.models.lease import Lease, LeaseStatus
+from app.models.property import Property
+from app.models.unit import Unit
+from app.services import invoice_numbers
+from app.services import ledger as ledger_service
+from app.services import vat as vat_service
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_TERM_DAYS = 14
+
+
+def period_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def period_end(value: date) -> date:
+    next_month = (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def _billable_leases_query(db: Session, *, period: date, owner_id: Optional[int]):
+    already_invoiced = (
+        db.query(Invoice.id)
+        .filter(
+            Invoice.lease_id == Lease.id,
+            or_(
+                Invoice.billing_period == period,
+                # Invoices created one by one carry no billing period
+                and_(
+                    Invoice.billing_period.is_(None),
+                    Invoice.issue_date.between(period, period_end(period)),
+                    Invoice.status != InvoiceStatus.CANCELLED.value,
+                ),
+            ),
+        )
+        .exists()
+    )
+    query = (
+        db.query(
+            Lease.id,
+            Lease.rent_amount,
+            Lease.vat_rate,
+            Lease.currency_iso,
+            Property.country_iso,
+            Property.owner_id,
+        )
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(
+            Lease.status == LeaseStatus.ACTIVE,
+            Lease.lease_start_date <= period_end(period),
+            Lease.lease_end_date >= period,
+            ~already_invoiced,
+        )
+    )
+    if owner_id is not None:
+        query = query.filter(Property.owner_id == owner_id)
+    return query
+
+
+def _assign_invoice_numbers(db: Session, leases: List[Any]) -> Dict[int, str]:
+    """Reserve one number per lease from its owner's series, a block per owner."""
+    leases_by_owner: Dict[int, List[int]] = defaultdict(list)
+    for lease in leases:
+        leases_by_owner[lease.owner_id].append(lease.id)
+    numbers = {}
+    for owner_id, lease_ids in leases_by_owner.items():
+        allocated = invoice_numbers.next_invoice_numbers(db, owner_id=owner_id, count=len(lease_ids))
+        numbers.update(zip(lease_ids, allocated))
+    return numbers
+
+
+def _invoice_rows(
+    leases: List[Any], *, period: date, issue_date: date, numbers: Optional[Dict[int, str]] = None
+) -> List[Dict[str, Any]]:
+    due_date = issue_date + timedelta(days=PAYMENT_TERM_DAYS)
+    rows = []
+    for lease_id, rent_amount, vat_rate, currency_iso, _, _ in leases:
+        vat_amount = rent_amount * (vat_rate / 100)
+        rows.append({
+            "lease_id": lease_id,
+            "invoice_number": numbers[lease_id] if numbers else None,
+            "issue_date": issue_date,
+            "due_date": due_date,
+            "billing_period": period,
+            "amount": rent_amount,
+            "vat_amount": vat_amount,
+            "total_amount": rent_amount + vat_amount,
+            "currency_iso": currency_iso,
+        })
+    return rows
+
+
+def preview_billing_run(db: Session, *, period: date, owner_id: Optional[int] = None) -> Dict[str, Any]:
+    """Dry run: what a billing run for the period would invoice, without writing."""
+    period = period_start(period)
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"invoice_count": 0, "amount": 0.0, "vat_amount": 0.0, "total_amount": 0.0})
+    leases = _billable_leases_query(db, period=period, owner_id=owner_id).yield_per(settings.BILLING_BATCH_SIZE)
+    for row in _invoice_rows(leases, period=period, issue_date=date.today()):
+        bucket = totals[row["currency_iso"]]
+        bucket["invoice_count"] += 1
+        bucket["amount"] += row["amount"]
+        bucket["vat_amount"] += row["vat_amount"]
+        bucket["total_amount"] += row["total_amount"]
+    return {
+        "period": period,
+        "invoice_count": sum(int(t["invoice_count"]) for t in totals.values()),
+        "totals": [
+            {"currency_iso": currency, **{k: round(v, 2) for k, v in t.items()}}
+            for currency, t in sorted(totals.items())
+        ],
+    }
+
+
+def _insert_batch(db: Session, leases: List[Any], *, period: date, issue_date: date) -> float:
+    # Numbers are reserved before this transaction writes anything
+    numbers = _assign_invoice_numbers(db, leases)
+    invoice_rows = _invoice_rows(leases, period=period, issue_date=issue_date, numbers=numbers)
+    returned = db.execute(insert(Invoice).returning(Invoice.id, Invoice.lease_id), invoice_rows)
+    invoice_ids = {lease_id: invoice_id for invoice_id, lease_id in returned}
+
+    owner_by_lease = {lease.id: lease.owner_id for lease in leases}
+    settled = ledger_service.post_charges(db, (
+        {
+            "lease_id": row["lease_id"],
+            "owner_id": owner_by_lease[row["lease_id"]],
+            "invoice_id": invoice_ids[row["lease_id"]],
+            "amount": row["total_amount"],
+            "due_date": row["due_date"],
+            "booked_on": issue_date,
+        }
+        for row in invoice_rows
+    ))
+    if settled:
+        # Paid from the leases' credit
+        db.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(settled))
+            .values(status=InvoiceStatus.PAID.value, paid_at=datetime.combine(issue_date, datetime.min.time()))
+            .execution_options(synchronize_session=False)
+        )
+
+    country_by_lease = {lease.id: lease.country_iso for lease in leases}
+    vat_rate_by_lease = {lease.id: lease.vat_rate for lease in leases}
+    vat_rows = [
+        {
+            "invoice_id": invoice_ids[row["lease_id"]],
+            "vat_rate": vat_rate_by_lease[row["lease_id"]],
+            "net_amount": row["amount"],
+            "vat_amount": row["vat_amount"],
+            "gross_amount": row["total_amount"],
+            "country_iso": country_by_lease[row["lease_id"]],
+        }
+        for row in invoice_rows
+        if row["vat_amount"] > 0
+    ]
+    if vat_rows:
+        db.execute(insert(VATEntry), vat_rows)
+        owner_by_invoice = {invoice_ids[lease_id]: owner_id for lease_id, owner_id in owner_by_lease.items()}
+        vat_rows_by_owner = defaultdict(list)
+        for row in vat_rows:
+            vat_rows_by_owner[owner_by_invoice[row["invoice_id"]]].append(row)
+        for owner_id, rows in vat_rows_by_owner.items():
+            vat_service.record_entries(db, owner_id=owner_id, issue_date=issue_date, entries=rows)
+    return sum(row["total_amount"] for row in invoice_rows)
+
+
+def start_or_resume_run(db: Session, *, period: date, owner_id: Optional[int] = None) -> BillingRun:
+    """Return the unfinished run for (owner, period) or start a new one."""
+    period = period_start(period)
+    run = (
+        db.query(BillingRun)
+        .filter(
+            BillingRun.period == period,
+            BillingRun.owner_id.is_(None) if owner_id is None else BillingRun.owner_id == owner_id,
+            BillingRun.status != BillingRunStatus.COMPLETED,
+        )
+        .order_by(BillingRun.id.desc())
+        .first()
+    )
+    if run:
+        logger.info(f"Resuming billing run {run.id} for {period} after lease {run.last_lease_id}")
+        run.status = BillingRunStatus.RUNNING
+        run.error = None
+    else:
+        run = BillingRun(owner_id=owner_id, period=period, status=BillingRunStatus.RUNNING)
+        db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+def execute_billing_run(
+    db: Session,
+    *,
+    period: date,
+    owner_id: Optional[int] = None,
+    issue_date: Optional[date] = None,
+    batch_size: Optional[int] = None,
+) -> BillingRun:
+    """Invoice every billable lease for the period, committing batch by batch."""
+    run = start_or_resume_run(db, period=period, owner_id=owner_id)
+    issue_date = issue_date or date.today()
+    batch_size = batch_size or settings.BILLING_BATCH_SIZE
+    base_query = _billable_leases_query(db, period=run.period, owner_id=owner_id)
+    conflicts = 0
+
+    try:
+        while True:
+            leases = (
+                base_query.filter(Lease.id > run.last_lease_id)
+                .order_by(Lease.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not leases:
+                break
+            try:
+                batch_total = _insert_batch(db, leases, period=run.period, issue_date=issue_date)
+            except IntegrityError:
+                # A concurrent run invoiced some of these leases first; the
+                # NOT EXISTS filter skips them when the batch is re-read
+                db.rollback()
+                conflicts += 1
+                if conflicts > 3:
+                    raise
+                continue
+            conflicts = 0
+            run.last_lease_id = leases[-1].id
+            run.invoices_created += len(leases)
+            run.total_amount += batch_total
+            db.commit()
+
+        run.status = BillingRunStatus.COMPLETED
+        run.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        run.status = BillingRunStatus.FAILED
+        run.error = str(e)[:500]
+        db.commit()
+        logger.error(f"Billing run {run.id} failed: {e}")
+        raise
+    db.refresh(run)
+    logger.info(f"Billing run {run.id} for {run.period} created {run.invoices_created} invoices")
+    return run
+
+
+def execute_queued_run(run_id: int) -> None:
+    """Execute a run recorded by ``start_or_resume_run``; a failure is logged and left on the run."""
+    db = SessionLocal()
+    try:
+        run = db.get(BillingRun, run_id)
+        if run is None or run.status != BillingRunStatus.RUNNING:
+            return
+        execute_billing_run(db, period=run.period, owner_id=run.owner_id)
+    except Exception:
+        logger.exception(f"Queued billing run {run_id} failed")
+    finally:
+        db.close()
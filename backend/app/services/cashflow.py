@@ -0,0 +1,182 @@
+"""
+Cash-flow report: income, expenses and net operating income per property
+and month.
+
+Income comes from invoices, through their lease's unit:
+- ``invoiced`` is the net amount of every invoice that is not cancelled, in
+  its billing month, or its issue month if it was not billed by a run.
+- ``collected`` is the net amount of paid invoices, in the month they were
+  paid.
+Expenses are completed outgoing bank transactions in their booking month,
+under the property they are allocated to. Unallocated expenses only count
+toward the portfolio. Net operating income is collected minus expenses.
+
+Each source is read with one grouped query and scattered into a
+(properties x months) matrix, so the work does not grow with the number of
+invoices or transactions in a month. Results are cached per owner and
+window, keyed by a fingerprint of the owner's data as in the rent
+projection.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, extract, func
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.lease import Lease
+from app.models.property import Property
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.models.unit import Unit
+from app.services.projection import month_ordinal, ordinal_to_date
+
+
+def _by_month(query, column):
+    year, month = extract("year", column), extract("month", column)
+    return query.add_columns(year, month).group_by(year, month)
+
+
+def _invoice_query(db: Session, *, owner_id: int, amount):
+    return (
+        db.query(Unit.property_id, func.sum(amount))
+        .select_from(Invoice)
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(Property.owner_id == owner_id)
+        .group_by(Unit.property_id)
+    )
+
+
+def _matrix(rows: Sequence[Tuple], property_ids: np.ndarray, start_month: int, months: int) -> np.ndarray:
+    """Sum (property_id, amount, year, month) rows by property and month."""
+    matrix = np.zeros((property_ids.shape[0] + 1, months))
+    if not rows:
+        return matrix
+    property_id, amount, year, month = zip(*rows)
+    property_id = np.array([-1 if p is None else p for p in property_id], dtype=np.int64)
+    amount = np.array([float(a or 0) for a in amount])
+    column = np.array(year, dtype=np.int64) * 12 + np.array(month, dtype=np.int64) - 1 - start_month
+    position = np.searchsorted(property_ids, property_id)
+    found = position < property_ids.shape[0]
+    found[found] = property_ids[position[found]] == property_id[found]
+    np.add.at(matrix, (np.where(found, position, property_ids.shape[0]), column), amount)
+    return matrix
+
+
+def load_totals(db: Session, *, owner_id: int, start_month: int, months: int) -> Tuple[List[Tuple[int, str]], Dict[str, np.ndarray]]:
+    """
+    The owner's properties, and per series a (properties + 1, months) matrix
+    whose last row holds amounts without a property.
+    """
+    first, after = ordinal_to_date(start_month), ordinal_to_date(start_month + months)
+    properties = (
+        db.query(Property.id, Property.name).filter(Property.owner_id == owner_id).order_by(Property.id).all()
+    )
+
+    invoiced_on = func.coalesce(Invoice.billing_period, Invoice.issue_date)
+    invoiced = _by_month(_invoice_query(db, owner_id=owner_id, amount=Invoice.amount), invoiced_on).filter(
+        Invoice.status != InvoiceStatus.CANCELLED.value, invoiced_on >= first, invoiced_on < after,
+    )
+    collected = _by_month(_invoice_query(db, owner_id=owner_id, amount=Invoice.amount), Invoice.paid_at).filter(
+        Invoice.status == InvoiceStatus.PAID.value,
+        Invoice.paid_at >= datetime.combine(first, datetime.min.time()),
+        Invoice.paid_at < datetime.combine(after, datetime.min.time()),
+    )
+    expenses = _by_month(
+        db.query(Transaction.property_id, (-func.sum(Transaction.amount)).label("amount"))
+        .filter(
+            Transaction.user_id == str(owner_id),
+            Transaction.type == TransactionType.EXPENSE,
+            Transaction.status == TransactionStatus.COMPLETED,
+            Transaction.booking_date >= datetime.combine(first, datetime.min.time()),
+            Transaction.booking_date < datetime.combine(after, datetime.min.time()),
+        )
+        .group_by(Transaction.property_id),
+        Transaction.booking_date,
+    )
+
+    property_ids = np.array([property_id for property_id, _ in properties], dtype=np.int64)
+    totals = {
+        "invoiced": _matrix(invoiced.all(), property_ids, start_month, months),
+        "collected": _matrix(collected.all(), property_ids, start_month, months),
+        "expenses": _matrix(expenses.all(), property_ids, start_month, months),
+    }
+    return properties, totals
+
+
+def _data_version(db: Session, *, owner_id: int) -> Tuple:
+    """Cheap fingerprint that changes whenever an invoice, transaction, unit or property of the owner changes."""
+    invoices = (
+        db.query(
+            func.count(Invoice.id),
+            func.max(Invoice.updated_at),
+            func.count(Invoice.paid_at),
+            func.sum(case((Invoice.status == InvoiceStatus.CANCELLED.value, 1), else_=0)),
+        )
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(Property.owner_id == owner_id)
+        .one()
+    )
+    transactions = (
+        db.query(func.count(Transaction.id), func.max(Transaction.updated_at), func.sum(Transaction.amount))
+        .filter(Transaction.user_id == str(owner_id))
+        .one()
+    )
+    units = (
+        db.query(func.count(Unit.id), func.coalesce(func.sum(Unit.version), 0))
+        .join(Property).filter(Property.owner_id == owner_id).one()
+    )
+    # Read on their own, so properties without units count too
+    properties = (
+        db.query(func.count(Property.id), func.max(Property.id), func.max(Property.updated_at))
+        .filter(Property.owner_id == owner_id)
+        .one()
+    )
+    return tuple(invoices) + tuple(transactions) + tuple(units) + tuple(properties)
+
+
+_cache = LRUCache(settings.REPORT_CACHE_SIZE)
+
+
+def _series(matrix: np.ndarray) -> Dict[str, List[float]]:
+    invoiced, collected, expenses = matrix
+    return {
+        "invoiced": np.round(invoiced, 2).tolist(),
+        "collected": np.round(collected, 2).tolist(),
+        "expenses": np.round(expenses, 2).tolist(),
+        "noi": np.round(collected - expenses, 2).tolist(),
+    }
+
+
+def cashflow(db: Session, *, owner_id: int, months: int = 24, end: Optional[date] = None) -> Dict[str, Any]:
+    """Monthly income, expenses and net operating income of the ``months`` through ``end``, per property."""
+    end_month = month_ordinal(end or date.today())
+    start_month = end_month - months + 1
+    key = (owner_id, start_month, months, _data_version(db, owner_id=owner_id))
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    properties, totals = load_totals(db, owner_id=owner_id, start_month=start_month, months=months)
+    # (series, properties + 1, months)
+    stacked = np.stack([totals["invoiced"], totals["collected"], totals["expenses"]])
+    by_property = [
+        {"property_id": property_id, "property_name": name, **_series(stacked[:, i])}
+        for i, (property_id, name) in enumerate(properties)
+    ]
+    if stacked[:, -1].any():
+        by_property.append({"property_id": None, "property_name": None, **_series(stacked[:, -1])})
+
+    result = {
+        "months": [ordinal_to_date(start_month + m) for m in range(months)],
+        **_series(stacked.sum(axis=1)),
+        "by_property": by_property,
+    }
+    _cache.set(key, result)
+    return result
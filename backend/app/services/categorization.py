@@ -0,0 +1,326 @@
+"""
+Transaction categorization.
+
+Transactions are categorized in batches, first by the owner's
+``CategoryRule``s and then by a naive Bayes text classifier trained on the
+owner's confirmed categories.
+
+The rules of an owner are compiled once:
+- Their text patterns become a single regular expression. It reports every
+  pattern occurring in a transaction's reference or description in one scan.
+- Amount, type and counterparty conditions become arrays.
+A batch is then matched against all rules at once as an (transactions x
+rules) mask, and each transaction takes its first matching rule by priority.
+
+The classifier sees the words of the reference, description and
+counterparty, hashed into ``2 ** CATEGORIZATION_HASH_BITS`` features, plus
+the direction and magnitude of the amount. It learns from transactions
+categorized manually or by a rule, and only assigns a category it is at
+least ``CATEGORIZATION_MIN_CONFIDENCE`` sure of. Owners with too few
+confirmed categories get no classifier.
+
+Both are cached per owner. Changing a rule drops the owner's cached copy in
+this process at once. Other processes, and new confirmed categories, are
+picked up after ``CATEGORIZATION_MODEL_TTL_SECONDS``. Manual categories are
+never overwritten.
+"""
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, event, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.transaction import CategoryRule, CategorySource, Transaction, TransactionType
+
+WORD_RE = re.compile(r"[a-z]{2,}")
+SPACE_RE = re.compile(r"\s+")
+
+Label = Tuple[str, Optional[str]]  # (category, subcategory)
+
+
+def normalize(text: Optional[str]) -> str:
+    return SPACE_RE.sub(" ", text.lower()).strip() if text else ""
+
+
+@dataclass
+class Batch:
+    """Columns of the transactions to categorize, in matching order."""
+    texts: List[str]  # Normalized reference and description
+    counterparties: List[str]  # Normalized
+    amounts: np.ndarray  # Signed
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict[str, Any]]) -> "Batch":
+        return cls(
+            texts=[normalize(f"{row.get('reference') or ''} {row.get('description') or ''}") for row in rows],
+            counterparties=[normalize(row.get("counterparty")) for row in rows],
+            amounts=np.fromiter((float(row["amount"]) for row in rows), dtype=np.float64, count=len(rows)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+class RuleSet:
+    """An owner's active rules, compiled for matching whole batches."""
+
+    def __init__(self, rules: Sequence[CategoryRule]):
+        rules = sorted(rules, key=lambda rule: (rule.priority, rule.id))
+        self.labels: List[Label] = [(rule.category, rule.subcategory) for rule in rules]
+
+        literals = sorted({normalize(rule.pattern) for rule in rules if normalize(rule.pattern)}, key=len, reverse=True)
+        self._literal_index = {literal: i for i, literal in enumerate(literals)}
+        # A lookahead matches at every position, longest pattern first; the shorter patterns
+        # starting at the same position are contained in it, so they count as found too
+        self._implied = [[j for j, other in enumerate(literals) if other in literal] for literal in literals]
+        self._regex = re.compile("(?=(" + "|".join(map(re.escape, literals)) + "))") if literals else None
+
+        self._rule_literal = np.array(
+            [self._literal_index.get(normalize(rule.pattern), -1) for rule in rules], dtype=np.int64
+        )
+        counterparties = sorted({normalize(rule.counterparty) for rule in rules if normalize(rule.counterparty)})
+        self._counterparty_index = {name: i for i, name in enumerate(counterparties)}
+        self._rule_counterparty = np.array(
+            [self._counterparty_index.get(normalize(rule.counterparty), -1) for rule in rules], dtype=np.int64
+        )
+        self._rule_income = np.array(
+            [-1 if rule.transaction_type is None else int(rule.transaction_type == TransactionType.INCOME) for rule in rules],
+            dtype=np.int64,
+        )
+        self._min = np.array([-np.inf if rule.min_amount is None else float(rule.min_amount) for rule in rules])
+        self._max = np.array([np.inf if rule.max_amount is None else float(rule.max_amount) for rule in rules])
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _pattern_hits(self, texts: List[str]) -> np.ndarray:
+        hits = np.zeros((len(texts), len(self._literal_index)), dtype=bool)
+        for row, text in enumerate(texts):
+            for match in self._regex.finditer(text):
+                hits[row, self._implied[self._literal_index[match.group(1)]]] = True
+        return hits
+
+    def match(self, batch: Batch) -> np.ndarray:
+        """Index of the first matching rule per transaction, -1 where none matches."""
+        if not self.labels or not len(batch):
+            return np.full(len(batch), -1, dtype=np.int64)
+        size = np.abs(batch.amounts)[:, None]
+        ok = (size >= self._min) & (size <= self._max)
+        income = (batch.amounts > 0).astype(np.int64)[:, None]
+        ok &= (self._rule_income < 0) | (self._rule_income == income)
+        counterparty = np.fromiter(
+            (self._counterparty_index.get(name, -2) for name in batch.counterparties), dtype=np.int64, count=len(batch)
+        )[:, None]
+        ok &= (self._rule_counterparty < 0) | (self._rule_counterparty == counterparty)
+        if self._regex is not None:
+            hits = self._pattern_hits(batch.texts)
+            ok &= (self._rule_literal < 0) | hits[:, np.maximum(self._rule_literal, 0)]
+        first = ok.argmax(axis=1)
+        return np.where(ok[np.arange(len(batch)), first], first, -1)
+
+
+def _features(batch: Batch, mask: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(offsets, features): the hashed features of row i are features[offsets[i]:offsets[i + 1]]."""
+    features: List[int] = []
+    offsets = [0]
+    for text, counterparty, amount in zip(batch.texts, batch.counterparties, batch.amounts.tolist()):
+        tokens = WORD_RE.findall(text)
+        tokens += [f"cp:{word}" for word in WORD_RE.findall(counterparty)]
+        # Every row has these two, so no row is empty
+        tokens.append("dir:in" if amount > 0 else "dir:out")
+        tokens.append(f"amt:{int(math.log2(abs(amount) + 1))}")
+        features.extend(hash(token) & mask for token in tokens)
+        offsets.append(len(features))
+    return np.array(offsets, dtype=np.int64), np.array(features, dtype=np.int64)
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over hashed tokens."""
+
+    def __init__(self, labels: List[Label], log_prior: np.ndarray, log_likelihood: np.ndarray, mask: int):
+        self.labels = labels
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood  # (labels, features)
+        self.mask = mask
+
+    @classmethod
+    def train(cls, batch: Batch, labels: List[Label], *, bits: int, alpha: float = 1.0) -> "NaiveBayes":
+        classes = sorted(set(labels), key=lambda label: (label[0], label[1] or ""))
+        class_index = {label: i for i, label in enumerate(classes)}
+        y = np.array([class_index[label] for label in labels], dtype=np.int64)
+        mask = (1 << bits) - 1
+        offsets, features = _features(batch, mask)
+        counts = np.zeros((len(classes), mask + 1), dtype=np.float32)
+        np.add.at(counts, (np.repeat(y, np.diff(offsets)), features), 1.0)
+        log_likelihood = np.log(counts + alpha) - np.log(counts.sum(axis=1, keepdims=True) + alpha * (mask + 1))
+        log_prior = np.log(np.bincount(y, minlength=len(classes)) / len(y))
+        return cls(classes, log_prior, log_likelihood.astype(np.float32), mask)
+
+    def predict(self, batch: Batch) -> Tuple[np.ndarray, np.ndarray]:
+        """Most likely label index and its probability per transaction."""
+        offsets, features = _features(batch, self.mask)
+        scores = np.add.reduceat(self.log_likelihood[:, features], offsets[:-1], axis=1).T + self.log_prior
+        best = scores.argmax(axis=1)
+        # Probability of the best label: 1 / sum(exp(score - best score))
+        confidence = 1.0 / np.exp(scores - scores[np.arange(len(batch)), best][:, None]).sum(axis=1)
+        return best, confidence
+
+
+@dataclass
+class Categorizer:
+    rules: RuleSet
+    model: Optional[NaiveBayes]
+    loaded_at: float
+
+    def categorize(self, batch: Batch) -> List[Optional[Tuple[str, Optional[str], str]]]:
+        """(category, subcategory, source) per transaction, None where neither rules nor the model decide."""
+        results: List[Optional[Tuple[str, Optional[str], str]]] = [None] * len(batch)
+        matched = self.rules.match(batch)
+        for row in np.flatnonzero(matched >= 0).tolist():
+            category, subcategory = self.rules.labels[matched[row]]
+            results[row] = (category, subcategory, CategorySource.RULE.value)
+        rest = np.flatnonzero(matched < 0)
+        if self.model is not None and rest.size:
+            remaining = Batch(
+                texts=[batch.texts[i] for i in rest.tolist()],
+                counterparties=[batch.counterparties[i] for i in rest.tolist()],
+                amounts=batch.amounts[rest],
+            )
+            best, confidence = self.model.predict(remaining)
+            for row, label, p in zip(rest.tolist(), best.tolist(), confidence.tolist()):
+                if p >= settings.CATEGORIZATION_MIN_CONFIDENCE:
+                    category, subcategory = self.model.labels[label]
+                    results[row] = (category, subcategory, CategorySource.MODEL.value)
+        return results
+
+
+def load_categorizer(db: Session, *, owner_id: int) -> Categorizer:
+    rules = (
+        db.query(CategoryRule)
+        .filter(CategoryRule.owner_id == owner_id, CategoryRule.is_active.is_(True))
+        .all()
+    )
+    training = (
+        db.query(
+            Transaction.amount, Transaction.reference, Transaction.description, Transaction.counterparty,
+            Transaction.category, Transaction.subcategory,
+        )
+        .filter(
+            Transaction.user_id == str(owner_id),
+            Transaction.category_source.in_([CategorySource.MANUAL.value, CategorySource.RULE.value]),
+            Transaction.category.isnot(None),
+        )
+        .order_by(Transaction.booking_date.desc())
+        .limit(settings.CATEGORIZATION_TRAINING_LIMIT)
+        .all()
+    )
+    model = None
+    labels = [(row.category, row.subcategory) for row in training]
+    if len(training) >= settings.CATEGORIZATION_MIN_TRAINING_SAMPLES and len(set(labels)) > 1:
+        rows = [row._asdict() for row in training]
+        model = NaiveBayes.train(Batch.from_rows(rows), labels, bits=settings.CATEGORIZATION_HASH_BITS)
+    return Categorizer(rules=RuleSet(rules), model=model, loaded_at=time.monotonic())
+
+
+_categorizers = LRUCache(settings.CATEGORIZATION_CACHE_SIZE)
+
+
+def get_categorizer(db: Session, *, owner_id: int) -> Categorizer:
+    categorizer = _categorizers.get(owner_id)
+    if categorizer is None or time.monotonic() - categorizer.loaded_at > settings.CATEGORIZATION_MODEL_TTL_SECONDS:
+        categorizer = load_categorizer(db, owner_id=owner_id)
+        _categorizers.set(owner_id, categorizer)
+    return categorizer
+
+
+def invalidate(owner_id: Optional[int] = None) -> None:
+    if owner_id is None:
+        _categorizers.clear()
+    else:
+        _categorizers.pop(owner_id)
+
+
+@event.listens_for(CategoryRule, "after_insert")
+@event.listens_for(CategoryRule, "after_update")
+@event.listens_for(CategoryRule, "after_delete")
+def _forget_rules(mapper, connection, target):
+    invalidate(target.owner_id)
+
+
+def _write(db: Session, key: str, updates: List[Dict[str, Any]]) -> int:
+    """Set categories by ``key`` column; manually categorized transactions are left alone."""
+    if not updates:
+        return 0
+    table = Transaction.__table__
+    return db.execute(
+        update(table)
+        .where(
+            table.c[key] == bindparam("b_key"),
+            or_(table.c.category_source.is_(None), table.c.category_source != CategorySource.MANUAL.value),
+        )
+        .values(category=bindparam("b_category"), subcategory=bindparam("b_subcategory"), category_source=bindparam("b_source")),
+        updates,
+    ).rowcount
+
+
+def categorize_synced(db: Session, *, owner_id: int, rows: Sequence[Dict[str, Any]]) -> int:
+    """Categorize freshly synced transactions, given as column dicts with ``bank_transaction_id``; no commit."""
+    if not rows:
+        return 0
+    results = get_categorizer(db, owner_id=owner_id).categorize(Batch.from_rows(rows))
+    return _write(db, "bank_transaction_id", [
+        {"b_key": row["bank_transaction_id"], "b_category": result[0], "b_subcategory": result[1], "b_source": result[2]}
+        for row, result in zip(rows, results) if result is not None
+    ])
+
+
+def recategorize(db: Session, *, owner_id: int, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Categorize all of an owner's transactions again, e.g. after changing rules; manual categories stay."""
+    batch_size = batch_size or settings.CATEGORIZATION_BATCH_SIZE
+    invalidate(owner_id)
+    categorizer = get_categorizer(db, owner_id=owner_id)
+    summary = {"transactions": 0, "updated": 0}
+    last_id = ""
+    while True:
+        rows = [
+            row._asdict() for row in
+            db.query(
+                Transaction.id, Transaction.amount, Transaction.reference, Transaction.description,
+                Transaction.counterparty, Transaction.category, Transaction.subcategory, Transaction.category_source,
+            )
+            .filter(Transaction.user_id == str(owner_id), Transaction.id > last_id)
+            .order_by(Transaction.id)
+            .limit(batch_size)
+        ]
+        if not rows:
+            return summary
+        last_id = rows[-1]["id"]
+        results = categorizer.categorize(Batch.from_rows(rows))
+        updates = []
+        for row, result in zip(rows, results):
+            if row["category_source"] == CategorySource.MANUAL.value:
+                continue
+            result = result or (None, None, None)
+            if result != (row["category"], row["subcategory"], row["category_source"]):
+                updates.append({"b_key": row["id"], "b_category": result[0], "b_subcategory": result[1], "b_source": result[2]})
+        summary["updated"] += _write(db, "id", updates)
+        summary["transactions"] += len(rows)
+        db.commit()
+
+
+def set_category(db: Session, transaction: Transaction, *, category: Optional[str], subcategory: Optional[str]) -> Transaction:
+    """Categorize a transaction by hand; it then also teaches the owner's classifier."""
+    transaction.category = category
+    transaction.subcategory = subcategory if category else None
+    transaction.category_source = CategorySource.MANUAL.value if category else None
+    db.commit()
+    db.refresh(transaction)
+    if transaction.user_id and transaction.user_id.isdigit():
+        invalidate(int(transaction.user_id))
+    return transaction
@@ -0,0 +1,111 @@
+"""
+Invoice number allocation (hi/lo).
+
+Each series (by default one per owner) has a row in ``invoice_sequences``.
+A worker reserves a block of numbers with a single atomic
+``UPDATE ... SET next_value = next_value + block RETURNING next_value`` in
+its own short transaction and then hands numbers out of that block from
+memory. Blocks never overlap, so numbers are strictly unique across
+threads, processes and nodes; numbers of a block that is not used up
+before a restart are skipped, which leaves gaps but never duplicates.
+
+Callers of one series wait for each other while a block is reserved; other
+series are not held up by it.
+"""
+import threading
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.invoice import Invoice, InvoiceSequence
+
+
+# Creating a series row can only race once; more conflicts mean something else is wrong
+RESERVE_ATTEMPTS = 3
+
+
+class SequenceReservationError(Exception):
+    pass
+
+
+def owner_series(owner_id: int) -> str:
+    return str(owner_id)
+
+
+class SequenceAllocator:
+    def __init__(self, block_size: int = 100):
+        self.block_size = block_size
+        # (engine id, series) -> [next number, last number of the block]
+        self._blocks: Dict[Tuple[int, str], List[int]] = {}
+        # One lock per series, so a reservation round trip only blocks its own series
+        self._locks: Dict[Tuple[int, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _series_lock(self, key: Tuple[int, str]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _reserve_block(self, engine: Engine, series: str, size: int) -> Tuple[int, int]:
+        """Atomically reserve ``size`` numbers and return (first, last)."""
+        stmt = (
+            update(InvoiceSequence)
+            .where(InvoiceSequence.series == series)
+            .values(next_value=InvoiceSequence.next_value + size)
+            .returning(InvoiceSequence.next_value)
+        )
+        for _ in range(RESERVE_ATTEMPTS):
+            try:
+                # Separate connection: the reservation must commit even if
+                # the caller's transaction later rolls back
+                with engine.begin() as conn:
+                    hi = conn.execute(stmt).scalar()
+                    if hi is None:
+                        hi = 1 + size
+                        conn.execute(insert(InvoiceSequence).values(series=series, next_value=hi))
+                return hi - size, hi - 1
+            except IntegrityError as e:
+                # Another worker created the series row first; update it instead
+                error = e
+        raise SequenceReservationError(
+            f"Could not reserve invoice numbers for series {series} after {RESERVE_ATTEMPTS} attempts: {error}"
+        )
+
+    def allocate_many(self, db: Session, series: str, count: int) -> List[int]:
+        engine = db.get_bind()
+        key = (id(engine), series)
+        numbers: List[int] = []
+        with self._series_lock(key):
+            while len(numbers) < count:
+                block = self._blocks.get(key)
+                if block is None or block[0] > block[1]:
+                    first, last = self._reserve_block(engine, series, max(self.block_size, count - len(numbers)))
+                    block = self._blocks[key] = [first, last]
+                take = min(count - len(numbers), block[1] - block[0] + 1)
+                numbers.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return numbers
+
+    def allocate(self, db: Session, series: str) -> int:
+        return self.allocate_many(db, series, 1)[0]
+
+    def reset(self) -> None:
+        """Forget cached blocks (the remaining numbers become gaps)."""
+        with self._lock:
+            self._blocks.clear()
+
+
+allocator = SequenceAllocator(block_size=settings.INVOICE_NUMBER_BLOCK_SIZE)
+
+
+def next_invoice_number(db: Session, *, owner_id: int) -> str:
+    series = owner_series(owner_id)
+    return Invoice.format_invoice_number(series, allocator.allocate(db, series))
+
+
+def next_invoice_numbers(db: Session, *, owner_id: int, count: int) -> List[str]:
+    series = owner_series(owner_id)
+    return [Invoice.format_invoice_number(series, n) for n in allocator.allocate_many(db, series, count)]
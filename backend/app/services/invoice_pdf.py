@@ -0,0 +1,207 @@
+"""
+Invoice PDF rendering.
+
+Rendering is CPU-bound, so it runs in a bounded process pool instead of the
+request workers. Rendered documents are stored in a content-addressed disk
+cache: the file name is a hash of the document data, including the invoice's
+``updated_at``, so any change to the invoice produces a new document while
+repeats are served straight from disk.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.core.config import settings
+from app.models.invoice import Invoice
+from app.models.lease import Lease
+from app.models.property import Property
+from app.models.unit import Unit
+from app.services.billing import period_end, period_start
+
+# Bump when the layout changes so cached documents are re-rendered
+RENDERER_VERSION = "1"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def pool_workers() -> int:
+    return settings.PDF_RENDER_WORKERS or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=pool_workers())
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(lines: List[str]) -> bytes:
+    """Write a single-page PDF showing ``lines`` in Helvetica."""
+    text = "BT /F1 11 Tf 50 790 Td 16 TL\n"
+    text += "".join(f"({_escape(line)}) Tj T*\n" for line in lines) + "ET"
+    stream = text.encode("cp1252", errors="replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def invoice_lines(data: Dict[str, Any]) -> List[str]:
+    currency = data["currency_iso"]
+    lines = [
+        f"INVOICE {data['invoice_number']}",
+        "",
+        f"Issue date: {data['issue_date']}",
+        f"Due date: {data['due_date']}",
+        f"Status: {data['status']}",
+        "",
+        f"Billed to: {data['tenant_name']}",
+        f"Property: {data['property_name']}, unit {data['unit_number']}",
+        f"Address: {data['property_address']}",
+        "",
+        f"Rent: {data['amount']:.2f} {currency}",
+    ]
+    for entry in data["vat_entries"]:
+        lines.append(
+            f"VAT {entry['vat_rate']:g}% ({entry['country_iso']}) on "
+            f"{entry['net_amount']:.2f}: {entry['vat_amount']:.2f} {currency}"
+        )
+    lines += ["", f"Total due: {data['total_amount']:.2f} {currency}"]
+    return lines
+
+
+def render_to_file(data: Dict[str, Any], path: str) -> str:
+    """Process pool task: render one invoice and atomically store it at ``path``."""
+    pdf = build_pdf(invoice_lines(data))
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+    return path
+
+
+def document_data(invoice: Invoice) -> Dict[str, Any]:
+    """Plain, picklable snapshot of everything the document shows."""
+    lease = invoice.lease
+    return {
+        "id": invoice.id,
+        "updated_at": invoice.updated_at.isoformat() if invoice.updated_at else "",
+        "invoice_number": invoice.invoice_number,
+        "issue_date": invoice.issue_date.isoformat(),
+        "due_date": invoice.due_date.isoformat(),
+        "status": str(getattr(invoice.status, "value", invoice.status)),
+        "amount": invoice.amount,
+        "vat_amount": invoice.vat_amount,
+        "total_amount": invoice.total_amount,
+        "currency_iso": invoice.currency_iso,
+        "tenant_name": lease.tenant.full_name if lease.tenant else "",
+        "property_name": lease.unit.property.name,
+        "property_address": lease.unit.property.full_address,
+        "unit_number": lease.unit.unit_number,
+        "vat_entries": [
+            {
+                "vat_rate": entry.vat_rate,
+                "net_amount": entry.net_amount,
+                "vat_amount": entry.vat_amount,
+                "country_iso": entry.country_iso,
+            }
+            for entry in invoice.vat_entries
+        ],
+    }
+
+
+def cache_path(data: Dict[str, Any]) -> str:
+    payload = json.dumps(data, sort_keys=True, default=str)
+    key = hashlib.sha256(f"{RENDERER_VERSION}:{payload}".encode()).hexdigest()
+    return os.path.join(settings.INVOICE_PDF_CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def _invoices_query(db: Session, owner_id: Optional[int]):
+    query = (
+        db.query(Invoice)
+        .join(Lease).join(Unit).join(Property)
+        .options(
+            joinedload(Invoice.lease).joinedload(Lease.unit).joinedload(Unit.property),
+            joinedload(Invoice.lease).joinedload(Lease.tenant),
+            selectinload(Invoice.vat_entries),
+        )
+    )
+    if owner_id is not None:
+        query = query.filter(Property.owner_id == owner_id)
+    return query
+
+
+def get_document_data(db: Session, *, invoice_id: int, owner_id: int) -> Optional[Dict[str, Any]]:
+    invoice = _invoices_query(db, owner_id).filter(Invoice.id == invoice_id).first()
+    return document_data(invoice) if invoice else None
+
+
+async def get_invoice_pdf(data: Dict[str, Any]) -> str:
+    """Return the cached document path, rendering it in the process pool on a miss."""
+    path = cache_path(data)
+    if os.path.exists(path):
+        return path
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), render_to_file, data, path)
+
+
+def render_period(db: Session, *, period: date, owner_id: Optional[int] = None) -> Dict[str, int]:
+    """Render every invoice of a billing period, spread over all pool workers."""
+    start, end = period_start(period), period_end(period)
+    invoices = (
+        _invoices_query(db, owner_id)
+        .filter(or_(
+            Invoice.billing_period == start,
+            # Invoices created one by one carry no billing period
+            and_(Invoice.billing_period.is_(None), Invoice.issue_date.between(start, end)),
+        ))
+        .order_by(Invoice.id)
+        .all()
+    )
+    pending = []
+    for invoice in invoices:
+        data = document_data(invoice)
+        path = cache_path(data)
+        if not os.path.exists(path):
+            pending.append((data, path))
+
+    if pending:
+        chunksize = max(1, len(pending) // (pool_workers() * 4))
+        datas, paths = zip(*pending)
+        list(get_pool().map(render_to_file, datas, paths, chunksize=chunksize))
+    return {"invoices": len(invoices), "rendered": len(pending), "cached": len(invoices) - len(pending)}
@@ -0,0 +1,294 @@
+"""
+Per-lease ledger of charges and payments.
+
+Every invoice posts a charge and every payment a (negative) payment line.
+``lease_balances`` holds the materialized balance per lease; it is updated
+with an additive upsert in the same transaction as the ledger lines, which
+also row-locks the balance so concurrent postings on one lease serialize
+and ``balance_after`` stays a true running balance. Payments settle open
+charges oldest first (the paid invoice first, when one is given), and the
+remaining ``open_amount`` per charge drives the aging report.
+
+An overpayment leaves a negative balance: credit. Since payments only leave
+credit once every charge is settled, the credit is exactly the negative
+balance, and new charges are settled from it as they are posted.
+
+Invoices from before the ledger existed have no charge. Theirs is posted
+when they are first paid, or for all of them at once by the
+``backfill-ledger`` command.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, func, insert, literal_column, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.lease import Lease
+from app.models.ledger import LeaseBalance, LedgerEntry, LedgerEntryType
+from app.models.property import Property
+from app.models.unit import Unit
+
+SETTLE_CHUNK_SIZE = 500  # Leases whose open charges are read per query
+
+AGING_BUCKETS = ("not_due", "days_0_30", "days_31_60", "days_61_90", "days_over_90")
+
+# Literal (not a bound parameter) so SQLite can use the partial open-charge index
+_is_open = LedgerEntry.open_amount > literal_column("0")
+
+
+def _add_to_balances(db: Session, deltas: Dict[int, Tuple[int, float]]) -> Dict[int, float]:
+    """Add ``amount`` to each lease's balance; returns the new balances."""
+    upsert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = upsert(LeaseBalance)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["lease_id"],
+        set_={"balance": LeaseBalance.balance + stmt.excluded.balance, "updated_at": func.now()},
+    ).returning(LeaseBalance.lease_id, LeaseBalance.balance)
+    rows = [
+        {"lease_id": lease_id, "owner_id": owner_id, "balance": amount}
+        for lease_id, (owner_id, amount) in deltas.items()
+    ]
+    return {lease_id: balance for lease_id, balance in db.execute(stmt, rows)}
+
+
+def post_charges(db: Session, charges: Iterable[Dict[str, Any]]) -> List[int]:
+    """
+    Post invoice charges (dicts with lease_id, owner_id, invoice_id, amount,
+    due_date and booked_on) inside the caller's transaction. Credit on the
+    lease settles them; returns the ids of invoices it fully paid.
+    """
+    charges = list(charges)
+    if not charges:
+        return []
+    deltas: Dict[int, Tuple[int, float]] = {}
+    for charge in charges:
+        _, total = deltas.get(charge["lease_id"], (charge["owner_id"], 0.0))
+        deltas[charge["lease_id"]] = (charge["owner_id"], total + charge["amount"])
+    balances = _add_to_balances(db, deltas)
+
+    running = {lease_id: balances[lease_id] - total for lease_id, (_, total) in deltas.items()}
+    rows = []
+    settled = []
+    for charge in charges:
+        credit = max(0.0, -running[charge["lease_id"]])
+        running[charge["lease_id"]] += charge["amount"]
+        open_amount = round(max(0.0, charge["amount"] - credit), 2)
+        if open_amount == 0 and charge["amount"] > 0 and charge.get("invoice_id") is not None:
+            settled.append(charge["invoice_id"])
+        rows.append({
+            **charge,
+            "entry_type": LedgerEntryType.CHARGE.value,
+            "balance_after": round(running[charge["lease_id"]], 2),
+            "open_amount": open_amount,
+        })
+    db.execute(insert(LedgerEntry), rows)
+    return settled
+
+
+def post_payments(db: Session, payments: Iterable[Dict[str, Any]]) -> List[int]:
+    """
+    Post payments (dicts with lease_id, owner_id, amount, booked_on and an
+    optional invoice_id) inside the caller's transaction and settle open
+    charges with them. Returns the ids of invoices that are now fully paid;
+    any overpayment stays on the lease as credit.
+    """
+    payments = list(payments)
+    if not payments:
+        return []
+    deltas: Dict[int, Tuple[int, float]] = {}
+    for payment in payments:
+        _, total = deltas.get(payment["lease_id"], (payment["owner_id"], 0.0))
+        deltas[payment["lease_id"]] = (payment["owner_id"], total - payment["amount"])
+    balances = _add_to_balances(db, deltas)
+
+    running = {lease_id: balances[lease_id] - total for lease_id, (_, total) in deltas.items()}
+    rows = []
+    for payment in payments:
+        running[payment["lease_id"]] -= payment["amount"]
+        rows.append({
+            "lease_id": payment["lease_id"],
+            "owner_id": payment["owner_id"],
+            "invoice_id": payment.get("invoice_id"),
+            "entry_type": LedgerEntryType.PAYMENT.value,
+            "amount": -payment["amount"],
+            "balance_after": round(running[payment["lease_id"]], 2),
+            "open_amount": 0.0,
+            "booked_on": payment["booked_on"],
+        })
+    db.execute(insert(LedgerEntry), rows)
+
+    # [id, invoice_id, open_amount] per open charge, oldest first
+    charges: Dict[int, List[List[Any]]] = defaultdict(list)
+    lease_ids = sorted(deltas)
+    for i in range(0, len(lease_ids), SETTLE_CHUNK_SIZE):
+        open_charges = (
+            db.query(LedgerEntry.id, LedgerEntry.lease_id, LedgerEntry.invoice_id, LedgerEntry.open_amount)
+            .filter(LedgerEntry.lease_id.in_(lease_ids[i:i + SETTLE_CHUNK_SIZE]), _is_open)
+            .order_by(LedgerEntry.due_date, LedgerEntry.id)
+        )
+        for charge_id, lease_id, invoice_id, amount in open_charges:
+            charges[lease_id].append([charge_id, invoice_id, amount])
+
+    remaining_open: Dict[int, float] = {}
+    settled = []
+    for payment in payments:
+        remaining = payment["amount"]
+        invoice_id = payment.get("invoice_id")
+        # The paid invoice first, then the oldest charges
+        for charge in sorted(charges[payment["lease_id"]], key=lambda c: c[1] != invoice_id):
+            if remaining <= 0:
+                break
+            if charge[2] <= 0:
+                continue
+            applied = min(remaining, charge[2])
+            charge[2] = round(charge[2] - applied, 2)
+            remaining = round(remaining - applied, 2)
+            remaining_open[charge[0]] = charge[2]
+            if charge[2] == 0 and charge[1] is not None:
+                settled.append(charge[1])
+
+    if remaining_open:
+        entries = LedgerEntry.__table__
+        db.execute(
+            update(entries).where(entries.c.id == bindparam("b_id")).values(open_amount=bindparam("b_open")),
+            [{"b_id": charge_id, "b_open": amount} for charge_id, amount in remaining_open.items()],
+        )
+    return settled
+
+
+def post_payment(
+    db: Session,
+    *,
+    lease_id: int,
+    owner_id: int,
+    amount: float,
+    booked_on: date,
+    invoice_id: Optional[int] = None,
+) -> List[int]:
+    """Post a single payment, see ``post_payments``."""
+    return post_payments(db, [{
+        "lease_id": lease_id, "owner_id": owner_id, "amount": amount,
+        "booked_on": booked_on, "invoice_id": invoice_id,
+    }])
+
+
+def missing_charges(
+    db: Session,
+    *,
+    invoice_ids: Optional[Iterable[int]] = None,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+) -> List[Any]:
+    """Invoices that are not cancelled but have no charge, by id; optionally only ``invoice_ids``."""
+    has_charge = (
+        db.query(LedgerEntry.id)
+        .filter(LedgerEntry.invoice_id == Invoice.id, LedgerEntry.entry_type == LedgerEntryType.CHARGE.value)
+        .exists()
+    )
+    query = (
+        db.query(
+            Invoice.id, Invoice.lease_id, Property.owner_id, Invoice.total_amount,
+            Invoice.due_date, Invoice.issue_date, Invoice.status, Invoice.paid_at,
+        )
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(Invoice.id > after_id, Invoice.status != InvoiceStatus.CANCELLED.value, ~has_charge)
+        .order_by(Invoice.id)
+    )
+    if invoice_ids is None:
+        return query.limit(limit).all()
+    ids = sorted(invoice_ids)
+    return [
+        row
+        for i in range(0, len(ids), SETTLE_CHUNK_SIZE)
+        for row in query.filter(Invoice.id.in_(ids[i:i + SETTLE_CHUNK_SIZE])).all()
+    ]
+
+
+def post_missing_charges(db: Session, invoices: List[Any]) -> List[int]:
+    """
+    Post the charges of ``missing_charges`` rows inside the caller's
+    transaction. A paid invoice also gets its payment, so it stays settled
+    and the balance unchanged; returns the ids of invoices now fully paid.
+    """
+    settled = post_charges(db, (
+        {
+            "lease_id": invoice.lease_id,
+            "owner_id": invoice.owner_id,
+            "invoice_id": invoice.id,
+            "amount": invoice.total_amount,
+            "due_date": invoice.due_date,
+            "booked_on": invoice.issue_date,
+        }
+        for invoice in invoices
+    ))
+    settled += post_payments(db, (
+        {
+            "lease_id": invoice.lease_id,
+            "owner_id": invoice.owner_id,
+            "amount": invoice.total_amount,
+            "booked_on": invoice.paid_at.date() if invoice.paid_at else invoice.issue_date,
+            "invoice_id": invoice.id,
+        }
+        for invoice in invoices
+        if invoice.status == InvoiceStatus.PAID.value and invoice.total_amount > 0
+    ))
+    return settled
+
+
+def open_amount(db: Session, *, invoice_id: int) -> float:
+    return db.query(func.coalesce(func.sum(LedgerEntry.open_amount), 0.0)).filter(
+        LedgerEntry.invoice_id == invoice_id,
+        LedgerEntry.entry_type == LedgerEntryType.CHARGE.value,
+    ).scalar()
+
+
+def lease_ledger(db: Session, *, lease_id: int, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+    balance = db.query(LeaseBalance.balance).filter(LeaseBalance.lease_id == lease_id).scalar()
+    entries = (
+        db.query(LedgerEntry)
+        .filter(LedgerEntry.lease_id == lease_id)
+        .order_by(LedgerEntry.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return {"lease_id": lease_id, "balance": round(balance or 0.0, 2), "entries": entries}
+
+
+def aging(db: Session, *, owner_id: int, as_of: Optional[date] = None) -> Dict[str, Any]:
+    """Open charges per lease bucketed by days past due, from one pass over the open-charge index."""
+    as_of = as_of or date.today()
+    due = LedgerEntry.due_date
+    bounds = [as_of - timedelta(days=days) for days in (30, 60, 90)]
+    conditions = [
+        due >= as_of,
+        (due < as_of) & (due >= bounds[0]),
+        (due < bounds[0]) & (due >= bounds[1]),
+        (due < bounds[1]) & (due >= bounds[2]),
+        due < bounds[2],
+    ]
+    rows = (
+        db.query(
+            LedgerEntry.lease_id,
+            *(func.sum(case((condition, LedgerEntry.open_amount), else_=0.0)) for condition in conditions),
+        )
+        .filter(LedgerEntry.owner_id == owner_id, _is_open)
+        .group_by(LedgerEntry.lease_id)
+        .order_by(LedgerEntry.lease_id)
+        .all()
+    )
+
+    totals = defaultdict(float)
+    leases = []
+    for lease_id, *amounts in rows:
+        buckets = {name: round(amount, 2) for name, amount in zip(AGING_BUCKETS, amounts)}
+        for name, amount in buckets.items():
+            totals[name] += amount
+        leases.append({"lease_id": lease_id, **buckets, "total": round(sum(amounts), 2)})
+    totals_row = {name: round(totals[name], 2) for name in AGING_BUCKETS}
+    return {"as_of": as_of, "totals": {**totals_row, "total": round(sum(totals_row.values()), 2)}, "leases": leases}
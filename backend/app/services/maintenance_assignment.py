@@ -0,0 +1,181 @@
+"""
+Automatic, load-balanced maintenance assignment.
+
+One query loads an owner's unassigned open requests into a heap ordered by
+priority, category and age; another counts each active worker's open work.
+Requests are popped in order and given to the least-loaded worker with the
+matching skill and spare capacity, found through a lazily updated heap per
+category. Assignments are written with one batched UPDATE that skips
+requests someone assigned by hand in the meantime.
+"""
+import heapq
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.models.maintenance import (
+    MaintenanceCategory, MaintenancePriority, MaintenanceRequest, MaintenanceStatus, MaintenanceWorker,
+    OPEN_MAINTENANCE_STATUSES,
+)
+from app.models.property import Property
+from app.models.unit import Unit
+
+PRIORITY_RANK = {
+    MaintenancePriority.URGENT.value: 0,
+    MaintenancePriority.HIGH.value: 1,
+    MaintenancePriority.NORMAL.value: 2,
+    MaintenancePriority.LOW.value: 3,
+}
+
+# Within a priority, categories that can damage the building go first
+CATEGORY_RANK = {
+    category.value: rank
+    for rank, category in enumerate([
+        MaintenanceCategory.PLUMBING, MaintenanceCategory.ELECTRICAL, MaintenanceCategory.HVAC,
+        MaintenanceCategory.DOORS, MaintenanceCategory.WINDOWS, MaintenanceCategory.APPLIANCES,
+        MaintenanceCategory.FLOORING, MaintenanceCategory.PAINTING, MaintenanceCategory.CLEANING,
+        MaintenanceCategory.OTHER,
+    ])
+}
+
+
+class WorkerPool:
+    """Open-work counters per worker with a least-loaded lookup per category."""
+
+    def __init__(self, workers: List[MaintenanceWorker], load: Dict[int, int]):
+        self.capacity = {w.user_id: w.capacity for w in workers}
+        self.load = {w.user_id: load.get(w.user_id, 0) for w in workers}
+        self.generalists = [w.user_id for w in workers if not w.skills]
+        self.skilled: Dict[str, List[int]] = defaultdict(list)
+        for worker in workers:
+            for skill in worker.skills or []:
+                self.skilled[skill].append(worker.user_id)
+        self._heaps: Dict[str, List[Tuple[int, int]]] = {}
+
+    def _heap(self, category: str) -> List[Tuple[int, int]]:
+        heap = self._heaps.get(category)
+        if heap is None:
+            eligible = set(self.skilled.get(category, [])) | set(self.generalists)
+            heap = [(self.load[u], u) for u in eligible if self.load[u] < self.capacity[u]]
+            heapq.heapify(heap)
+            self._heaps[category] = heap
+        return heap
+
+    def take(self, category: str) -> Optional[int]:
+        """Least-loaded eligible worker with spare capacity, counted as one request busier."""
+        heap = self._heap(category)
+        while heap:
+            load, user_id = heapq.heappop(heap)
+            if load != self.load[user_id]:
+                # Stale entry: the worker took work through another category
+                if self.load[user_id] < self.capacity[user_id]:
+                    heapq.heappush(heap, (self.load[user_id], user_id))
+                continue
+            self.load[user_id] += 1
+            if self.load[user_id] < self.capacity[user_id]:
+                heapq.heappush(heap, (self.load[user_id], user_id))
+            return user_id
+        return None
+
+
+def _open_load(db: Session, user_ids: List[int]) -> Dict[int, int]:
+    if not user_ids:
+        return {}
+    rows = (
+        db.query(MaintenanceRequest.assigned_to, func.count(MaintenanceRequest.id))
+        .filter(
+            MaintenanceRequest.assigned_to.in_(user_ids),
+            MaintenanceRequest.status.in_(OPEN_MAINTENANCE_STATUSES),
+        )
+        .group_by(MaintenanceRequest.assigned_to)
+    )
+    return dict(rows)
+
+
+def plan_assignments(db: Session, *, owner_id: int, limit: Optional[int] = None) -> Tuple[List[Tuple[int, int]], int]:
+    """Return ([(request_id, user_id), ...], number of requests left unassigned)."""
+    workers = (
+        db.query(MaintenanceWorker)
+        .filter(MaintenanceWorker.owner_id == owner_id, MaintenanceWorker.is_active.is_(True))
+        .all()
+    )
+    query = (
+        db.query(
+            MaintenanceRequest.id,
+            MaintenanceRequest.priority,
+            MaintenanceRequest.category,
+            MaintenanceRequest.reported_at,
+        )
+        .join(Unit, MaintenanceRequest.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(
+            Property.owner_id == owner_id,
+            MaintenanceRequest.status == MaintenanceStatus.OPEN.value,
+            MaintenanceRequest.assigned_to.is_(None),
+        )
+    )
+    pending = [
+        (PRIORITY_RANK.get(priority, 2), CATEGORY_RANK.get(category, len(CATEGORY_RANK)), reported_at or datetime.min, id, category)
+        for id, priority, category, reported_at in query
+    ]
+    heapq.heapify(pending)
+
+    pool = WorkerPool(workers, _open_load(db, [w.user_id for w in workers]))
+    plan = []
+    skipped = 0
+    while pending and (limit is None or len(plan) < limit):
+        *_, request_id, category = heapq.heappop(pending)
+        user_id = pool.take(category)
+        if user_id is None:
+            skipped += 1
+        else:
+            plan.append((request_id, user_id))
+    return plan, skipped + len(pending)
+
+
+def auto_assign(db: Session, *, owner_id: int, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Assign the owner's pending requests to workers and commit the batch."""
+    plan, unassigned = plan_assignments(db, owner_id=owner_id, limit=limit)
+    assigned = []
+    if plan:
+        now = datetime.utcnow()
+        table = MaintenanceRequest.__table__
+        result = db.execute(
+            update(table)
+            # Requests assigned by hand since planning are left alone
+            .where(table.c.id == bindparam("b_id"), table.c.assigned_to.is_(None))
+            .values(
+                assigned_to=bindparam("b_user_id"),
+                assigned_at=now,
+                status=MaintenanceStatus.IN_PROGRESS.value,
+                updated_at=func.now(),
+            ),
+            [{"b_id": request_id, "b_user_id": user_id} for request_id, user_id in plan],
+        )
+        db.commit()
+        assigned = plan
+        if result.rowcount != len(plan):
+            # Re-read which rows we actually own
+            mine = dict(
+                db.query(MaintenanceRequest.id, MaintenanceRequest.assigned_to)
+                .filter(MaintenanceRequest.id.in_([request_id for request_id, _ in plan]))
+            )
+            assigned = [(r, u) for r, u in plan if mine.get(r) == u]
+            unassigned += len(plan) - len(assigned)
+    return {
+        "assigned": len(assigned),
+        "unassigned": unassigned,
+        "assignments": [{"request_id": r, "assigned_to": u} for r, u in assigned],
+    }
+
+
+def auto_assign_all(db: Session) -> int:
+    """Run auto-assignment for every owner with active workers."""
+    owner_ids = [
+        owner_id for (owner_id,) in
+        db.query(MaintenanceWorker.owner_id).filter(MaintenanceWorker.is_active.is_(True)).distinct()
+    ]
+    return sum(auto_assign(db, owner_id=owner_id)["assigned"] for owner_id in owner_ids)
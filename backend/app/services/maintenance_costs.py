@@ -0,0 +1,282 @@
+"""
+Maintenance cost reporting.
+
+Costs are kept as numbers next to the free-form strings on each request and
+added to ``maintenance_cost_rollups`` when a request is resolved, one
+additive upsert per (owner, property, category, month of resolution) in the
+resolving transaction. Mapper events keep the rollups in step with every ORM
+write: re-resolving or editing a resolved request's category or costs moves
+its contribution, and reopening or deleting it takes it out. Bulk statements
+bypass them. Cost reports read those rollups instead of scanning requests. ``rebuild_rollups`` recomputes the table from the requests, e.g.
+after ``backfill_costs`` has parsed the costs of existing requests.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, event, extract, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.maintenance import MaintenanceCostRollup, MaintenanceRequest, MaintenanceStatus, parse_cost_range
+from app.models.property import Property
+from app.models.unit import Unit
+
+RollupKey = Tuple[int, int, str, date]
+
+RESOLVED_STATUSES = (MaintenanceStatus.RESOLVED.value, MaintenanceStatus.CLOSED.value)
+
+
+def _empty() -> Dict[str, float]:
+    return {"resolved_count": 0, "costed_count": 0, "actual_cost": 0.0, "estimated_cost_min": 0.0, "estimated_cost_max": 0.0}
+
+
+def _upsert(connection, totals: Dict[RollupKey, Dict[str, float]]) -> None:
+    if not totals:
+        return
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    rows = [
+        {"owner_id": owner_id, "property_id": property_id, "category": category, "period": period, **amounts}
+        for (owner_id, property_id, category, period), amounts in totals.items()
+    ]
+    stmt = insert(MaintenanceCostRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["owner_id", "property_id", "category", "period"],
+        set_={
+            "resolved_count": MaintenanceCostRollup.resolved_count + stmt.excluded.resolved_count,
+            "costed_count": MaintenanceCostRollup.costed_count + stmt.excluded.costed_count,
+            "actual_cost": MaintenanceCostRollup.actual_cost + stmt.excluded.actual_cost,
+            "estimated_cost_min": MaintenanceCostRollup.estimated_cost_min + stmt.excluded.estimated_cost_min,
+            "estimated_cost_max": MaintenanceCostRollup.estimated_cost_max + stmt.excluded.estimated_cost_max,
+            "updated_at": func.now(),
+        },
+    )
+    connection.execute(stmt, rows)
+
+
+def _add(
+    bucket: Dict[str, float], actual: Optional[float], estimated_min: Optional[float],
+    estimated_max: Optional[float], sign: int = 1,
+) -> None:
+    bucket["resolved_count"] += sign
+    if actual is not None:
+        bucket["costed_count"] += sign
+        bucket["actual_cost"] += sign * actual
+    # Open-ended estimates ("500+") count with their lower bound
+    bucket["estimated_cost_min"] += sign * (estimated_min or 0.0)
+    bucket["estimated_cost_max"] += sign * (estimated_max if estimated_max is not None else estimated_min or 0.0)
+
+
+def _key(owner_id: int, property_id: int, category: str, resolved_at: datetime) -> RollupKey:
+    return owner_id, property_id, getattr(category, "value", category), resolved_at.date().replace(day=1)
+
+
+# What decides whether and where a request is counted
+_ROLLUP_ATTRIBUTES = (
+    "status", "resolved_at", "category", "unit_id", "actual_cost_amount", "estimated_cost_min", "estimated_cost_max",
+)
+
+
+def _counted(values: Dict[str, Any]) -> bool:
+    return values["status"] in RESOLVED_STATUSES and values["resolved_at"] is not None
+
+
+def _record_change(connection, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+    """Move a request's contribution from its old to its new rollup, in the flushing transaction."""
+    old = old if old is not None and _counted(old) else None
+    new = new if new is not None and _counted(new) else None
+    if old == new:
+        return
+    unit_ids = {values["unit_id"] for values in (old, new) if values is not None}
+    owners = {
+        unit_id: (owner_id, property_id)
+        for unit_id, owner_id, property_id in connection.execute(
+            select(Unit.id, Property.owner_id, Unit.property_id)
+            .join(Property, Unit.property_id == Property.id)
+            .where(Unit.id.in_(unit_ids))
+        )
+    }
+    totals: Dict[RollupKey, Dict[str, float]] = defaultdict(_empty)
+    for values, sign in ((old, -1), (new, 1)):
+        if values is None:
+            continue
+        owner_id, property_id = owners[values["unit_id"]]
+        _add(
+            totals[_key(owner_id, property_id, values["category"], values["resolved_at"])],
+            values["actual_cost_amount"], values["estimated_cost_min"], values["estimated_cost_max"], sign=sign,
+        )
+    _upsert(connection, totals)
+
+
+def _current(target: MaintenanceRequest) -> Dict[str, Any]:
+    return {name: getattr(target, name) for name in _ROLLUP_ATTRIBUTES}
+
+
+@event.listens_for(MaintenanceRequest, "after_insert")
+def _count_inserted(mapper, connection, target):
+    _record_change(connection, None, _current(target))
+
+
+@event.listens_for(MaintenanceRequest, "after_update")
+def _count_updated(mapper, connection, target):
+    # Resolving, re-resolving, reopening, recategorizing and cost edits all pass through here
+    attrs = inspect(target).attrs
+    new = _current(target)
+    old = {}
+    for name in _ROLLUP_ATTRIBUTES:
+        deleted = attrs[name].history.deleted
+        old[name] = deleted[0] if deleted else new[name]
+    _record_change(connection, old, new)
+
+
+@event.listens_for(MaintenanceRequest, "after_delete")
+def _count_deleted(mapper, connection, target):
+    _record_change(connection, _current(target), None)
+
+
+def rebuild_rollups(db: Session, *, owner_id: Optional[int] = None) -> int:
+    """Recompute rollups from resolved requests; returns the number of rollup rows written."""
+    year = extract("year", MaintenanceRequest.resolved_at)
+    month = extract("month", MaintenanceRequest.resolved_at)
+    estimated_max = func.coalesce(MaintenanceRequest.estimated_cost_max, MaintenanceRequest.estimated_cost_min, 0.0)
+    query = (
+        db.query(
+            Property.owner_id,
+            Property.id,
+            MaintenanceRequest.category,
+            year,
+            month,
+            func.count(MaintenanceRequest.id),
+            func.count(MaintenanceRequest.actual_cost_amount),
+            func.coalesce(func.sum(MaintenanceRequest.actual_cost_amount), 0.0),
+            func.coalesce(func.sum(MaintenanceRequest.estimated_cost_min), 0.0),
+            func.sum(estimated_max),
+        )
+        .join(Unit, MaintenanceRequest.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(MaintenanceRequest.status.in_(RESOLVED_STATUSES), MaintenanceRequest.resolved_at.isnot(None))
+        .group_by(Property.owner_id, Property.id, MaintenanceRequest.category, year, month)
+    )
+    clear = delete(MaintenanceCostRollup)
+    if owner_id is not None:
+        query = query.filter(Property.owner_id == owner_id)
+        clear = clear.where(MaintenanceCostRollup.owner_id == owner_id)
+
+    totals = {
+        (row_owner, property_id, category, date(int(y), int(m), 1)): {
+            "resolved_count": resolved, "costed_count": costed, "actual_cost": actual,
+            "estimated_cost_min": est_min, "estimated_cost_max": est_max,
+        }
+        for row_owner, property_id, category, y, m, resolved, costed, actual, est_min, est_max in query
+    }
+    db.execute(clear)
+    _upsert(db.connection(), totals)
+    db.commit()
+    return len(totals)
+
+
+def backfill_costs(db: Session, *, batch_size: int = 5000) -> int:
+    """Parse the cost strings of requests written before the numeric columns existed."""
+    table = MaintenanceRequest.__table__
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(table.c.id, table.c.estimated_cost, table.c.actual_cost)
+            .where(
+                table.c.id > last_id,
+                (table.c.estimated_cost.isnot(None) & table.c.estimated_cost_min.is_(None))
+                | (table.c.actual_cost.isnot(None) & table.c.actual_cost_amount.is_(None)),
+            )
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return total
+        params = []
+        for id, estimated_cost, actual_cost in rows:
+            estimated_min, estimated_max = parse_cost_range(estimated_cost)
+            params.append({
+                "b_id": id,
+                "b_min": estimated_min,
+                "b_max": estimated_max,
+                "b_actual": parse_cost_range(actual_cost)[0],
+            })
+        db.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                estimated_cost_min=bindparam("b_min"),
+                estimated_cost_max=bindparam("b_max"),
+                actual_cost_amount=bindparam("b_actual"),
+            ),
+            params,
+        )
+        db.commit()
+        total += len(rows)
+        last_id = rows[-1][0]
+
+
+def _zero_totals() -> List[float]:
+    # resolved_count, costed_count, actual_cost, estimated_cost_min, estimated_cost_max
+    return [0, 0, 0.0, 0.0, 0.0]
+
+
+def _line(values: List[float]) -> Dict[str, Any]:
+    resolved, costed, actual, est_min, est_max = values
+    return {
+        "resolved_count": int(resolved),
+        "costed_count": int(costed),
+        "actual_cost": round(actual, 2),
+        "average_cost": round(actual / costed, 2) if costed else None,
+        "estimated_cost_min": round(est_min, 2),
+        "estimated_cost_max": round(est_max, 2),
+    }
+
+
+def cost_report(db: Session, *, owner_id: int, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+    """Costs of requests resolved in the months from ``start`` through ``end``, per property and category."""
+    query = (
+        db.query(
+            MaintenanceCostRollup.property_id,
+            Property.name,
+            MaintenanceCostRollup.category,
+            func.sum(MaintenanceCostRollup.resolved_count),
+            func.sum(MaintenanceCostRollup.costed_count),
+            func.sum(MaintenanceCostRollup.actual_cost),
+            func.sum(MaintenanceCostRollup.estimated_cost_min),
+            func.sum(MaintenanceCostRollup.estimated_cost_max),
+        )
+        .join(Property, MaintenanceCostRollup.property_id == Property.id)
+        .filter(MaintenanceCostRollup.owner_id == owner_id)
+        .group_by(MaintenanceCostRollup.property_id, Property.name, MaintenanceCostRollup.category)
+        # Requests moved out of a rollup leave it at zero
+        .having(func.sum(MaintenanceCostRollup.resolved_count) > 0)
+    )
+    if start:
+        query = query.filter(MaintenanceCostRollup.period >= start.replace(day=1))
+    if end:
+        query = query.filter(MaintenanceCostRollup.period <= end.replace(day=1))
+
+    names: Dict[int, str] = {}
+    by_property: Dict[int, List[float]] = {}
+    by_category: Dict[str, List[float]] = {}
+    overall = _zero_totals()
+    for property_id, name, category, *values in query:
+        names[property_id] = name
+        property_totals = by_property.setdefault(property_id, _zero_totals())
+        category_totals = by_category.setdefault(category, _zero_totals())
+        for totals in (property_totals, category_totals, overall):
+            for i, value in enumerate(values):
+                totals[i] += value or 0
+
+    return {
+        "period_start": start.replace(day=1) if start else None,
+        "period_end": end.replace(day=1) if end else None,
+        "by_property": [
+            {"property_id": property_id, "property_name": names[property_id], **_line(totals)}
+            for property_id, totals in sorted(by_property.items())
+        ],
+        "by_category": [{"category": category, **_line(totals)} for category, totals in sorted(by_category.items())],
+        **_line(overall),
+    }
@@ -0,0 +1,290 @@
+"""
+Photo, video and document uploads for properties and maintenance requests.
+
+Uploads are streamed from the request body to a temporary file in chunks
+while being hashed, so memory use does not depend on the file size. File
+writes and database work run in the thread pool, never on the event loop. The
+finished file is moved into a content-addressed store
+(``MEDIA_DIR/blobs/ab/<sha256>``); uploading the same content again only adds
+an attachment row pointing at the existing blob. Image thumbnails are made in
+a small process pool, so resizing never runs on a request worker. Blobs and
+thumbnails never change once written, which is what lets them be served with
+immutable cache headers.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from PIL import Image
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.media import MediaAttachment, MediaBlob
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.MEDIA_THUMBNAIL_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(settings.MEDIA_DIR, "blobs", sha256[:2], sha256)
+
+
+def thumbnail_path(sha256: str) -> str:
+    return os.path.join(settings.MEDIA_DIR, "thumbnails", sha256[:2], f"{sha256}.jpg")
+
+
+def has_thumbnail_support(content_type: str) -> bool:
+    return content_type.startswith("image/")
+
+
+def _move_into_store(tmp_path: str, sha256: str) -> None:
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+
+def _discard(tmp_path: str) -> None:
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def _temp_file() -> Tuple[int, str]:
+    tmp_dir = os.path.join(settings.MEDIA_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return tempfile.mkstemp(dir=tmp_dir, suffix=".upload")
+
+
+async def store_stream(chunks: AsyncIterator[bytes], *, max_bytes: int) -> Tuple[str, int]:
+    """Write ``chunks`` into the blob store and return (sha256, size); identical content is stored once."""
+    fd, tmp_path = await run_in_threadpool(_temp_file)
+    digest = hashlib.sha256()
+    size = 0
+    # Request chunks are small; write them in larger pieces to keep thread pool hops few
+    pending = bytearray()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                pending += chunk
+                if len(pending) >= READ_CHUNK_SIZE:
+                    await run_in_threadpool(f.write, bytes(pending))
+                    pending.clear()
+            if pending:
+                await run_in_threadpool(f.write, bytes(pending))
+        sha256 = digest.hexdigest()
+        await run_in_threadpool(_move_into_store, tmp_path, sha256)
+    except BaseException:
+        await run_in_threadpool(_discard, tmp_path)
+        raise
+    return sha256, size
+
+
+def get_or_create_blob(db: Session, *, sha256: str, size: int, content_type: str) -> MediaBlob:
+    blob = db.query(MediaBlob).filter(MediaBlob.sha256 == sha256).first()
+    if blob is not None:
+        return blob
+    blob = MediaBlob(sha256=sha256, size=size, content_type=content_type)
+    db.add(blob)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Same content uploaded concurrently
+        db.rollback()
+        blob = db.query(MediaBlob).filter(MediaBlob.sha256 == sha256).one()
+    return blob
+
+
+async def upload(
+    db: Session,
+    chunks: AsyncIterator[bytes],
+    *,
+    filename: str,
+    content_type: str,
+    owner_id: int,
+    uploaded_by: int,
+    property_id: Optional[int] = None,
+    maintenance_request_id: Optional[int] = None,
+) -> MediaAttachment:
+    """Store an upload and attach it to a property or maintenance request."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type not in settings.MEDIA_ALLOWED_CONTENT_TYPES:
+        raise ValueError(f"Unsupported content type '{content_type}'")
+    sha256, size = await store_stream(chunks, max_bytes=settings.MEDIA_MAX_UPLOAD_BYTES)
+    if size == 0:
+        raise ValueError("Upload is empty")
+
+    attachment = await run_in_threadpool(
+        attach,
+        db,
+        sha256=sha256,
+        size=size,
+        content_type=content_type,
+        filename=filename,
+        owner_id=owner_id,
+        uploaded_by=uploaded_by,
+        property_id=property_id,
+        maintenance_request_id=maintenance_request_id,
+    )
+    schedule_thumbnail(sha256, content_type)
+    return attachment
+
+
+def attach(
+    db: Session,
+    *,
+    sha256: str,
+    size: int,
+    content_type: str,
+    filename: str,
+    owner_id: int,
+    uploaded_by: int,
+    property_id: Optional[int] = None,
+    maintenance_request_id: Optional[int] = None,
+) -> MediaAttachment:
+    """Record a stored blob and attach it to a property or maintenance request."""
+    blob = get_or_create_blob(db, sha256=sha256, size=size, content_type=content_type)
+    attachment = MediaAttachment(
+        blob_id=blob.id,
+        owner_id=owner_id,
+        uploaded_by=uploaded_by,
+        property_id=property_id,
+        maintenance_request_id=maintenance_request_id,
+        filename=os.path.basename(filename)[:255] or sha256,
+    )
+    db.add(attachment)
+    db.commit()
+    db.refresh(attachment)
+    return attachment
+
+
+def make_thumbnail(src: str, dst: str, size: int) -> bool:
+    """Process pool task: write a JPEG thumbnail of ``src`` to ``dst``."""
+    try:
+        with Image.open(src) as image:
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, "JPEG", quality=80)
+            os.replace(tmp_path, dst)
+        return True
+    except (OSError, ValueError) as e:
+        logger.warning("Could not make thumbnail of %s: %s", src, e)
+        return False
+
+
+def schedule_thumbnail(sha256: str, content_type: str) -> None:
+    """Start making a thumbnail in the background; the upload does not wait for it."""
+    if not has_thumbnail_support(content_type) or os.path.exists(thumbnail_path(sha256)):
+        return
+    get_pool().submit(make_thumbnail, blob_path(sha256), thumbnail_path(sha256), settings.MEDIA_THUMBNAIL_SIZE)
+
+
+async def get_thumbnail(sha256: str, content_type: str) -> Optional[str]:
+    """Path of the blob's thumbnail, made now if the background task has not finished yet."""
+    path = thumbnail_path(sha256)
+    if os.path.exists(path):
+        return path
+    if not has_thumbnail_support(content_type):
+        return None
+    loop = asyncio.get_running_loop()
+    made = await loop.run_in_executor(
+        get_pool(), make_thumbnail, blob_path(sha256), path, settings.MEDIA_THUMBNAIL_SIZE
+    )
+    return path if made else None
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single ``bytes=`` range, or None to send the whole file."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        # Multiple ranges are allowed to be answered with the full content
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(end_text), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+def iter_file(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Yield bytes start..end (inclusive) of ``path`` in chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def get_attachment(db: Session, *, attachment_id: int, user_id: int) -> Optional[MediaAttachment]:
+    """Attachment visible to the user: their own property's media, or media they uploaded."""
+    return (
+        db.query(MediaAttachment)
+        .filter(
+            MediaAttachment.id == attachment_id,
+            or_(MediaAttachment.owner_id == user_id, MediaAttachment.uploaded_by == user_id),
+        )
+        .first()
+    )
+
+
+def list_attachments(
+    db: Session, *, property_id: Optional[int] = None, maintenance_request_id: Optional[int] = None
+) -> List[MediaAttachment]:
+    query = db.query(MediaAttachment)
+    if property_id is not None:
+        query = query.filter(MediaAttachment.property_id == property_id)
+    if maintenance_request_id is not None:
+        query = query.filter(MediaAttachment.maintenance_request_id == maintenance_request_id)
+    return query.order_by(MediaAttachment.id).all()
@@ -0,0 +1,306 @@
+"""
+Bank transaction to invoice reconciliation.
+
+Open invoices of an owner are loaded once and indexed in two dicts: by
+normalized invoice number and by open amount in cents. Each unreconciled
+incoming transaction is first looked up by the invoice numbers found in its
+reference and description (rule ``reference``). Failing that, invoices with
+exactly the transferred amount are scored on how close the booking date is
+to the due date and how much of the tenant's name appears in the payment
+text (rule ``fuzzy``); only a confident, unambiguous best candidate is
+accepted. Every decision carries its reasons so the report explains itself.
+Matches are booked on the lease ledger and settled invoices are marked paid
+in one batched statement. Invoices from before the ledger are open for their
+full amount; their charge is posted when a payment is matched to them.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from difflib import get_close_matches
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.lease import Lease
+from app.models.ledger import LedgerEntry, LedgerEntryType
+from app.models.property import Property
+from app.models.tenant import Tenant
+from app.models.transaction import Transaction, TransactionType
+from app.models.unit import Unit
+from app.services import ledger as ledger_service
+
+# Numbers are zero-padded to six digits and grow past that; separators may be dashes or spaces
+INVOICE_NUMBER_RE = re.compile(r"INV[-\s]?(\d+)[-\s]?(\d{6,})\b")
+WORD_RE = re.compile(r"[a-z]+")
+
+# Fuzzy score weights; the name carries most evidence
+NAME_WEIGHT = 0.6
+DATE_WEIGHT = 0.4
+AMBIGUITY_MARGIN = 0.1
+
+
+@dataclass
+class OpenInvoice:
+    id: int
+    invoice_number: str
+    lease_id: int
+    open_cents: int
+    due_date: date
+    currency_iso: str
+    name_tokens: List[str]
+
+
+@dataclass
+class Decision:
+    transaction_id: str
+    amount: float
+    booking_date: date
+    invoice: Optional[OpenInvoice] = None
+    rule: Optional[str] = None
+    score: float = 0.0
+    reasons: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "transaction_id": self.transaction_id,
+            "amount": self.amount,
+            "booking_date": self.booking_date,
+            "invoice_id": self.invoice.id if self.invoice else None,
+            "invoice_number": self.invoice.invoice_number if self.invoice else None,
+            "rule": self.rule,
+            "score": round(self.score, 2),
+            "reasons": self.reasons,
+        }
+
+
+def _cents(amount) -> int:
+    return int(round(float(amount) * 100))
+
+
+def normalize_invoice_number(series: str, number: str) -> str:
+    return Invoice.format_invoice_number(str(int(series)), int(number))
+
+
+def _name_tokens(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def load_open_invoices(db: Session, *, owner_id: int) -> List[OpenInvoice]:
+    """Open invoices with their unpaid amount, in one query."""
+    open_charges = (
+        db.query(LedgerEntry.invoice_id, func.sum(LedgerEntry.open_amount).label("open_amount"))
+        .filter(LedgerEntry.owner_id == owner_id, LedgerEntry.entry_type == LedgerEntryType.CHARGE.value)
+        .group_by(LedgerEntry.invoice_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            Invoice.id,
+            Invoice.invoice_number,
+            Invoice.lease_id,
+            # Invoices from before the ledger existed are open for their full amount
+            func.coalesce(open_charges.c.open_amount, Invoice.total_amount),
+            Invoice.due_date,
+            Invoice.currency_iso,
+            Tenant.first_name,
+            Tenant.last_name,
+        )
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .join(Tenant, Lease.tenant_id == Tenant.id)
+        .outerjoin(open_charges, open_charges.c.invoice_id == Invoice.id)
+        .filter(
+            Property.owner_id == owner_id,
+            Invoice.status.in_([InvoiceStatus.PENDING.value, InvoiceStatus.OVERDUE.value]),
+        )
+        .all()
+    )
+    return [
+        OpenInvoice(
+            id=invoice_id,
+            invoice_number=number,
+            lease_id=lease_id,
+            open_cents=_cents(open_amount),
+            due_date=due_date,
+            currency_iso=currency_iso,
+            name_tokens=_name_tokens(f"{first_name} {last_name}"),
+        )
+        for invoice_id, number, lease_id, open_amount, due_date, currency_iso, first_name, last_name in rows
+        if _cents(open_amount) > 0
+    ]
+
+
+def _name_score(name_tokens: List[str], text_tokens: Set[str]) -> float:
+    """Share of the tenant's name tokens found in the text, tolerating small typos."""
+    if not name_tokens or not text_tokens:
+        return 0.0
+    found = sum(
+        1 for token in name_tokens
+        if token in text_tokens or get_close_matches(token, text_tokens, n=1, cutoff=0.8)
+    )
+    return found / len(name_tokens)
+
+
+class Matcher:
+    def __init__(self, invoices: List[OpenInvoice], *, window_days: int, min_score: float):
+        self.window_days = window_days
+        self.min_score = min_score
+        self.by_number: Dict[str, OpenInvoice] = {inv.invoice_number: inv for inv in invoices}
+        self.by_amount: Dict[int, List[OpenInvoice]] = {}
+        for inv in invoices:
+            self.by_amount.setdefault(inv.open_cents, []).append(inv)
+        self.taken = set()
+        # Still open after this run's earlier matches; a payment may come in parts
+        self.remaining: Dict[int, int] = {inv.id: inv.open_cents for inv in invoices}
+
+    def _take(self, invoice: OpenInvoice, cents: int) -> None:
+        self.taken.add(invoice.id)
+        self.remaining[invoice.id] -= cents
+
+    def match(self, transaction: Transaction) -> Decision:
+        booking_date = transaction.booking_date.date()
+        cents = _cents(transaction.amount)
+        text = f"{transaction.reference or ''} {transaction.description or ''}"
+        decision = Decision(transaction_id=transaction.id, amount=cents / 100, booking_date=booking_date)
+
+        numbers = {normalize_invoice_number(*m) for m in INVOICE_NUMBER_RE.findall(text.upper())}
+        for number in sorted(numbers):
+            invoice = self.by_number.get(number)
+            if invoice is None:
+                decision.reasons.append(f"reference {number} is not an open invoice")
+                continue
+            open_cents = self.remaining[invoice.id]
+            if open_cents <= 0:
+                decision.reasons.append(f"{number} already paid in full in this run")
+                continue
+            if invoice.currency_iso != transaction.currency:
+                decision.reasons.append(f"{number} is in {invoice.currency_iso}, payment in {transaction.currency}")
+                continue
+            decision.invoice, decision.rule, decision.score = invoice, "reference", 1.0
+            if cents == open_cents:
+                decision.reasons.append(f"reference {number} and amount match")
+            else:
+                decision.reasons.append(
+                    f"reference {number} matches; amount {cents / 100:.2f} vs open {open_cents / 100:.2f}"
+                )
+            self._take(invoice, cents)
+            return decision
+
+        candidates = [
+            inv for inv in self.by_amount.get(cents, [])
+            if inv.id not in self.taken
+            and inv.currency_iso == transaction.currency
+            and abs((booking_date - inv.due_date).days) <= self.window_days
+        ]
+        if not candidates:
+            decision.reasons.append(
+                f"no open invoice of {cents / 100:.2f} {transaction.currency} due within {self.window_days} days"
+            )
+            return decision
+
+        text_tokens = set(_name_tokens(text))
+        scored = sorted(
+            (
+                (
+                    NAME_WEIGHT * _name_score(inv.name_tokens, text_tokens)
+                    + DATE_WEIGHT * (1 - abs((booking_date - inv.due_date).days) / (self.window_days + 1)),
+                    inv,
+                )
+                for inv in candidates
+            ),
+            key=lambda pair: (-pair[0], pair[1].due_date, pair[1].id),
+        )
+        best_score, best = scored[0]
+        if best_score < self.min_score:
+            decision.reasons.append(
+                f"best candidate {best.invoice_number} scored {best_score:.2f}, below {self.min_score:.2f}"
+            )
+            return decision
+        if len(scored) > 1 and best_score - scored[1][0] < AMBIGUITY_MARGIN:
+            decision.reasons.append(
+                f"ambiguous: {best.invoice_number} and {scored[1][1].invoice_number} score "
+                f"{best_score:.2f} and {scored[1][0]:.2f}"
+            )
+            return decision
+
+        decision.invoice, decision.rule, decision.score = best, "fuzzy", best_score
+        decision.reasons.append(
+            f"amount matches {best.invoice_number}, booked {(booking_date - best.due_date).days:+d} days "
+            f"from due date, name match {_name_score(best.name_tokens, text_tokens):.0%}"
+        )
+        self._take(best, cents)
+        return decision
+
+
+def reconcile(
+    db: Session,
+    *,
+    owner_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Match the owner's unreconciled incoming transactions booked in [start, end] to open invoices."""
+    query = db.query(Transaction).filter(
+        Transaction.user_id == str(owner_id),
+        Transaction.type == TransactionType.INCOME,
+        Transaction.amount > 0,
+        Transaction.invoice_id.is_(None),
+    )
+    if start:
+        query = query.filter(Transaction.booking_date >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.filter(Transaction.booking_date < datetime.combine(end, datetime.max.time()))
+    transactions = query.order_by(Transaction.booking_date, Transaction.id).all()
+
+    matcher = Matcher(
+        load_open_invoices(db, owner_id=owner_id),
+        window_days=settings.RECONCILIATION_DATE_WINDOW_DAYS,
+        min_score=settings.RECONCILIATION_MIN_SCORE,
+    )
+    decisions = [matcher.match(transaction) for transaction in transactions]
+    matched = [d for d in decisions if d.invoice is not None]
+
+    paid = 0
+    if matched and not dry_run:
+        # Invoices from before the ledger get their charge first, so the payments settle them
+        missing = ledger_service.missing_charges(db, invoice_ids={d.invoice.id for d in matched})
+        settled = set(ledger_service.post_missing_charges(db, missing))
+        settled |= set(ledger_service.post_payments(db, (
+            {
+                "lease_id": d.invoice.lease_id, "owner_id": owner_id, "amount": d.amount,
+                "booked_on": d.booking_date, "invoice_id": d.invoice.id,
+            }
+            for d in matched
+        )))
+        now = datetime.utcnow()
+        if settled:
+            # Overpayments can also settle older invoices of the lease
+            paid_at = {d.invoice.id: datetime.combine(d.booking_date, datetime.min.time()) for d in matched}
+            invoices = Invoice.__table__
+            paid = db.execute(
+                update(invoices)
+                .where(invoices.c.id == bindparam("b_id"), invoices.c.status != InvoiceStatus.PAID.value)
+                .values(status=InvoiceStatus.PAID.value, paid_at=bindparam("b_paid_at"), updated_at=func.now()),
+                [{"b_id": invoice_id, "b_paid_at": paid_at.get(invoice_id, now)} for invoice_id in sorted(settled)],
+            ).rowcount
+        transactions_table = Transaction.__table__
+        db.execute(
+            update(transactions_table)
+            .where(transactions_table.c.id == bindparam("b_id"))
+            .values(invoice_id=bindparam("b_invoice_id"), match_rule=bindparam("b_rule"), reconciled_at=now),
+            [{"b_id": d.transaction_id, "b_invoice_id": d.invoice.id, "b_rule": d.rule} for d in matched],
+        )
+        db.commit()
+
+    return {
+        "dry_run": dry_run,
+        "transactions": len(decisions),
+        "matched": len(matched),
+        "invoices_paid": paid,
+        "items": [d.as_dict() for d in decisions],
+    }
@@ -0,0 +1,105 @@
+"""
+Ledger of an owner's bank transactions, read by booking date.
+
+Pages and CSV exports walk the ``(user_id, booking_date, id)`` index newest
+first with keyset pagination. A page therefore costs the same for this
+month as for ten years back, however many rows the table holds. On
+PostgreSQL the index also includes the filtered columns and the amount, so
+filtering and the cash-flow report never read the table itself.
+
+The table is not partitioned by month on PostgreSQL. A unique key of a
+partitioned table must include the partition column, but the bank sync
+deduplicates on ``bank_transaction_id`` alone, and banks move booking dates.
+The per-owner index keeps date-range reads flat without it.
+"""
+import base64
+import csv
+import io
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
+
+from app.core.config import settings
+from app.models.transaction import Transaction, TransactionType
+
+CSV_COLUMNS = (
+    "id", "booking_date", "value_date", "amount", "currency", "type", "status", "counterparty", "description",
+    "reference", "category", "subcategory", "bank_account_id", "property_id", "invoice_id",
+)
+
+
+def encode_cursor(booking_date: datetime, id: str) -> str:
+    return base64.urlsafe_b64encode(f"{booking_date.isoformat()},{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        booking_date, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return datetime.fromisoformat(booking_date), id
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def ledger_query(
+    db: Session,
+    *,
+    user_id: int,
+    account_id: Optional[str] = None,
+    type: Optional[TransactionType] = None,
+    category: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Query:
+    """An owner's transactions matching the filters, newest first; ``start`` and ``end`` are inclusive days."""
+    if start and end and start > end:
+        raise ValueError("start must not be after end")
+    query = db.query(Transaction).filter(Transaction.user_id == str(user_id))
+    if account_id:
+        query = query.filter(Transaction.bank_account_id == account_id)
+    if type:
+        query = query.filter(Transaction.type == type)
+    if category:
+        query = query.filter(Transaction.category == category)
+    if start:
+        query = query.filter(Transaction.booking_date >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.filter(Transaction.booking_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return query.order_by(Transaction.booking_date.desc(), Transaction.id.desc())
+
+
+def page(query: Query, *, before: Optional[str] = None, limit: int = 100) -> Tuple[List[Transaction], Optional[str]]:
+    """One page of a ``ledger_query`` and the cursor of the next page."""
+    if before:
+        query = query.filter(tuple_(Transaction.booking_date, Transaction.id) < decode_cursor(before))
+    transactions = query.limit(limit + 1).all()
+    if len(transactions) <= limit:
+        return transactions, None
+    transactions = transactions[:limit]
+    return transactions, encode_cursor(transactions[-1].booking_date, transactions[-1].id)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return getattr(value, "value", value)
+
+
+def iter_csv(query: Query, *, batch_size: Optional[int] = None) -> Iterator[str]:
+    """A ``ledger_query`` as CSV, one chunk per page; memory use does not grow with the export."""
+    batch_size = batch_size or settings.TRANSACTION_EXPORT_BATCH_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    cursor = None
+    while True:
+        transactions, cursor = page(query, before=cursor, limit=batch_size)
+        writer.writerows([_csv_value(getattr(tx, column)) for column in CSV_COLUMNS] for tx in transactions)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if cursor is None:
+            return
@@ -0,0 +1,148 @@
+"""
+VAT reporting.
+
+Every path that writes ``VATEntry`` rows also adds them to ``vat_rollups``
+in the same transaction, one additive upsert per (owner, country, month,
+rate). A quarterly return therefore reads a handful of rollup rows instead
+of scanning all entries. ``rebuild_rollups`` recomputes the table from the
+entries after manual corrections.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, extract, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.invoice import Invoice, VATEntry, VATRollup
+from app.models.lease import Lease
+from app.models.property import Property
+from app.models.unit import Unit
+
+RollupKey = Tuple[int, str, date, float]
+
+
+def _month(value: date) -> date:
+    return value.replace(day=1)
+
+
+def quarter_bounds(year: int, quarter: int) -> Tuple[date, date]:
+    """First and last month (as first-of-month dates) of a calendar quarter."""
+    first_month = 3 * (quarter - 1) + 1
+    return date(year, first_month, 1), date(year, first_month + 2, 1)
+
+
+def _upsert(db: Session, totals: Dict[RollupKey, Dict[str, float]]) -> None:
+    if not totals:
+        return
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    rows = [
+        {"owner_id": owner_id, "country_iso": country_iso, "period": period, "vat_rate": vat_rate, **amounts}
+        for (owner_id, country_iso, period, vat_rate), amounts in totals.items()
+    ]
+    stmt = insert(VATRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["owner_id", "country_iso", "period", "vat_rate"],
+        set_={
+            "entry_count": VATRollup.entry_count + stmt.excluded.entry_count,
+            "net_amount": VATRollup.net_amount + stmt.excluded.net_amount,
+            "vat_amount": VATRollup.vat_amount + stmt.excluded.vat_amount,
+            "gross_amount": VATRollup.gross_amount + stmt.excluded.gross_amount,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def record_entries(db: Session, *, owner_id: int, issue_date: date, entries: Iterable[Dict[str, Any]]) -> None:
+    """
+    Add freshly written VAT entries to the rollups. Runs inside the caller's
+    transaction so rollups and entries commit (or roll back) together.
+    """
+    totals: Dict[RollupKey, Dict[str, float]] = defaultdict(
+        lambda: {"entry_count": 0, "net_amount": 0.0, "vat_amount": 0.0, "gross_amount": 0.0}
+    )
+    for entry in entries:
+        bucket = totals[(owner_id, entry["country_iso"], _month(issue_date), entry["vat_rate"])]
+        bucket["entry_count"] += 1
+        bucket["net_amount"] += entry["net_amount"]
+        bucket["vat_amount"] += entry["vat_amount"]
+        bucket["gross_amount"] += entry["gross_amount"]
+    _upsert(db, totals)
+
+
+def rebuild_rollups(db: Session, *, owner_id: Optional[int] = None) -> int:
+    """Recompute rollups from VAT entries; returns the number of rollup rows written."""
+    year = extract("year", Invoice.issue_date)
+    month = extract("month", Invoice.issue_date)
+    query = (
+        db.query(
+            Property.owner_id,
+            VATEntry.country_iso,
+            year,
+            month,
+            VATEntry.vat_rate,
+            func.count(VATEntry.id),
+            func.sum(VATEntry.net_amount),
+            func.sum(VATEntry.vat_amount),
+            func.sum(VATEntry.gross_amount),
+        )
+        .join(Invoice, VATEntry.invoice_id == Invoice.id)
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .group_by(Property.owner_id, VATEntry.country_iso, year, month, VATEntry.vat_rate)
+    )
+    clear = delete(VATRollup)
+    if owner_id is not None:
+        query = query.filter(Property.owner_id == owner_id)
+        clear = clear.where(VATRollup.owner_id == owner_id)
+
+    totals = {
+        (row_owner, country_iso, date(int(y), int(m), 1), vat_rate): {
+            "entry_count": count, "net_amount": net, "vat_amount": vat, "gross_amount": gross,
+        }
+        for row_owner, country_iso, y, m, vat_rate, count, net, vat, gross in query
+    }
+    db.execute(clear)
+    _upsert(db, totals)
+    db.commit()
+    return len(totals)
+
+
+def vat_return(db: Session, *, owner_id: int, start: date, end: date) -> Dict[str, Any]:
+    """VAT totals per country and rate for the months from ``start`` through ``end``."""
+    start, end = _month(start), _month(end)
+    rows = (
+        db.query(
+            VATRollup.country_iso,
+            VATRollup.vat_rate,
+            func.sum(VATRollup.entry_count),
+            func.sum(VATRollup.net_amount),
+            func.sum(VATRollup.vat_amount),
+            func.sum(VATRollup.gross_amount),
+        )
+        .filter(VATRollup.owner_id == owner_id, VATRollup.period.between(start, end))
+        .group_by(VATRollup.country_iso, VATRollup.vat_rate)
+        .order_by(VATRollup.country_iso, VATRollup.vat_rate)
+        .all()
+    )
+    lines = [
+        {
+            "country_iso": country_iso,
+            "vat_rate": vat_rate,
+            "entry_count": int(count),
+            "net_amount": round(net, 2),
+            "vat_amount": round(vat, 2),
+            "gross_amount": round(gross, 2),
+        }
+        for country_iso, vat_rate, count, net, vat, gross in rows
+    ]
+    return {
+        "period_start": start,
+        "period_end": end,
+        "lines": lines,
+        "net_amount": round(sum(line["net_amount"] for line in lines), 2),
+        "vat_amount": round(sum(line["vat_amount"] for line in lines), 2),
+    }
@@ -0,0 +1,189 @@
+"""
+WhatsApp Business API: webhook signatures and outgoing messages.
+
+Credentials are per business account, see ``whatsapp_accounts``. Outgoing
+messages go through one ``GraphAPIClient`` per process, opened and
+closed with the application, so connections are pooled and kept alive
+instead of paying a TCP and TLS handshake per message.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from app.core.config import settings
+from app.services.whatsapp_accounts import WhatsAppAccount
+
+logger = logging.getLogger(__name__)
+
+# Rate limited or temporarily unavailable; anything else will fail again
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+
+def verify_signature(payload: bytes, signature: str, app_secret: str) -> bool:
+    """Verify webhook signature for security"""
+    if not signature.startswith("sha256=") or not app_secret:
+        return False
+
+    signature = signature[7:]  # Remove 'sha256=' prefix
+    expected_signature = hmac.new(
+        app_secret.encode(),
+        payload,
+        hashlib.sha256
+    ).hexdigest()
+
+    return hmac.compare_digest(expected_signature, signature)
+
+
+class GraphAPIError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(f"Graph API error {status}: {detail}")
+        self.status = status
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second on average, in bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class GraphAPIClient:
+    """
+    Long-lived Graph API client: one pooled keep-alive HTTP session for the
+    process, a token bucket per sending phone number and retries with
+    jittered exponential backoff on rate limiting, server errors and
+    connection failures.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        *,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.base_url = (base_url or settings.WHATSAPP_GRAPH_API_URL).rstrip("/")
+        self.rate_per_second = rate_per_second or settings.WHATSAPP_RATE_PER_SECOND
+        self.burst = burst or settings.WHATSAPP_RATE_BURST
+        self.pool_size = pool_size or settings.WHATSAPP_HTTP_POOL_SIZE
+        self.max_retries = settings.WHATSAPP_MAX_RETRIES if max_retries is None else max_retries
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is loop:
+            return
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=settings.WHATSAPP_HTTP_TIMEOUT_SECONDS),
+        )
+        # Sessions and locks belong to the loop that created them
+        self._loop = loop
+        self._buckets = {}
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _bucket(self, phone_number_id: str) -> TokenBucket:
+        bucket = self._buckets.get(phone_number_id)
+        if bucket is None:
+            bucket = self._buckets[phone_number_id] = TokenBucket(self.rate_per_second, self.burst)
+        return bucket
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        # Full jitter spreads out retries of messages that failed together
+        ceiling = min(settings.WHATSAPP_RETRY_MAX_SECONDS, settings.WHATSAPP_RETRY_BASE_SECONDS * 2 ** attempt)
+        delay = random.uniform(0, ceiling)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    async def send(self, phone_number_id: str, access_token: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a message payload and return the response body; raises GraphAPIError once retries are spent."""
+        await self.start()
+        url = f"{self.base_url}/{phone_number_id}/messages"
+        headers = {"Authorization": f"Bearer {access_token}"}
+        bucket = self._bucket(phone_number_id)
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            retry_after = None
+            try:
+                async with self._session.post(url, headers=headers, json=payload) as response:
+                    if response.status == 200:
+                        try:
+                            return await response.json(content_type=None)
+                        except ValueError:
+                            # Sent; never retry a delivered message over an unreadable body
+                            return {}
+                    error = GraphAPIError(response.status, (await response.text())[:500])
+                    if response.status not in RETRYABLE_STATUSES:
+                        raise error
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = GraphAPIError(0, str(e) or type(e).__name__)
+            if attempt >= self.max_retries:
+                raise error
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+
+    async def send_text(
+        self,
+        to_number: str,
+        message_text: str,
+        *,
+        phone_number_id: str,
+        access_token: str,
+    ) -> Optional[str]:
+        """Send a text message; returns its message ID."""
+        body = await self.send(
+            phone_number_id,
+            access_token,
+            {"messaging_product": "whatsapp", "to": to_number, "text": {"body": message_text}},
+        )
+        return (body.get("messages") or [{}])[0].get("id")
+
+
+client = GraphAPIClient()
+
+
+async def send_whatsapp_message(account: WhatsAppAccount, to_number: str, message_text: str) -> Optional[str]:
+    """Send message from the account's business number; returns the message ID on success"""
+    try:
+        message_id = await client.send_text(
+            to_number, message_text, phone_number_id=account.phone_number_id, access_token=account.access_token
+        )
+        logger.debug(f"Message sent successfully to {to_number}")
+        return message_id
+    except GraphAPIError as e:
+        logger.error(f"Failed to send message to {to_number}: {e}")
+        return None
@@ -0,0 +1,122 @@
+"""
+WhatsApp Business accounts: which owner a business number belongs to and
+the credentials to verify its webhooks and send from it.
+
+Accounts are the active ``WhatsAppConfig`` rows, plus an optional default
+account from the ``WHATSAPP_*`` settings for single-owner deployments. The
+whole set is small. It is loaded into one in-memory snapshot, indexed by
+phone number ID, verify token and owner, so signature checks and sends look
+credentials up in a dictionary instead of the database. Saving a
+``WhatsAppConfig`` drops the snapshot in this process. Other processes
+reload theirs after ``WHATSAPP_ACCOUNT_CACHE_SECONDS``.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.whatsapp_config import WhatsAppConfig
+
+
+@dataclass(frozen=True)
+class WhatsAppAccount:
+    phone_number_id: str
+    access_token: str
+    app_secret: str
+    verify_token: str
+    owner_id: Optional[int] = None  # None for the default account from settings
+    business_phone_number: Optional[str] = None
+    id: Optional[int] = None
+
+
+@dataclass
+class AccountSnapshot:
+    by_phone_number_id: Dict[str, WhatsAppAccount] = field(default_factory=dict)
+    by_verify_token: Dict[str, WhatsAppAccount] = field(default_factory=dict)
+    by_owner: Dict[int, WhatsAppAccount] = field(default_factory=dict)
+    default: Optional[WhatsAppAccount] = None
+    loaded_at: float = 0.0
+
+    def for_phone_number_id(self, phone_number_id: Optional[str]) -> Optional[WhatsAppAccount]:
+        return self.by_phone_number_id.get(phone_number_id) if phone_number_id else None
+
+    def for_verify_token(self, verify_token: Optional[str]) -> Optional[WhatsAppAccount]:
+        return self.by_verify_token.get(verify_token) if verify_token else None
+
+    def for_owner(self, owner_id: int) -> Optional[WhatsAppAccount]:
+        """The owner's own account, else the default one."""
+        return self.by_owner.get(owner_id) or self.default
+
+
+def default_account() -> Optional[WhatsAppAccount]:
+    if not (settings.WHATSAPP_PHONE_NUMBER_ID and settings.WHATSAPP_ACCESS_TOKEN and settings.WHATSAPP_APP_SECRET):
+        return None
+    return WhatsAppAccount(
+        phone_number_id=settings.WHATSAPP_PHONE_NUMBER_ID,
+        access_token=settings.WHATSAPP_ACCESS_TOKEN,
+        app_secret=settings.WHATSAPP_APP_SECRET,
+        verify_token=settings.WHATSAPP_VERIFY_TOKEN or "",
+    )
+
+
+def build_snapshot(configs: Iterable[WhatsAppConfig]) -> AccountSnapshot:
+    snapshot = AccountSnapshot(default=default_account(), loaded_at=time.monotonic())
+    if snapshot.default is not None:
+        snapshot.by_phone_number_id[snapshot.default.phone_number_id] = snapshot.default
+        if snapshot.default.verify_token:
+            snapshot.by_verify_token[snapshot.default.verify_token] = snapshot.default
+    for config in configs:
+        account = WhatsAppAccount(
+            id=config.id,
+            owner_id=config.user_id,
+            phone_number_id=config.phone_number_id,
+            access_token=config.access_token,
+            app_secret=config.app_secret,
+            verify_token=config.verify_token,
+            business_phone_number=config.business_phone_number,
+        )
+        snapshot.by_phone_number_id[account.phone_number_id] = account
+        snapshot.by_verify_token[account.verify_token] = account
+        # Oldest first, so an owner's first account sends their broadcasts
+        snapshot.by_owner.setdefault(account.owner_id, account)
+    return snapshot
+
+
+class AccountRegistry:
+    """Process-wide, periodically reloaded snapshot of all accounts."""
+
+    def __init__(self):
+        self._snapshot: Optional[AccountSnapshot] = None
+
+    def cached(self) -> Optional[AccountSnapshot]:
+        """The current snapshot if it is fresh enough, without touching the database."""
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.loaded_at > settings.WHATSAPP_ACCOUNT_CACHE_SECONDS:
+            return None
+        return snapshot
+
+    def load(self, db: Session) -> AccountSnapshot:
+        configs = (
+            db.query(WhatsAppConfig).filter(WhatsAppConfig.is_active.is_(True)).order_by(WhatsAppConfig.id).all()
+        )
+        self._snapshot = build_snapshot(configs)
+        return self._snapshot
+
+    def snapshot(self, db: Session) -> AccountSnapshot:
+        return self.cached() or self.load(db)
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+
+registry = AccountRegistry()
+
+
+@event.listens_for(WhatsAppConfig, "after_insert")
+@event.listens_for(WhatsAppConfig, "after_update")
+@event.listens_for(WhatsAppConfig, "after_delete")
+def _invalidate_accounts(mapper, connection, target):
+    registry.invalidate()
@@ -0,0 +1,217 @@
+"""
+Archive of WhatsApp messages, read back as per-tenant conversation threads.
+
+Every message is a ``whatsapp_messages`` row whose ``counterparty`` is the
+tenant-side number in normalized form. Threads are read newest first from
+the ``(counterparty, created_at, id)`` index with keyset pagination. A page
+therefore costs the same on the first screen and deep in the history,
+however many million rows the table holds.
+
+Incoming messages are inserted by the inbox as they arrive, because their
+insert is what deduplicates redelivered webhooks. Outgoing messages go
+through a write-behind buffer instead. Sending does not wait for the
+database, and the buffer is written in multi-row inserts of
+``WHATSAPP_ARCHIVE_BATCH_SIZE`` every ``WHATSAPP_ARCHIVE_FLUSH_SECONDS``, or
+sooner once a batch is full. Messages still buffered when a process dies are
+lost from the archive, not from WhatsApp.
+
+Messages older than ``WHATSAPP_ARCHIVE_RETENTION_DAYS`` are deleted. Raw
+webhook bodies are compacted away ``WHATSAPP_ARCHIVE_COMPACT_AFTER_DAYS``
+after processing, since their messages are archived. Both deletions run in
+short batches walking the primary key, so they never hold long locks.
+"""
+import asyncio
+import base64
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.tenant import normalize_phone
+from app.models.whatsapp_config import WebhookEventStatus, WhatsAppMessage, WhatsAppWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Columns of buffered rows, so every batch is one executemany
+DEFAULTS = {
+    "message_id": None,
+    "message_type": "text",
+    "status": "sent",
+    "user_id": None,
+    "tenant_id": None,
+    "broadcast_id": None,
+    "error": None,
+}
+
+# Never sent, so not part of a conversation
+UNSENT_STATUSES = ("queued", "cancelled")
+
+
+def counterparty(number: str) -> str:
+    return normalize_phone(number) or number
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()},{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def thread(
+    db: Session, *, user_id: int, phone: str, before: Optional[str] = None, limit: int = 50
+) -> Tuple[List[WhatsAppMessage], Optional[str]]:
+    """One page of ``user_id``'s messages with ``phone``, newest first, and the cursor of the next page."""
+    query = (
+        db.query(WhatsAppMessage)
+        .filter(
+            WhatsAppMessage.counterparty == phone,
+            WhatsAppMessage.user_id == user_id,
+            WhatsAppMessage.status.notin_(UNSENT_STATUSES),
+        )
+        .order_by(WhatsAppMessage.created_at.desc(), WhatsAppMessage.id.desc())
+    )
+    if before:
+        query = query.filter(tuple_(WhatsAppMessage.created_at, WhatsAppMessage.id) < decode_cursor(before))
+    messages = query.limit(limit + 1).all()
+    if len(messages) <= limit:
+        return messages, None
+    messages = messages[:limit]
+    return messages, encode_cursor(messages[-1].created_at, messages[-1].id)
+
+
+def _delete_in_batches(db: Session, table, condition, batch_size: int) -> int:
+    # Oldest rows come first in primary key order, so each batch is found without a full scan
+    ids = select(table.c.id).where(condition).order_by(table.c.id).limit(batch_size).scalar_subquery()
+    deleted = 0
+    while True:
+        count = db.execute(delete(table).where(table.c.id.in_(ids))).rowcount
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def purge(db: Session, *, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Apply the retention and compaction settings; returns the number of rows deleted per table."""
+    now = now or datetime.utcnow()
+    batch_size = settings.WHATSAPP_ARCHIVE_PURGE_BATCH_SIZE
+    result = {"messages": 0, "webhook_events": 0}
+    if settings.WHATSAPP_ARCHIVE_RETENTION_DAYS > 0:
+        cutoff = now - timedelta(days=settings.WHATSAPP_ARCHIVE_RETENTION_DAYS)
+        table = WhatsAppMessage.__table__
+        result["messages"] = _delete_in_batches(db, table, table.c.created_at < cutoff, batch_size)
+    if settings.WHATSAPP_ARCHIVE_COMPACT_AFTER_DAYS > 0:
+        cutoff = now - timedelta(days=settings.WHATSAPP_ARCHIVE_COMPACT_AFTER_DAYS)
+        table = WhatsAppWebhookEvent.__table__
+        result["webhook_events"] = _delete_in_batches(
+            db, table, (table.c.status == WebhookEventStatus.DONE.value) & (table.c.processed_at < cutoff), batch_size
+        )
+    return result
+
+
+class MessageArchive:
+    """Write-behind buffer of outgoing messages, flushed in batches on the application's event loop."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Buffer messages for the archive; call from the event loop."""
+        now = datetime.utcnow()
+        rows = [
+            {
+                **DEFAULTS,
+                "created_at": now,
+                **row,
+                "counterparty": counterparty(row["from_number"] if row["direction"] == "incoming" else row["to_number"]),
+            }
+            for row in rows
+        ]
+        with self._lock:
+            self._pending.extend(rows)
+            # Keep the newest if the database stays unavailable
+            dropped = len(self._pending) - settings.WHATSAPP_ARCHIVE_BUFFER_LIMIT
+            if dropped > 0:
+                del self._pending[:dropped]
+                logger.error(f"WhatsApp archive buffer full, dropped {dropped} messages")
+            full = len(self._pending) >= settings.WHATSAPP_ARCHIVE_BATCH_SIZE
+        if full:
+            self._full.set()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self, db: Session) -> int:
+        """Write all buffered messages; returns how many were written."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        batch_size = settings.WHATSAPP_ARCHIVE_BATCH_SIZE
+        try:
+            for start in range(0, len(rows), batch_size):
+                db.execute(WhatsAppMessage.__table__.insert(), rows[start:start + batch_size])
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._pending[:0] = rows
+            raise
+        return len(rows)
+
+    def _flush_in_session(self) -> int:
+        db = self.session_factory()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=settings.WHATSAPP_ARCHIVE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await run_in_threadpool(self._flush_in_session)
+            except Exception as e:
+                # Kept in the buffer for the next attempt
+                logger.error(f"WhatsApp archive flush failed: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="whatsapp-archive")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await run_in_threadpool(self._flush_in_session)
+        except Exception as e:
+            logger.error(f"WhatsApp archive lost {self.pending()} messages at shutdown: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending = []
+
+
+archive = MessageArchive()
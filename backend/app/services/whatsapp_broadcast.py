@@ -0,0 +1,398 @@
+"""
+Templated WhatsApp broadcasts, such as monthly rent reminders.
+
+Creating a broadcast runs its audience query once and writes every recipient
+as a queued ``WhatsAppMessage`` with the rendered text, in batched inserts.
+Messages go out from the owner's WhatsApp account. Sending reads the queued
+rows of the broadcast in id order, fans each batch out with bounded
+concurrency through the shared Graph API client (which applies the
+per-number rate limit and retries) and writes the results back with one
+executemany per batch, together with the broadcast's counters and heartbeat.
+
+Progress lives in the message rows, so a broadcast interrupted by a restart
+resumes from its queued remainder: at startup and then periodically, pending
+broadcasts and running ones without a live sender are claimed again. A sender
+retries a failing batch read or write a few times, keeping the results it
+has not written yet; if the database stays unavailable it gives up its claim
+and the next periodic resume continues. Only the batch that was in flight
+when the process died can be sent twice.
+"""
+import asyncio
+import logging
+import string
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.lease import Lease
+from app.models.property import Property
+from app.models.tenant import Tenant
+from app.models.unit import Unit
+from app.models.whatsapp_config import BroadcastStatus, WhatsAppBroadcast, WhatsAppMessage
+from app.services import whatsapp as whatsapp_service
+from app.services import whatsapp_accounts
+from app.services.whatsapp_accounts import WhatsAppAccount
+
+logger = logging.getLogger(__name__)
+
+RENT_REMINDER_FIELDS = {
+    "first_name", "last_name", "invoice_number", "amount", "currency", "due_date", "days_until_due",
+    "property_name", "unit_number",
+}
+
+# (broadcast message id, Graph API message id, status, error)
+SendResult = Tuple[int, Optional[str], str, Optional[str]]
+
+
+def validate_template(template: str, fields: set = RENT_REMINDER_FIELDS) -> None:
+    """Reject templates with unknown placeholders or broken braces before anyone is queued."""
+    try:
+        parsed = [(name, spec) for _, name, spec, _ in string.Formatter().parse(template) if name is not None]
+    except ValueError as e:
+        raise ValueError(f"Invalid template: {e}")
+    if any("{" in spec for _, spec in parsed):
+        raise ValueError("Template format specs cannot contain placeholders")
+    names = {name for name, _ in parsed}
+    if "" in names or any(not name.isidentifier() for name in names):
+        raise ValueError("Template placeholders must be named, e.g. {first_name}")
+    unknown = names - fields
+    if unknown:
+        raise ValueError(f"Unknown template fields: {', '.join(sorted(unknown))}")
+
+
+def rent_reminder_recipients(
+    db: Session, *, owner_id: int, days_ahead: int, today: Optional[date] = None
+) -> Iterator[Dict[str, Any]]:
+    """Tenants with a pending invoice due within ``days_ahead`` days, one per invoice."""
+    today = today or date.today()
+    rows = (
+        db.query(
+            Tenant.id, Tenant.first_name, Tenant.last_name, Tenant.phone_normalized,
+            Invoice.invoice_number, Invoice.total_amount, Invoice.currency_iso, Invoice.due_date,
+            Property.name, Unit.unit_number,
+        )
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .join(Tenant, Lease.tenant_id == Tenant.id)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(
+            Property.owner_id == owner_id,
+            Invoice.status == InvoiceStatus.PENDING.value,
+            Invoice.due_date.between(today, today + timedelta(days=days_ahead)),
+            Tenant.phone_normalized.isnot(None),
+        )
+        .order_by(Invoice.due_date, Invoice.id)
+        .yield_per(settings.WHATSAPP_BROADCAST_BATCH_SIZE)
+    )
+    for tenant_id, first_name, last_name, to_number, number, amount, currency, due_date, property_name, unit_number in rows:
+        yield {
+            "tenant_id": tenant_id,
+            "to_number": to_number,
+            "fields": {
+                "first_name": first_name,
+                "last_name": last_name,
+                "invoice_number": number,
+                "amount": f"{amount:.2f}",
+                "currency": currency,
+                "due_date": due_date.isoformat(),
+                "days_until_due": (due_date - today).days,
+                "property_name": property_name,
+                "unit_number": unit_number,
+            },
+        }
+
+
+def create_broadcast(
+    db: Session, *, owner_id: int, name: str, template: str, days_ahead: int, today: Optional[date] = None
+) -> WhatsAppBroadcast:
+    """Create a rent reminder broadcast and queue one rendered message per recipient."""
+    validate_template(template)
+    account = whatsapp_accounts.registry.snapshot(db).for_owner(owner_id)
+    if account is None:
+        raise ValueError("No WhatsApp account is configured for this owner")
+    broadcast = WhatsAppBroadcast(
+        owner_id=owner_id,
+        name=name,
+        template=template,
+        audience={"type": "rent_reminder", "days_ahead": days_ahead},
+        status=BroadcastStatus.PENDING.value,
+    )
+    db.add(broadcast)
+    db.flush()
+
+    table = WhatsAppMessage.__table__
+    total = 0
+    batch: List[Dict[str, Any]] = []
+    recipients = rent_reminder_recipients(db, owner_id=owner_id, days_ahead=days_ahead, today=today)
+    for recipient in recipients:
+        batch.append({
+            "broadcast_id": broadcast.id,
+            "tenant_id": recipient["tenant_id"],
+            "from_number": account.business_phone_number or account.phone_number_id,
+            "to_number": recipient["to_number"],
+            "counterparty": recipient["to_number"],
+            "user_id": owner_id,
+            "message_text": template.format(**recipient["fields"]),
+            "message_type": "text",
+            "direction": "outgoing",
+            "status": "queued",
+        })
+        if len(batch) >= settings.WHATSAPP_BROADCAST_BATCH_SIZE:
+            db.execute(table.insert(), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.execute(table.insert(), batch)
+        total += len(batch)
+
+    broadcast.total_recipients = total
+    if total == 0:
+        broadcast.status = BroadcastStatus.COMPLETED.value
+        broadcast.finished_at = datetime.utcnow()
+    db.commit()
+    db.refresh(broadcast)
+    return broadcast
+
+
+def _claimable(now: datetime):
+    table = WhatsAppBroadcast.__table__
+    stale = now - timedelta(seconds=settings.WHATSAPP_BROADCAST_CLAIM_TIMEOUT_SECONDS)
+    return or_(
+        table.c.status == BroadcastStatus.PENDING.value,
+        and_(
+            table.c.status == BroadcastStatus.RUNNING.value,
+            or_(table.c.claimed_by.is_(None), table.c.heartbeat_at < stale),
+        ),
+    )
+
+
+def claimable_broadcast_ids(db: Session, *, now: Optional[datetime] = None) -> List[int]:
+    table = WhatsAppBroadcast.__table__
+    return db.execute(
+        select(table.c.id).where(_claimable(now or datetime.utcnow())).order_by(table.c.id)
+    ).scalars().all()
+
+
+def broadcast_account(db: Session, broadcast_id: int) -> Optional[WhatsAppAccount]:
+    """The account a broadcast is sent from: its owner's current one."""
+    owner_id = db.query(WhatsAppBroadcast.owner_id).filter(WhatsAppBroadcast.id == broadcast_id).scalar()
+    return whatsapp_accounts.registry.snapshot(db).for_owner(owner_id) if owner_id is not None else None
+
+
+def claim_broadcast(db: Session, broadcast_id: int, *, now: Optional[datetime] = None) -> Optional[str]:
+    """Make this caller the broadcast's only sender; returns its claim token, or None if taken or finished."""
+    now = now or datetime.utcnow()
+    table = WhatsAppBroadcast.__table__
+    token = uuid.uuid4().hex
+    claimed = db.execute(
+        update(table)
+        .where(table.c.id == broadcast_id, _claimable(now))
+        .values(
+            status=BroadcastStatus.RUNNING.value,
+            claimed_by=token,
+            heartbeat_at=now,
+            started_at=func.coalesce(table.c.started_at, now),
+        )
+    ).rowcount
+    db.commit()
+    return token if claimed else None
+
+
+def next_batch(db: Session, broadcast_id: int, *, after_id: int, limit: int) -> List[Tuple[int, str, str]]:
+    """Queued (id, to_number, text) of the broadcast after ``after_id``."""
+    table = WhatsAppMessage.__table__
+    return [
+        tuple(row)
+        for row in db.execute(
+            select(table.c.id, table.c.to_number, table.c.message_text)
+            .where(table.c.broadcast_id == broadcast_id, table.c.status == "queued", table.c.id > after_id)
+            .order_by(table.c.id)
+            .limit(limit)
+        )
+    ]
+
+
+def record_results(db: Session, broadcast_id: int, token: str, results: List[SendResult]) -> bool:
+    """Write a batch of send results; returns False if the broadcast was cancelled or claimed by another sender."""
+    messages = WhatsAppMessage.__table__
+    if results:
+        db.execute(
+            update(messages)
+            .where(messages.c.id == bindparam("b_id"))
+            .values(
+                message_id=bindparam("b_message_id"),
+                status=bindparam("b_status"),
+                error=bindparam("b_error"),
+                updated_at=func.now(),
+            ),
+            [
+                {"b_id": id, "b_message_id": message_id, "b_status": status, "b_error": error}
+                for id, message_id, status, error in results
+            ],
+        )
+    sent = sum(1 for _, _, status, _ in results if status == "sent")
+    broadcasts = WhatsAppBroadcast.__table__
+    still_ours = db.execute(
+        update(broadcasts)
+        .where(
+            broadcasts.c.id == broadcast_id,
+            broadcasts.c.claimed_by == token,
+            broadcasts.c.status == BroadcastStatus.RUNNING.value,
+        )
+        .values(
+            sent_count=broadcasts.c.sent_count + sent,
+            failed_count=broadcasts.c.failed_count + len(results) - sent,
+            heartbeat_at=datetime.utcnow(),
+        )
+    ).rowcount
+    db.commit()
+    return bool(still_ours)
+
+
+def finish_broadcast(db: Session, broadcast_id: int, token: str) -> None:
+    table = WhatsAppBroadcast.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == broadcast_id, table.c.claimed_by == token, table.c.status == BroadcastStatus.RUNNING.value)
+        .values(status=BroadcastStatus.COMPLETED.value, finished_at=datetime.utcnow(), claimed_by=None)
+    )
+    db.commit()
+
+
+def release_broadcast(db: Session, broadcast_id: int, token: str) -> None:
+    """Give up the claim so the next resume continues at once, e.g. on shutdown."""
+    table = WhatsAppBroadcast.__table__
+    db.execute(update(table).where(table.c.id == broadcast_id, table.c.claimed_by == token).values(claimed_by=None))
+    db.commit()
+
+
+def cancel_broadcast(db: Session, *, broadcast_id: int, owner_id: int) -> Optional[WhatsAppBroadcast]:
+    broadcast = (
+        db.query(WhatsAppBroadcast)
+        .filter(WhatsAppBroadcast.id == broadcast_id, WhatsAppBroadcast.owner_id == owner_id)
+        .first()
+    )
+    if broadcast is None:
+        return None
+    if broadcast.status in (BroadcastStatus.PENDING.value, BroadcastStatus.RUNNING.value):
+        broadcast.status = BroadcastStatus.CANCELLED.value
+        broadcast.finished_at = datetime.utcnow()
+        broadcast.claimed_by = None
+        db.execute(
+            update(WhatsAppMessage.__table__)
+            .where(WhatsAppMessage.broadcast_id == broadcast_id, WhatsAppMessage.status == "queued")
+            .values(status="cancelled")
+        )
+        db.commit()
+        db.refresh(broadcast)
+    return broadcast
+
+
+class Broadcaster:
+    """Sends claimed broadcasts as background tasks on the application's event loop."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._tokens: Dict[int, str] = {}
+
+    def _in_session(self, func: Callable, *args, **kwargs):
+        db = self.session_factory()
+        try:
+            return func(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    async def _db(self, func: Callable, *args, **kwargs):
+        return await run_in_threadpool(self._in_session, func, *args, **kwargs)
+
+    async def _db_retrying(self, func: Callable, *args, **kwargs):
+        """Run a batch read or write, retrying database errors with growing delays."""
+        for attempt in range(settings.WHATSAPP_BROADCAST_DB_ATTEMPTS):
+            try:
+                return await self._db(func, *args, **kwargs)
+            except SQLAlchemyError as e:
+                if attempt + 1 >= settings.WHATSAPP_BROADCAST_DB_ATTEMPTS:
+                    raise
+                logger.warning(f"Broadcast database call {func.__name__} failed, retrying: {e}")
+                await asyncio.sleep(settings.WHATSAPP_BROADCAST_DB_RETRY_SECONDS * 2 ** attempt)
+
+    async def _send(
+        self, semaphore: asyncio.Semaphore, account: WhatsAppAccount, row: Tuple[int, str, str]
+    ) -> SendResult:
+        id, to_number, text = row
+        async with semaphore:
+            try:
+                message_id = await whatsapp_service.client.send_text(
+                    to_number, text, phone_number_id=account.phone_number_id, access_token=account.access_token
+                )
+                return id, message_id, "sent", None
+            except whatsapp_service.GraphAPIError as e:
+                return id, None, "failed", str(e)[:500]
+
+    async def run(self, broadcast_id: int) -> None:
+        """Send the broadcast's queued messages if no one else is; returns when done, cancelled or outclaimed."""
+        account = await self._db(broadcast_account, broadcast_id)
+        if account is None:
+            logger.error(f"Broadcast {broadcast_id} has no WhatsApp account to send from")
+            return
+        token = await self._db(claim_broadcast, broadcast_id)
+        if token is None:
+            return
+        self._tokens[broadcast_id] = token
+        semaphore = asyncio.Semaphore(settings.WHATSAPP_BROADCAST_CONCURRENCY)
+        last_id = 0
+        try:
+            while True:
+                batch = await self._db_retrying(
+                    next_batch, broadcast_id, after_id=last_id, limit=settings.WHATSAPP_BROADCAST_BATCH_SIZE
+                )
+                if not batch:
+                    await self._db_retrying(finish_broadcast, broadcast_id, token)
+                    return
+                results = await asyncio.gather(*(self._send(semaphore, account, row) for row in batch))
+                if not await self._db_retrying(record_results, broadcast_id, token, results):
+                    logger.info(f"Broadcast {broadcast_id} was cancelled or taken over; stopping")
+                    return
+                last_id = batch[-1][0]
+        except SQLAlchemyError as e:
+            logger.error(f"Broadcast {broadcast_id} paused after database errors, resumed later: {e}")
+            try:
+                await self._db(release_broadcast, broadcast_id, token)
+            except SQLAlchemyError:
+                # The claim goes stale instead
+                pass
+        finally:
+            self._tokens.pop(broadcast_id, None)
+
+    def start(self, broadcast_id: int) -> None:
+        if broadcast_id in self._tasks:
+            return
+        task = asyncio.create_task(self.run(broadcast_id), name=f"whatsapp-broadcast:{broadcast_id}")
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    async def resume(self) -> None:
+        """Pick up broadcasts left pending or running by a previous process."""
+        for broadcast_id in await self._db(claimable_broadcast_ids):
+            self.start(broadcast_id)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        tokens = dict(self._tokens)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for broadcast_id, token in tokens.items():
+            await self._db(release_broadcast, broadcast_id, token)
+
+
+broadcaster = Broadcaster()
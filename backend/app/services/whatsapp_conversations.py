@@ -0,0 +1,151 @@
+"""
+Who is writing to the WhatsApp bot, and where their conversation stands.
+
+Senders are matched to the tenants of the business number's owner through
+``Tenant.phone_normalized``, the indexed international form of each
+tenant's number. Conversations are kept per business number and sender in
+``whatsapp_conversations`` and are forgotten after
+``WHATSAPP_CONVERSATION_TTL_SECONDS``. Both go through in-process LRU caches.
+For a sender who wrote recently, answering a message costs two dictionary
+lookups. The tables are read on a cache miss and written only when the
+conversation changed.
+
+Tenant matches are reused for ``WHATSAPP_TENANT_CACHE_SECONDS``. Changing a
+tenant's number drops the match at once in this process, and after that
+delay in the others.
+"""
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.lease import Lease, LeaseStatus
+from app.models.tenant import Tenant, normalize_phone
+from app.models.whatsapp_config import WhatsAppConversation
+from app.services import whatsapp_intents
+from app.services.whatsapp_accounts import WhatsAppAccount
+from app.services.whatsapp_intents import Conversation
+
+# (owner id, normalized phone) -> (tenant id or None, monotonic expiry)
+_tenant_ids = LRUCache(maxsize=settings.WHATSAPP_CONVERSATION_CACHE_SIZE)
+
+
+def find_tenant_id(db: Session, phone: str, *, owner_id: Optional[int] = None) -> Optional[int]:
+    """
+    The tenant writing from ``phone``, among ``owner_id``'s tenants if given;
+    with several, the one with an active lease, then the newest.
+    """
+    cached = _tenant_ids.get((owner_id, phone))
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    query = (
+        db.query(Tenant.id)
+        .outerjoin(Lease, (Lease.tenant_id == Tenant.id) & (Lease.status == LeaseStatus.ACTIVE.value))
+        .filter(Tenant.phone_normalized == phone)
+    )
+    if owner_id is not None:
+        query = query.filter(Tenant.owner_id == owner_id)
+    tenant_id = query.order_by(Lease.id.is_(None), Tenant.id.desc()).limit(1).scalar()
+    _tenant_ids.set((owner_id, phone), (tenant_id, time.monotonic() + settings.WHATSAPP_TENANT_CACHE_SECONDS))
+    return tenant_id
+
+
+@event.listens_for(Tenant, "after_insert")
+@event.listens_for(Tenant, "after_update")
+@event.listens_for(Tenant, "after_delete")
+def _forget_tenant_phone(mapper, connection, target):
+    # Both the new number and the one it replaced may now match someone else
+    for phone in {target.phone_normalized, *inspect(target).attrs.phone_normalized.history.deleted}:
+        if phone:
+            _tenant_ids.pop((target.owner_id, phone))
+            _tenant_ids.pop((None, phone))
+
+
+class ConversationStore:
+    """Conversations by business number and sender, cached in memory and written through to the table."""
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self._cache = LRUCache(maxsize=maxsize or settings.WHATSAPP_CONVERSATION_CACHE_SIZE)
+
+    def get(
+        self, db: Session, phone: str, *, phone_number_id: str = "", now: Optional[datetime] = None
+    ) -> Conversation:
+        """The sender's conversation, or a new one if there is none or it expired; safe to change in place."""
+        now = now or datetime.utcnow()
+        key = (phone_number_id, phone)
+        conversation = self._cache.get(key)
+        if conversation is None:
+            row = db.get(WhatsAppConversation, key)
+            conversation = Conversation(phone=phone, phone_number_id=phone_number_id)
+            if row is not None:
+                conversation = replace(
+                    conversation, state=row.state, context=row.context or {}, locale=row.locale, expires_at=row.expires_at
+                )
+            self._cache.set(key, conversation)
+        if conversation.expires_at is not None and conversation.expires_at <= now:
+            return Conversation(phone=phone, phone_number_id=phone_number_id, locale=conversation.locale)
+        return replace(conversation, context=dict(conversation.context))
+
+    def save(self, db: Session, conversation: Conversation, *, now: Optional[datetime] = None) -> None:
+        """Store the conversation if it changed since ``get``."""
+        now = now or datetime.utcnow()
+        key = (conversation.phone_number_id, conversation.phone)
+        cached = self._cache.get(key)
+        if cached is not None and (cached.state, cached.context, cached.locale) == (
+            conversation.state, conversation.context, conversation.locale
+        ) and (cached.expires_at is None or cached.expires_at > now):
+            return
+        conversation = replace(
+            conversation, expires_at=now + timedelta(seconds=settings.WHATSAPP_CONVERSATION_TTL_SECONDS)
+        )
+        values = {
+            "state": conversation.state,
+            "context": conversation.context,
+            "locale": conversation.locale,
+            "updated_at": now,
+            "expires_at": conversation.expires_at,
+        }
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        db.execute(
+            insert(WhatsAppConversation.__table__)
+            .values(phone_number_id=conversation.phone_number_id, phone=conversation.phone, **values)
+            .on_conflict_do_update(index_elements=["phone_number_id", "phone"], set_=values)
+        )
+        db.commit()
+        self._cache.set(key, conversation)
+
+    def purge_expired(self, db: Session, *, now: Optional[datetime] = None) -> int:
+        now = now or datetime.utcnow()
+        deleted = db.execute(
+            delete(WhatsAppConversation.__table__).where(WhatsAppConversation.expires_at <= now)
+        ).rowcount
+        db.commit()
+        return deleted
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+conversations = ConversationStore()
+
+
+def clear_caches() -> None:
+    _tenant_ids.clear()
+    conversations.clear()
+
+
+def reply_to(db: Session, from_number: str, text: str, *, account: Optional[WhatsAppAccount] = None) -> str:
+    """Answer a message to ``account``'s business number in the context of its sender's tenancy and conversation."""
+    phone = normalize_phone(from_number) or from_number
+    owner_id = account.owner_id if account else None
+    conversation = conversations.get(db, phone, phone_number_id=account.phone_number_id if account else "")
+    tenant_id = find_tenant_id(db, phone, owner_id=owner_id)
+    reply = whatsapp_intents.respond(db, text, tenant_id=tenant_id, conversation=conversation)
+    conversations.save(db, conversation)
+    return reply
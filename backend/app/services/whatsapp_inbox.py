@@ -0,0 +1,327 @@
+"""
+Durable inbox for WhatsApp webhook deliveries.
+
+The webhook only verifies the signature and stores the raw body as a
+``whatsapp_webhook_events`` row, so Meta gets its 200 in milliseconds
+however slow the Graph API is. A pool of workers on the application's event
+loop claims pending events in batches and processes them:
+
+* incoming messages are inserted into ``whatsapp_messages`` with
+  ``ON CONFLICT (message_id) DO NOTHING``. A message is marked answered
+  (``replied_at``) by a guarded UPDATE once its reply has been generated, and
+  only the worker whose UPDATE took the row sends it. Redelivered webhooks
+  never answer the same message twice, while an event retried because
+  generating the reply failed still answers it;
+* replies go out from the business number a message was sent to, and only
+  that number's owner's tenants are recognised; they are archived through
+  the write-behind buffer of ``whatsapp_archive``;
+* delivery statuses only move a message forward (sent, delivered, read).
+  The archive buffer is flushed first, so a status never arrives before the
+  message it belongs to.
+
+Claiming is a single UPDATE guarded by the event's status, so several
+workers, or several application processes, never take the same event.
+Events left ``processing`` by a crashed process are reclaimed after
+``WHATSAPP_INBOX_CLAIM_TIMEOUT_SECONDS``; failed events are retried with
+growing delays up to ``WHATSAPP_INBOX_MAX_ATTEMPTS`` times. A worker only
+finishes an event it still holds the claim token of, so a slow worker whose
+event was reclaimed cannot overwrite the outcome of the new claim.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, bindparam, case, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.whatsapp_config import WebhookEventStatus, WhatsAppMessage, WhatsAppWebhookEvent
+from app.services import whatsapp as whatsapp_service
+from app.services import whatsapp_accounts, whatsapp_archive, whatsapp_conversations
+
+logger = logging.getLogger(__name__)
+
+# Delivery statuses only move forward; webhooks may arrive out of order
+STATUS_RANK = {"sent": 1, "delivered": 2, "read": 3, "failed": 4}
+
+
+def enqueue(db: Session, payload: bytes) -> int:
+    """Store a verified webhook body; the only database work done before acknowledging."""
+    table = WhatsAppWebhookEvent.__table__
+    event_id = db.execute(
+        table.insert()
+        .values(
+            payload=payload.decode("utf-8"),
+            status=WebhookEventStatus.PENDING.value,
+            attempts=0,
+            available_at=datetime.utcnow(),
+        )
+        .returning(table.c.id)
+    ).scalar_one()
+    db.commit()
+    return event_id
+
+
+def claim_events(db: Session, *, limit: int, now: Optional[datetime] = None) -> List[Tuple[int, str, int, str]]:
+    """Mark up to ``limit`` available events as processing for this caller; returns (id, payload, attempts, token)."""
+    now = now or datetime.utcnow()
+    table = WhatsAppWebhookEvent.__table__
+    token = uuid.uuid4().hex
+    claimable = or_(
+        and_(table.c.status == WebhookEventStatus.PENDING.value, table.c.available_at <= now),
+        and_(
+            table.c.status == WebhookEventStatus.PROCESSING.value,
+            table.c.claimed_at < now - timedelta(seconds=settings.WHATSAPP_INBOX_CLAIM_TIMEOUT_SECONDS),
+        ),
+    )
+    ids = select(table.c.id).where(claimable).order_by(table.c.id).limit(limit).scalar_subquery()
+    claimed = db.execute(
+        # Re-checking the status makes a concurrent claim of the same row a no-op
+        update(table)
+        .where(table.c.id.in_(ids), claimable)
+        .values(
+            status=WebhookEventStatus.PROCESSING.value,
+            claimed_by=token,
+            claimed_at=now,
+            attempts=table.c.attempts + 1,
+        )
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return []
+    return [
+        tuple(row)
+        for row in db.execute(
+            select(table.c.id, table.c.payload, table.c.attempts, table.c.claimed_by)
+            .where(table.c.claimed_by == token)
+            .order_by(table.c.id)
+        )
+    ]
+
+
+def phone_number_ids(data: Dict[str, Any]) -> Set[Optional[str]]:
+    """Business numbers a webhook body is addressed to; untrusted until its signature is checked."""
+    return {
+        change.get("value", {}).get("metadata", {}).get("phone_number_id")
+        for entry in data.get("entry", [])
+        for change in entry.get("changes", [])
+    }
+
+
+def parse_payload(payload: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Incoming messages and delivery statuses contained in a webhook body."""
+    data = json.loads(payload)
+    messages, statuses = [], []
+    for entry in data.get("entry", []):
+        for change in entry.get("changes", []):
+            if change.get("field") != "messages":
+                continue
+            value = change.get("value", {})
+            metadata = value.get("metadata", {})
+            business_number = metadata.get("display_phone_number", "")
+            for message in value.get("messages", []):
+                messages.append({
+                    "phone_number_id": metadata.get("phone_number_id"),
+                    "message_id": message["id"],
+                    "from_number": message["from"],
+                    "to_number": business_number,
+                    "message_type": message.get("type", "text"),
+                    "message_text": message.get("text", {}).get("body", ""),
+                })
+            statuses.extend(
+                {"message_id": status["id"], "status": status["status"]}
+                for status in value.get("statuses", [])
+                if status.get("status") in STATUS_RANK
+            )
+    return messages, statuses
+
+
+def record_incoming(
+    db: Session, messages: List[Dict[str, Any]], statuses: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Store incoming messages and status updates; returns the messages that have not been answered yet."""
+    unanswered = set()
+    if messages:
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        table = WhatsAppMessage.__table__
+        stmt = insert(table).on_conflict_do_nothing(index_elements=["message_id"])
+        accounts = whatsapp_accounts.registry.snapshot(db)
+        now = datetime.utcnow()
+        rows = []
+        for message in messages:
+            account = accounts.for_phone_number_id(message["phone_number_id"])
+            row = {key: value for key, value in message.items() if key != "phone_number_id"}
+            rows.append({
+                **row,
+                "user_id": account.owner_id if account else None,
+                "counterparty": whatsapp_archive.counterparty(message["from_number"]),
+                "direction": "incoming",
+                "status": "received",
+                "created_at": now,
+            })
+        db.execute(stmt, rows)
+        unanswered = set(
+            db.execute(
+                select(table.c.message_id).where(
+                    table.c.message_id.in_([message["message_id"] for message in messages]),
+                    table.c.replied_at.is_(None),
+                )
+            ).scalars()
+        )
+    if statuses:
+        table = WhatsAppMessage.__table__
+        rank = case(STATUS_RANK, value=table.c.status, else_=0)
+        db.execute(
+            update(table)
+            .where(table.c.message_id == bindparam("b_message_id"), rank < bindparam("b_rank"))
+            .values(status=bindparam("b_status"), updated_at=func.now()),
+            [
+                {"b_message_id": s["message_id"], "b_status": s["status"], "b_rank": STATUS_RANK[s["status"]]}
+                for s in statuses
+            ],
+        )
+    db.commit()
+    return [message for message in messages if message["message_id"] in unanswered]
+
+
+def mark_replied(db: Session, message_id: str) -> bool:
+    """Mark an incoming message answered; False if another worker already did, so it must not be sent again."""
+    table = WhatsAppMessage.__table__
+    marked = db.execute(
+        update(table)
+        .where(table.c.message_id == message_id, table.c.replied_at.is_(None))
+        .values(replied_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return marked == 1
+
+
+def finish_event(
+    db: Session, event_id: int, *, token: str, error: Optional[str] = None, attempts: int = 0
+) -> bool:
+    """Record the outcome of a claimed event; False if the claim was lost to another worker meanwhile."""
+    table = WhatsAppWebhookEvent.__table__
+    now = datetime.utcnow()
+    if error is None:
+        values = {"status": WebhookEventStatus.DONE.value, "processed_at": now, "claimed_by": None, "last_error": None}
+    elif attempts >= settings.WHATSAPP_INBOX_MAX_ATTEMPTS:
+        values = {"status": WebhookEventStatus.FAILED.value, "processed_at": now, "claimed_by": None, "last_error": error}
+    else:
+        values = {
+            "status": WebhookEventStatus.PENDING.value,
+            "available_at": now + timedelta(seconds=2 ** attempts),
+            "claimed_by": None,
+            "last_error": error,
+        }
+    finished = db.execute(
+        update(table).where(table.c.id == event_id, table.c.claimed_by == token).values(**values)
+    ).rowcount
+    db.commit()
+    if not finished:
+        logger.warning(f"WhatsApp webhook event {event_id} was reclaimed before it finished")
+    return finished == 1
+
+
+class WebhookInbox:
+    """Pool of workers draining the webhook event table on the application's event loop."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def _in_session(self, func: Callable, *args, **kwargs):
+        db = self.session_factory()
+        try:
+            return func(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    async def _db(self, func: Callable, *args, **kwargs):
+        return await run_in_threadpool(self._in_session, func, *args, **kwargs)
+
+    def wake(self) -> None:
+        """Signal that an event was enqueued, so idle workers start without waiting for the next poll."""
+        self._wake.set()
+
+    async def process_event(self, event_id: int, payload: str, attempts: int, token: str) -> None:
+        try:
+            messages, statuses = parse_payload(payload)
+            if statuses and whatsapp_archive.archive.pending():
+                await self._db(whatsapp_archive.archive.flush)
+            unanswered = await self._db(record_incoming, messages, statuses)
+            replies = []
+            accounts = whatsapp_accounts.registry.cached() or await self._db(whatsapp_accounts.registry.load)
+            for message in unanswered:
+                account = accounts.for_phone_number_id(message["phone_number_id"])
+                if message["message_type"] != "text" or account is None:
+                    continue
+                reply = await self._db(
+                    whatsapp_conversations.reply_to,
+                    message["from_number"],
+                    message["message_text"],
+                    account=account,
+                )
+                if not await self._db(mark_replied, message["message_id"]):
+                    continue
+                sent_id = await whatsapp_service.send_whatsapp_message(account, message["from_number"], reply)
+                replies.append({
+                    "message_id": sent_id,
+                    "from_number": message["to_number"],
+                    "to_number": message["from_number"],
+                    "message_text": reply,
+                    "message_type": "text",
+                    "direction": "outgoing",
+                    "status": "sent" if sent_id else "failed",
+                    "user_id": account.owner_id,
+                })
+            whatsapp_archive.archive.add(replies)
+            await self._db(finish_event, event_id, token=token)
+        except Exception as e:
+            logger.error(f"WhatsApp webhook event {event_id} failed: {e}")
+            await self._db(finish_event, event_id, token=token, error=str(e), attempts=attempts)
+
+    async def drain(self) -> int:
+        """Process claimable events until none are left; returns how many were processed."""
+        processed = 0
+        while True:
+            events = await self._db(claim_events, limit=settings.WHATSAPP_INBOX_BATCH_SIZE)
+            if not events:
+                return processed
+            for event_id, payload, attempts, token in events:
+                await self.process_event(event_id, payload, attempts, token)
+            processed += len(events)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                # Database unavailable; try again on the next poll
+                logger.error(f"WhatsApp inbox worker error: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.WHATSAPP_INBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, workers: int) -> None:
+        if self._tasks or workers <= 0:
+            return
+        self._tasks = [asyncio.create_task(self._worker(), name=f"whatsapp-inbox:{i}") for i in range(workers)]
+        logger.info(f"WhatsApp inbox started with {workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+inbox = WebhookInbox()
@@ -0,0 +1,580 @@
+"""
+Intent classification and replies for the WhatsApp bot.
+
+Keywords and phrases are kept per locale, in the languages the frontend
+ships. They are compiled once into a single regular expression with shared
+prefixes factored out, like a trie. Classifying a message then takes one
+pass over its text, whatever the number of keywords, which keeps the bot
+cheap under heavy inbound volume.
+
+A keyword ending in ``*`` also matches longer words, e.g. ``repair*`` matches
+"repairs" and "repairing". Every other keyword must match a whole word, so
+"hi" does not match "this". Accented keywords also match without their
+accents. When a message matches several intents, the one listed first in
+``PRIORITY`` wins: "the heating is broken, is rent due?" is a maintenance
+request. The reply is in the language of the winning keyword.
+
+Each intent has a handler. Handlers look up the tenant's own invoices,
+leases and property manager when the sender is known. A handler can also
+leave the conversation in a state, e.g. waiting for the description of a
+repair; the next message then goes to that state's handler, unless it is
+an emergency.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.invoice import Invoice, InvoiceStatus
+from app.models.lease import Lease, LeaseStatus
+from app.models.property import Property
+from app.models.tenant import Tenant
+from app.models.unit import Unit
+from app.models.user import User
+from app.schemas.maintenance import MaintenanceRequestCreate
+
+LOCALES = ("en", "de", "fr", "es")
+DEFAULT_LOCALE = "en"
+
+# Most specific first; a matched keyword of an earlier intent wins
+PRIORITY = ("emergency", "maintenance", "rent", "invoice", "lease", "contact", "greeting")
+
+KEYWORDS: Dict[str, Dict[str, List[str]]] = {
+    "en": {
+        "emergency": [
+            "emergency", "urgent", "fire", "smoke", "gas leak", "smell gas", "smell of gas", "flood*",
+            "burst pipe", "carbon monoxide", "sparks",
+        ],
+        "maintenance": [
+            "maintenance", "repair*", "fix", "fixed", "fixing", "broken", "breaks", "leak*", "drip*", "clog*",
+            "blocked", "mold", "mould", "heating", "boiler", "heater", "not working", "doesn't work",
+            "does not work", "plumb*", "toilet", "sink", "shower", "window", "lock", "damage*",
+        ],
+        "rent": [
+            "rent", "rents", "payment*", "pay", "paid", "paying", "due", "overdue", "balance", "owe", "arrears",
+            "direct debit", "transfer",
+        ],
+        "invoice": ["invoice*", "bill", "bills", "receipt*", "statement"],
+        "lease": [
+            "lease*", "contract*", "agreement", "renew*", "move out", "moving out", "notice", "terminat*",
+            "deposit",
+        ],
+        "contact": [
+            "contact*", "landlord", "property manager", "manager", "owner", "speak to", "talk to", "call me",
+            "human",
+        ],
+        "greeting": ["hello", "hi", "hey", "help", "start", "menu", "good morning", "good afternoon", "good evening"],
+    },
+    "de": {
+        "emergency": [
+            "notfall", "dringend", "feuer", "brand", "rauch", "gasgeruch", "riecht nach gas", "überschwemm*",
+            "wasserrohrbruch", "kohlenmonoxid",
+        ],
+        "maintenance": [
+            "reparatur*", "reparier*", "kaputt", "defekt", "undicht", "leck", "tropf*", "verstopft", "schimmel",
+            "heizung*", "funktioniert nicht", "geht nicht", "wartung", "instandhaltung", "toilette",
+            "waschbecken", "dusche", "fenster", "schloss", "schaden", "schäden",
+        ],
+        "rent": [
+            "miete", "mietzahlung*", "zahlung*", "bezahl*", "gezahlt", "überweisung", "fällig", "überfällig",
+            "rückstand", "lastschrift", "kontostand",
+        ],
+        "invoice": ["rechnung*", "quittung*", "beleg*", "abrechnung*", "nebenkostenabrechnung"],
+        "lease": ["mietvertrag*", "vertrag*", "verlänger*", "kündig*", "auszug", "ausziehen", "kaution"],
+        "contact": [
+            "kontakt*", "vermieter*", "hausverwalt*", "verwalter*", "eigentümer", "anrufen", "rückruf",
+            "mitarbeiter", "mensch",
+        ],
+        "greeting": ["hallo", "guten tag", "guten morgen", "guten abend", "moin", "servus", "hilfe", "menü"],
+    },
+    "fr": {
+        "emergency": [
+            "urgence", "urgent", "incendie", "feu", "fumée", "fuite de gaz", "odeur de gaz", "inondation",
+            "inondé*", "monoxyde de carbone",
+        ],
+        "maintenance": [
+            "réparation*", "réparer", "cassé*", "en panne", "panne", "fuite*", "goutte", "bouché*",
+            "moisissure*", "chauffage", "chaudière", "ne marche pas", "ne fonctionne pas", "entretien",
+            "plomberie", "toilettes", "évier", "douche", "fenêtre", "serrure", "dégât*",
+        ],
+        "rent": [
+            "loyer*", "paiement*", "payer", "payé", "virement", "prélèvement", "échéance", "retard", "impayé*",
+            "solde",
+        ],
+        "invoice": ["facture*", "reçu*", "quittance*", "relevé"],
+        "lease": [
+            "bail", "baux", "contrat*", "renouvel*", "résili*", "préavis", "déménag*", "caution",
+            "dépôt de garantie",
+        ],
+        "contact": [
+            "contact*", "propriétaire", "gestionnaire", "bailleur", "agence", "appeler", "rappeler",
+            "conseiller", "humain",
+        ],
+        "greeting": ["bonjour", "bonsoir", "salut", "coucou", "aide", "menu"],
+    },
+    "es": {
+        "emergency": [
+            "emergencia", "urgente", "incendio", "fuego", "humo", "fuga de gas", "olor a gas", "inundación",
+            "inundado", "monóxido de carbono",
+        ],
+        "maintenance": [
+            "reparación", "reparar", "arregl*", "roto", "rota", "avería", "no funciona", "fuga", "gotea*",
+            "atascado", "moho", "calefacción", "caldera", "mantenimiento", "fontaner*", "inodoro", "lavabo",
+            "ducha", "ventana", "cerradura", "daño*",
+        ],
+        "rent": [
+            "alquiler", "pago*", "pagar", "pagado", "transferencia", "domiciliación", "vence", "vencimiento",
+            "atrasado", "deuda", "saldo",
+        ],
+        "invoice": ["factura*", "recibo*", "comprobante*"],
+        "lease": [
+            "contrato*", "arrendamiento", "renov*", "rescindir", "rescisión", "preaviso", "mudanza", "fianza",
+            "depósito",
+        ],
+        "contact": [
+            "contacto", "contactar", "propietario", "casero", "administrador", "gestor", "llamar", "llamada",
+            "agente", "humano",
+        ],
+        "greeting": ["hola", "buenos días", "buenas tardes", "buenas noches", "buenas", "ayuda", "menú"],
+    },
+}
+
+REPLIES: Dict[str, Dict[str, str]] = {
+    "en": {
+        "greeting": (
+            "👋 Hello! I'm your RentGuy assistant. I can help you with:\n\n"
+            "• Check rent payment status\n• Schedule maintenance requests\n• Access lease information\n"
+            "• View invoices and receipts\n• Contact property management\n\nHow can I assist you today?"
+        ),
+        "emergency": (
+            "🚨 If anyone is in danger or you smell gas, leave the building and call 112 now. For other urgent "
+            "repairs, please call your property manager directly."
+        ),
+        "maintenance": (
+            "I can help you schedule maintenance! Please describe what needs to be fixed and I'll create a "
+            "maintenance request for you."
+        ),
+        "maintenance_created": (
+            "Thank you! I've created maintenance request #{request_id}. Your property manager will contact you to "
+            "schedule the repair."
+        ),
+        "rent_clear": "Your rent payments are up to date! There are no open invoices on your account.",
+        "rent_open": "You have {count} open invoice(s) totalling {total}. The next one, {invoice_number}, is due on {due_date}.",
+        "rent_overdue": "You have {count} open invoice(s) totalling {total}. Invoice {invoice_number} was due on {due_date}.",
+        "invoice_none": "There are no invoices on your account yet.",
+        "invoice_paid": "Your latest invoice, {invoice_number} for {amount}, has been paid. Thank you!",
+        "invoice_open": "Your latest invoice, {invoice_number} for {amount}, is due on {due_date}.",
+        "lease_active": (
+            "Your lease for unit {unit_number} at {property_name} runs until {end_date}, at {rent} per month. "
+            "Would you like to discuss renewal?"
+        ),
+        "lease_none": "I couldn't find an active lease on your account. Your property manager can help with lease questions.",
+        "contact": "Your property manager is {name} ({email}). Would you like them to get in touch with you?",
+        "unknown_tenant": (
+            "I couldn't match this phone number to a tenancy. Please write from the number registered with your "
+            "landlord, or contact your property manager."
+        ),
+        "fallback": (
+            "I understand your request. Let me connect you with our property management team who can assist you "
+            "further. Is this urgent?"
+        ),
+    },
+    "de": {
+        "greeting": (
+            "👋 Hallo! Ich bin Ihr RentGuy-Assistent. Ich helfe Ihnen gerne bei:\n\n"
+            "• Status Ihrer Mietzahlungen\n• Reparaturanfragen\n• Informationen zu Ihrem Mietvertrag\n"
+            "• Rechnungen und Quittungen\n• Kontakt zur Hausverwaltung\n\nWie kann ich Ihnen helfen?"
+        ),
+        "emergency": (
+            "🚨 Wenn jemand in Gefahr ist oder es nach Gas riecht, verlassen Sie das Gebäude und rufen Sie sofort "
+            "112 an. Bei anderen dringenden Reparaturen rufen Sie bitte direkt Ihre Hausverwaltung an."
+        ),
+        "maintenance": (
+            "Ich helfe Ihnen gerne bei der Reparatur! Bitte beschreiben Sie, was kaputt ist, und ich erstelle "
+            "eine Reparaturanfrage für Sie."
+        ),
+        "maintenance_created": (
+            "Vielen Dank! Ich habe die Reparaturanfrage #{request_id} erstellt. Ihre Hausverwaltung meldet sich "
+            "für einen Termin bei Ihnen."
+        ),
+        "rent_clear": "Ihre Mietzahlungen sind auf dem neuesten Stand! Es gibt keine offenen Rechnungen.",
+        "rent_open": "Sie haben {count} offene Rechnung(en) über insgesamt {total}. Die nächste, {invoice_number}, ist am {due_date} fällig.",
+        "rent_overdue": "Sie haben {count} offene Rechnung(en) über insgesamt {total}. Rechnung {invoice_number} war am {due_date} fällig.",
+        "invoice_none": "Für Ihr Konto gibt es noch keine Rechnungen.",
+        "invoice_paid": "Ihre letzte Rechnung, {invoice_number} über {amount}, ist bezahlt. Vielen Dank!",
+        "invoice_open": "Ihre letzte Rechnung, {invoice_number} über {amount}, ist am {due_date} fällig.",
+        "lease_active": (
+            "Ihr Mietvertrag für Einheit {unit_number} in {property_name} läuft bis {end_date}, zu {rent} pro "
+            "Monat. Möchten Sie über eine Verlängerung sprechen?"
+        ),
+        "lease_none": "Ich konnte keinen aktiven Mietvertrag finden. Ihre Hausverwaltung hilft Ihnen gerne weiter.",
+        "contact": "Ihr Ansprechpartner ist {name} ({email}). Möchten Sie, dass man sich bei Ihnen meldet?",
+        "unknown_tenant": (
+            "Ich konnte diese Telefonnummer keinem Mietverhältnis zuordnen. Bitte schreiben Sie von der bei Ihrem "
+            "Vermieter hinterlegten Nummer oder wenden Sie sich an Ihre Hausverwaltung."
+        ),
+        "fallback": (
+            "Ich habe Ihre Anfrage verstanden. Ich verbinde Sie mit unserer Hausverwaltung, die Ihnen weiterhelfen "
+            "kann. Ist es dringend?"
+        ),
+    },
+    "fr": {
+        "greeting": (
+            "👋 Bonjour ! Je suis votre assistant RentGuy. Je peux vous aider à :\n\n"
+            "• Vérifier vos paiements de loyer\n• Demander une réparation\n• Consulter votre bail\n"
+            "• Voir vos factures et quittances\n• Contacter votre gestionnaire\n\nComment puis-je vous aider ?"
+        ),
+        "emergency": (
+            "🚨 Si quelqu'un est en danger ou si vous sentez une odeur de gaz, quittez le bâtiment et appelez "
+            "immédiatement le 112. Pour les autres réparations urgentes, appelez directement votre gestionnaire."
+        ),
+        "maintenance": (
+            "Je peux vous aider à organiser une réparation ! Décrivez ce qui doit être réparé et je créerai une "
+            "demande d'intervention pour vous."
+        ),
+        "maintenance_created": (
+            "Merci ! J'ai créé la demande d'intervention n°{request_id}. Votre gestionnaire vous contactera pour "
+            "planifier la réparation."
+        ),
+        "rent_clear": "Vos paiements de loyer sont à jour ! Vous n'avez aucune facture en attente.",
+        "rent_open": "Vous avez {count} facture(s) en attente pour un total de {total}. La prochaine, {invoice_number}, est due le {due_date}.",
+        "rent_overdue": "Vous avez {count} facture(s) en attente pour un total de {total}. La facture {invoice_number} était due le {due_date}.",
+        "invoice_none": "Votre compte n'a pas encore de factures.",
+        "invoice_paid": "Votre dernière facture, {invoice_number} de {amount}, a été payée. Merci !",
+        "invoice_open": "Votre dernière facture, {invoice_number} de {amount}, est due le {due_date}.",
+        "lease_active": (
+            "Votre bail pour le logement {unit_number} à {property_name} court jusqu'au {end_date}, pour {rent} "
+            "par mois. Souhaitez-vous parler d'un renouvellement ?"
+        ),
+        "lease_none": "Je n'ai pas trouvé de bail actif sur votre compte. Votre gestionnaire peut répondre à vos questions.",
+        "contact": "Votre gestionnaire est {name} ({email}). Souhaitez-vous être recontacté ?",
+        "unknown_tenant": (
+            "Je n'ai pas pu associer ce numéro à une location. Écrivez-nous depuis le numéro enregistré auprès de "
+            "votre propriétaire ou contactez votre gestionnaire."
+        ),
+        "fallback": (
+            "J'ai bien compris votre demande. Je vous mets en relation avec notre équipe de gestion, qui pourra "
+            "vous aider. Est-ce urgent ?"
+        ),
+    },
+    "es": {
+        "greeting": (
+            "👋 ¡Hola! Soy su asistente de RentGuy. Puedo ayudarle a:\n\n"
+            "• Consultar sus pagos de alquiler\n• Solicitar reparaciones\n• Consultar su contrato\n"
+            "• Ver facturas y recibos\n• Contactar con la administración\n\n¿En qué puedo ayudarle?"
+        ),
+        "emergency": (
+            "🚨 Si alguien está en peligro o huele a gas, salga del edificio y llame al 112 ahora mismo. Para otras "
+            "reparaciones urgentes, llame directamente a su administrador."
+        ),
+        "maintenance": (
+            "¡Puedo ayudarle a programar una reparación! Describa qué hay que arreglar y crearé una solicitud de "
+            "mantenimiento."
+        ),
+        "maintenance_created": (
+            "¡Gracias! He creado la solicitud de mantenimiento n.º {request_id}. Su administrador se pondrá en "
+            "contacto con usted para programar la reparación."
+        ),
+        "rent_clear": "¡Sus pagos de alquiler están al día! No tiene facturas pendientes.",
+        "rent_open": "Tiene {count} factura(s) pendiente(s) por un total de {total}. La próxima, {invoice_number}, vence el {due_date}.",
+        "rent_overdue": "Tiene {count} factura(s) pendiente(s) por un total de {total}. La factura {invoice_number} venció el {due_date}.",
+        "invoice_none": "Todavía no hay facturas en su cuenta.",
+        "invoice_paid": "Su última factura, {invoice_number} por {amount}, está pagada. ¡Gracias!",
+        "invoice_open": "Su última factura, {invoice_number} por {amount}, vence el {due_date}.",
+        "lease_active": (
+            "Su contrato de la unidad {unit_number} en {property_name} es válido hasta el {end_date}, por {rent} "
+            "al mes. ¿Desea hablar de una renovación?"
+        ),
+        "lease_none": "No encontré ningún contrato activo en su cuenta. Su administrador puede ayudarle.",
+        "contact": "Su administrador es {name} ({email}). ¿Quiere que se ponga en contacto con usted?",
+        "unknown_tenant": (
+            "No pude asociar este número a ningún alquiler. Escriba desde el número registrado con su propietario "
+            "o contacte con su administrador."
+        ),
+        "fallback": (
+            "He entendido su solicitud. Le pondré en contacto con nuestro equipo de administración, que podrá "
+            "ayudarle. ¿Es urgente?"
+        ),
+    },
+}
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def _trie_pattern(keywords: Dict[str, bool]) -> str:
+    """One regex alternation over ``keywords`` (keyword -> matches as prefix) with shared prefixes factored out."""
+    root: Dict[str, dict] = {}
+    for keyword, prefix in keywords.items():
+        node = root
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = prefix
+
+    def build(node: dict) -> str:
+        # Longer keywords are tried first; where one ends, a whole-word keyword needs a word boundary
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if "" in node:
+            branches.append("" if node[""] else r"\b")
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return r"\b" + build(root)
+
+
+class IntentClassifier:
+    """Keyword tables compiled into one regex; ``classify`` returns the winning intent and its locale."""
+
+    def __init__(
+        self, keywords: Dict[str, Dict[str, List[str]]] = KEYWORDS, priority: Tuple[str, ...] = PRIORITY
+    ):
+        entries: Dict[str, Tuple[str, bool, List[str]]] = {}
+        for locale, intents in keywords.items():
+            for intent, words in intents.items():
+                if intent not in priority:
+                    raise ValueError(f"Intent {intent!r} has no priority")
+                for word in words:
+                    prefix = word.endswith("*")
+                    word = " ".join(word.rstrip("*").lower().split())
+                    for variant in {word, _strip_accents(word)}:
+                        existing = entries.setdefault(variant, (intent, prefix, []))
+                        if existing[:2] != (intent, prefix):
+                            raise ValueError(f"Keyword {variant!r} is listed with different intents or matching")
+                        if locale not in existing[2]:
+                            existing[2].append(locale)
+        # keyword -> (rank, intent, locales)
+        self._lookup = {
+            keyword: (priority.index(intent), intent, tuple(locales))
+            for keyword, (intent, _, locales) in entries.items()
+        }
+        self._pattern = re.compile(_trie_pattern({keyword: prefix for keyword, (_, prefix, _) in entries.items()}))
+
+    def classify(self, text: str, locale: Optional[str] = None) -> Tuple[Optional[str], str]:
+        """Highest-priority intent in ``text`` (None if nothing matched) and the locale to reply in."""
+        best = None
+        for match in self._pattern.findall(text.lower()):
+            entry = self._lookup.get(match) or self._lookup[" ".join(match.split())]
+            if best is None or entry[0] < best[0]:
+                best = entry
+        if best is None:
+            return None, locale or DEFAULT_LOCALE
+        locales = best[2]
+        return best[1], locale if locale in locales else locales[0]
+
+
+classifier = IntentClassifier()
+
+
+@dataclass
+class Conversation:
+    """Per-sender state kept between messages; handlers change ``state`` and ``context`` in place."""
+    phone: str
+    phone_number_id: str = ""
+    state: Optional[str] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+    locale: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+
+@dataclass
+class IntentContext:
+    db: Session
+    text: str
+    locale: str
+    tenant_id: Optional[int] = None
+    conversation: Optional[Conversation] = None
+
+    def reply(self, key: str, **fields) -> str:
+        template = REPLIES.get(self.locale, {}).get(key) or REPLIES[DEFAULT_LOCALE][key]
+        return template.format(**fields)
+
+    def set_state(self, state: Optional[str], **context) -> None:
+        if self.conversation is not None:
+            self.conversation.state = state
+            self.conversation.context = context
+
+
+HANDLERS: Dict[str, Callable[[IntentContext], str]] = {}
+STATE_HANDLERS: Dict[str, Callable[[IntentContext], str]] = {}
+
+
+def handles(intent: str):
+    """Register the decorated function as the handler of ``intent``."""
+    def register(func: Callable[[IntentContext], str]) -> Callable[[IntentContext], str]:
+        HANDLERS[intent] = func
+        return func
+    return register
+
+
+def handles_state(state: str):
+    """Register the decorated function as the handler of the message after a handler set ``state``."""
+    def register(func: Callable[[IntentContext], str]) -> Callable[[IntentContext], str]:
+        STATE_HANDLERS[state] = func
+        return func
+    return register
+
+
+def _money(amount: float, currency: str) -> str:
+    return f"{currency} {amount:.2f}"
+
+
+def _static(key: str) -> Callable[[IntentContext], str]:
+    return lambda ctx: ctx.reply(key)
+
+
+for _intent in ("greeting", "emergency"):
+    handles(_intent)(_static(_intent))
+
+
+@handles("maintenance")
+def maintenance(ctx: IntentContext) -> str:
+    if ctx.tenant_id is None or ctx.conversation is None:
+        return ctx.reply("unknown_tenant")
+    ctx.set_state("maintenance_description")
+    return ctx.reply("maintenance")
+
+
+@handles_state("maintenance_description")
+def create_maintenance_request(ctx: IntentContext) -> str:
+    ctx.set_state(None)
+    row = (
+        ctx.db.query(Lease.unit_id, Property.owner_id, Tenant.first_name, Tenant.last_name)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .join(Tenant, Lease.tenant_id == Tenant.id)
+        .filter(Lease.tenant_id == ctx.tenant_id, Lease.status == LeaseStatus.ACTIVE.value)
+        .order_by(Lease.lease_start_date.desc())
+        .first()
+    )
+    if row is None:
+        return ctx.reply("lease_none")
+    unit_id, owner_id, first_name, last_name = row
+    text = ctx.text.strip()[:1800]
+    request = crud.maintenance_request.create_for_unit(
+        ctx.db,
+        obj_in=MaintenanceRequestCreate(
+            unit_id=unit_id,
+            title=(text.splitlines() or ["WhatsApp"])[0][:80] or "WhatsApp",
+            description=f"{text}\n\nReported via WhatsApp by {first_name} {last_name} (+{ctx.conversation.phone})",
+        ),
+        # Tenants have no user account; the request is filed on the owner's behalf
+        reported_by=owner_id,
+    )
+    return ctx.reply("maintenance_created", request_id=request.id)
+
+
+@handles("rent")
+def rent_status(ctx: IntentContext) -> str:
+    if ctx.tenant_id is None:
+        return ctx.reply("unknown_tenant")
+    open_invoices = (
+        ctx.db.query(Invoice.invoice_number, Invoice.total_amount, Invoice.currency_iso, Invoice.due_date)
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .filter(
+            Lease.tenant_id == ctx.tenant_id,
+            Invoice.status.in_([InvoiceStatus.PENDING.value, InvoiceStatus.OVERDUE.value]),
+        )
+        .order_by(Invoice.due_date, Invoice.id)
+        .all()
+    )
+    if not open_invoices:
+        return ctx.reply("rent_clear")
+    totals: Dict[str, float] = {}
+    for _, amount, currency, _ in open_invoices:
+        totals[currency] = totals.get(currency, 0.0) + amount
+    number, _, _, due_date = open_invoices[0]
+    return ctx.reply(
+        "rent_overdue" if due_date < date.today() else "rent_open",
+        count=len(open_invoices),
+        total=", ".join(_money(amount, currency) for currency, amount in sorted(totals.items())),
+        invoice_number=number,
+        due_date=due_date.isoformat(),
+    )
+
+
+@handles("invoice")
+def latest_invoice(ctx: IntentContext) -> str:
+    if ctx.tenant_id is None:
+        return ctx.reply("unknown_tenant")
+    invoice = (
+        ctx.db.query(Invoice)
+        .join(Lease, Invoice.lease_id == Lease.id)
+        .filter(Lease.tenant_id == ctx.tenant_id, Invoice.status != InvoiceStatus.CANCELLED.value)
+        .order_by(Invoice.issue_date.desc(), Invoice.id.desc())
+        .first()
+    )
+    if invoice is None:
+        return ctx.reply("invoice_none")
+    return ctx.reply(
+        "invoice_paid" if invoice.status == InvoiceStatus.PAID.value else "invoice_open",
+        invoice_number=invoice.invoice_number,
+        amount=_money(invoice.total_amount, invoice.currency_iso),
+        due_date=invoice.due_date.isoformat(),
+    )
+
+
+@handles("lease")
+def active_lease(ctx: IntentContext) -> str:
+    if ctx.tenant_id is None:
+        return ctx.reply("unknown_tenant")
+    row = (
+        ctx.db.query(Lease.lease_end_date, Lease.rent_amount, Lease.currency_iso, Unit.unit_number, Property.name)
+        .join(Unit, Lease.unit_id == Unit.id)
+        .join(Property, Unit.property_id == Property.id)
+        .filter(Lease.tenant_id == ctx.tenant_id, Lease.status == LeaseStatus.ACTIVE.value)
+        .order_by(Lease.lease_start_date.desc())
+        .first()
+    )
+    if row is None:
+        return ctx.reply("lease_none")
+    end_date, rent, currency, unit_number, property_name = row
+    return ctx.reply(
+        "lease_active",
+        unit_number=unit_number,
+        property_name=property_name,
+        end_date=end_date.isoformat(),
+        rent=_money(rent, currency),
+    )
+
+
+@handles("contact")
+def property_manager(ctx: IntentContext) -> str:
+    owner = None
+    if ctx.tenant_id is not None:
+        owner = ctx.db.query(User).join(Tenant, Tenant.owner_id == User.id).filter(Tenant.id == ctx.tenant_id).first()
+    if owner is None:
+        return ctx.reply("fallback")
+    return ctx.reply("contact", name=owner.full_name, email=owner.email)
+
+
+def respond(
+    db: Session,
+    text: str,
+    *,
+    tenant_id: Optional[int] = None,
+    locale: Optional[str] = None,
+    conversation: Optional[Conversation] = None,
+) -> str:
+    """
+    The bot's reply to ``text``, in the language it was written in. With a
+    ``conversation``, its state decides what the message means and is updated
+    for the next one.
+    """
+    if conversation is not None:
+        locale = locale or conversation.locale
+    intent, locale = classifier.classify(text, locale)
+    ctx = IntentContext(db=db, text=text, locale=locale, tenant_id=tenant_id, conversation=conversation)
+    if conversation is not None:
+        conversation.locale = locale
+        if conversation.state in STATE_HANDLERS and intent != "emergency":
+            return STATE_HANDLERS[conversation.state](ctx)
+    handler = HANDLERS.get(intent)
+    return handler(ctx) if handler else ctx.reply("fallback")
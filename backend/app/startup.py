@@ -7,6 +7,7 @@ from sqlalchemy import text
 from app import crud, models, schemas
 from app.core.config import settings
 from app.db.base import Base, engine, SessionLocal
+from app.models.lease import install_overlap_protection
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,6 +18,7 @@ def init_db() -> None:
     """
     logger.info("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    install_lease_overlap_protection()
     
     db = SessionLocal()
     try:
@@ -46,6 +48,19 @@ def init_db() -> None:
     finally:
         db.close()
 
+def install_lease_overlap_protection() -> None:
+    """
+    Tables created before the lease overlap protection existed do not get it
+    from create_all; add it to them.
+    """
+    try:
+        with engine.begin() as connection:
+            added = install_overlap_protection(connection)
+        if added:
+            logger.info(f"Installed {added} lease overlap constraints")
+    except Exception as e:
+        logger.error(f"Could not install lease overlap protection, existing leases may overlap: {e}")
+
 def check_db_connected() -> bool:
     """
     Check if the database is connected.
@@ -1,8 +1,11 @@
+import hashlib
+import hmac
+import json
 import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.main import app
 from app.db.base import get_db
@@ -21,6 +24,19 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 # Import all models to ensure they're registered with the Base metadata
 from app.models import *  # This imports all models
 
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="Also run the timing and throughput benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Wall-clock budgets depend on the machine, so they are opt-in
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark; run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
 # Override the get_db dependency
 def override_get_db():
     db = TestingSessionLocal()
@@ -40,10 +56,34 @@ def test_db():
         yield db
     finally:
         db.close()
+        # Cached invoice number blocks belong to the database being dropped
+        from app.services.invoice_numbers import allocator
+        allocator.reset()
+        # So are cached WhatsApp accounts, tenant matches, conversations and categorizers
+        from app.services import categorization, whatsapp_accounts, whatsapp_archive, whatsapp_conversations
+        categorization.invalidate()
+        whatsapp_accounts.registry.invalidate()
+        whatsapp_archive.archive.clear()
+        whatsapp_conversations.clear_caches()
         # Clean up after each test - drop and recreate tables
         Base.metadata.drop_all(bind=engine)
         Base.metadata.create_all(bind=engine)
 
+@pytest.fixture(scope="function")
+def shared_session(test_db):
+    # The in-memory database exists per connection; share one with worker threads
+    connection = test_db.get_bind().connect()
+    sessions = []
+
+    def factory():
+        sessions.append(Session(bind=connection))
+        return sessions[-1]
+
+    yield factory
+    for session in sessions:
+        session.close()
+    connection.close()
+
 @pytest.fixture(scope="function")
 def client():
     with TestClient(app) as c:
@@ -80,4 +120,102 @@ def auth_client(client, test_db):
     headers = {"Authorization": f"Bearer {token}"}
     client.headers.update(headers)
     
-    yield client
\ No newline at end of file
+    yield client
+
+@pytest.fixture(scope="function")
+def test_owner(test_db):
+    from app.models.user import User
+
+    owner = User(email="owner@example.com", hashed_password="not-used", first_name="Olivia", last_name="Owner")
+    test_db.add(owner)
+    test_db.commit()
+    test_db.refresh(owner)
+    return owner
+
+
+@pytest.fixture(scope="function")
+def test_property(test_db, test_owner):
+    from app.models.property import Property
+
+    property_obj = Property(
+        name="Canal House",
+        address_line1="Keizersgracht 1",
+        city="Amsterdam",
+        postal_code="1015CJ",
+        country_iso="NL",
+        default_vat_rate=21.0,
+        owner_id=test_owner.id,
+    )
+    test_db.add(property_obj)
+    test_db.commit()
+    test_db.refresh(property_obj)
+    return property_obj
+
+
+@pytest.fixture(scope="function")
+def test_unit(test_db, test_property):
+    from app.models.unit import Unit
+
+    unit_obj = Unit(property_id=test_property.id, unit_number="1A", current_rent=1200.0)
+    test_db.add(unit_obj)
+    test_db.commit()
+    test_db.refresh(unit_obj)
+    return unit_obj
+
+
+@pytest.fixture(scope="function")
+def test_tenant(test_db, test_owner):
+    from app.models.tenant import Tenant
+
+    tenant_obj = Tenant(
+        first_name="Tom",
+        last_name="Tenant",
+        email="tenant@example.com",
+        phone_number="+31612345678",
+        owner_id=test_owner.id,
+    )
+    test_db.add(tenant_obj)
+    test_db.commit()
+    test_db.refresh(tenant_obj)
+    return tenant_obj
+
+
+@pytest.fixture(scope="function")
+def test_whatsapp_account(test_db, test_owner):
+    from app.models.whatsapp_config import WhatsAppConfig
+
+    config = WhatsAppConfig(
+        user_id=test_owner.id,
+        phone_number_id="1",
+        business_phone_number="31201234567",
+        access_token="token",
+        verify_token="verify",
+        app_secret="secret",
+    )
+    test_db.add(config)
+    test_db.commit()
+    test_db.refresh(config)
+    return config
+
+
+@pytest.fixture
+def webhook_payload():
+    """Builds a WhatsApp webhook body with one incoming text message and any status updates."""
+    def build(message_id="wamid.1", text="my sink is broken", statuses=(), phone_number_id="1"):
+        value = {
+            "metadata": {"display_phone_number": "31201234567", "phone_number_id": phone_number_id},
+            "messages": [{"id": message_id, "from": "31612345678", "type": "text", "text": {"body": text}}] if message_id else [],
+            "statuses": [{"id": id, "status": status} for id, status in statuses],
+        }
+        return json.dumps({"entry": [{"changes": [{"field": "messages", "value": value}]}]}).encode()
+
+    return build
+
+
+@pytest.fixture
+def sign_webhook():
+    """Signs a webhook body the way Meta does, with an account's app secret."""
+    def sign(body: bytes, secret: str = "secret") -> str:
+        return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+    return sign
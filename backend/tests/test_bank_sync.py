@@ -0,0 +1,159 @@
+"""Tests for the incremental bank transaction sync."""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.models.bank_connection import BankConnectionStatus
+from app.models.transaction import TransactionStatus, TransactionType
+from app.services.bank_providers import FakeBankProvider, ProviderTransaction
+from app.services.bank_sync import BankSync
+
+NOW = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def engine_session(shared_session):
+    # Parallel accounts write from several threads, but the shared connection takes one at a time
+    lock = threading.Lock()
+
+    def factory():
+        lock.acquire()
+        db = shared_session()
+        close = db.close
+
+        def close_and_release():
+            db.close = close
+            close()
+            lock.release()
+
+        db.close = close_and_release
+        return db
+
+    return factory
+
+
+def _connect(db: Session, owner, connection_id: str = "conn1") -> models.BankConnection:
+    connection = models.BankConnection(
+        id=connection_id, user_id=str(owner.id), institution_id="fake", institution_name="Fake Bank",
+        status=BankConnectionStatus.CONNECTED.value,
+    )
+    db.add(connection)
+    db.commit()
+    return connection
+
+
+class TestBankSync:
+    """Test incremental fetching, idempotent upserts and bounded parallelism."""
+
+    def test_first_sync_fetches_recent_history_and_balances(self, shared_session, engine_session, test_owner):
+        """Test that a new connection gets the initial window, accounts, balances and raw payloads."""
+        db = shared_session()
+        _connect(db, test_owner)
+        provider = FakeBankProvider(transactions_per_account=200, start=NOW - timedelta(days=200), days=200)
+        engine = BankSync(provider, session_factory=engine_session)
+
+        result = asyncio.run(engine.sync_connection("conn1", now=NOW))
+
+        cutoff = NOW - timedelta(days=settings.BANK_SYNC_INITIAL_DAYS)
+        expected = sum(tx.booking_date >= cutoff for a in provider.account_ids("conn1") for tx in provider.history(a))
+        assert result == {"connection_id": "conn1", "accounts": 2, "transactions": expected}
+        assert db.query(models.Transaction).count() == expected == db.query(models.TransactionRawData).count()
+        assert db.query(models.Transaction).filter(models.Transaction.booking_date < cutoff).count() == 0
+
+        account = db.query(models.BankAccount).filter_by(account_id="conn1-acc0").one()
+        assert Decimal(account.current_balance) == sum(tx.amount for tx in provider.history("conn1-acc0"))
+        tx = db.query(models.Transaction).filter_by(bank_transaction_id="conn1-acc0-tx00000196").one()
+        assert (tx.bank_account_id, tx.user_id, tx.type) == (account.id, str(test_owner.id), TransactionType.INCOME)
+        connection = db.get(models.BankConnection, "conn1")
+        assert (connection.status, connection.last_synced_at) == (BankConnectionStatus.CONNECTED.value, NOW)
+
+    def test_resync_fetches_incrementally_and_only_writes_changes(self, shared_session, engine_session, test_owner):
+        """Test the overlap window, settled pending transactions and preserved categories."""
+        db = shared_session()
+        _connect(db, test_owner)
+        provider = FakeBankProvider(accounts_per_connection=1, transactions_per_account=50, start=NOW - timedelta(days=50), days=50)
+        engine = BankSync(provider, session_factory=engine_session)
+        asyncio.run(engine.sync_connection("conn1", now=NOW))
+
+        history = provider.history("conn1-acc0")
+        history[-1].pending = True
+        history.append(ProviderTransaction(
+            transaction_id="conn1-acc0-new", amount=Decimal("-42.50"), currency="EUR",
+            booking_date=NOW + timedelta(hours=1), value_date=NOW + timedelta(hours=1), description="Plumber",
+        ))
+        db.query(models.Transaction).filter_by(bank_transaction_id=history[-2].transaction_id).update({"category": "rent"})
+        db.commit()
+        provider.requests.clear()
+
+        later = NOW + timedelta(days=1)
+        assert asyncio.run(engine.sync_connection("conn1", now=later))["transactions"] == 2
+        since = {r["since"] for r in provider.requests if r["call"] == "transactions"}
+        assert since == {NOW - timedelta(days=settings.BANK_SYNC_OVERLAP_DAYS)}
+
+        db.expire_all()
+        changed = db.query(models.Transaction).filter_by(bank_transaction_id=history[-2].transaction_id).one()
+        assert (changed.status, changed.category) == (TransactionStatus.PENDING, "rent")
+        assert db.query(models.Transaction).count() == 51
+        assert asyncio.run(engine.sync_connection("conn1", now=later + timedelta(days=1)))["transactions"] == 0
+
+    def test_accounts_are_fetched_in_parallel_within_the_limit(
+        self, shared_session, engine_session, test_owner, monkeypatch
+    ):
+        """Test that accounts of all connections share the concurrency limit."""
+        monkeypatch.setattr(settings, "BANK_SYNC_CONCURRENCY", 3)
+        monkeypatch.setattr(settings, "BANK_SYNC_PAGE_SIZE", 10)
+        db = shared_session()
+        for i in range(3):
+            _connect(db, test_owner, f"conn{i}")
+        provider = FakeBankProvider(
+            accounts_per_connection=4, transactions_per_account=30, start=datetime.utcnow() - timedelta(days=30),
+            days=30, latency_seconds=0.005,
+        )
+
+        summary = asyncio.run(BankSync(provider, session_factory=engine_session).sync_all())
+
+        assert summary == {"connections": 3, "failed": 0, "transactions": 360}
+        assert provider.max_in_flight == 3
+
+    def test_failed_sync_keeps_the_window_and_others_continue(self, shared_session, engine_session, test_owner):
+        """Test that a failing account marks only its connection and is retried from the same point."""
+        db = shared_session()
+        _connect(db, test_owner, "good")
+        _connect(db, test_owner, "bad")
+
+        class FlakyProvider(FakeBankProvider):
+            async def transactions(self, target, account_id, **kwargs):
+                if account_id == "bad-acc1":
+                    raise RuntimeError("consent expired")
+                return await super().transactions(target, account_id, **kwargs)
+
+        provider = FlakyProvider(start=datetime.utcnow() - timedelta(days=30), days=30)
+        summary = asyncio.run(BankSync(provider, session_factory=engine_session).sync_all())
+
+        assert summary["failed"] == 1
+        bad, good = db.get(models.BankConnection, "bad"), db.get(models.BankConnection, "good")
+        assert (bad.status, bad.last_synced_at) == (BankConnectionStatus.ERROR.value, None)
+        assert good.status == BankConnectionStatus.CONNECTED.value and good.last_synced_at is not None
+
+    @pytest.mark.benchmark
+    def test_syncs_over_a_million_transactions_per_hour(self, shared_session, engine_session, test_owner):
+        """Test end-to-end throughput against the in-memory provider."""
+        db = shared_session()
+        _connect(db, test_owner)
+        provider = FakeBankProvider(transactions_per_account=10_000, start=NOW - timedelta(days=80), days=80)
+        engine = BankSync(provider, session_factory=engine_session)
+
+        started = time.perf_counter()
+        written = asyncio.run(engine.sync_connection("conn1", now=NOW))["transactions"]
+        elapsed = time.perf_counter() - started
+
+        assert written == 20_000
+        assert written / elapsed * 3600 > 1_000_000
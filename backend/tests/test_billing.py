@@ -0,0 +1,165 @@
+"""Tests for batch monthly billing runs."""
+
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import models
+from app.api import deps
+from app.db.base import get_db
+from app.db.base_class import Base
+from app.main import app
+from app.models.invoice import InvoiceStatus
+from app.models.lease import LeaseStatus
+from app.services import billing as billing_service
+from app.services.invoice_numbers import allocator
+
+
+@pytest.fixture
+def active_leases(test_db: Session, test_property, test_tenant):
+    leases = []
+    for i in range(25):
+        unit = models.Unit(property_id=test_property.id, unit_number=f"U{i}")
+        test_db.add(unit)
+        test_db.flush()
+        lease = models.Lease(
+            unit_id=unit.id, tenant_id=test_tenant.id, rent_amount=1000.0 + i,
+            vat_rate=21.0 if i % 2 else 0.0, status=LeaseStatus.ACTIVE,
+            lease_start_date=date(2030, 1, 1), lease_end_date=date(2030, 12, 31),
+        )
+        test_db.add(lease)
+        leases.append(lease)
+    test_db.commit()
+    return leases
+
+
+class TestBillingRun:
+    """Test billing run generation, idempotency and resume."""
+
+    def test_preview_does_not_write(self, test_db: Session, test_owner, active_leases):
+        """Test that a dry run reports totals without creating invoices."""
+        preview = billing_service.preview_billing_run(db=test_db, period=date(2030, 3, 15), owner_id=test_owner.id)
+
+        assert preview["period"] == date(2030, 3, 1)
+        assert preview["invoice_count"] == 25
+        assert preview["totals"][0]["currency_iso"] == "EUR"
+        assert test_db.query(models.Invoice).count() == 0
+
+    def test_run_creates_invoices_and_vat_entries(self, test_db: Session, test_owner, active_leases):
+        """Test that every active lease gets one invoice and taxed ones a VAT entry."""
+        run = billing_service.execute_billing_run(
+            db=test_db, period=date(2030, 3, 1), owner_id=test_owner.id, batch_size=10
+        )
+
+        assert run.status == models.BillingRunStatus.COMPLETED
+        assert run.invoices_created == 25
+        invoices = test_db.query(models.Invoice).all()
+        assert len(invoices) == 25
+        assert all(inv.billing_period == date(2030, 3, 1) for inv in invoices)
+        assert test_db.query(models.VATEntry).count() == 12
+        entry = test_db.query(models.VATEntry).first()
+        assert entry.country_iso == "NL"
+
+    def test_run_is_idempotent(self, test_db: Session, test_owner, active_leases):
+        """Test that repeating a run for the same period creates nothing new."""
+        billing_service.execute_billing_run(db=test_db, period=date(2030, 3, 1), owner_id=test_owner.id)
+        rerun = billing_service.execute_billing_run(db=test_db, period=date(2030, 3, 1), owner_id=test_owner.id)
+
+        assert rerun.invoices_created == 0
+        assert test_db.query(models.Invoice).count() == 25
+
+    def test_interrupted_run_resumes(self, test_db: Session, test_owner, active_leases):
+        """Test that an unfinished run continues after its cursor."""
+        crashed = models.BillingRun(
+            owner_id=test_owner.id, period=date(2030, 3, 1),
+            status=models.BillingRunStatus.FAILED, last_lease_id=active_leases[9].id,
+        )
+        test_db.add(crashed)
+        test_db.commit()
+
+        run = billing_service.execute_billing_run(db=test_db, period=date(2030, 3, 1), owner_id=test_owner.id)
+
+        assert run.id == crashed.id
+        assert run.invoices_created == 15
+        assert run.status == models.BillingRunStatus.COMPLETED
+
+    def test_leases_outside_period_not_billed(self, test_db: Session, test_owner, active_leases):
+        """Test that leases not running in the period are skipped."""
+        run = billing_service.execute_billing_run(db=test_db, period=date(2031, 1, 1), owner_id=test_owner.id)
+        assert run.invoices_created == 0
+
+    def test_leases_invoiced_by_hand_not_billed_again(self, test_db: Session, test_owner, active_leases):
+        """Test that an invoice created one by one in the month counts, unless it was cancelled."""
+        for lease, status in [(active_leases[0], InvoiceStatus.PENDING), (active_leases[1], InvoiceStatus.CANCELLED)]:
+            test_db.add(models.Invoice(
+                lease_id=lease.id, invoice_number=f"MAN-{lease.id}", issue_date=date(2030, 3, 20),
+                due_date=date(2030, 4, 3), amount=lease.rent_amount, total_amount=lease.rent_amount, status=status,
+            ))
+        test_db.commit()
+
+        run = billing_service.execute_billing_run(db=test_db, period=date(2030, 3, 1), owner_id=test_owner.id)
+
+        assert run.invoices_created == 24
+        assert test_db.query(models.Invoice).filter(models.Invoice.lease_id == active_leases[0].id).count() == 1
+
+
+class TestBillingRunAPI:
+    """Test queueing a billing run over the API."""
+
+    @pytest.fixture
+    def api_client(self, tmp_path, monkeypatch):
+        # The queued run and the invoice number allocator open sessions of their own, so use a file database
+        engine = create_engine(f"sqlite:///{tmp_path / 'billing.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        monkeypatch.setattr(billing_service, "SessionLocal", SessionFactory)
+        with SessionFactory() as db:
+            owner = models.User(email="owner@example.com", hashed_password="not-used")
+            db.add(owner)
+            db.flush()
+            house = models.Property(
+                name="House", address_line1="Street 1", city="Amsterdam", postal_code="1015CJ", country_iso="NL",
+                owner_id=owner.id,
+            )
+            tenant = models.Tenant(first_name="Tom", last_name="Tenant", email="tenant@example.com", owner_id=owner.id)
+            db.add_all([house, tenant])
+            db.flush()
+            for i in range(5):
+                unit = models.Unit(property_id=house.id, unit_number=f"U{i}")
+                db.add(unit)
+                db.flush()
+                db.add(models.Lease(
+                    unit_id=unit.id, tenant_id=tenant.id, rent_amount=1000.0, status=LeaseStatus.ACTIVE,
+                    lease_start_date=date(2030, 1, 1), lease_end_date=date(2030, 12, 31),
+                ))
+            db.commit()
+            owner_id = owner.id
+
+        db = SessionFactory()
+        previous = dict(app.dependency_overrides)
+        app.dependency_overrides.update({get_db: lambda: db, deps.get_current_user: lambda: db.get(models.User, owner_id)})
+        try:
+            yield TestClient(app), SessionFactory
+        finally:
+            app.dependency_overrides.clear()
+            app.dependency_overrides.update(previous)
+            db.close()
+            allocator.reset()
+            engine.dispose()
+
+    def test_run_is_queued_and_polled(self, api_client):
+        """Test that the request only records the run, which completes after the response."""
+        client, SessionFactory = api_client
+        response = client.post("/api/v1/invoices/billing-runs", json={"period": "2030-03-15"})
+
+        assert response.status_code == 202
+        queued = response.json()
+        assert queued["status"] == "running" and queued["invoices_created"] == 0
+        run = client.get(f"/api/v1/invoices/billing-runs/{queued['id']}").json()
+        assert run["status"] == "completed" and run["invoices_created"] == 5
+        with SessionFactory() as db:
+            assert db.query(models.Invoice).count() == 5
+        assert client.get("/api/v1/invoices/billing-runs/9999").status_code == 404
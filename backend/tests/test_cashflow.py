@@ -0,0 +1,215 @@
+"""Tests for the cash-flow report per property and month."""
+
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import models
+from app.api import deps
+from app.db.base import get_db
+from app.main import app
+from app.models.invoice import InvoiceStatus
+from app.models.lease import LeaseStatus
+from app.models.transaction import TransactionStatus, TransactionType
+from app.services import cashflow as cashflow_service
+
+
+def _lease(db: Session, unit, tenant) -> models.Lease:
+    lease = models.Lease(
+        unit_id=unit.id, tenant_id=tenant.id, rent_amount=1000.0,
+        lease_start_date=date(2023, 1, 1), lease_end_date=date(2030, 12, 31), status=LeaseStatus.ACTIVE,
+    )
+    db.add(lease)
+    db.commit()
+    return lease
+
+
+def _invoice_row(lease_id, period: date, amount=1000.0, status=InvoiceStatus.PENDING, paid_at=None):
+    return {
+        "lease_id": lease_id, "invoice_number": f"INV-{uuid.uuid4().hex[:12]}", "issue_date": period,
+        "due_date": period + timedelta(days=14), "billing_period": period, "amount": amount,
+        "vat_amount": 0.0, "total_amount": amount, "status": status.value, "paid_at": paid_at,
+    }
+
+
+def _transaction_row(owner, amount, booked: datetime, property_id=None, status=TransactionStatus.COMPLETED):
+    return {
+        "id": str(uuid.uuid4()), "user_id": str(owner.id), "amount": amount, "currency": "EUR",
+        "type": TransactionType.INCOME if amount > 0 else TransactionType.EXPENSE, "status": status,
+        "booking_date": booked, "value_date": booked, "property_id": property_id,
+    }
+
+
+def _insert(db: Session, model, rows):
+    db.execute(model.__table__.insert(), rows)
+    db.commit()
+
+
+@pytest.fixture
+def portfolio(test_db: Session, test_owner, test_property, test_unit, test_tenant):
+    lease = _lease(test_db, test_unit, test_tenant)
+    empty = models.Property(
+        name="Empty", address_line1="Street 2", city="Utrecht", postal_code="3511AA", country_iso="NL", owner_id=test_owner.id,
+    )
+    test_db.add(empty)
+    test_db.commit()
+    _insert(test_db, models.Invoice, [
+        _invoice_row(lease.id, date(2024, 1, 1), status=InvoiceStatus.PAID, paid_at=datetime(2024, 1, 5)),
+        # Paid a month late
+        _invoice_row(lease.id, date(2024, 2, 1), status=InvoiceStatus.PAID, paid_at=datetime(2024, 3, 2)),
+        _invoice_row(lease.id, date(2024, 3, 1)),
+        {**_invoice_row(lease.id, date(2024, 3, 1), amount=500.0, status=InvoiceStatus.CANCELLED), "billing_period": None},
+    ])
+    _insert(test_db, models.Transaction, [
+        _transaction_row(test_owner, -200.0, datetime(2024, 1, 10), property_id=test_property.id),
+        _transaction_row(test_owner, -50.0, datetime(2024, 3, 31, 23, 0)),
+        _transaction_row(test_owner, -75.0, datetime(2024, 3, 12), status=TransactionStatus.PENDING),
+        # The rent itself arrives as income and is counted from the invoice
+        _transaction_row(test_owner, 1000.0, datetime(2024, 1, 5)),
+        _transaction_row(test_owner, -300.0, datetime(2023, 12, 31), property_id=test_property.id),
+    ])
+    return test_property, empty
+
+
+class TestCashflow:
+    """Test the monthly series and their cache."""
+
+    def test_series_per_property_and_month(self, test_db: Session, test_owner, portfolio):
+        """Test invoiced, collected, expense and NOI series, including unallocated expenses."""
+        house, empty = portfolio
+
+        report = cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=3, end=date(2024, 3, 15))
+
+        assert report["months"] == [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)]
+        assert report["invoiced"] == [1000.0, 1000.0, 1000.0]
+        assert report["collected"] == [1000.0, 0.0, 1000.0]
+        assert report["expenses"] == [200.0, 0.0, 50.0]
+        assert report["noi"] == [800.0, 0.0, 950.0]
+        by_property = {line["property_id"]: line for line in report["by_property"]}
+        assert list(by_property) == [house.id, empty.id, None]
+        assert by_property[house.id]["noi"] == [800.0, 0.0, 1000.0]
+        assert by_property[empty.id]["invoiced"] == [0.0, 0.0, 0.0]
+        assert by_property[None]["expenses"] == [0.0, 0.0, 50.0]
+
+    def test_cached_until_the_data_changes(self, test_db: Session, test_owner, portfolio):
+        """Test that an unchanged portfolio is served from the cache and a change is seen at once."""
+        house, _ = portfolio
+        first = cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=3, end=date(2024, 3, 1))
+        assert cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=3, end=date(2024, 3, 1)) is first
+
+        expense = test_db.query(models.Transaction).filter(models.Transaction.property_id.is_(None)).first()
+        expense.property_id = house.id
+        test_db.commit()
+
+        second = cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=3, end=date(2024, 3, 1))
+        assert second is not first
+        assert [line["property_id"] for line in second["by_property"]] == [house.id, portfolio[1].id]
+
+    def test_property_without_units_is_seen_at_once(self, test_db: Session, test_owner, portfolio):
+        """Test that adding and deleting a property without units changes the cached report."""
+        first = cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=3, end=date(2024, 3, 1))
+        garage = models.Property(
+            name="Garage", address_line1="Street 3", city="Utrecht", postal_code="3511AB", country_iso="NL",
+            owner_id=test_owner.id,
+        )
+        test_db.add(garage)
+        test_db.commit()
+
+        second = cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=3, end=date(2024, 3, 1))
+        assert garage.id in [line["property_id"] for line in second["by_property"]]
+
+        test_db.delete(garage)
+        test_db.commit()
+        third = cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=3, end=date(2024, 3, 1))
+        assert [line["property_id"] for line in third["by_property"]] == [
+            line["property_id"] for line in first["by_property"]
+        ]
+
+    @pytest.mark.benchmark
+    def test_large_owner(self, test_db: Session, test_owner, test_tenant):
+        """Test a 24-month series over hundreds of units and tens of thousands of transactions."""
+        properties = [
+            models.Property(
+                name=f"Building {i}", address_line1=f"Street {i}", city="Amsterdam", postal_code="1000AA", country_iso="NL",
+                owner_id=test_owner.id,
+            )
+            for i in range(20)
+        ]
+        test_db.add_all(properties)
+        test_db.commit()
+        units = [models.Unit(property_id=p.id, unit_number=str(n), current_rent=1000.0) for p in properties for n in range(15)]
+        test_db.add_all(units)
+        test_db.commit()
+        leases = [
+            models.Lease(
+                unit_id=unit.id, tenant_id=test_tenant.id, rent_amount=1000.0, lease_start_date=date(2023, 1, 1),
+                lease_end_date=date(2030, 12, 31), status=LeaseStatus.ACTIVE,
+            )
+            for unit in units
+        ]
+        test_db.add_all(leases)
+        test_db.commit()
+        months = [date(2023 + m // 12, m % 12 + 1, 1) for m in range(24)]
+        _insert(test_db, models.Invoice, [
+            _invoice_row(lease.id, month, status=InvoiceStatus.PAID, paid_at=datetime.combine(month, datetime.min.time()))
+            for lease in leases for month in months
+        ])
+        _insert(test_db, models.Transaction, [
+            _transaction_row(
+                test_owner, -10.0, datetime(2023, 1, 1) + timedelta(hours=i % (24 * 720)),
+                property_id=properties[i % 21].id if i % 21 < 20 else None,
+            )
+            for i in range(40_000)
+        ])
+
+        started = time.perf_counter()
+        report = cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=24, end=date(2024, 12, 1))
+        computed = time.perf_counter() - started
+        started = time.perf_counter()
+        cashflow_service.cashflow(test_db, owner_id=test_owner.id, months=24, end=date(2024, 12, 1))
+        cached = time.perf_counter() - started
+
+        assert report["collected"] == [300_000.0] * 24 and len(report["by_property"]) == 21
+        assert round(sum(report["expenses"]), 2) == 400_000.0
+        assert computed < 1.0 and cached < 0.2
+
+
+class TestCashflowAPI:
+    """Test the report endpoint and allocating expenses to properties."""
+
+    @pytest.fixture
+    def api_client(self, test_db: Session, test_owner):
+        # The in-memory database exists per connection; share this thread's with the app's thread
+        connection = test_db.get_bind().connect()
+        db = Session(bind=connection)
+        previous = dict(app.dependency_overrides)
+        owner_id = test_owner.id
+        app.dependency_overrides.update({get_db: lambda: db, deps.get_current_user: lambda: db.get(models.User, owner_id)})
+        try:
+            yield TestClient(app)
+        finally:
+            app.dependency_overrides.clear()
+            app.dependency_overrides.update(previous)
+            db.close()
+            connection.close()
+
+    def test_allocating_an_expense_moves_it_in_the_report(self, api_client, test_db: Session, portfolio):
+        """Test the allocation endpoint, its ownership check and the report it changes."""
+        house, _ = portfolio
+        expense_id = test_db.query(models.Transaction.id).filter(models.Transaction.amount == -50).scalar()
+        params = {"months": 3, "end": "2024-03-01"}
+        before = api_client.get("/api/v1/reports/cashflow", params=params).json()
+        assert before["by_property"][-1]["property_id"] is None
+
+        response = api_client.put(f"/api/v1/transactions/{expense_id}/property", json={"property_id": house.id})
+        assert response.status_code == 200 and response.json()["property_id"] == house.id
+        foreign = api_client.put(f"/api/v1/transactions/{expense_id}/property", json={"property_id": 9999})
+        assert foreign.status_code == 404
+
+        after = api_client.get("/api/v1/reports/cashflow", params=params).json()
+        assert [line["property_id"] for line in after["by_property"]] == [house.id, portfolio[1].id]
+        assert after["by_property"][0]["expenses"] == [200.0, 0.0, 50.0]
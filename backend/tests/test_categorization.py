@@ -0,0 +1,195 @@
+"""Tests for rule-based and learned transaction categorization."""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.models.bank_connection import BankConnectionStatus
+from app.models.transaction import CategorySource, TransactionType
+from app.services import categorization
+from app.services.bank_providers import FakeBankProvider
+from app.services.bank_sync import BankSync
+from app.services.categorization import Batch, RuleSet
+
+NOW = datetime(2025, 1, 1)
+
+
+def _rule(rule_id, category, priority=100, **conditions):
+    return models.CategoryRule(id=rule_id, owner_id=1, priority=priority, category=category, **conditions)
+
+
+def _batch(*rows):
+    return Batch.from_rows([
+        {"amount": amount, "description": description, "counterparty": counterparty}
+        for amount, description, counterparty in rows
+    ])
+
+
+def _add_transactions(db: Session, owner, rows):
+    db.execute(models.Transaction.__table__.insert(), [
+        {
+            "id": str(uuid.uuid4()), "user_id": str(owner.id), "amount": amount, "description": description,
+            "counterparty": counterparty, "type": TransactionType.INCOME if amount > 0 else TransactionType.EXPENSE,
+            "booking_date": NOW - timedelta(minutes=i), "value_date": NOW - timedelta(minutes=i),
+            "category": None, "category_source": None, **values,
+        }
+        for i, (amount, description, counterparty, values) in enumerate(rows)
+    ])
+    db.commit()
+
+
+class TestRuleSet:
+    """Test matching a batch against all of an owner's rules at once."""
+
+    def test_first_matching_rule_by_priority_wins(self):
+        """Test pattern, amount, type and counterparty conditions and their priority."""
+        rules = RuleSet([
+            _rule(1, "utilities", priority=20, pattern="Energy"),
+            _rule(2, "large repairs", priority=10, pattern="plumb", min_amount=Decimal("500")),
+            _rule(3, "repairs", priority=30, pattern="plumb"),
+            _rule(4, "rent", priority=40, transaction_type=TransactionType.INCOME, counterparty="Tenant 1"),
+        ])
+        batch = _batch(
+            (-80.0, "ENERGY bill march", "Eneco"),
+            (-900.0, "Plumbing emergency", "Jansen"),
+            (-90.0, "plumbing", "Jansen"),
+            (1200.0, "Rent", "tenant 1"),
+            (-1200.0, "Rent", "Tenant 1"),
+            (15.0, "Refund", "Shop"),
+        )
+
+        matched = rules.match(batch)
+
+        assert [rules.labels[i][0] if i >= 0 else None for i in matched] == [
+            "utilities", "large repairs", "repairs", "rent", None, None,
+        ]
+
+    def test_overlapping_patterns_are_all_found_in_one_scan(self):
+        """Test that patterns inside or overlapping a longer one still match."""
+        rules = RuleSet([
+            _rule(1, "water", priority=1, pattern="water"),
+            _rule(2, "waterproofing", priority=2, pattern="waterproof"),
+            _rule(3, "roof", priority=3, pattern="roof"),
+            _rule(4, "proof", priority=4, pattern="proofing"),
+        ])
+        batch = _batch((-10.0, "waterproofing kit", None), (-10.0, "roof tiles", None), (-10.0, "proofing", None))
+
+        # Columns are the patterns longest first: waterproof, proofing, water, roof
+        hits = rules._pattern_hits(batch.texts)
+
+        assert hits.tolist() == [[True, True, True, True], [False, False, False, True], [False, True, False, True]]
+        assert rules.match(batch).tolist() == [0, 2, 2]
+
+
+class TestCategorizer:
+    """Test the classifier and how categories are written."""
+
+    def test_classifier_learns_from_manual_categories(self, test_db: Session, test_owner, monkeypatch):
+        """Test confident predictions, and that unsure ones are left uncategorized."""
+        monkeypatch.setattr(settings, "CATEGORIZATION_MIN_CONFIDENCE", 0.9)
+        manual = {"category_source": CategorySource.MANUAL.value}
+        _add_transactions(test_db, test_owner, [
+            (-60.0 - i, f"Eneco energie termijn {i}", "Eneco", {**manual, "category": "utilities"}) for i in range(15)
+        ] + [
+            (-300.0 - i, f"Loodgieter reparatie lekkage {i}", "Jansen", {**manual, "category": "maintenance"})
+            for i in range(15)
+        ])
+
+        categorizer = categorization.get_categorizer(test_db, owner_id=test_owner.id)
+        results = categorizer.categorize(_batch(
+            (-70.0, "Eneco energie termijn april", "Eneco"),
+            (-250.0, "reparatie lekkage badkamer", "Jansen"),
+            (-1000.0, "something else entirely", "Unknown"),
+        ))
+
+        assert results[:2] == [
+            ("utilities", None, CategorySource.MODEL.value), ("maintenance", None, CategorySource.MODEL.value),
+        ]
+        assert results[2] is None
+
+    def test_too_few_confirmed_categories_give_no_classifier(self, test_db: Session, test_owner):
+        """Test that the model needs enough examples of more than one category."""
+        _add_transactions(test_db, test_owner, [
+            (-60.0, "Eneco", "Eneco", {"category": "utilities", "category_source": CategorySource.MANUAL.value}),
+        ])
+        assert categorization.get_categorizer(test_db, owner_id=test_owner.id).model is None
+
+    def test_recategorize_applies_rules_and_keeps_manual_categories(self, test_db: Session, test_owner):
+        """Test a rule change followed by a run over the owner's history."""
+        _add_transactions(test_db, test_owner, [
+            (-60.0, "Eneco energy", "Eneco", {}),
+            (-70.0, "Eneco energy", "Eneco", {"category": "personal", "category_source": CategorySource.MANUAL.value}),
+            (-80.0, "Gamma", "Gamma", {"category": "stale", "category_source": CategorySource.RULE.value}),
+        ])
+        assert categorization.get_categorizer(test_db, owner_id=test_owner.id).rules.labels == []
+        test_db.add(models.CategoryRule(owner_id=test_owner.id, pattern="energy", category="utilities"))
+        test_db.commit()
+        # Adding the rule dropped the cached categorizer
+        assert categorization.get_categorizer(test_db, owner_id=test_owner.id).rules.labels == [("utilities", None)]
+
+        assert categorization.recategorize(test_db, owner_id=test_owner.id, batch_size=2) == {
+            "transactions": 3, "updated": 2,
+        }
+        categories = {
+            float(tx.amount): (tx.category, tx.category_source) for tx in test_db.query(models.Transaction)
+        }
+        assert categories == {
+            -60.0: ("utilities", CategorySource.RULE.value),
+            -70.0: ("personal", CategorySource.MANUAL.value),
+            -80.0: (None, None),
+        }
+
+    def test_synced_transactions_are_categorized(self, test_db: Session, test_owner):
+        """Test that the sync categorizes new transactions in the same write."""
+        connection = test_db.get_bind().connect()
+        test_db.add_all([
+            models.BankConnection(
+                id="conn1", user_id=str(test_owner.id), institution_id="fake", institution_name="Fake Bank",
+                status=BankConnectionStatus.CONNECTED.value,
+            ),
+            models.CategoryRule(owner_id=test_owner.id, counterparty="Eneco", category="utilities"),
+            models.CategoryRule(owner_id=test_owner.id, transaction_type=TransactionType.INCOME, category="rent"),
+        ])
+        test_db.commit()
+        provider = FakeBankProvider(accounts_per_connection=1, transactions_per_account=42, start=NOW - timedelta(days=42), days=42)
+        engine = BankSync(provider, session_factory=lambda: Session(bind=connection))
+        try:
+            asyncio.run(engine.sync_connection("conn1", now=NOW))
+        finally:
+            connection.close()
+
+        counts = {}
+        for tx in test_db.query(models.Transaction):
+            counts[tx.category] = counts.get(tx.category, 0) + 1
+        assert counts == {"rent": 11, "utilities": 3, None: 28}
+
+    @pytest.mark.benchmark
+    def test_recategorize_throughput(self, test_db: Session, test_owner):
+        """Test that a million transactions would be recategorized in minutes."""
+        count = 20_000
+        rng = np.random.default_rng(7)
+        words = ["energie", "water", "reparatie", "huur", "verzekering", "internet", "schoonmaak", "tuin"]
+        test_db.add_all([
+            models.CategoryRule(owner_id=test_owner.id, priority=i, pattern=word, category=word)
+            for i, word in enumerate(words[:4])
+        ])
+        test_db.commit()
+        _add_transactions(test_db, test_owner, [
+            (-float(rng.integers(10, 900)), f"{words[i % 8]} {words[(i * 3) % 8]} ref {i}", f"Payee {i % 50}", {})
+            for i in range(count)
+        ])
+
+        started = time.perf_counter()
+        summary = categorization.recategorize(test_db, owner_id=test_owner.id)
+        elapsed = time.perf_counter() - started
+
+        assert summary["transactions"] == count and summary["updated"] > count / 2
+        assert elapsed * 1_000_000 / count < 10 * 60
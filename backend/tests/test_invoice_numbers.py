@@ -0,0 +1,148 @@
+"""Tests for hi/lo invoice number allocation."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import models
+from app.crud.crud_invoice import invoice as crud_invoice
+from app.db.base_class import Base
+from app.services import invoice_numbers
+from app.services.invoice_numbers import SequenceAllocator, SequenceReservationError
+
+
+class TestSequenceAllocator:
+    """Test block reservation and number hand-out."""
+
+    def test_numbers_are_sequential_within_blocks(self, test_db: Session):
+        """Test that numbers come from consecutive reserved blocks."""
+        allocator = SequenceAllocator(block_size=10)
+
+        numbers = [allocator.allocate(test_db, "7") for _ in range(25)]
+
+        assert numbers == list(range(1, 26))
+        sequence = test_db.get(models.InvoiceSequence, "7")
+        assert sequence.next_value == 31  # three blocks of ten reserved
+
+    def test_workers_get_disjoint_blocks(self, test_db: Session):
+        """Test that two independent allocators never hand out the same number."""
+        worker_a, worker_b = SequenceAllocator(block_size=5), SequenceAllocator(block_size=5)
+
+        numbers = []
+        for _ in range(12):
+            numbers.append(worker_a.allocate(test_db, "series"))
+            numbers.append(worker_b.allocate(test_db, "series"))
+
+        assert len(set(numbers)) == len(numbers)
+
+    def test_series_are_independent(self, test_db: Session):
+        """Test that each series counts on its own."""
+        allocator = SequenceAllocator(block_size=10)
+
+        assert allocator.allocate(test_db, "1") == 1
+        assert allocator.allocate(test_db, "2") == 1
+        assert allocator.allocate_many(test_db, "1", 3) == [2, 3, 4]
+
+    def test_reservation_conflicts_are_bounded(self, test_db: Session, monkeypatch):
+        """Test that a series row that keeps conflicting raises instead of retrying forever."""
+        attempts = []
+
+        class ConflictingEngine:
+            def begin(self):
+                attempts.append(1)
+                raise IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed"))
+
+        allocator = SequenceAllocator(block_size=10)
+        monkeypatch.setattr(test_db, "get_bind", lambda: ConflictingEngine())
+
+        with pytest.raises(SequenceReservationError, match="series 1"):
+            allocator.allocate(test_db, "1")
+        assert len(attempts) == invoice_numbers.RESERVE_ATTEMPTS
+
+    def test_reserving_does_not_block_other_series(self, tmp_path):
+        """Test that a reservation in progress only holds up its own series."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'series.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        allocator = SequenceAllocator(block_size=10)
+
+        def allocate(series):
+            with Session(bind=engine) as db:
+                return allocator.allocate(db, series)
+
+        with allocator._series_lock((id(engine), "1")), ThreadPoolExecutor(max_workers=1) as pool:
+            assert pool.submit(allocate, "2").result(timeout=5) == 1
+
+    def test_create_for_lease_uses_owner_series(self, test_db: Session, test_owner, test_unit, test_tenant):
+        """Test that invoices created one by one get consecutive owner numbers."""
+        lease = models.Lease(
+            unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1000.0,
+            lease_start_date=date(2030, 1, 1), lease_end_date=date(2030, 12, 31),
+        )
+        test_db.add(lease)
+        test_db.commit()
+
+        first = crud_invoice.create_for_lease(db=test_db, lease_id=lease.id, owner_id=test_owner.id)
+        second = crud_invoice.create_for_lease(db=test_db, lease_id=lease.id, owner_id=test_owner.id)
+
+        assert first.invoice_number == f"INV-{test_owner.id}-000001"
+        assert second.invoice_number == f"INV-{test_owner.id}-000002"
+
+
+class TestConcurrentInvoiceCreation:
+    """Stress test parallel invoice creation against a shared database file."""
+
+    TOTAL = 50_000
+    CHUNK = 500
+
+    def test_parallel_invoices_have_unique_numbers(self, tmp_path):
+        """Test that 50k invoices created by parallel workers never collide."""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'numbers.db'}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+            pool_size=16,
+        )
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with SessionFactory() as db:
+            lease = models.Lease(
+                unit_id=1, tenant_id=1, rent_amount=100.0,
+                lease_start_date=date(2030, 1, 1), lease_end_date=date(2030, 12, 31),
+            )
+            db.add(lease)
+            db.commit()
+            lease_id = lease.id
+
+        # Two allocators stand in for two separate worker processes
+        workers = [SequenceAllocator(block_size=100), SequenceAllocator(block_size=100)]
+
+        def create_chunk(i):
+            allocator = workers[i % 2]
+            with SessionFactory() as db:
+                numbers = []
+                for _ in range(self.CHUNK):
+                    numbers.append(allocator.allocate(db, "stress"))
+                db.execute(insert(models.Invoice), [
+                    {
+                        "lease_id": lease_id,
+                        "invoice_number": models.Invoice.format_invoice_number("stress", n),
+                        "issue_date": date(2030, 1, 1),
+                        "due_date": date(2030, 1, 15),
+                        "amount": 100.0,
+                        "total_amount": 100.0,
+                    }
+                    for n in numbers
+                ])
+                db.commit()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(create_chunk, range(self.TOTAL // self.CHUNK)))
+
+        with SessionFactory() as db:
+            assert db.query(models.Invoice).count() == self.TOTAL
+            numbers = [n for (n,) in db.query(models.Invoice.invoice_number)]
+        assert len(set(numbers)) == self.TOTAL
+        engine.dispose()
@@ -0,0 +1,87 @@
+"""Tests for overdue invoice detection and the job scheduler."""
+
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.scheduler import Scheduler
+from app.crud.crud_invoice import invoice as crud_invoice
+from app.models.invoice import InvoiceStatus
+
+
+@pytest.fixture
+def invoices(test_db: Session, test_unit, test_tenant):
+    lease = models.Lease(
+        unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=800.0,
+        lease_start_date=date(2020, 1, 1), lease_end_date=date(2040, 12, 31),
+    )
+    test_db.add(lease)
+    test_db.flush()
+    today = date.today()
+    rows = [
+        ("past-pending", today - timedelta(days=3), InvoiceStatus.PENDING),
+        ("past-paid", today - timedelta(days=3), InvoiceStatus.PAID),
+        ("future-pending", today + timedelta(days=3), InvoiceStatus.PENDING),
+        ("old-pending", today - timedelta(days=90), InvoiceStatus.PENDING),
+    ]
+    for number, due_date, status in rows:
+        test_db.add(models.Invoice(
+            lease_id=lease.id, invoice_number=number, issue_date=due_date - timedelta(days=14),
+            due_date=due_date, amount=800.0, total_amount=800.0, status=status,
+        ))
+    test_db.commit()
+    return rows
+
+
+class TestOverdueInvoices:
+    """Test bulk overdue transitions and the overdue query path."""
+
+    def test_mark_overdue_updates_only_pending_past_due(self, test_db: Session, invoices):
+        """Test that only pending invoices past their due date change status."""
+        updated = crud_invoice.mark_overdue(test_db, batch_size=1)
+
+        assert updated == 2
+        statuses = dict(test_db.query(models.Invoice.invoice_number, models.Invoice.status))
+        assert statuses == {
+            "past-pending": InvoiceStatus.OVERDUE,
+            "past-paid": InvoiceStatus.PAID,
+            "future-pending": InvoiceStatus.PENDING,
+            "old-pending": InvoiceStatus.OVERDUE,
+        }
+        assert crud_invoice.mark_overdue(test_db) == 0
+
+    def test_overdue_filter_includes_not_yet_transitioned(self, test_db: Session, test_owner, invoices):
+        """Test that status=overdue also finds pending invoices the job has not reached yet."""
+        overdue = crud_invoice.get_by_owner(test_db, owner_id=test_owner.id, status=InvoiceStatus.OVERDUE)
+
+        assert [inv.invoice_number for inv in overdue] == ["old-pending", "past-pending"]
+        assert all(inv.is_overdue for inv in overdue)
+
+    def test_status_filter(self, test_db: Session, test_owner, invoices):
+        """Test filtering by a plain status."""
+        paid = crud_invoice.get_by_owner(test_db, owner_id=test_owner.id, status=InvoiceStatus.PAID)
+        assert [inv.invoice_number for inv in paid] == ["past-paid"]
+
+
+class TestScheduler:
+    """Test the periodic job runner."""
+
+    async def test_job_runs_periodically_and_survives_errors(self):
+        """Test that jobs run on their interval and a failing job keeps its schedule."""
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+
+        scheduler = Scheduler()
+        scheduler.register("flaky", 0.01, flaky)
+        scheduler.start()
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+
+        assert len(calls) >= 2
@@ -0,0 +1,82 @@
+"""Tests for cached invoice PDF rendering."""
+
+import asyncio
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.models.invoice import InvoiceStatus
+from app.models.lease import LeaseStatus
+from app.services import billing as billing_service
+from app.services import invoice_pdf
+
+
+@pytest.fixture
+def pdf_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INVOICE_PDF_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PDF_RENDER_WORKERS", 2)
+    yield tmp_path
+    invoice_pdf.shutdown_pool()
+
+
+@pytest.fixture
+def billed_leases(test_db: Session, test_owner, test_unit, test_tenant):
+    for offset in range(3):
+        test_db.add(models.Lease(
+            unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1000.0 + offset, vat_rate=21.0,
+            lease_start_date=date(2024, 1 + offset * 4, 1), lease_end_date=date(2024, 4 + offset * 4, 30),
+            status=LeaseStatus.ACTIVE,
+        ))
+    test_db.commit()
+    billing_service.execute_billing_run(test_db, period=date(2024, 2, 1), owner_id=test_owner.id)
+    return test_db.query(models.Invoice).all()
+
+
+class TestInvoicePdf:
+    """Test PDF generation, the content-addressed cache and bulk rendering."""
+
+    def test_build_pdf_is_well_formed(self):
+        """Test that the writer produces a PDF with a valid xref offset."""
+        pdf = invoice_pdf.build_pdf(["INVOICE (1)", "Total due: 12.00 EUR"])
+
+        assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+        startxref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+        assert pdf[startxref:].startswith(b"xref")
+        assert b"(INVOICE \\(1\\)) Tj" in pdf
+
+    def test_invoice_rendered_once_per_revision(self, test_db: Session, test_owner, billed_leases, pdf_cache):
+        """Test that repeats hit the cache and a changed invoice gets a new document."""
+        invoice = billed_leases[0]
+        data = invoice_pdf.get_document_data(test_db, invoice_id=invoice.id, owner_id=test_owner.id)
+
+        path = asyncio.run(invoice_pdf.get_invoice_pdf(data))
+        with open(path, "rb") as f:
+            content = f.read()
+        assert content.startswith(b"%PDF")
+        assert invoice.invoice_number.encode() in content
+        assert b"VAT 21% \\(NL\\)" in content
+        assert asyncio.run(invoice_pdf.get_invoice_pdf(data)) == path
+
+        invoice.status = InvoiceStatus.PAID
+        test_db.commit()
+        changed = invoice_pdf.get_document_data(test_db, invoice_id=invoice.id, owner_id=test_owner.id)
+        assert invoice_pdf.cache_path(changed) != path
+
+    def test_other_owner_cannot_load_invoice(self, test_db: Session, test_owner, billed_leases):
+        """Test that invoice data is scoped to the owner."""
+        assert invoice_pdf.get_document_data(
+            test_db, invoice_id=billed_leases[0].id, owner_id=test_owner.id + 1
+        ) is None
+
+    def test_render_period(self, test_db: Session, test_owner, billed_leases, pdf_cache):
+        """Test that bulk rendering covers the period and skips cached documents."""
+        result = invoice_pdf.render_period(test_db, period=date(2024, 2, 15), owner_id=test_owner.id)
+
+        assert result == {"invoices": 1, "rendered": 1, "cached": 0}
+        assert len([f for _, _, files in os.walk(pdf_cache) for f in files if f.endswith(".pdf")]) == 1
+        again = invoice_pdf.render_period(test_db, period=date(2024, 2, 1), owner_id=test_owner.id)
+        assert again == {"invoices": 1, "rendered": 0, "cached": 1}
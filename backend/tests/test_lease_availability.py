@@ -0,0 +1,127 @@
+"""Tests for lease period overlap protection and unit availability search."""
+
+import pytest
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.crud.crud_lease import lease as crud_lease
+from app.crud.crud_unit import unit as crud_unit
+
+
+def _lease_in(unit, tenant, start, end):
+    return schemas.LeaseCreate(
+        unit_id=unit.id,
+        tenant_id=tenant.id,
+        lease_start_date=start,
+        lease_end_date=end,
+        rent_amount=1200.0,
+    )
+
+
+class TestLeaseOverlap:
+    """Test that overlapping lease periods are rejected."""
+
+    def test_create_consecutive_leases(self, test_db: Session, test_owner, test_unit, test_tenant):
+        """Test that back-to-back leases on the same unit are accepted."""
+        first = crud_lease.create_for_owner(
+            db=test_db, obj_in=_lease_in(test_unit, test_tenant, date(2030, 1, 1), date(2030, 5, 31)),
+            owner_id=test_owner.id,
+        )
+        second = crud_lease.create_for_owner(
+            db=test_db, obj_in=_lease_in(test_unit, test_tenant, date(2030, 6, 1), date(2030, 8, 31)),
+            owner_id=test_owner.id,
+        )
+
+        assert first.id != second.id
+
+    def test_create_overlapping_lease_rejected(self, test_db: Session, test_owner, test_unit, test_tenant):
+        """Test that create_for_owner refuses an overlapping period."""
+        crud_lease.create_for_owner(
+            db=test_db, obj_in=_lease_in(test_unit, test_tenant, date(2030, 1, 1), date(2030, 6, 30)),
+            owner_id=test_owner.id,
+        )
+
+        with pytest.raises(ValueError, match="overlaps"):
+            crud_lease.create_for_owner(
+                db=test_db, obj_in=_lease_in(test_unit, test_tenant, date(2030, 6, 30), date(2030, 12, 31)),
+                owner_id=test_owner.id,
+            )
+
+    def test_database_rejects_overlap(self, test_db: Session, test_unit, test_tenant):
+        """Test that the database constraint rejects overlaps written directly."""
+        for start, end in [(date(2030, 1, 1), date(2030, 6, 30)), (date(2030, 3, 1), date(2030, 4, 1))]:
+            test_db.add(models.Lease(
+                unit_id=test_unit.id, tenant_id=test_tenant.id,
+                lease_start_date=start, lease_end_date=end, rent_amount=1000.0,
+            ))
+        with pytest.raises(IntegrityError):
+            test_db.commit()
+        test_db.rollback()
+
+    def test_protection_is_installed_on_existing_tables(self, test_db: Session, test_unit, test_tenant):
+        """Test that a leases table created without the triggers gets them, once."""
+        connection = test_db.connection()
+        for name in ("trg_leases_no_overlap_insert", "trg_leases_no_overlap_update"):
+            connection.execute(text(f"DROP TRIGGER {name}"))
+
+        assert models.lease.install_overlap_protection(connection) == 2
+        assert models.lease.install_overlap_protection(connection) == 0
+        test_db.commit()
+        for start, end in [(date(2030, 1, 1), date(2030, 6, 30)), (date(2030, 3, 1), date(2030, 4, 1))]:
+            test_db.add(models.Lease(
+                unit_id=test_unit.id, tenant_id=test_tenant.id,
+                lease_start_date=start, lease_end_date=end, rent_amount=1000.0,
+            ))
+        with pytest.raises(IntegrityError):
+            test_db.commit()
+        test_db.rollback()
+
+    def test_terminated_lease_does_not_block(self, test_db: Session, test_owner, test_unit, test_tenant):
+        """Test that terminated leases free up their period."""
+        old = crud_lease.create_for_owner(
+            db=test_db, obj_in=_lease_in(test_unit, test_tenant, date(2030, 1, 1), date(2030, 12, 31)),
+            owner_id=test_owner.id,
+        )
+        old.status = models.lease.LeaseStatus.TERMINATED
+        test_db.commit()
+
+        new = crud_lease.create_for_owner(
+            db=test_db, obj_in=_lease_in(test_unit, test_tenant, date(2030, 3, 1), date(2030, 9, 30)),
+            owner_id=test_owner.id,
+        )
+        assert new.id is not None
+
+
+class TestUnitAvailability:
+    """Test availability search across an owner's portfolio."""
+
+    def test_available_units_for_period(self, test_db: Session, test_owner, test_property, test_unit, test_tenant):
+        """Test that only units without an overlapping lease are returned."""
+        free_unit = models.Unit(property_id=test_property.id, unit_number="2B")
+        test_db.add(free_unit)
+        test_db.commit()
+        crud_lease.create_for_owner(
+            db=test_db, obj_in=_lease_in(test_unit, test_tenant, date(2030, 7, 1), date(2030, 12, 31)),
+            owner_id=test_owner.id,
+        )
+
+        summer = crud_unit.get_available_for_owner(
+            db=test_db, owner_id=test_owner.id, start_date=date(2030, 6, 1), end_date=date(2030, 8, 31)
+        )
+        spring = crud_unit.get_available_for_owner(
+            db=test_db, owner_id=test_owner.id, start_date=date(2030, 3, 1), end_date=date(2030, 5, 31)
+        )
+
+        assert [u.id for u in summer] == [free_unit.id]
+        assert {u.id for u in spring} == {test_unit.id, free_unit.id}
+
+    def test_available_units_scoped_to_owner(self, test_db: Session, test_unit):
+        """Test that other owners' units are never returned."""
+        units = crud_unit.get_available_for_owner(
+            db=test_db, owner_id=test_unit.property.owner_id + 1,
+            start_date=date(2030, 1, 1), end_date=date(2030, 1, 31),
+        )
+        assert units == []
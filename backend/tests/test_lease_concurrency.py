@@ -0,0 +1,123 @@
+"""Tests for optimistic concurrency control when leasing units."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud, models, schemas
+from app.db.base_class import Base
+
+
+def _lease_in(unit_id, tenant_id, start=date(2031, 1, 1), end=date(2031, 12, 31)):
+    return schemas.LeaseCreate(
+        unit_id=unit_id,
+        tenant_id=tenant_id,
+        lease_start_date=start,
+        lease_end_date=end,
+        rent_amount=950.0,
+    )
+
+
+class TestVersionedUpdates:
+    """Test compare-and-swap behaviour of versioned models."""
+
+    def test_unit_version_increments(self, test_db: Session, test_unit):
+        """Test that every update bumps the unit version."""
+        assert test_unit.version == 1
+        unit = crud.unit.update(db=test_db, db_obj=test_unit, obj_in={"current_rent": 1300.0})
+        assert unit.version == 2
+
+    def test_stale_client_version_rejected(self, test_db: Session, test_unit):
+        """Test that an update carrying an outdated version is refused."""
+        crud.unit.update(db=test_db, db_obj=test_unit, obj_in={"current_rent": 1300.0})
+
+        with pytest.raises(crud.ConcurrencyConflictError):
+            crud.unit.update(db=test_db, db_obj=test_unit, obj_in={"current_rent": 1400.0, "version": 1})
+
+    def test_stale_unit_lease_conflict(self, test_db: Session, test_owner, test_unit, test_tenant):
+        """Test that leasing from a stale unit snapshot raises a conflict."""
+        stale_db = sessionmaker(bind=test_db.get_bind())()
+        try:
+            # The second session keeps version 1 in its identity map
+            stale_unit = stale_db.query(models.Unit).filter(models.Unit.id == test_unit.id).one()
+            assert stale_unit.version == 1
+
+            crud.lease.create_for_owner(
+                db=test_db, obj_in=_lease_in(test_unit.id, test_tenant.id), owner_id=test_owner.id
+            )
+            with pytest.raises(crud.ConcurrencyConflictError):
+                crud.lease.create_for_owner(
+                    db=stale_db,
+                    obj_in=_lease_in(test_unit.id, test_tenant.id, date(2032, 1, 1), date(2032, 12, 31)),
+                    owner_id=test_owner.id,
+                )
+        finally:
+            stale_db.close()
+
+
+class TestConcurrentLeasing:
+    """Stress test parallel lease creation against a shared database file."""
+
+    UNITS = 20
+    ATTEMPTS_PER_UNIT = 15
+
+    def test_exactly_one_lease_wins_per_unit(self, tmp_path):
+        """Test that hundreds of racing lease creations yield one lease per unit."""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'stress.db'}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+            pool_size=32,
+        )
+        Base.metadata.create_all(bind=engine)
+        SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        with SessionFactory() as db:
+            owner = models.User(email="stress@example.com", hashed_password="x")
+            db.add(owner)
+            db.flush()
+            property_obj = models.Property(
+                name="Tower", address_line1="1 Main St", city="Berlin",
+                postal_code="10115", country_iso="DE", owner_id=owner.id,
+            )
+            db.add(property_obj)
+            db.flush()
+            tenant = models.Tenant(first_name="R", last_name="Acer", email="r@example.com", owner_id=owner.id)
+            units = [models.Unit(property_id=property_obj.id, unit_number=str(i)) for i in range(self.UNITS)]
+            db.add_all([tenant, *units])
+            db.commit()
+            owner_id, tenant_id = owner.id, tenant.id
+            unit_ids = [u.id for u in units]
+
+        barrier = threading.Barrier(32)
+
+        def attempt(unit_id):
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            with SessionFactory() as db:
+                try:
+                    crud.lease.create_for_owner(
+                        db=db, obj_in=_lease_in(unit_id, tenant_id), owner_id=owner_id
+                    )
+                    return "won"
+                except crud.ConcurrencyConflictError:
+                    return "conflict"
+                except ValueError:
+                    return "overlap"
+
+        jobs = [u for u in unit_ids for _ in range(self.ATTEMPTS_PER_UNIT)]
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            outcomes = list(pool.map(attempt, jobs))
+
+        assert outcomes.count("won") == self.UNITS
+        with SessionFactory() as db:
+            for unit_id in unit_ids:
+                assert db.query(models.Lease).filter(models.Lease.unit_id == unit_id).count() == 1
+                # One successful compare-and-swap per unit
+                assert db.get(models.Unit, unit_id).version == 2
+        engine.dispose()
@@ -0,0 +1,146 @@
+"""Tests for the lease ledger, materialized balances and arrears aging."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud.crud_invoice import invoice as crud_invoice
+from app.models.invoice import InvoiceStatus
+from app.models.lease import LeaseStatus
+from app.services import billing as billing_service
+from app.services import ledger as ledger_service
+
+
+@pytest.fixture
+def lease(test_db: Session, test_unit, test_tenant):
+    lease = models.Lease(
+        unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1000.0,
+        lease_start_date=date(2024, 1, 1), lease_end_date=date(2040, 12, 31),
+        status=LeaseStatus.ACTIVE,
+    )
+    test_db.add(lease)
+    test_db.commit()
+    return lease
+
+
+def _balance(db: Session, lease_id: int) -> float:
+    return db.get(models.LeaseBalance, lease_id).balance
+
+
+class TestLedger:
+    """Test charge and payment posting on the lease ledger."""
+
+    def test_invoices_and_payments_keep_running_balance(self, test_db: Session, test_owner, lease):
+        """Test that each posting updates the materialized balance and its own running balance."""
+        first = crud_invoice.create_for_lease(test_db, lease_id=lease.id, owner_id=test_owner.id)
+        second = crud_invoice.create_for_lease(test_db, lease_id=lease.id, owner_id=test_owner.id)
+        assert _balance(test_db, lease.id) == 2000.0
+
+        paid = crud_invoice.record_payment(test_db, invoice_id=first.id, owner_id=test_owner.id, amount=400.0)
+        assert paid.status == InvoiceStatus.PENDING
+        assert ledger_service.open_amount(test_db, invoice_id=first.id) == 600.0
+
+        paid = crud_invoice.record_payment(test_db, invoice_id=first.id, owner_id=test_owner.id)
+        assert paid.status == InvoiceStatus.PAID and paid.paid_at is not None
+
+        ledger = ledger_service.lease_ledger(test_db, lease_id=lease.id)
+        assert ledger["balance"] == 1000.0
+        assert [(e.entry_type, e.amount, e.balance_after) for e in reversed(ledger["entries"])] == [
+            ("charge", 1000.0, 1000.0), ("charge", 1000.0, 2000.0),
+            ("payment", -400.0, 1600.0), ("payment", -600.0, 1000.0),
+        ]
+        test_db.refresh(second)
+        assert second.status == InvoiceStatus.PENDING
+
+    def test_payment_settles_oldest_charges_and_keeps_credit(self, test_db: Session, test_owner, lease):
+        """Test that a payment beyond its invoice settles older charges, leaving a credit."""
+        invoices = [crud_invoice.create_for_lease(test_db, lease_id=lease.id, owner_id=test_owner.id) for _ in range(3)]
+
+        crud_invoice.record_payment(test_db, invoice_id=invoices[2].id, owner_id=test_owner.id, amount=3500.0)
+
+        statuses = {inv.id: inv.status for inv in test_db.query(models.Invoice)}
+        assert set(statuses.values()) == {InvoiceStatus.PAID}
+        assert _balance(test_db, lease.id) == -500.0
+
+    def test_credit_settles_later_charges(self, test_db: Session, test_owner, lease):
+        """Test that an overpayment pays the next invoices and leaves them out of the aging report."""
+        first = crud_invoice.create_for_lease(test_db, lease_id=lease.id, owner_id=test_owner.id)
+        crud_invoice.record_payment(test_db, invoice_id=first.id, owner_id=test_owner.id, amount=2500.0)
+
+        covered = crud_invoice.create_for_lease(test_db, lease_id=lease.id, owner_id=test_owner.id)
+        assert covered.status == InvoiceStatus.PAID and ledger_service.open_amount(test_db, invoice_id=covered.id) == 0
+        billing_service.execute_billing_run(test_db, period=date(2024, 3, 1), owner_id=test_owner.id)
+
+        billed = test_db.query(models.Invoice).filter(models.Invoice.billing_period == date(2024, 3, 1)).one()
+        assert billed.status == InvoiceStatus.PENDING
+        assert ledger_service.open_amount(test_db, invoice_id=billed.id) == 500.0
+        assert _balance(test_db, lease.id) == 500.0
+        aging = ledger_service.aging(test_db, owner_id=test_owner.id, as_of=date(2024, 1, 1))
+        assert aging["totals"]["total"] == 500.0
+
+    def test_rejects_foreign_invoice_and_bad_amount(self, test_db: Session, test_owner, lease):
+        """Test that payments check ownership and amounts."""
+        invoice = crud_invoice.create_for_lease(test_db, lease_id=lease.id, owner_id=test_owner.id)
+        with pytest.raises(ValueError):
+            crud_invoice.record_payment(test_db, invoice_id=invoice.id, owner_id=test_owner.id + 1)
+        with pytest.raises(ValueError):
+            crud_invoice.record_payment(test_db, invoice_id=invoice.id, owner_id=test_owner.id, amount=0)
+
+    def test_invoices_from_before_the_ledger(self, test_db: Session, test_owner, lease):
+        """Test that their charges are posted on first payment or by the backfill, once."""
+        def legacy(number, status, paid_at=None):
+            invoice = models.Invoice(
+                lease_id=lease.id, invoice_number=number, issue_date=date(2023, 12, 1), due_date=date(2023, 12, 15),
+                amount=1000.0, total_amount=1000.0, status=status, paid_at=paid_at,
+            )
+            test_db.add(invoice)
+            test_db.commit()
+            return invoice
+
+        unpaid = legacy("OLD-1", InvoiceStatus.PENDING)
+        legacy("OLD-2", InvoiceStatus.PAID, paid_at=datetime(2023, 12, 10))
+        legacy("OLD-3", InvoiceStatus.CANCELLED)
+        overdue = legacy("OLD-4", InvoiceStatus.OVERDUE)
+
+        paid = crud_invoice.record_payment(test_db, invoice_id=unpaid.id, owner_id=test_owner.id)
+        assert paid.status == InvoiceStatus.PAID
+        assert crud_invoice.backfill_ledger(test_db, batch_size=1) == 2
+        assert crud_invoice.backfill_ledger(test_db) == 0
+
+        assert _balance(test_db, lease.id) == 1000.0
+        assert ledger_service.open_amount(test_db, invoice_id=overdue.id) == 1000.0
+        assert test_db.query(models.LedgerEntry).filter(models.LedgerEntry.entry_type == "charge").count() == 3
+
+    def test_billing_run_posts_charges(self, test_db: Session, test_owner, lease):
+        """Test that batch billing posts one charge per invoice."""
+        billing_service.execute_billing_run(test_db, period=date(2024, 3, 1), owner_id=test_owner.id)
+
+        assert _balance(test_db, lease.id) == 1000.0
+        charge = test_db.query(models.LedgerEntry).one()
+        assert charge.invoice_id is not None and charge.open_amount == 1000.0
+
+
+class TestAging:
+    """Test the per-owner arrears aging report."""
+
+    def test_buckets_by_days_past_due(self, test_db: Session, test_owner, lease):
+        """Test that open amounts land in the bucket of their days past due."""
+        as_of = date(2024, 12, 31)
+        for month, days_past_due in ((12, -5), (11, 10), (10, 45), (9, 75), (5, 200)):
+            billing_service.execute_billing_run(
+                test_db, period=date(2024, month, 1), owner_id=test_owner.id,
+                issue_date=as_of - timedelta(days=days_past_due + billing_service.PAYMENT_TERM_DAYS),
+            )
+        paid = test_db.query(models.Invoice).order_by(models.Invoice.due_date).first()
+        crud_invoice.record_payment(test_db, invoice_id=paid.id, owner_id=test_owner.id, amount=250.0)
+
+        report = ledger_service.aging(test_db, owner_id=test_owner.id, as_of=as_of)
+
+        assert report["totals"] == {
+            "not_due": 1000.0, "days_0_30": 1000.0, "days_31_60": 1000.0,
+            "days_61_90": 1000.0, "days_over_90": 750.0, "total": 4750.0,
+        }
+        assert [row["lease_id"] for row in report["leases"]] == [lease.id]
+        assert ledger_service.aging(test_db, owner_id=test_owner.id + 1, as_of=as_of)["leases"] == []
@@ -0,0 +1,111 @@
+"""Tests for load-balanced maintenance auto-assignment."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.crud.crud_maintenance import maintenance_worker as crud_worker
+from app.models.maintenance import MaintenanceCategory, MaintenancePriority, MaintenanceStatus
+from app.services import maintenance_assignment
+
+
+def _worker(db: Session, owner, email, *, skills, capacity, is_active=True):
+    user = models.User(email=email, hashed_password="not-used")
+    db.add(user)
+    db.flush()
+    db.add(models.MaintenanceWorker(
+        owner_id=owner.id, user_id=user.id, skills=skills, capacity=capacity, is_active=is_active,
+    ))
+    db.commit()
+    return user.id
+
+
+def _request(db: Session, unit, owner, title, category, priority, hours_ago):
+    request = models.MaintenanceRequest(
+        unit_id=unit.id, reported_by=owner.id, title=title, description="-",
+        category=category, priority=priority,
+        reported_at=datetime.utcnow() - timedelta(hours=hours_ago),
+    )
+    db.add(request)
+    db.commit()
+    return request.id
+
+
+class TestAutoAssign:
+    """Test ordering, skills, capacity and load balancing of auto-assignment."""
+
+    def test_assigns_by_priority_skill_and_capacity(self, test_db: Session, test_owner, test_unit):
+        """Test that urgent work goes first to a skilled worker and capacity is respected."""
+        plumber = _worker(test_db, test_owner, "plumber@example.com", skills=["plumbing"], capacity=1)
+        handyman = _worker(test_db, test_owner, "handy@example.com", skills=[], capacity=1)
+        _worker(test_db, test_owner, "away@example.com", skills=[], capacity=5, is_active=False)
+
+        old_leak = _request(test_db, test_unit, test_owner, "old leak", MaintenanceCategory.PLUMBING, MaintenancePriority.NORMAL, 48)
+        urgent_leak = _request(test_db, test_unit, test_owner, "burst pipe", MaintenanceCategory.PLUMBING, MaintenancePriority.URGENT, 1)
+        paint = _request(test_db, test_unit, test_owner, "paint", MaintenanceCategory.PAINTING, MaintenancePriority.LOW, 72)
+
+        result = maintenance_assignment.auto_assign(test_db, owner_id=test_owner.id)
+
+        assignments = {a["request_id"]: a["assigned_to"] for a in result["assignments"]}
+        assert assignments == {urgent_leak: plumber, old_leak: handyman}
+        assert result["unassigned"] == 1
+        test_db.expire_all()
+        assert test_db.get(models.MaintenanceRequest, urgent_leak).status == MaintenanceStatus.IN_PROGRESS
+        assert test_db.get(models.MaintenanceRequest, paint).assigned_to is None
+
+    def test_counts_existing_open_work(self, test_db: Session, test_owner, test_unit):
+        """Test that workers already busy with open requests get new work last."""
+        busy = _worker(test_db, test_owner, "busy@example.com", skills=[], capacity=5)
+        idle = _worker(test_db, test_owner, "idle@example.com", skills=[], capacity=5)
+        for i in range(2):
+            request_id = _request(test_db, test_unit, test_owner, f"old {i}", MaintenanceCategory.OTHER, MaintenancePriority.LOW, 100)
+            test_db.query(models.MaintenanceRequest).filter_by(id=request_id).update(
+                {"assigned_to": busy, "status": MaintenanceStatus.IN_PROGRESS.value}
+            )
+        test_db.commit()
+        for i in range(3):
+            _request(test_db, test_unit, test_owner, f"new {i}", MaintenanceCategory.OTHER, MaintenancePriority.NORMAL, i)
+
+        result = maintenance_assignment.auto_assign(test_db, owner_id=test_owner.id)
+
+        assert sorted(a["assigned_to"] for a in result["assignments"]) == sorted([idle, idle, busy])
+
+    def test_balances_large_backlog(self, test_db: Session, test_owner, test_unit):
+        """Test that thousands of pending requests spread evenly and specialists only get their skills."""
+        generalists = [_worker(test_db, test_owner, f"g{i}@example.com", skills=[], capacity=1000) for i in range(10)]
+        specialists = [
+            _worker(test_db, test_owner, f"s{i}@example.com", skills=["plumbing", "electrical"], capacity=1000)
+            for i in range(10)
+        ]
+        categories = list(MaintenanceCategory)
+        test_db.execute(insert(models.MaintenanceRequest), [
+            {
+                "unit_id": test_unit.id, "reported_by": test_owner.id, "title": f"r{i}", "description": "-",
+                "category": categories[i % len(categories)].value, "priority": MaintenancePriority.NORMAL.value,
+                "status": MaintenanceStatus.OPEN.value, "escalation_level": 0,
+            }
+            for i in range(4000)
+        ])
+        test_db.commit()
+
+        plan, unassigned = maintenance_assignment.plan_assignments(test_db, owner_id=test_owner.id)
+
+        assert len(plan) == 4000 and unassigned == 0
+        categories_by_id = dict(test_db.query(models.MaintenanceRequest.id, models.MaintenanceRequest.category))
+        loads = {worker: 0 for worker in generalists + specialists}
+        for request_id, worker in plan:
+            loads[worker] += 1
+            if worker in specialists:
+                assert categories_by_id[request_id] in ("plumbing", "electrical")
+        assert max(loads[w] for w in generalists) - min(loads[w] for w in generalists) <= 1
+        assert max(loads[w] for w in specialists) - min(loads[w] for w in specialists) <= 1
+
+    def test_user_is_registered_once_per_owner(self, test_db: Session, test_owner):
+        """Test that registering the same user as worker twice is refused."""
+        user_id = _worker(test_db, test_owner, "fixer@example.com", skills=[], capacity=5)
+        with pytest.raises(ValueError):
+            crud_worker.create_for_owner(test_db, obj_in=schemas.MaintenanceWorkerCreate(user_id=user_id), owner_id=test_owner.id)
+        assert test_db.query(models.MaintenanceWorker).count() == 1
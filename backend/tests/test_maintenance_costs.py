@@ -0,0 +1,110 @@
+"""Tests for numeric maintenance costs and cost rollups."""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud.crud_maintenance import maintenance_request as crud_maintenance
+from app.models.maintenance import MaintenanceCategory, MaintenanceStatus, parse_cost_range
+from app.services import maintenance_costs
+
+
+def _request(db: Session, unit, owner, title, category, estimated_cost=None):
+    request = models.MaintenanceRequest(
+        unit_id=unit.id, reported_by=owner.id, title=title, description="-",
+        category=category, estimated_cost=estimated_cost,
+    )
+    db.add(request)
+    db.commit()
+    return request
+
+
+class TestCostParsing:
+    """Test parsing of free-form cost strings."""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("0-100", (0.0, 100.0)),
+        ("100 - 500", (100.0, 500.0)),
+        ("500+", (500.0, None)),
+        ("EUR 1.250,50", (1250.5, 1250.5)),
+        ("$1,250.50", (1250.5, 1250.5)),
+        ("1,250", (1250.0, 1250.0)),
+        ("1.250.000", (1250000.0, 1250000.0)),
+        ("0.125", (0.125, 0.125)),
+        ("12.500", (12.5, 12.5)),
+        ("unknown", (None, None)),
+        (None, (None, None)),
+    ])
+    def test_parse_cost_range(self, text, expected):
+        """Test ranges, open-ended estimates, currencies and separators."""
+        assert parse_cost_range(text) == expected
+
+
+class TestMaintenanceCosts:
+    """Test numeric columns, rollups maintained on resolve, backfill and the report."""
+
+    def test_resolve_updates_rollups(self, test_db: Session, test_owner, test_property, test_unit):
+        """Test that resolving adds to the rollups once, and re-resolving moves rather than doubles."""
+        leak = _request(test_db, test_unit, test_owner, "leak", MaintenanceCategory.PLUMBING, "100-500")
+        tap = _request(test_db, test_unit, test_owner, "tap", MaintenanceCategory.PLUMBING, "50")
+        fuse = _request(test_db, test_unit, test_owner, "fuse", MaintenanceCategory.ELECTRICAL)
+        assert (leak.estimated_cost_min, leak.estimated_cost_max) == (100.0, 500.0)
+
+        crud_maintenance.resolve_request(test_db, request_id=leak.id, owner_id=test_owner.id, actual_cost="€ 320")
+        crud_maintenance.resolve_request(test_db, request_id=tap.id, owner_id=test_owner.id, actual_cost="40")
+        crud_maintenance.resolve_request(test_db, request_id=fuse.id, owner_id=test_owner.id)
+        crud_maintenance.resolve_request(test_db, request_id=leak.id, owner_id=test_owner.id, actual_cost="380")
+
+        report = maintenance_costs.cost_report(test_db, owner_id=test_owner.id)
+        assert (report["resolved_count"], report["costed_count"], report["actual_cost"]) == (3, 2, 420.0)
+        assert report["average_cost"] == 210.0
+        by_category = {line["category"]: line for line in report["by_category"]}
+        assert by_category["plumbing"]["estimated_cost_min"] == 150.0
+        assert by_category["plumbing"]["estimated_cost_max"] == 550.0
+        assert by_category["electrical"]["average_cost"] is None
+        assert report["by_property"][0]["property_name"] == test_property.name
+        assert maintenance_costs.cost_report(test_db, owner_id=test_owner.id, end=date(2000, 1, 1))["resolved_count"] == 0
+
+    def test_updates_to_resolved_requests_move_rollups(self, test_db: Session, test_owner, test_unit):
+        """Test that cost edits, recategorizing and reopening through the generic update keep the rollups right."""
+        leak = _request(test_db, test_unit, test_owner, "leak", MaintenanceCategory.PLUMBING, "100-500")
+        crud_maintenance.resolve_request(test_db, request_id=leak.id, owner_id=test_owner.id, actual_cost="300")
+
+        crud_maintenance.update(test_db, db_obj=leak, obj_in={"actual_cost": "350", "category": MaintenanceCategory.OTHER})
+        report = maintenance_costs.cost_report(test_db, owner_id=test_owner.id)
+        assert (report["resolved_count"], report["actual_cost"]) == (1, 350.0)
+        assert [(line["category"], line["resolved_count"]) for line in report["by_category"]] == [("other", 1)]
+        rebuilt = maintenance_costs.rebuild_rollups(test_db)
+        assert maintenance_costs.cost_report(test_db, owner_id=test_owner.id) == report and rebuilt == 1
+
+        test_db.refresh(leak)
+        crud_maintenance.update(test_db, db_obj=leak, obj_in={"status": MaintenanceStatus.IN_PROGRESS})
+        assert maintenance_costs.cost_report(test_db, owner_id=test_owner.id)["resolved_count"] == 0
+
+    def test_backfill_and_rebuild_match_incremental_rollups(self, test_db: Session, test_owner, test_unit):
+        """Test that legacy rows are parsed in batches and rebuilt rollups give the same report."""
+        test_db.execute(insert(models.MaintenanceRequest), [
+            {
+                "unit_id": test_unit.id, "reported_by": test_owner.id, "title": f"r{i}", "description": "-",
+                "category": MaintenanceCategory.OTHER.value, "priority": "normal",
+                "status": MaintenanceStatus.OPEN.value, "escalation_level": 0,
+                "estimated_cost": "0-100", "actual_cost": None if i % 3 else "75,50",
+            }
+            for i in range(10)
+        ])
+        test_db.commit()
+        assert test_db.query(models.MaintenanceRequest).filter_by(estimated_cost_min=None).count() == 10
+
+        assert maintenance_costs.backfill_costs(test_db, batch_size=3) == 10
+        assert maintenance_costs.backfill_costs(test_db) == 0
+
+        for request in test_db.query(models.MaintenanceRequest).order_by(models.MaintenanceRequest.id)[:4]:
+            crud_maintenance.resolve_request(test_db, request_id=request.id, owner_id=test_owner.id)
+        incremental = maintenance_costs.cost_report(test_db, owner_id=test_owner.id)
+        maintenance_costs.rebuild_rollups(test_db)
+
+        assert maintenance_costs.cost_report(test_db, owner_id=test_owner.id) == incremental
+        assert (incremental["resolved_count"], incremental["costed_count"], incremental["actual_cost"]) == (4, 2, 151.0)
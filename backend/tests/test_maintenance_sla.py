@@ -0,0 +1,80 @@
+"""Tests for maintenance SLA deadlines, the overdue queue and escalation."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud.crud_maintenance import maintenance_request as crud_maintenance
+from app.models.maintenance import MaintenancePriority, MaintenanceStatus
+
+
+def _request(db: Session, unit, owner, *, title, priority, reported_days_ago, status=MaintenanceStatus.OPEN):
+    request = models.MaintenanceRequest(
+        unit_id=unit.id, reported_by=owner.id, title=title, description="broken",
+        priority=priority, status=status,
+        reported_at=datetime.utcnow() - timedelta(days=reported_days_ago),
+    )
+    db.add(request)
+    db.commit()
+    return request
+
+
+@pytest.fixture
+def requests(test_db: Session, test_unit, test_owner):
+    return {
+        "urgent": _request(test_db, test_unit, test_owner, title="urgent", priority=MaintenancePriority.URGENT, reported_days_ago=2),
+        "low": _request(test_db, test_unit, test_owner, title="low", priority=MaintenancePriority.LOW, reported_days_ago=10),
+        "normal": _request(test_db, test_unit, test_owner, title="normal", priority=MaintenancePriority.NORMAL, reported_days_ago=9),
+        "fresh": _request(test_db, test_unit, test_owner, title="fresh", priority=MaintenancePriority.NORMAL, reported_days_ago=1),
+        "resolved": _request(
+            test_db, test_unit, test_owner, title="resolved", priority=MaintenancePriority.LOW,
+            reported_days_ago=30, status=MaintenanceStatus.RESOLVED,
+        ),
+    }
+
+
+class TestMaintenanceSLA:
+    """Test SLA deadlines, the overdue queue and batched escalation."""
+
+    def test_deadline_set_on_create_and_priority_change(self, test_db: Session, requests):
+        """Test that the deadline follows the priority's SLA from the report time."""
+        fresh = requests["fresh"]
+        assert fresh.sla_due_at == fresh.reported_at + timedelta(days=7)
+
+        fresh.priority = MaintenancePriority.URGENT
+        test_db.commit()
+        assert fresh.sla_due_at == fresh.reported_at + timedelta(hours=24)
+        assert fresh.is_overdue
+
+    def test_overdue_queue_is_ordered_and_scoped(self, test_db: Session, test_owner, requests):
+        """Test that the queue lists open breached requests, most overdue first."""
+        overdue = crud_maintenance.get_overdue_by_owner(test_db, owner_id=test_owner.id)
+
+        assert [r.title for r in overdue] == ["low", "normal", "urgent"]
+        assert crud_maintenance.get_overdue_by_owner(test_db, owner_id=test_owner.id + 1) == []
+
+    def test_escalation_bumps_priority_and_notifies_urgent(self, test_db: Session, requests):
+        """Test that breached requests move up one priority level and urgent ones are re-notified."""
+        counts = crud_maintenance.escalate_overdue(test_db, batch_size=1)
+
+        assert counts == {"escalated": 2, "notified": 1}
+        test_db.expire_all()
+        by_title = {r.title: r for r in test_db.query(models.MaintenanceRequest)}
+        assert by_title["low"].priority == MaintenancePriority.NORMAL
+        assert by_title["normal"].priority == MaintenancePriority.HIGH
+        assert by_title["urgent"].escalation_level == 1
+        assert by_title["resolved"].priority == MaintenancePriority.LOW
+        assert not any(r.is_overdue for r in by_title.values())
+        assert crud_maintenance.escalate_overdue(test_db) == {"escalated": 0, "notified": 0}
+
+    def test_backfill_missing_deadlines(self, test_db: Session, requests):
+        """Test that requests without a deadline get one from their priority."""
+        test_db.query(models.MaintenanceRequest).update({"sla_due_at": None})
+        test_db.commit()
+
+        assert crud_maintenance.backfill_sla_deadlines(test_db, batch_size=2) == 4
+        test_db.expire_all()
+        low = test_db.get(models.MaintenanceRequest, requests["low"].id)
+        assert low.sla_due_at == low.reported_at + timedelta(days=7)
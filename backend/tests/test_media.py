@@ -0,0 +1,109 @@
+"""Tests for streamed media uploads, deduplication, thumbnails and range requests."""
+
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app import models
+from app.api import deps
+from app.core.config import settings
+from app.db.base import get_db
+from app.main import app
+from app.services import media as media_service
+
+
+@pytest.fixture
+def media_client(test_db: Session, test_owner, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MEDIA_DIR", str(tmp_path))
+    # The in-memory database exists per connection; share this thread's with the app's thread
+    connection = test_db.get_bind().connect()
+    db = Session(bind=connection)
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides.update({get_db: lambda: db, deps.get_current_user: lambda: test_owner})
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(previous)
+        db.close()
+        connection.close()
+        media_service.shutdown_pool()
+
+
+def _png(color="red", size=(800, 600)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, "PNG")
+    return out.getvalue()
+
+
+def _upload(client, path, body, filename="photo.png", content_type="image/png"):
+    return client.post(
+        f"/api/v1/media/{path}", params={"filename": filename}, content=body, headers={"Content-Type": content_type}
+    )
+
+
+class TestMedia:
+    """Test uploading, listing and serving property and maintenance media."""
+
+    def test_upload_dedupes_identical_content(self, media_client, test_db: Session, test_property, test_unit, test_owner):
+        """Test that the same file uploaded twice is stored once but attached twice."""
+        request = models.MaintenanceRequest(unit_id=test_unit.id, reported_by=test_owner.id, title="leak", description="-")
+        test_db.add(request)
+        test_db.commit()
+        body = _png()
+
+        first = _upload(media_client, f"properties/{test_property.id}", body)
+        second = _upload(media_client, f"maintenance-requests/{request.id}", body, filename="../leak.png")
+
+        assert first.status_code == 200 and second.status_code == 200
+        assert first.json()["sha256"] == second.json()["sha256"]
+        assert second.json()["filename"] == "leak.png"
+        assert test_db.query(models.MediaBlob).count() == 1
+        blobs = os.listdir(os.path.join(settings.MEDIA_DIR, "blobs", first.json()["sha256"][:2]))
+        assert blobs == [first.json()["sha256"]]
+        listed = media_client.get(f"/api/v1/media/maintenance-requests/{request.id}").json()
+        assert [m["id"] for m in listed] == [second.json()["id"]]
+
+    def test_rejects_unsupported_and_oversized_uploads(self, media_client, test_property, monkeypatch):
+        """Test that unknown types and uploads over the limit are refused without leaving files behind."""
+        assert _upload(media_client, f"properties/{test_property.id}", b"MZ...", content_type="application/x-msdownload").status_code == 400
+        monkeypatch.setattr(settings, "MEDIA_MAX_UPLOAD_BYTES", 10)
+        assert _upload(media_client, f"properties/{test_property.id}", _png()).status_code == 413
+        assert _upload(media_client, f"properties/{test_property.id + 1}", _png()).status_code == 404
+        assert not os.path.exists(os.path.join(settings.MEDIA_DIR, "blobs"))
+
+    def test_serves_ranges_with_cache_headers(self, media_client, test_property):
+        """Test full and partial downloads, conditional requests and unsatisfiable ranges."""
+        body = os.urandom(3 * media_service.READ_CHUNK_SIZE + 17)
+        attachment = _upload(media_client, f"properties/{test_property.id}", body, "tour.mp4", "video/mp4").json()
+        url = f"/api/v1/media/{attachment['id']}"
+
+        full = media_client.get(url)
+        assert full.content == body
+        assert full.headers["cache-control"] == "private, max-age=31536000, immutable"
+        etag = full.headers["etag"]
+
+        part = media_client.get(url, headers={"Range": "bytes=1048570-2097160"})
+        assert part.status_code == 206
+        assert part.content == body[1048570:2097161]
+        assert part.headers["content-range"] == f"bytes 1048570-2097160/{len(body)}"
+        assert media_client.get(url, headers={"Range": "bytes=-10"}).content == body[-10:]
+
+        assert media_client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        assert media_client.get(url, headers={"Range": f"bytes={len(body)}-"}).status_code == 416
+
+    def test_thumbnail(self, media_client, test_property):
+        """Test that image uploads get a small JPEG thumbnail and other files none."""
+        image = _upload(media_client, f"properties/{test_property.id}", _png()).json()
+        document = _upload(media_client, f"properties/{test_property.id}", b"%PDF-1.4", "deed.pdf", "application/pdf").json()
+
+        response = media_client.get(f"/api/v1/media/{image['id']}/thumbnail")
+
+        assert response.status_code == 200
+        thumbnail = Image.open(io.BytesIO(response.content))
+        assert thumbnail.format == "JPEG" and thumbnail.size == (settings.MEDIA_THUMBNAIL_SIZE, 240)
+        assert media_client.get(f"/api/v1/media/{document['id']}/thumbnail").status_code == 404
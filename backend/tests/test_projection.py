@@ -0,0 +1,100 @@
+"""Tests for the portfolio rent projection service."""
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services import projection as projection_service
+from app.services.projection import PortfolioArrays, ProjectionParams, compute_schedule
+
+
+class TestComputeSchedule:
+    """Test the vectorized schedule computation."""
+
+    def _arrays(self, market, leases):
+        unit_idx, rent, start, end = zip(*leases) if leases else ((), (), (), ())
+        return PortfolioArrays(
+            unit_ids=np.arange(len(market)),
+            unit_property_ids=np.zeros(len(market), dtype=np.int64),
+            market_rent=np.array(market, dtype=float),
+            lease_unit_idx=np.array(unit_idx, dtype=np.int64),
+            lease_rent=np.array(rent, dtype=float),
+            lease_start=np.array(start, dtype=np.int64),
+            lease_end=np.array(end, dtype=np.int64),
+        )
+
+    def test_vacant_unit_earns_discounted_market_rent(self):
+        """Test that an unleased unit earns market rent net of vacancy."""
+        data = self._arrays([1000.0], [])
+        params = ProjectionParams(years=1, indexation_rate=0.0, vacancy_rate=0.1)
+
+        expected, contracted = compute_schedule(data, params, start_month=0)
+
+        assert expected.shape == (1, 12)
+        assert np.allclose(expected, 900.0)
+        assert np.allclose(contracted, 0.0)
+
+    def test_lease_then_renewal_blend(self):
+        """Test contracted months followed by the renewal scenario."""
+        data = self._arrays([1000.0], [(0, 1200.0, 0, 5)])
+        params = ProjectionParams(years=1, indexation_rate=0.0, renewal_probability=0.5, vacancy_rate=0.0)
+
+        expected, contracted = compute_schedule(data, params, start_month=0)
+
+        assert np.allclose(contracted[0, :6], 1200.0)
+        assert np.allclose(contracted[0, 6:], 0.0)
+        assert np.allclose(expected[0, 6:], 0.5 * 1200.0 + 0.5 * 1000.0)
+
+    def test_indexation_applies_yearly(self):
+        """Test that rents step up once every twelve months."""
+        data = self._arrays([1000.0], [(0, 1000.0, 0, 23)])
+        params = ProjectionParams(years=2, indexation_rate=10.0)
+
+        expected, _ = compute_schedule(data, params, start_month=0)
+
+        assert np.allclose(expected[0, :12], 1000.0)
+        assert np.allclose(expected[0, 12:], 1100.0)
+
+
+class TestProjectRent:
+    """Test the database-backed projection and its cache."""
+
+    def test_projection_for_portfolio(self, test_db: Session, test_owner, test_unit, test_tenant):
+        """Test totals and cache invalidation when leases change."""
+        start = date(2031, 1, 1)
+        params = ProjectionParams(years=1, indexation_rate=0.0, vacancy_rate=0.0, start=start)
+
+        vacant = projection_service.project_rent(test_db, owner_id=test_owner.id, params=params)
+        assert vacant["unit_count"] == 1
+        assert vacant["expected"] == [1200.0] * 12
+        assert vacant["contracted"] == [0.0] * 12
+        assert projection_service.project_rent(test_db, owner_id=test_owner.id, params=params) is vacant
+
+        test_db.add(models.Lease(
+            unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1500.0,
+            lease_start_date=date(2030, 1, 1), lease_end_date=date(2031, 12, 31),
+        ))
+        test_db.commit()
+
+        leased = projection_service.project_rent(test_db, owner_id=test_owner.id, params=params)
+        assert leased is not vacant
+        assert leased["contracted"] == [1500.0] * 12
+        assert leased["by_property"][0]["property_id"] == test_unit.property_id
+        assert len(leased["months"]) == 12 and leased["months"][0] == start
+
+    def test_replaced_unit_is_not_served_from_cache(self, test_db: Session, test_owner, test_property, test_unit):
+        """Test that deleting a unit and adding another of the same count and version is seen."""
+        params = ProjectionParams(years=1, indexation_rate=0.0, vacancy_rate=0.0, start=date(2031, 1, 1))
+        test_db.add(models.Unit(property_id=test_property.id, unit_number="2", current_rent=1200.0))
+        test_db.commit()
+        before = projection_service.project_rent(test_db, owner_id=test_owner.id, params=params)
+
+        test_db.delete(test_unit)
+        test_db.add(models.Unit(property_id=test_property.id, unit_number="3", current_rent=900.0))
+        test_db.commit()
+
+        after = projection_service.project_rent(test_db, owner_id=test_owner.id, params=params)
+        assert after["unit_count"] == before["unit_count"] == 2
+        assert after["expected"] == [2100.0] * 12
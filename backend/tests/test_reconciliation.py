@@ -0,0 +1,137 @@
+"""Tests for matching bank transactions to invoices."""
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models.invoice import InvoiceStatus
+from app.models.lease import LeaseStatus
+from app.models.transaction import TransactionType
+from app.services import billing as billing_service
+from app.services import reconciliation as reconciliation_service
+
+
+@pytest.fixture
+def invoices(test_db: Session, test_owner, test_unit, test_tenant):
+    test_db.add(models.Lease(
+        unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1000.0,
+        lease_start_date=date(2024, 1, 1), lease_end_date=date(2040, 12, 31),
+        status=LeaseStatus.ACTIVE,
+    ))
+    test_db.commit()
+    for month in (1, 2, 3):
+        billing_service.execute_billing_run(
+            test_db, period=date(2024, month, 1), owner_id=test_owner.id, issue_date=date(2024, month, 1)
+        )
+    return test_db.query(models.Invoice).order_by(models.Invoice.id).all()
+
+
+def _transaction(db: Session, owner, tx_id: str, amount: float, booked: date, reference="", description=""):
+    db.add(models.Transaction(
+        id=tx_id, user_id=str(owner.id), amount=amount, currency="EUR", reference=reference,
+        description=description, type=TransactionType.INCOME,
+        booking_date=datetime.combine(booked, datetime.min.time()),
+        value_date=datetime.combine(booked, datetime.min.time()),
+    ))
+    db.commit()
+
+
+class TestReconciliation:
+    """Test exact, fuzzy and rejected matches and their bookings."""
+
+    def test_reference_match_marks_invoice_paid(self, test_db: Session, test_owner, invoices):
+        """Test that an invoice number in the reference matches regardless of formatting."""
+        number = invoices[1].invoice_number.lower().replace("-", " ")
+        _transaction(test_db, test_owner, "tx-1", 1000.0, date(2024, 2, 10), reference=f"rent {number}")
+
+        report = reconciliation_service.reconcile(test_db, owner_id=test_owner.id)
+
+        assert report["matched"] == 1 and report["invoices_paid"] == 1
+        item = report["items"][0]
+        assert (item["invoice_id"], item["rule"]) == (invoices[1].id, "reference")
+        test_db.expire_all()
+        assert test_db.get(models.Invoice, invoices[1].id).status == InvoiceStatus.PAID
+        assert test_db.get(models.Transaction, "tx-1").invoice_id == invoices[1].id
+        # Reconciled transactions are not considered again
+        assert reconciliation_service.reconcile(test_db, owner_id=test_owner.id)["transactions"] == 0
+
+    def test_invoice_numbers_beyond_six_digits(self, test_db: Session, test_owner, invoices):
+        """Test that a seven-digit number is not cut short to another invoice's number."""
+        invoices[0].invoice_number = models.Invoice.format_invoice_number("9", 100000)
+        invoices[1].invoice_number = models.Invoice.format_invoice_number("9", 1000000)
+        test_db.commit()
+        _transaction(test_db, test_owner, "tx-1", 1000.0, date(2024, 2, 10), reference="rent INV-9-1000000 feb")
+
+        item = reconciliation_service.reconcile(test_db, owner_id=test_owner.id)["items"][0]
+
+        assert (item["invoice_id"], item["rule"]) == (invoices[1].id, "reference")
+
+    def test_payment_in_parts_settles_the_invoice(self, test_db: Session, test_owner, invoices):
+        """Test that two transactions citing one invoice are both booked against it."""
+        number = invoices[1].invoice_number
+        _transaction(test_db, test_owner, "tx-1", 600.0, date(2024, 2, 10), reference=number)
+        _transaction(test_db, test_owner, "tx-2", 400.0, date(2024, 2, 12), reference=number)
+
+        report = reconciliation_service.reconcile(test_db, owner_id=test_owner.id)
+
+        assert report["matched"] == 2 and report["invoices_paid"] == 1
+        assert {item["invoice_id"] for item in report["items"]} == {invoices[1].id}
+        test_db.expire_all()
+        invoice = test_db.get(models.Invoice, invoices[1].id)
+        assert (invoice.status, invoice.paid_at) == (InvoiceStatus.PAID, datetime(2024, 2, 12))
+
+    def test_fuzzy_match_on_amount_date_and_name(self, test_db: Session, test_owner, invoices):
+        """Test that a payment without reference matches the invoice due closest, by tenant name."""
+        _transaction(test_db, test_owner, "tx-1", 1000.0, date(2024, 3, 16), description="Huur T. Tenent")
+
+        report = reconciliation_service.reconcile(test_db, owner_id=test_owner.id)
+
+        item = report["items"][0]
+        assert (item["invoice_id"], item["rule"]) == (invoices[2].id, "fuzzy")
+        assert "name match 50%" in item["reasons"][0]
+        assert report["invoices_paid"] == 1
+
+    def test_unmatched_transactions_explain_why(self, test_db: Session, test_owner, invoices):
+        """Test that low-confidence and amount mismatches are reported, not booked."""
+        _transaction(test_db, test_owner, "tx-1", 1000.0, date(2024, 2, 15), description="transfer")
+        _transaction(test_db, test_owner, "tx-2", 999.0, date(2024, 2, 15), description="Tom Tenant")
+
+        report = reconciliation_service.reconcile(test_db, owner_id=test_owner.id)
+
+        assert report["matched"] == 0
+        reasons = {item["transaction_id"]: item["reasons"][0] for item in report["items"]}
+        assert "below" in reasons["tx-1"]
+        assert reasons["tx-2"].startswith("no open invoice of 999.00 EUR")
+
+    def test_dry_run_books_nothing(self, test_db: Session, test_owner, invoices):
+        """Test that a dry run reports matches without paying invoices."""
+        _transaction(test_db, test_owner, "tx-1", 1000.0, date(2024, 1, 20), reference=invoices[0].invoice_number)
+
+        report = reconciliation_service.reconcile(test_db, owner_id=test_owner.id, dry_run=True)
+
+        assert report["matched"] == 1 and report["invoices_paid"] == 0
+        test_db.expire_all()
+        assert test_db.get(models.Invoice, invoices[0].id).status == InvoiceStatus.PENDING
+        assert test_db.get(models.Transaction, "tx-1").invoice_id is None
+
+    def test_invoice_from_before_the_ledger_is_settled(self, test_db: Session, test_owner, invoices):
+        """Test that payments over two runs settle an invoice that had no ledger charge."""
+        legacy = models.Invoice(
+            lease_id=invoices[0].lease_id, invoice_number="INV-9-000001", issue_date=date(2023, 12, 1),
+            due_date=date(2023, 12, 15), amount=1000.0, total_amount=1000.0,
+        )
+        test_db.add(legacy)
+        test_db.commit()
+
+        _transaction(test_db, test_owner, "tx-1", 600.0, date(2023, 12, 10), reference=legacy.invoice_number)
+        first = reconciliation_service.reconcile(test_db, owner_id=test_owner.id)
+        _transaction(test_db, test_owner, "tx-2", 400.0, date(2023, 12, 12), reference=legacy.invoice_number)
+        second = reconciliation_service.reconcile(test_db, owner_id=test_owner.id)
+
+        assert (first["matched"], first["invoices_paid"]) == (1, 0)
+        assert (second["matched"], second["invoices_paid"]) == (1, 1)
+        test_db.expire_all()
+        assert test_db.get(models.Invoice, legacy.id).status == InvoiceStatus.PAID
+        assert test_db.get(models.LeaseBalance, legacy.lease_id).balance == 3000.0
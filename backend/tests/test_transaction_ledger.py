@@ -0,0 +1,134 @@
+"""Tests for the transaction ledger and its CSV export."""
+
+import csv
+import io
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.api import deps
+from app.core.config import settings
+from app.db.base import get_db
+from app.main import app
+from app.models.transaction import TransactionType
+from app.services import transaction_ledger
+
+START = datetime(2024, 1, 1)
+
+
+def _add_transactions(db: Session, owner, count, user_id=None, **values):
+    rows = []
+    for i in range(count):
+        # Two transactions per day, so pages have to break ties on id
+        booked = START + timedelta(days=i // 2)
+        amount = 1000 if i % 5 == 0 else -(10 + i)
+        rows.append({
+            "id": str(uuid.uuid4()), "user_id": user_id or str(owner.id), "amount": amount, "currency": "EUR",
+            "type": TransactionType.INCOME if amount > 0 else TransactionType.EXPENSE, "description": f"tx {i}",
+            "category": "rent" if amount > 0 else "repairs", "bank_account_id": f"acc{i % 2}",
+            "booking_date": booked, "value_date": booked, **values,
+        })
+    db.execute(models.Transaction.__table__.insert(), rows)
+    db.commit()
+    return rows
+
+
+@pytest.fixture
+def ledger_client(test_db: Session, test_owner):
+    # The in-memory database exists per connection; share this thread's with the app's thread
+    connection = test_db.get_bind().connect()
+    db = Session(bind=connection)
+    previous = dict(app.dependency_overrides)
+    owner_id = test_owner.id
+    app.dependency_overrides.update({get_db: lambda: db, deps.get_current_user: lambda: db.get(models.User, owner_id)})
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(previous)
+        db.close()
+        connection.close()
+
+
+class TestLedger:
+    """Test filtering and keyset pagination of an owner's transactions."""
+
+    def test_pages_cover_the_ledger_once_newest_first(self, test_db: Session, test_owner):
+        """Test that following cursors returns every transaction exactly once, ties included."""
+        rows = _add_transactions(test_db, test_owner, 25)
+        _add_transactions(test_db, test_owner, 3, user_id="999")
+        query = transaction_ledger.ledger_query(test_db, user_id=test_owner.id)
+
+        seen, cursor = [], None
+        while True:
+            transactions, cursor = transaction_ledger.page(query, before=cursor, limit=7)
+            seen.extend(transactions)
+            if cursor is None:
+                break
+        assert len(seen) == 25 and {tx.id for tx in seen} == {row["id"] for row in rows}
+        keys = [(tx.booking_date, tx.id) for tx in seen]
+        assert keys == sorted(keys, reverse=True)
+
+    def test_filters(self, test_db: Session, test_owner):
+        """Test the account, type, category and inclusive date range filters."""
+        _add_transactions(test_db, test_owner, 40)
+
+        def count(**filters):
+            return transaction_ledger.ledger_query(test_db, user_id=test_owner.id, **filters).count()
+
+        assert count(account_id="acc1") == 20
+        assert count(type=TransactionType.INCOME) == count(category="rent") == 8
+        assert count(start=date(2024, 1, 3), end=date(2024, 1, 4)) == 4
+        with pytest.raises(ValueError):
+            count(start=date(2024, 2, 1), end=date(2024, 1, 1))
+
+    def test_reads_use_the_owner_date_index(self, test_db: Session, test_owner):
+        """Test that a date-range page is read from the index, not by scanning the table."""
+        query = transaction_ledger.ledger_query(test_db, user_id=test_owner.id, start=date(2024, 1, 1))
+        statement = query.limit(100).statement.compile(test_db.get_bind(), compile_kwargs={"literal_binds": True})
+        plan = " ".join(row[-1] for row in test_db.execute(text(f"EXPLAIN QUERY PLAN {statement}")))
+        assert "ix_transactions_user_id_booking_date_id" in plan and "TEMP B-TREE" not in plan
+
+    def test_invalid_cursor_is_rejected(self, test_db: Session, test_owner):
+        """Test that a tampered cursor is a client error."""
+        query = transaction_ledger.ledger_query(test_db, user_id=test_owner.id)
+        with pytest.raises(ValueError):
+            transaction_ledger.page(query, before="not-a-cursor")
+
+
+class TestLedgerAPI:
+    """Test the ledger and export endpoints."""
+
+    def test_ledger_endpoint(self, ledger_client, test_db: Session, test_owner):
+        """Test a filtered page and following its cursor."""
+        _add_transactions(test_db, test_owner, 12)
+
+        first = ledger_client.get("/api/v1/transactions/", params={"type": "expense", "limit": 5}).json()
+        second = ledger_client.get(
+            "/api/v1/transactions/", params={"type": "expense", "limit": 5, "before": first["next_cursor"]}
+        ).json()
+
+        assert [len(first["transactions"]), len(second["transactions"])] == [5, 4]
+        assert second["next_cursor"] is None
+        assert {tx["type"] for tx in first["transactions"] + second["transactions"]} == {"expense"}
+        assert ledger_client.get("/api/v1/transactions/", params={"before": "bad"}).status_code == 400
+
+    def test_csv_export_is_streamed_in_pages(self, ledger_client, test_db: Session, test_owner, monkeypatch):
+        """Test that the export holds every transaction, read a page at a time."""
+        monkeypatch.setattr(settings, "TRANSACTION_EXPORT_BATCH_SIZE", 4)
+        rows = _add_transactions(test_db, test_owner, 10)
+
+        response = ledger_client.get("/api/v1/transactions/export", params={"account_id": "acc0"})
+
+        assert response.status_code == 200 and response.headers["content-type"].startswith("text/csv")
+        exported = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["id"] for row in exported] == [
+            row["id"] for row in sorted(rows, key=lambda row: (row["booking_date"], row["id"]), reverse=True)
+            if row["bank_account_id"] == "acc0"
+        ]
+        assert exported[-1]["amount"] == "1000.00" and exported[-1]["type"] == "income"
@@ -0,0 +1,80 @@
+"""Tests for incremental VAT rollups and the VAT return."""
+
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud.crud_invoice import invoice as crud_invoice
+from app.models.lease import LeaseStatus
+from app.services import billing as billing_service
+from app.services import vat as vat_service
+
+
+@pytest.fixture
+def leases(test_db: Session, test_unit, test_tenant):
+    created = []
+    for offset, vat_rate in enumerate([21.0, 21.0, 9.0]):
+        lease = models.Lease(
+            unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1000.0, vat_rate=vat_rate,
+            lease_start_date=date(2024, 1 + offset * 3, 1), lease_end_date=date(2024, 3 + offset * 3, 28),
+            status=LeaseStatus.ACTIVE,
+        )
+        test_db.add(lease)
+        created.append(lease)
+    test_db.commit()
+    return created
+
+
+def _rollups(db: Session):
+    return sorted(
+        (r.period, r.vat_rate, r.entry_count, round(r.vat_amount, 2))
+        for r in db.query(models.VATRollup)
+    )
+
+
+class TestVATRollups:
+    """Test that rollups follow every VAT entry write and match a full rebuild."""
+
+    def test_billing_and_single_invoices_update_rollups(self, test_db: Session, test_owner, leases):
+        """Test that both invoice paths add to the same rollup rows."""
+        billing_service.execute_billing_run(
+            test_db, period=date(2024, 2, 1), owner_id=test_owner.id, issue_date=date(2024, 2, 1)
+        )
+        billing_service.execute_billing_run(
+            test_db, period=date(2024, 5, 1), owner_id=test_owner.id, issue_date=date(2024, 5, 1)
+        )
+        invoice = crud_invoice.create_for_lease(test_db, lease_id=leases[2].id, owner_id=test_owner.id)
+
+        today = invoice.issue_date.replace(day=1)
+        expected = [(date(2024, 2, 1), 21.0, 1, 210.0), (date(2024, 5, 1), 21.0, 1, 210.0), (today, 9.0, 1, 90.0)]
+        assert _rollups(test_db) == sorted(expected)
+
+    def test_rebuild_matches_incremental(self, test_db: Session, test_owner, leases):
+        """Test that a rebuild reproduces the incrementally maintained rollups."""
+        for lease in leases:
+            crud_invoice.create_for_lease(test_db, lease_id=lease.id, owner_id=test_owner.id)
+        incremental = _rollups(test_db)
+        assert sum(row[2] for row in incremental) == 3
+
+        test_db.query(models.VATRollup).delete()
+        test_db.commit()
+        assert vat_service.rebuild_rollups(test_db, owner_id=test_owner.id) == len(incremental)
+        assert _rollups(test_db) == incremental
+
+    def test_quarterly_return(self, test_db: Session, test_owner, leases):
+        """Test that the return sums the quarter's months per country and rate."""
+        for month in (1, 2, 4):
+            billing_service.execute_billing_run(
+                test_db, period=date(2024, month, 1), owner_id=test_owner.id, issue_date=date(2024, month, 1)
+            )
+        start, end = vat_service.quarter_bounds(2024, 1)
+        result = vat_service.vat_return(test_db, owner_id=test_owner.id, start=start, end=end)
+
+        assert (start, end) == (date(2024, 1, 1), date(2024, 3, 1))
+        assert result["lines"] == [{
+            "country_iso": "NL", "vat_rate": 21.0, "entry_count": 2,
+            "net_amount": 2000.0, "vat_amount": 420.0, "gross_amount": 2420.0,
+        }]
+        assert result["vat_amount"] == 420.0
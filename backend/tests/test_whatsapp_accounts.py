@@ -0,0 +1,127 @@
+"""Tests for routing WhatsApp webhooks, replies and sends per business account."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import models
+from app.api import deps
+from app.db.base import get_db
+from app.main import app
+from app.models.whatsapp_config import WhatsAppConfig
+from app.services import whatsapp as whatsapp_service
+from app.services.whatsapp_accounts import registry
+from app.services.whatsapp_conversations import reply_to
+
+
+@pytest.fixture
+def webhook_client(test_db: Session):
+    # The in-memory database exists per connection; share one with the threadpool
+    connection = test_db.get_bind().connect()
+    db = Session(bind=connection)
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+    db.close()
+    connection.close()
+
+
+@pytest.fixture
+def second_owner(test_db: Session):
+    owner = models.User(email="other@example.com", hashed_password="not-used", first_name="Otto", last_name="Other")
+    test_db.add(owner)
+    test_db.flush()
+    test_db.add(WhatsAppConfig(
+        user_id=owner.id, phone_number_id="2", access_token="token2", verify_token="verify2", app_secret="secret2",
+    ))
+    test_db.commit()
+    return owner
+
+
+class TestWhatsAppAccounts:
+    """Test credential lookup, caching and per-account routing."""
+
+    def test_webhooks_are_verified_with_their_accounts_secret(
+        self, webhook_client, test_whatsapp_account, second_owner, webhook_payload, sign_webhook
+    ):
+        """Test that each number's events must be signed with that number's app secret."""
+        body = webhook_payload(phone_number_id="2")
+        post = lambda signature: webhook_client.post(
+            "/api/v1/whatsapp/webhook", content=body, headers={"X-Hub-Signature-256": signature}
+        )
+        assert post(sign_webhook(body, "secret")).status_code == 403
+        assert post(sign_webhook(body, "secret2")).status_code == 200
+
+        unknown = webhook_payload(phone_number_id="3")
+        assert webhook_client.post(
+            "/api/v1/whatsapp/webhook", content=unknown, headers={"X-Hub-Signature-256": sign_webhook(unknown, "secret")}
+        ).status_code == 403
+
+    def test_subscription_accepts_any_accounts_verify_token(self, webhook_client, test_whatsapp_account, second_owner):
+        """Test the webhook handshake against the configured verify tokens."""
+        params = {"hub_mode": "subscribe", "hub_challenge": "42"}
+        response = webhook_client.get("/api/v1/whatsapp/webhook", params={**params, "hub_verify_token": "verify2"})
+        assert (response.status_code, response.text) == (200, "42")
+        assert webhook_client.get(
+            "/api/v1/whatsapp/webhook", params={**params, "hub_verify_token": "wrong"}
+        ).status_code == 403
+
+    def test_snapshot_is_cached_until_an_account_changes(self, test_db: Session, test_whatsapp_account):
+        """Test that lookups skip the database and saving a config takes effect at once."""
+        assert registry.snapshot(test_db).for_phone_number_id("1").access_token == "token"
+        # Bypasses the ORM, so only the cache can still answer
+        test_db.execute(WhatsAppConfig.__table__.delete())
+        assert registry.snapshot(test_db).for_phone_number_id("1").access_token == "token"
+
+        test_db.rollback()
+        test_whatsapp_account.access_token = "rotated"
+        test_db.commit()
+        assert registry.snapshot(test_db).for_phone_number_id("1").access_token == "rotated"
+
+    def test_senders_are_matched_among_the_accounts_owners_tenants(
+        self, test_db: Session, test_whatsapp_account, second_owner, test_tenant
+    ):
+        """Test that the same number is a tenant to one owner and a stranger to another."""
+        accounts = registry.snapshot(test_db)
+        assert accounts.for_owner(second_owner.id).phone_number_id == "2"
+
+        own = reply_to(test_db, "31612345678", "is my rent paid?", account=accounts.for_phone_number_id("1"))
+        other = reply_to(test_db, "31612345678", "is my rent paid?", account=accounts.for_phone_number_id("2"))
+        assert "couldn't match this phone number" not in own
+        assert "couldn't match this phone number" in other
+        assert test_db.query(models.WhatsAppConversation).count() == 2
+
+    def test_messages_are_sent_with_the_accounts_credentials(self, test_db: Session, second_owner, monkeypatch):
+        """Test that sends go out from the owner's own business number."""
+        calls = []
+
+        async def fake_send_text(to_number, message_text, **credentials):
+            calls.append(credentials)
+            return "wamid.out"
+
+        monkeypatch.setattr(whatsapp_service.client, "send_text", fake_send_text)
+        account = registry.snapshot(test_db).for_owner(second_owner.id)
+        assert asyncio.run(whatsapp_service.send_whatsapp_message(account, "31612345678", "hello")) == "wamid.out"
+        assert calls == [{"phone_number_id": "2", "access_token": "token2"}]
+
+    def test_send_endpoint_reports_client_and_upstream_errors(
+        self, webhook_client, test_whatsapp_account, test_owner, monkeypatch
+    ):
+        """Test a 400 for a bad request and a 502 when WhatsApp refuses the message."""
+        app.dependency_overrides[deps.get_current_active_user] = lambda: test_owner
+
+        async def fake_send(account, to_number, message_text):
+            return None if to_number == "31600000000" else "wamid.out"
+
+        monkeypatch.setattr("app.api.api_v1.endpoints.whatsapp.send_whatsapp_message", fake_send)
+        registry.invalidate()
+
+        assert webhook_client.post("/api/v1/whatsapp/send-message", json={"to": "31612345678"}).status_code == 400
+        refused = webhook_client.post("/api/v1/whatsapp/send-message", json={"to": "31600000000", "message": "hi"})
+        assert refused.status_code == 502
+        sent = webhook_client.post("/api/v1/whatsapp/send-message", json={"to": "31612345678", "message": "hi"})
+        assert sent.status_code == 200
@@ -0,0 +1,131 @@
+"""Tests for the WhatsApp message archive and conversation threads."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.models.whatsapp_config import WebhookEventStatus
+from app.services import whatsapp_archive
+from app.services.whatsapp_archive import MessageArchive, thread
+
+
+def _reply(to_number="31612345678", text="hello", user_id=1, **values):
+    return {
+        "message_id": None, "from_number": "31201234567", "to_number": to_number, "message_text": text,
+        "direction": "outgoing", "user_id": user_id, **values,
+    }
+
+
+class TestMessageArchive:
+    """Test the write-behind buffer of outgoing messages."""
+
+    def test_buffered_messages_are_written_in_batches(self, test_db: Session, monkeypatch):
+        """Test that nothing is written until a flush, which writes everything."""
+        monkeypatch.setattr(settings, "WHATSAPP_ARCHIVE_BATCH_SIZE", 3)
+        archive = MessageArchive()
+        archive.add([_reply(to_number="+31 6 1234 5678", text=f"m{i}") for i in range(7)])
+        assert test_db.query(models.WhatsAppMessage).count() == 0
+
+        assert archive.flush(test_db) == 7 and archive.pending() == 0
+        messages = test_db.query(models.WhatsAppMessage).all()
+        assert len(messages) == 7 and {m.counterparty for m in messages} == {"31612345678"}
+
+    def test_failed_flush_keeps_messages_for_the_next_one(self, test_db: Session, monkeypatch):
+        """Test that a database error loses nothing."""
+        archive = MessageArchive()
+        archive.add([_reply(text="first")])
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("database unavailable")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(test_db, "execute", fail)
+            with pytest.raises(RuntimeError):
+                archive.flush(test_db)
+        archive.add([_reply(text="second")])
+
+        assert archive.flush(test_db) == 2
+        assert [m.message_text for m in test_db.query(models.WhatsAppMessage).order_by(models.WhatsAppMessage.id)] == [
+            "first", "second",
+        ]
+
+    def test_background_flush_on_full_batch_and_at_stop(self, shared_session, monkeypatch):
+        """Test that a full batch is written without waiting for the interval, and the rest at shutdown."""
+        monkeypatch.setattr(settings, "WHATSAPP_ARCHIVE_BATCH_SIZE", 5)
+        monkeypatch.setattr(settings, "WHATSAPP_ARCHIVE_FLUSH_SECONDS", 60)
+        archive = MessageArchive(session_factory=shared_session)
+        db = shared_session()
+
+        async def run():
+            archive.start()
+            archive.add([_reply(text=f"m{i}") for i in range(5)])
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if not archive.pending():
+                    break
+            written = db.query(models.WhatsAppMessage).count()
+            archive.add([_reply(text="last")])
+            await archive.stop()
+            return written
+
+        assert asyncio.run(run()) == 5
+        assert db.query(models.WhatsAppMessage).count() == 6
+
+
+class TestThreads:
+    """Test reading a tenant's conversation with keyset pagination."""
+
+    def test_pages_cover_the_thread_once_newest_first(self, test_db: Session):
+        """Test that following cursors returns every message exactly once, ties included."""
+        archive = MessageArchive()
+        same_time = datetime(2024, 5, 1, 12, 0)
+        archive.add([_reply(text=f"m{i}", created_at=same_time + timedelta(minutes=i // 3)) for i in range(10)])
+        archive.add([
+            _reply(to_number="31699999999", text="other tenant"),
+            _reply(text="other owner", user_id=2),
+            _reply(text="never sent", status="queued"),
+        ])
+        archive.flush(test_db)
+
+        pages, cursor = [], None
+        while True:
+            page, cursor = thread(test_db, user_id=1, phone="31612345678", before=cursor, limit=4)
+            pages.append([m.message_text for m in page])
+            if cursor is None:
+                break
+        assert [len(page) for page in pages] == [4, 4, 2]
+        texts = [text for page in pages for text in page]
+        assert texts[0] == "m9" and sorted(texts) == sorted(f"m{i}" for i in range(10))
+
+    def test_invalid_cursor_is_rejected(self, test_db: Session):
+        """Test that a tampered cursor is a client error."""
+        with pytest.raises(ValueError):
+            thread(test_db, user_id=1, phone="31612345678", before="not-a-cursor")
+
+
+class TestRetention:
+    """Test deleting old messages and compacting processed webhook bodies."""
+
+    def test_purge_deletes_only_expired_rows(self, test_db: Session, monkeypatch):
+        """Test retention and compaction in small batches."""
+        monkeypatch.setattr(settings, "WHATSAPP_ARCHIVE_PURGE_BATCH_SIZE", 2)
+        now = datetime.utcnow()
+        old = now - timedelta(days=settings.WHATSAPP_ARCHIVE_RETENTION_DAYS + 1)
+        archive = MessageArchive()
+        archive.add([_reply(text=f"old{i}", created_at=old) for i in range(5)] + [_reply(text="recent", created_at=now)])
+        archive.flush(test_db)
+        processed = now - timedelta(days=settings.WHATSAPP_ARCHIVE_COMPACT_AFTER_DAYS + 1)
+        test_db.add_all([
+            models.WhatsAppWebhookEvent(payload="{}", status=WebhookEventStatus.DONE.value, processed_at=processed),
+            models.WhatsAppWebhookEvent(payload="{}", status=WebhookEventStatus.FAILED.value, processed_at=processed),
+            models.WhatsAppWebhookEvent(payload="{}", status=WebhookEventStatus.DONE.value, processed_at=now),
+        ])
+        test_db.commit()
+
+        assert whatsapp_archive.purge(test_db, now=now) == {"messages": 5, "webhook_events": 1}
+        assert [m.message_text for m in test_db.query(models.WhatsAppMessage)] == ["recent"]
+        assert test_db.query(models.WhatsAppWebhookEvent).count() == 2
@@ -0,0 +1,199 @@
+"""Tests for templated WhatsApp broadcasts."""
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.models.invoice import InvoiceStatus
+from app.models.whatsapp_config import BroadcastStatus
+from app.services import whatsapp as whatsapp_service
+from app.services import whatsapp_broadcast
+
+TEMPLATE = "Hi {first_name}, invoice {invoice_number} of {currency} {amount} is due on {due_date}."
+
+
+@pytest.fixture
+def shared_session(shared_session, test_whatsapp_account):
+    return shared_session
+
+
+@pytest.fixture
+def audience(test_db: Session, test_owner, test_property):
+    """60 tenants with a rent invoice due in two days, plus tenants who must not be messaged."""
+    today = date.today()
+    rows = [(f"3161{i:07d}", today + timedelta(days=2), InvoiceStatus.PENDING) for i in range(60)]
+    rows += [
+        ("+31 6 9999 0001", today + timedelta(days=30), InvoiceStatus.PENDING),
+        ("+31 6 9999 0002", today + timedelta(days=2), InvoiceStatus.PAID),
+        ("+31 6 9999 0003", today - timedelta(days=1), InvoiceStatus.PENDING),
+        (None, today + timedelta(days=2), InvoiceStatus.PENDING),
+    ]
+    for i, (phone, due_date, status) in enumerate(rows):
+        tenant = models.Tenant(
+            first_name=f"T{i}", last_name="Tenant", email=f"t{i}@example.com", phone_number=phone, owner_id=test_owner.id
+        )
+        unit = models.Unit(property_id=test_property.id, unit_number=f"{i + 1}", current_rent=800.0)
+        test_db.add_all([tenant, unit])
+        test_db.flush()
+        lease = models.Lease(
+            unit_id=unit.id, tenant_id=tenant.id, rent_amount=800.0,
+            lease_start_date=date(2020, 1, 1), lease_end_date=date(2040, 12, 31),
+        )
+        test_db.add(lease)
+        test_db.flush()
+        test_db.add(models.Invoice(
+            lease_id=lease.id, invoice_number=f"INV-{i}", issue_date=due_date - timedelta(days=14),
+            due_date=due_date, amount=800.0, total_amount=800.0, status=status,
+        ))
+    test_db.commit()
+
+
+@pytest.fixture
+def graph_api(monkeypatch):
+    monkeypatch.setattr(settings, "WHATSAPP_BROADCAST_BATCH_SIZE", 25)
+    monkeypatch.setattr(settings, "WHATSAPP_BROADCAST_CONCURRENCY", 5)
+    api = {"sent": [], "in_flight": 0, "max_in_flight": 0, "fail": set()}
+
+    async def fake_send_text(to_number, message_text, **credentials):
+        api["in_flight"] += 1
+        api["max_in_flight"] = max(api["max_in_flight"], api["in_flight"])
+        try:
+            await asyncio.sleep(0.001)
+            if to_number in api["fail"]:
+                raise whatsapp_service.GraphAPIError(400, "not a WhatsApp number")
+            api["sent"].append((to_number, message_text))
+            return f"wamid.{to_number}"
+        finally:
+            api["in_flight"] -= 1
+
+    monkeypatch.setattr(whatsapp_service.client, "send_text", fake_send_text)
+    return api
+
+
+class TestWhatsAppBroadcast:
+    """Test audience selection, fan-out, status recording and resuming."""
+
+    def test_broadcast_sends_rendered_reminders_to_due_tenants(self, shared_session, audience, test_owner, graph_api):
+        """Test that only tenants with pending invoices due soon are messaged, concurrently but bounded."""
+        graph_api["fail"] = {"31610000007"}
+        db = shared_session()
+        broadcast = whatsapp_broadcast.create_broadcast(
+            db, owner_id=test_owner.id, name="June rent", template=TEMPLATE, days_ahead=7
+        )
+        assert broadcast.total_recipients == 60 and broadcast.status == BroadcastStatus.PENDING.value
+
+        asyncio.run(whatsapp_broadcast.Broadcaster(session_factory=shared_session).run(broadcast.id))
+
+        assert len(graph_api["sent"]) == 59
+        assert graph_api["max_in_flight"] == 5
+        to_number, text = graph_api["sent"][0]
+        assert to_number == "31610000000"
+        assert text == f"Hi T0, invoice INV-0 of EUR 800.00 is due on {date.today() + timedelta(days=2)}."
+        db.expire_all()
+        broadcast = db.get(models.WhatsAppBroadcast, broadcast.id)
+        assert (broadcast.status, broadcast.sent_count, broadcast.failed_count) == (BroadcastStatus.COMPLETED.value, 59, 1)
+        failed = db.query(models.WhatsAppMessage).filter_by(broadcast_id=broadcast.id, status="failed").one()
+        assert failed.to_number == "31610000007" and "not a WhatsApp number" in failed.error
+        sent = db.query(models.WhatsAppMessage).filter_by(message_id="wamid.31610000001").one()
+        assert sent.tenant_id is not None and sent.from_number == "31201234567"
+
+    def test_interrupted_broadcast_resumes_without_resending(self, shared_session, audience, test_owner, graph_api):
+        """Test that a crashed sender's broadcast is resumed from its queued remainder."""
+        db = shared_session()
+        broadcast = whatsapp_broadcast.create_broadcast(
+            db, owner_id=test_owner.id, name="June rent", template=TEMPLATE, days_ahead=7
+        )
+        # A process claims it, records one batch, then dies
+        token = whatsapp_broadcast.claim_broadcast(db, broadcast.id)
+        batch = whatsapp_broadcast.next_batch(db, broadcast.id, after_id=0, limit=25)
+        whatsapp_broadcast.record_results(db, broadcast.id, token, [(id, f"wamid.{to}", "sent", None) for id, to, _ in batch])
+
+        broadcaster = whatsapp_broadcast.Broadcaster(session_factory=shared_session)
+        assert whatsapp_broadcast.claimable_broadcast_ids(db) == []
+        asyncio.run(broadcaster.run(broadcast.id))
+        assert graph_api["sent"] == []
+
+        later = datetime.utcnow() + timedelta(seconds=settings.WHATSAPP_BROADCAST_CLAIM_TIMEOUT_SECONDS + 1)
+        assert whatsapp_broadcast.claimable_broadcast_ids(db, now=later) == [broadcast.id]
+        db.query(models.WhatsAppBroadcast).filter_by(id=broadcast.id).update(
+            {"heartbeat_at": datetime.utcnow() - timedelta(seconds=settings.WHATSAPP_BROADCAST_CLAIM_TIMEOUT_SECONDS + 1)}
+        )
+        db.commit()
+        asyncio.run(broadcaster.run(broadcast.id))
+
+        assert len(graph_api["sent"]) == 35
+        assert not {to for to, _ in graph_api["sent"]} & {to for _, to, _ in batch}
+        db.expire_all()
+        broadcast = db.get(models.WhatsAppBroadcast, broadcast.id)
+        assert (broadcast.status, broadcast.sent_count) == (BroadcastStatus.COMPLETED.value, 60)
+
+    def test_database_errors_are_retried_then_left_for_the_next_resume(
+        self, shared_session, audience, test_owner, graph_api, monkeypatch
+    ):
+        """Test that a failing result write is retried without resending, and a lasting outage releases the claim."""
+        monkeypatch.setattr(settings, "WHATSAPP_BROADCAST_DB_RETRY_SECONDS", 0)
+        db = shared_session()
+        broadcast = whatsapp_broadcast.create_broadcast(
+            db, owner_id=test_owner.id, name="June rent", template=TEMPLATE, days_ahead=7
+        )
+        record_results = whatsapp_broadcast.record_results
+        failures = {"left": 2}
+
+        def flaky_record_results(*args):
+            if failures["left"]:
+                failures["left"] -= 1
+                raise OperationalError("UPDATE", {}, Exception("database is locked"))
+            return record_results(*args)
+
+        monkeypatch.setattr(whatsapp_broadcast, "record_results", flaky_record_results)
+        broadcaster = whatsapp_broadcast.Broadcaster(session_factory=shared_session)
+        asyncio.run(broadcaster.run(broadcast.id))
+
+        db.expire_all()
+        assert db.get(models.WhatsAppBroadcast, broadcast.id).status == BroadcastStatus.COMPLETED.value
+        assert len(graph_api["sent"]) == 60
+
+        graph_api["sent"].clear()
+        broadcast = whatsapp_broadcast.create_broadcast(
+            db, owner_id=test_owner.id, name="July rent", template=TEMPLATE, days_ahead=7
+        )
+        failures["left"] = settings.WHATSAPP_BROADCAST_DB_ATTEMPTS
+        asyncio.run(broadcaster.run(broadcast.id))
+
+        db.expire_all()
+        paused = db.get(models.WhatsAppBroadcast, broadcast.id)
+        assert (paused.status, paused.claimed_by, paused.sent_count) == (BroadcastStatus.RUNNING.value, None, 0)
+        assert whatsapp_broadcast.claimable_broadcast_ids(db) == [broadcast.id]
+
+    def test_cancel_stops_remaining_messages(self, shared_session, audience, test_owner, graph_api):
+        """Test that cancelling marks queued messages and a running sender stops at its next batch."""
+        db = shared_session()
+        broadcast = whatsapp_broadcast.create_broadcast(
+            db, owner_id=test_owner.id, name="June rent", template=TEMPLATE, days_ahead=7
+        )
+        token = whatsapp_broadcast.claim_broadcast(db, broadcast.id)
+
+        whatsapp_broadcast.cancel_broadcast(db, broadcast_id=broadcast.id, owner_id=test_owner.id)
+
+        assert not whatsapp_broadcast.record_results(db, broadcast.id, token, [])
+        assert whatsapp_broadcast.next_batch(db, broadcast.id, after_id=0, limit=25) == []
+        assert db.query(models.WhatsAppMessage).filter_by(broadcast_id=broadcast.id, status="cancelled").count() == 60
+
+    def test_template_fields_are_validated(self, test_db: Session, test_owner, test_whatsapp_account):
+        """Test that unknown or unnamed placeholders are rejected before anything is queued."""
+        for template in ("Hi {name}", "Hi {}", "Hi {first_name", "Hi {first_name.__class__}", "Hi {amount:{first_name}}"):
+            with pytest.raises(ValueError):
+                whatsapp_broadcast.create_broadcast(
+                    test_db, owner_id=test_owner.id, name="x", template=template, days_ahead=7
+                )
+        assert test_db.query(models.WhatsAppBroadcast).count() == 0
+
+        empty = whatsapp_broadcast.create_broadcast(
+            test_db, owner_id=test_owner.id, name="x", template="Hi {first_name}", days_ahead=7
+        )
+        assert (empty.total_recipients, empty.status) == (0, BroadcastStatus.COMPLETED.value)
@@ -0,0 +1,118 @@
+"""Tests for the pooled, rate-limited Graph API client against a local mock server."""
+
+import asyncio
+import time
+from collections import Counter, defaultdict
+
+import pytest
+from aiohttp import web
+
+from app.core.config import settings
+from app.services.whatsapp import GraphAPIClient, GraphAPIError
+
+
+class MockGraphAPI:
+    """Answers like the messages endpoint; ``failures`` maps recipients to statuses returned first."""
+
+    def __init__(self, failures=None):
+        self.failures = {to: list(statuses) for to, statuses in (failures or {}).items()}
+        self.requests = Counter()
+        self.received = defaultdict(list)  # Arrival times per sending phone number id
+        self.connections = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        to = body["to"]
+        self.requests[to] += 1
+        self.received[request.match_info["phone_number_id"]].append(time.perf_counter())
+        self.connections.add(request.transport.get_extra_info("peername"))
+        if self.failures.get(to):
+            return web.json_response({"error": {"message": "try later"}}, status=self.failures[to].pop(0))
+        return web.json_response({"messages": [{"id": f"wamid.{request.match_info['phone_number_id']}.{to}"}]})
+
+
+async def _with_server(api: MockGraphAPI, scenario):
+    app = web.Application()
+    app.router.add_post("/{phone_number_id}/messages", api.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        return await scenario(f"http://{host}:{port}")
+    finally:
+        await runner.cleanup()
+
+
+class TestGraphAPIClient:
+    """Test throughput, connection reuse, rate limiting and retries."""
+
+    @pytest.mark.benchmark
+    def test_sends_1000_messages_per_second_over_pooled_connections(self):
+        """Test that thousands of messages go out above 1,000/s over at most pool-size connections."""
+        api = MockGraphAPI()
+
+        async def scenario(base_url):
+            client = GraphAPIClient(base_url, rate_per_second=10_000, burst=1_000, pool_size=20)
+            try:
+                started = time.perf_counter()
+                ids = await asyncio.gather(*(
+                    client.send_text(f"316{i:08d}", "Rent is due", phone_number_id="1", access_token="t")
+                    for i in range(3_000)
+                ))
+                return ids, time.perf_counter() - started
+            finally:
+                await client.close()
+
+        ids, elapsed = asyncio.run(_with_server(api, scenario))
+
+        assert len(set(ids)) == 3_000 and ids[0] == "wamid.1.31600000000"
+        assert 3_000 / elapsed > 1_000
+        assert len(api.connections) <= 20
+
+    def test_rate_limit_is_per_phone_number(self):
+        """Test that one number is throttled to its rate while another sends independently."""
+        api = MockGraphAPI()
+
+        async def scenario(base_url):
+            client = GraphAPIClient(base_url, rate_per_second=200, burst=10)
+            try:
+                await asyncio.gather(*(
+                    client.send_text(f"3161{i:07d}", "hi", phone_number_id=phone_number_id, access_token="t")
+                    for phone_number_id in ("1", "2")
+                    for i in range(60)
+                ))
+            finally:
+                await client.close()
+
+        asyncio.run(_with_server(api, scenario))
+
+        # 50 messages over the burst at 200/s take 0.25 s per number, less the first connection setup
+        first, second = sorted(api.received["1"]), sorted(api.received["2"])
+        assert first[-1] - first[0] > 0.2 and second[-1] - second[0] > 0.2
+        # The numbers were sending at the same time, not one after the other
+        assert second[0] < first[-1] and first[0] < second[-1]
+
+    def test_retries_rate_limits_and_server_errors(self, monkeypatch):
+        """Test that 429 and 5xx are retried with backoff and client errors are not."""
+        monkeypatch.setattr(settings, "WHATSAPP_RETRY_BASE_SECONDS", 0.01)
+        api = MockGraphAPI(failures={"a": [429, 429], "b": [503], "c": [400], "d": [500] * 5})
+
+        async def scenario(base_url):
+            client = GraphAPIClient(base_url, max_retries=3)
+            try:
+                results = []
+                for to in "abcd":
+                    try:
+                        results.append(await client.send_text(to, "hi", phone_number_id="1", access_token="t"))
+                    except GraphAPIError as e:
+                        results.append(e.status)
+                return results
+            finally:
+                await client.close()
+
+        results = asyncio.run(_with_server(api, scenario))
+
+        assert results == ["wamid.1.a", "wamid.1.b", 400, 500]
+        assert api.requests == {"a": 3, "b": 2, "c": 1, "d": 4}
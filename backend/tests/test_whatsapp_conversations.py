@@ -0,0 +1,123 @@
+"""Tests for matching WhatsApp senders to tenants and multi-turn conversations."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.config import settings
+from app.models.lease import LeaseStatus
+from app.models.tenant import normalize_phone
+from app.services import whatsapp_conversations
+from app.services.whatsapp_conversations import conversations, find_tenant_id, reply_to
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    whatsapp_conversations.clear_caches()
+    yield
+    whatsapp_conversations.clear_caches()
+
+
+@pytest.fixture
+def active_lease(test_db: Session, test_unit, test_tenant):
+    lease = models.Lease(
+        unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1200.0, status=LeaseStatus.ACTIVE.value,
+        lease_start_date=date(2024, 1, 1), lease_end_date=date(2030, 12, 31),
+    )
+    test_db.add(lease)
+    test_db.commit()
+    return lease
+
+
+class TestTenantPhoneIndex:
+    """Test phone normalization and the cached sender lookup."""
+
+    @pytest.mark.parametrize("number", ["+31 6 1234 5678", "0031612345678", "06-12345678", "31612345678", "+31612345678"])
+    def test_normalizes_to_international_digits(self, number):
+        """Test that the usual ways of writing a number give WhatsApp's form."""
+        assert normalize_phone(number) == "31612345678"
+
+    def test_normalized_number_follows_phone_changes(self, test_db: Session, test_tenant):
+        """Test that the indexed column is kept in sync with phone_number."""
+        assert test_tenant.phone_normalized == "31612345678"
+        test_tenant.phone_number = "+49 170 1234567"
+        test_db.commit()
+        assert test_tenant.phone_normalized == "491701234567"
+        test_tenant.phone_number = None
+        test_db.commit()
+        assert test_tenant.phone_normalized is None
+
+    def test_lookup_is_cached_and_invalidated_on_change(self, test_db: Session, test_tenant):
+        """Test that repeat senders skip the database and number changes take effect at once."""
+        assert find_tenant_id(test_db, "31612345678") == test_tenant.id
+        # Bypasses the ORM, so only the cache can still answer
+        test_db.execute(models.Tenant.__table__.update().values(phone_normalized=None))
+        assert find_tenant_id(test_db, "31612345678") == test_tenant.id
+
+        test_tenant.phone_number = "+31 6 0000 0000"
+        test_db.commit()
+        assert find_tenant_id(test_db, "31612345678") is None
+        assert find_tenant_id(test_db, "31600000000") == test_tenant.id
+
+    def test_backfill_normalizes_existing_tenants(self, test_db: Session, test_tenant):
+        """Test that tenants saved before the column existed are indexed by the backfill."""
+        test_db.execute(models.Tenant.__table__.update().values(phone_normalized=None))
+        test_db.commit()
+
+        assert crud.tenant.backfill_phone_numbers(test_db, batch_size=1) == 1
+        test_db.expire_all()
+        assert test_db.get(models.Tenant, test_tenant.id).phone_normalized == "31612345678"
+
+
+class TestConversations:
+    """Test multi-turn context kept per sender."""
+
+    def test_describing_a_repair_creates_a_maintenance_request(self, test_db: Session, active_lease, test_owner):
+        """Test the maintenance flow across messages, surviving a restart in between."""
+        assert "describe what needs to be fixed" in reply_to(test_db, "31612345678", "my sink is broken")
+        assert test_db.get(models.WhatsAppConversation, ("", "31612345678")).state == "maintenance_description"
+
+        # A restart loses the in-memory copies, not the conversation
+        whatsapp_conversations.clear_caches()
+        reply = reply_to(test_db, "31612345678", "The kitchen tap has been dripping since yesterday")
+
+        request = test_db.query(models.MaintenanceRequest).one()
+        assert f"#{request.id}" in reply
+        assert request.unit_id == active_lease.unit_id and request.reported_by == test_owner.id
+        assert request.title == "The kitchen tap has been dripping since yesterday"
+        assert "Reported via WhatsApp by Tom Tenant (+31612345678)" in request.description
+        assert conversations.get(test_db, "31612345678").state is None
+
+    def test_emergency_interrupts_without_losing_state(self, test_db: Session, active_lease):
+        """Test that an emergency is answered as one while a description is awaited."""
+        reply_to(test_db, "31612345678", "Meine Heizung ist kaputt")
+        assert "112" in reply_to(test_db, "31612345678", "Es riecht nach Gas!")
+        assert conversations.get(test_db, "31612345678").state == "maintenance_description"
+        reply = reply_to(test_db, "31612345678", "Die Heizung im Bad wird nicht warm")
+        assert "Reparaturanfrage #" in reply
+        assert test_db.query(models.MaintenanceRequest).count() == 1
+
+    def test_unchanged_conversations_are_not_rewritten(self, test_db: Session, active_lease):
+        """Test that messages which change nothing cost no write."""
+        reply_to(test_db, "31612345678", "hello")
+        updated_at = test_db.get(models.WhatsAppConversation, ("", "31612345678")).updated_at
+        reply_to(test_db, "31612345678", "hi again")
+        test_db.expire_all()
+        assert test_db.get(models.WhatsAppConversation, ("", "31612345678")).updated_at == updated_at
+
+    def test_expired_conversations_are_forgotten_and_purged(self, test_db: Session, active_lease):
+        """Test that stale context does not apply to a message a day later."""
+        reply_to(test_db, "31612345678", "my sink is broken")
+        later = datetime.utcnow() + timedelta(seconds=settings.WHATSAPP_CONVERSATION_TTL_SECONDS + 1)
+
+        assert conversations.get(test_db, "31612345678", now=later).state is None
+        assert conversations.purge_expired(test_db, now=later) == 1
+        assert test_db.query(models.WhatsAppConversation).count() == 0
+
+    def test_unknown_sender_cannot_file_requests(self, test_db: Session, active_lease):
+        """Test that numbers without a tenancy get no access."""
+        assert "couldn't match this phone number" in reply_to(test_db, "4915112345678", "my sink is broken")
+        assert reply_to(test_db, "4915112345678", "thanks").startswith("I understand your request")
+        assert test_db.query(models.MaintenanceRequest).count() == 0
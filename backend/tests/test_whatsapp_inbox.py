@@ -0,0 +1,188 @@
+"""Tests for the durable WhatsApp webhook inbox."""
+
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.core.config import settings
+from app.db.base import get_db
+from app.main import app
+from app.models.whatsapp_config import WebhookEventStatus
+from app.services import whatsapp as whatsapp_service
+from app.services import whatsapp_archive, whatsapp_conversations, whatsapp_inbox
+
+
+@pytest.fixture
+def shared_session(shared_session, test_whatsapp_account):
+    whatsapp_conversations.clear_caches()
+    return shared_session
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    messages = []
+
+    async def fake_send(account, to_number, message_text):
+        await asyncio.sleep(0)
+        messages.append((to_number, message_text))
+        return f"wamid.out{len(messages)}"
+
+    monkeypatch.setattr(whatsapp_service, "send_whatsapp_message", fake_send)
+    return messages
+
+
+class TestWebhookInbox:
+    """Test acknowledging, deduplicating and processing webhook events."""
+
+    def test_webhook_stores_events(self, shared_session, webhook_payload, sign_webhook):
+        """Test that the webhook only verifies and queues."""
+        db = shared_session()
+        previous = dict(app.dependency_overrides)
+        app.dependency_overrides[get_db] = lambda: db
+        try:
+            client = TestClient(app)
+            body = webhook_payload()
+            assert client.post("/api/v1/whatsapp/webhook", content=body, headers={"X-Hub-Signature-256": "sha256=bad"}).status_code == 403
+            bad_json = b"{not json"
+            assert client.post("/api/v1/whatsapp/webhook", content=bad_json, headers={"X-Hub-Signature-256": sign_webhook(bad_json)}).status_code == 400
+            for _ in range(3):
+                response = client.post("/api/v1/whatsapp/webhook", content=body, headers={"X-Hub-Signature-256": sign_webhook(body)})
+                assert response.status_code == 200
+        finally:
+            app.dependency_overrides.clear()
+            app.dependency_overrides.update(previous)
+
+        assert db.query(models.WhatsAppWebhookEvent).filter_by(status=WebhookEventStatus.PENDING.value).count() == 3
+
+    @pytest.mark.benchmark
+    def test_webhook_acks_fast(self, shared_session, webhook_payload, sign_webhook):
+        """Test that acknowledging a webhook stays well within Meta's patience."""
+        db = shared_session()
+        previous = dict(app.dependency_overrides)
+        app.dependency_overrides[get_db] = lambda: db
+        try:
+            client = TestClient(app)
+            body = webhook_payload()
+            timings = []
+            for _ in range(50):
+                started = time.perf_counter()
+                response = client.post("/api/v1/whatsapp/webhook", content=body, headers={"X-Hub-Signature-256": sign_webhook(body)})
+                timings.append(time.perf_counter() - started)
+                assert response.status_code == 200
+        finally:
+            app.dependency_overrides.clear()
+            app.dependency_overrides.update(previous)
+
+        # Includes the test client's own overhead
+        assert statistics.median(timings) < 0.010
+
+    def test_redelivered_message_is_answered_once(self, shared_session, sent, test_tenant, webhook_payload):
+        """Test that the same message delivered twice is stored and replied to once."""
+        db = shared_session()
+        for _ in range(2):
+            whatsapp_inbox.enqueue(db, webhook_payload())
+        inbox = whatsapp_inbox.WebhookInbox(session_factory=shared_session)
+
+        assert asyncio.run(inbox.drain()) == 2
+
+        assert len(sent) == 1 and sent[0][0] == "31612345678"
+        assert "maintenance" in sent[0][1]
+        # Replies are archived through the write-behind buffer
+        assert whatsapp_archive.archive.flush(db) == 1
+        messages = db.query(models.WhatsAppMessage).order_by(models.WhatsAppMessage.id).all()
+        assert [(m.direction, m.message_id) for m in messages] == [("incoming", "wamid.1"), ("outgoing", "wamid.out1")]
+        assert {e.status for e in db.query(models.WhatsAppWebhookEvent)} == {WebhookEventStatus.DONE.value}
+
+    def test_statuses_only_move_forward(self, shared_session, sent, webhook_payload):
+        """Test that a late 'delivered' does not overwrite 'read'."""
+        db = shared_session()
+        whatsapp_inbox.enqueue(db, webhook_payload())
+        inbox = whatsapp_inbox.WebhookInbox(session_factory=shared_session)
+        asyncio.run(inbox.drain())
+
+        whatsapp_inbox.enqueue(db, webhook_payload(message_id=None, statuses=[("wamid.out1", "read")]))
+        whatsapp_inbox.enqueue(db, webhook_payload(message_id=None, statuses=[("wamid.out1", "delivered")]))
+        asyncio.run(inbox.drain())
+
+        db.expire_all()
+        assert db.query(models.WhatsAppMessage).filter_by(message_id="wamid.out1").one().status == "read"
+
+    def test_claims_are_exclusive_and_stale_claims_reclaimed(self, shared_session, webhook_payload):
+        """Test that concurrent claims split the queue and abandoned events come back."""
+        db = shared_session()
+        for i in range(5):
+            whatsapp_inbox.enqueue(db, webhook_payload(message_id=f"wamid.{i}"))
+
+        first = whatsapp_inbox.claim_events(db, limit=3)
+        second = whatsapp_inbox.claim_events(db, limit=3)
+
+        assert [e[0] for e in first] + [e[0] for e in second] == sorted({e[0] for e in first + second})
+        assert len(first) == 3 and len(second) == 2
+        assert whatsapp_inbox.claim_events(db, limit=3) == []
+        later = datetime.utcnow() + timedelta(seconds=settings.WHATSAPP_INBOX_CLAIM_TIMEOUT_SECONDS + 1)
+        reclaimed = whatsapp_inbox.claim_events(db, limit=10, now=later)
+        assert len(reclaimed) == 5 and {attempts for _, _, attempts, _ in reclaimed} == {2}
+
+    def test_reclaimed_event_is_not_finished_by_its_old_worker(self, shared_session, webhook_payload):
+        """Test that a worker whose claim went stale cannot overwrite the new claim."""
+        db = shared_session()
+        whatsapp_inbox.enqueue(db, webhook_payload())
+        (event_id, _, _, stale_token), = whatsapp_inbox.claim_events(db, limit=1)
+        later = datetime.utcnow() + timedelta(seconds=settings.WHATSAPP_INBOX_CLAIM_TIMEOUT_SECONDS + 1)
+        (_, _, _, token), = whatsapp_inbox.claim_events(db, limit=1, now=later)
+
+        assert not whatsapp_inbox.finish_event(db, event_id, token=stale_token, error="timeout", attempts=5)
+        db.expire_all()
+        assert db.get(models.WhatsAppWebhookEvent, event_id).status == WebhookEventStatus.PROCESSING.value
+        assert whatsapp_inbox.finish_event(db, event_id, token=token)
+        db.expire_all()
+        assert db.get(models.WhatsAppWebhookEvent, event_id).status == WebhookEventStatus.DONE.value
+
+    def test_message_is_answered_on_retry_when_the_reply_failed(
+        self, shared_session, sent, monkeypatch, test_tenant, webhook_payload
+    ):
+        """Test that storing a message does not count as answering it."""
+        db = shared_session()
+        whatsapp_inbox.enqueue(db, webhook_payload())
+        inbox = whatsapp_inbox.WebhookInbox(session_factory=shared_session)
+        reply_to = whatsapp_conversations.reply_to
+
+        def failing_reply_to(*args, **kwargs):
+            raise RuntimeError("conversation store unavailable")
+
+        monkeypatch.setattr(whatsapp_conversations, "reply_to", failing_reply_to)
+        asyncio.run(inbox.drain())
+        event = db.query(models.WhatsAppWebhookEvent).one()
+        assert event.status == WebhookEventStatus.PENDING.value and sent == []
+
+        monkeypatch.setattr(whatsapp_conversations, "reply_to", reply_to)
+        asyncio.run(inbox.process_event(*whatsapp_inbox.claim_events(db, limit=1, now=event.available_at)[0]))
+        whatsapp_inbox.enqueue(db, webhook_payload())
+        asyncio.run(inbox.drain())
+
+        assert len(sent) == 1 and sent[0][0] == "31612345678"
+        db.expire_all()
+        assert db.query(models.WhatsAppMessage).filter_by(message_id="wamid.1").one().replied_at is not None
+
+    def test_failing_event_is_retried_then_failed(self, shared_session, sent, monkeypatch):
+        """Test that a broken event backs off, then is parked as failed."""
+        monkeypatch.setattr(settings, "WHATSAPP_INBOX_MAX_ATTEMPTS", 2)
+        db = shared_session()
+        whatsapp_inbox.enqueue(db, json.dumps({"entry": [{"changes": [{"field": "messages", "value": {"messages": [{}]}}]}]}).encode())
+        inbox = whatsapp_inbox.WebhookInbox(session_factory=shared_session)
+
+        asyncio.run(inbox.drain())
+        event = db.query(models.WhatsAppWebhookEvent).one()
+        assert event.status == WebhookEventStatus.PENDING.value and event.available_at > datetime.utcnow()
+
+        asyncio.run(inbox.process_event(*whatsapp_inbox.claim_events(db, limit=1, now=event.available_at)[0]))
+        db.expire_all()
+        event = db.query(models.WhatsAppWebhookEvent).one()
+        assert event.status == WebhookEventStatus.FAILED.value and event.attempts == 2 and "id" in event.last_error
+        assert sent == []
@@ -0,0 +1,116 @@
+"""Tests for the WhatsApp bot's intent classifier and handlers."""
+
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models.invoice import InvoiceStatus
+from app.models.lease import LeaseStatus
+from app.services.whatsapp_intents import IntentClassifier, classifier, respond
+
+MESSAGES = [
+    ("Hi, my sink is broken", "maintenance", "en"),
+    ("When is my rent due?", "rent", "en"),
+    ("I smell gas in the kitchen!", "emergency", "en"),
+    ("can I get my latest invoice please", "invoice", "en"),
+    ("I want to talk to the property   manager", "contact", "en"),
+    ("Meine Heizung ist kaputt", "maintenance", "de"),
+    ("Wann ist meine Miete fällig?", "rent", "de"),
+    ("Die Nebenkostenabrechnung ist falsch", "invoice", "de"),
+    ("Bonjour, j'ai une fuite dans la salle de bain", "maintenance", "fr"),
+    ("Je voudrais résilier mon bail", "lease", "fr"),
+    ("Hola, ¿cuándo vence el alquiler?", "rent", "es"),
+    ("Quiero renovar mi contrato", "lease", "es"),
+    ("ok thanks", None, "en"),
+]
+
+
+@pytest.fixture
+def tenancy(test_db: Session, test_owner, test_unit, test_tenant):
+    lease = models.Lease(
+        unit_id=test_unit.id, tenant_id=test_tenant.id, rent_amount=1200.0, status=LeaseStatus.ACTIVE.value,
+        lease_start_date=date(2024, 1, 1), lease_end_date=date(2030, 12, 31),
+    )
+    test_db.add(lease)
+    test_db.flush()
+    today = date.today()
+    for number, due_date, status in [
+        ("INV-1", today - timedelta(days=40), InvoiceStatus.PAID),
+        ("INV-2", today + timedelta(days=5), InvoiceStatus.PENDING),
+    ]:
+        test_db.add(models.Invoice(
+            lease_id=lease.id, invoice_number=number, issue_date=due_date - timedelta(days=14),
+            due_date=due_date, amount=1200.0, total_amount=1200.0, status=status,
+        ))
+    test_db.commit()
+    return lease
+
+
+class TestIntentClassifier:
+    """Test keyword matching, priorities and locales."""
+
+    @pytest.mark.parametrize("text,intent,locale", MESSAGES)
+    def test_classifies_messages_in_each_locale(self, text, intent, locale):
+        """Test that messages get their intent and the language they were written in."""
+        assert classifier.classify(text) == (intent, locale)
+
+    def test_keywords_match_whole_words_unless_stems(self):
+        """Test that 'hi' does not match 'this' while 'repair*' matches 'repairs'."""
+        assert classifier.classify("this is fine") == (None, "en")
+        assert classifier.classify("repairs needed")[0] == "maintenance"
+        assert classifier.classify("reparation svp")[0] == "maintenance"
+
+    def test_priority_decides_between_intents(self):
+        """Test that the more specific intent wins regardless of word order."""
+        assert classifier.classify("hello, the rent is due and the shower is leaking")[0] == "maintenance"
+        assert classifier.classify("help, there is smoke and my window is broken")[0] == "emergency"
+
+    def test_locale_hint_breaks_ties_between_shared_keywords(self):
+        """Test that a keyword used in several languages replies in the preferred one."""
+        assert classifier.classify("urgent!") == ("emergency", "en")
+        assert classifier.classify("urgent!", locale="fr") == ("emergency", "fr")
+
+    def test_conflicting_keyword_tables_are_rejected(self):
+        """Test that one keyword cannot mean two intents."""
+        with pytest.raises(ValueError):
+            IntentClassifier({"en": {"rent": ["due"]}, "fr": {"lease": ["due"]}})
+
+    @pytest.mark.benchmark
+    def test_classifies_100k_messages_per_second(self):
+        """Test the classifier's throughput on one core."""
+        texts = [text for text, _, _ in MESSAGES]
+        count = 200_000
+        started = time.perf_counter()
+        for i in range(count):
+            classifier.classify(texts[i % len(texts)])
+        assert count / (time.perf_counter() - started) > 100_000
+
+
+class TestIntentHandlers:
+    """Test replies built from the tenant's own data."""
+
+    def test_rent_reply_lists_open_invoices(self, test_db: Session, tenancy, test_tenant):
+        """Test that the rent reply reflects the tenant's real open invoices."""
+        reply = respond(test_db, "is my rent paid?", tenant_id=test_tenant.id)
+        assert "1 open invoice(s) totalling EUR 1200.00" in reply and "INV-2" in reply
+
+        test_db.query(models.Invoice).update({"status": InvoiceStatus.PAID.value})
+        test_db.commit()
+        assert "up to date" in respond(test_db, "is my rent paid?", tenant_id=test_tenant.id)
+
+    def test_invoice_lease_and_contact_replies(self, test_db: Session, tenancy, test_tenant, test_owner):
+        """Test the invoice, lease and contact handlers in the tenant's language."""
+        assert "INV-2" in respond(test_db, "Rechnung bitte", tenant_id=test_tenant.id)
+        assert "Ihre letzte Rechnung" in respond(test_db, "Rechnung bitte", tenant_id=test_tenant.id)
+        reply = respond(test_db, "my lease", tenant_id=test_tenant.id)
+        assert "unit 1A at Canal House" in reply and "2030-12-31" in reply and "EUR 1200.00" in reply
+        assert test_owner.email in respond(test_db, "contacter le propriétaire", tenant_id=test_tenant.id)
+
+    def test_unknown_sender_gets_no_account_details(self, test_db: Session, tenancy):
+        """Test that account questions from an unknown number reveal nothing."""
+        reply = respond(test_db, "is my rent paid?")
+        assert "couldn't match this phone number" in reply and "INV" not in reply
+        assert "¿En qué puedo ayudarle?" in respond(test_db, "hola")